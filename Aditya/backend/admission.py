@@ -0,0 +1,202 @@
+# admission.py
+"""
+Admission control with priority classes for the search endpoints.
+
+During a city-wide incident every request competes for the same MongoDB
+pool, and with unlimited queueing each one waits behind all the others, so
+latency grows for everyone, dispatchers included. The controller bounds the
+searches running at once (`max_concurrent`) and queues the rest per priority
+class (PRIORITIES, highest first):
+
+- a freed slot goes to the oldest waiter of the highest class that has one;
+- `reserved` slots are only used by the highest class, so dispatcher
+  requests find a free slot even while public traffic fills the rest;
+- each class has a queue deadline; a request not admitted by then is shed
+  (Shed is raised), as is one arriving at a full queue unless it can evict
+  the newest waiter of a lower class.
+
+A shed search is answered quickly by the caller, degraded (the last results
+recorded near the caller, search_cache.LastResults) or with a 503.
+
+Everything runs on the event loop; no locking.
+
+Metrics:
+    chetak_admission_active
+    chetak_admission_queue_depth{priority=...}
+    chetak_admission_admitted_total{priority=...}
+    chetak_admission_shed_total{priority=..., reason=queue_full|deadline|evicted}
+    chetak_admission_degraded_total{priority=...}
+    chetak_admission_wait_seconds{priority=..., outcome=admitted|shed}   (histogram)
+"""
+
+import hmac
+import time
+import asyncio
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, List, Optional
+
+import metrics
+from metrics import ADMISSION_WAIT_SECONDS, Sampled
+
+PRIORITIES = ("dispatch", "public") # Highest first
+SHED_REASONS = ("queue_full", "deadline", "evicted")
+
+
+class Shed(Exception):
+    """A request refused by admission control."""
+
+    def __init__(self, priority: str, reason: str):
+        super().__init__(f"{priority} request shed ({reason})")
+        self.priority = priority
+        self.reason = reason
+
+
+def request_priority(dispatch_key: Optional[str], dispatch_keys: Iterable[str]) -> str:
+    """'dispatch' for a request carrying one of the dispatcher API keys, else 'public'."""
+    if dispatch_key and any(hmac.compare_digest(dispatch_key.encode(), key.encode()) for key in dispatch_keys):
+        return "dispatch"
+    return "public"
+
+
+class AdmissionController:
+    """Bounded concurrency with per-priority queues and deadlines (see module docstring)."""
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_seconds: Dict[str, float], reserved: int = 0):
+        if not 0 <= reserved < max_concurrent:
+            raise ValueError("reserved slots must be fewer than max_concurrent")
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_seconds = {priority: queue_seconds[priority] for priority in PRIORITIES}
+        self.reserved = reserved
+        self.active = 0
+        # [future, deadline timer] per waiter; resolved ones are skipped when they reach the front
+        self._waiters: Dict[str, Deque[List[Any]]] = {priority: deque() for priority in PRIORITIES}
+        self._queued: Dict[str, int] = {priority: 0 for priority in PRIORITIES} # Waiters not yet admitted or shed
+        # Counters
+        self.admitted: Counter = Counter()
+        self.shed: Counter = Counter() # (priority, reason) -> requests
+        self.degraded: Counter = Counter() # Shed requests answered from the last results instead of a 503
+
+    def _limit(self, priority: str) -> int:
+        return self.max_concurrent if priority == PRIORITIES[0] else self.max_concurrent - self.reserved
+
+    def queued(self, priority: Optional[str] = None) -> int:
+        return self._queued[priority] if priority is not None else sum(self._queued.values())
+
+    def _observe(self, priority: str, outcome: str, start: float) -> None:
+        if metrics.ENABLED:
+            ADMISSION_WAIT_SECONDS.labels(priority, outcome).observe(time.perf_counter() - start)
+
+    def _refuse(self, priority: str, reason: str, start: float) -> Shed:
+        self.shed[(priority, reason)] += 1
+        self._observe(priority, "shed", start)
+        return Shed(priority, reason)
+
+    def _resolve(self, priority: str, waiter: List[Any], reason: Optional[str] = None) -> None:
+        """Admits a waiter (`reason` None) or sheds it."""
+        future, deadline = waiter
+        deadline.cancel()
+        self._queued[priority] -= 1
+        if reason is None:
+            future.set_result(None)
+        else:
+            future.set_exception(Shed(priority, reason))
+
+    def _evict_below(self, priority: str) -> bool:
+        """Sheds the newest waiter of the lowest class below `priority`; False if there is none."""
+        for lower in reversed(PRIORITIES[PRIORITIES.index(priority) + 1:]):
+            for waiter in reversed(self._waiters[lower]):
+                if not waiter[0].done():
+                    self._resolve(lower, waiter, "evicted")
+                    return True
+        return False
+
+    def _wake(self) -> None:
+        """Hands free slots to waiters, highest class first (lower classes wait while a higher one queues)."""
+        for priority in PRIORITIES:
+            waiters = self._waiters[priority]
+            while waiters and self.active < self._limit(priority):
+                waiter = waiters.popleft()
+                if not waiter[0].done():
+                    self.active += 1
+                    self._resolve(priority, waiter)
+            if self._queued[priority]:
+                return
+
+    async def acquire(self, priority: str) -> None:
+        """Waits for a slot (release() it afterwards); raises Shed if none comes in time."""
+        start = time.perf_counter()
+        ahead = any(self._queued[p] for p in PRIORITIES[:PRIORITIES.index(priority) + 1])
+        if not ahead and self.active < self._limit(priority):
+            self.active += 1
+            self.admitted[priority] += 1
+            self._observe(priority, "admitted", start)
+            return
+        if self.queued() >= self.max_queue and not self._evict_below(priority):
+            raise self._refuse(priority, "queue_full", start)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = [future, None]
+        waiter[1] = loop.call_later(self.queue_seconds[priority], self._expire, priority, waiter)
+        self._waiters[priority].append(waiter)
+        self._queued[priority] += 1
+        try:
+            await future
+        except Shed as shed:
+            self.shed[(priority, shed.reason)] += 1
+            self._observe(priority, "shed", start)
+            raise
+        except asyncio.CancelledError:
+            if future.cancelled(): # Client gone while queued
+                waiter[1].cancel()
+                self._queued[priority] -= 1
+            elif future.exception() is None: # Client gone just after being handed a slot: give it back
+                self.release()
+            raise
+        self.admitted[priority] += 1
+        self._observe(priority, "admitted", start)
+
+    def _expire(self, priority: str, waiter: List[Any]) -> None:
+        if not waiter[0].done():
+            self._resolve(priority, waiter, "deadline")
+
+    def release(self) -> None:
+        self.active -= 1
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self, priority: str) -> AsyncIterator[None]:
+        """`async with controller.slot(priority):` runs the block holding a slot (raises Shed before it if refused)."""
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "reserved_for_dispatch": self.reserved,
+            "max_queue": self.max_queue,
+            "queue_seconds": dict(self.queue_seconds),
+            "active": self.active,
+            "queued": dict(self._queued),
+            "admitted": {priority: self.admitted[priority] for priority in PRIORITIES},
+            "shed": {priority: {reason: self.shed[(priority, reason)] for reason in SHED_REASONS} for priority in PRIORITIES},
+            "degraded": {priority: self.degraded[priority] for priority in PRIORITIES},
+        }
+
+    def register_metrics(self) -> None:
+        """Exports the queue and counters at /metrics (read at scrape time)."""
+        Sampled("chetak_admission_active", "Searches holding an admission slot.", "gauge", [],
+                lambda: [((), self.active)])
+        Sampled("chetak_admission_queue_depth", "Searches waiting for an admission slot, by priority class.", "gauge", ["priority"],
+                lambda: [((priority,), self._queued[priority]) for priority in PRIORITIES])
+        Sampled("chetak_admission_admitted_total", "Searches admitted, by priority class.", "counter", ["priority"],
+                lambda: [((priority,), self.admitted[priority]) for priority in PRIORITIES])
+        Sampled("chetak_admission_shed_total", "Searches shed, by priority class and reason.", "counter", ["priority", "reason"],
+                lambda: [((priority, reason), self.shed[(priority, reason)]) for priority in PRIORITIES for reason in SHED_REASONS])
+        Sampled("chetak_admission_degraded_total", "Shed searches answered with the last results near the caller.", "counter", ["priority"],
+                lambda: [((priority,), self.degraded[priority]) for priority in PRIORITIES])
@@ -0,0 +1,92 @@
+# allocation.py
+"""
+Capacity-aware allocation of a batch of patients to hospitals.
+
+Solves the assignment that minimizes total great-circle travel distance
+subject to:
+- each patient goes to at most one hospital it is suitable for (ICU /
+  specialist / equipment filters, within the search radius),
+- each hospital receives at most its capacity.
+
+Hospitals are expanded into one column per bed ("slots") and the problem is
+solved as a sparse min-weight bipartite matching (SciPy's LAPJVsp). Each
+patient also gets a private "unassigned" column with a huge cost, so a full
+matching always exists and as many patients as possible are placed first.
+
+Pruning (exact): in an optimal assignment a patient's hospital is never
+farther than its nearest suitable hospitals whose capacities add up to the
+number of patients, since otherwise one of those would still have a free bed
+and moving the patient there would shorten the trip.
+"""
+
+import time
+from typing import List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+
+from ranking import haversine_matrix_m
+
+# Cost of leaving a patient unassigned; larger than any possible sum of real distances
+UNASSIGNED_COST_M = 1e12
+
+
+class AllocationResult(NamedTuple):
+    hospitals: List[Optional[int]]       # hospital index per patient (None = unassigned)
+    distances_m: List[Optional[float]]   # travel distance per patient (None = unassigned)
+    solver_ms: float
+
+
+def allocate(patient_lats: Sequence[float], patient_lons: Sequence[float],
+             hospital_lats: Sequence[float], hospital_lons: Sequence[float],
+             capacities: Sequence[int], suitable: np.ndarray,
+             max_distance_m: float) -> AllocationResult:
+    """
+    Assigns patients to hospitals minimizing total distance.
+    `suitable` is a boolean (n_patients, n_hospitals) matrix of capability matches.
+    """
+    start = time.perf_counter()
+    n_patients, n_hospitals = len(patient_lats), len(hospital_lats)
+    if n_patients == 0:
+        return AllocationResult([], [], 0.0)
+    if n_hospitals == 0:
+        return AllocationResult([None] * n_patients, [None] * n_patients, (time.perf_counter() - start) * 1000)
+
+    capacities = np.maximum(np.asarray(capacities, dtype=np.int64), 0)
+    distances = haversine_matrix_m(patient_lats, patient_lons, hospital_lats, hospital_lons)
+    allowed = np.asarray(suitable, dtype=bool) & (distances <= max_distance_m) & (capacities > 0)[None, :]
+
+    # --- Exact pruning: keep each patient's nearest allowed hospitals until their capacity covers everyone ---
+    masked = np.where(allowed, distances, np.inf)
+    order = np.argsort(masked, axis=1, kind="stable")
+    sorted_capacity = np.where(np.isfinite(np.take_along_axis(masked, order, axis=1)), capacities[order], 0)
+    keep_count = np.minimum((np.cumsum(sorted_capacity, axis=1) < n_patients).sum(axis=1) + 1, allowed.sum(axis=1))
+    ranks = np.empty_like(order)
+    ranks[np.arange(n_patients)[:, None], order] = np.arange(n_hospitals)[None, :]
+    keep = ranks < keep_count[:, None]
+
+    # --- Expand hospitals into bed slots (never more than the patients that may use them) ---
+    slots = np.minimum(capacities, keep.sum(axis=0))
+    slot_hospital = np.repeat(np.arange(n_hospitals), slots)
+    rows, slot_cols = np.nonzero(keep[:, slot_hospital])
+    # +1 m on every edge: explicit zeros would be dropped from the sparse matrix,
+    # and a constant per matched patient doesn't change the optimum
+    weights = distances[rows, slot_hospital[slot_cols]] + 1.0
+
+    n_slots = len(slot_hospital)
+    rows = np.concatenate([rows, np.arange(n_patients)])
+    slot_cols = np.concatenate([slot_cols, n_slots + np.arange(n_patients)])
+    weights = np.concatenate([weights, np.full(n_patients, UNASSIGNED_COST_M)])
+    graph = csr_matrix((weights, (rows, slot_cols)), shape=(n_patients, n_slots + n_patients))
+
+    matched_rows, matched_cols = min_weight_full_bipartite_matching(graph)
+
+    hospitals: List[Optional[int]] = [None] * n_patients
+    trip_m: List[Optional[float]] = [None] * n_patients
+    for patient, column in zip(matched_rows.tolist(), matched_cols.tolist()):
+        if column < n_slots:
+            hospital = int(slot_hospital[column])
+            hospitals[patient] = hospital
+            trip_m[patient] = float(distances[patient, hospital])
+    return AllocationResult(hospitals, trip_m, (time.perf_counter() - start) * 1000)
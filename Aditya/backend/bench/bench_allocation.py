@@ -0,0 +1,64 @@
+# bench/bench_allocation.py
+"""
+Benchmark: capacity-aware allocation solver (allocation.py).
+
+Solves synthetic patient batches (clustered around an incident site) against
+synthetic hospitals, reports solver time, and checks the total distance
+against a dense Hungarian-algorithm solution of the unpruned problem.
+
+Usage (from Aditya/backend):
+    python -m bench.bench_allocation --patients 500 --hospitals 1000
+"""
+
+import argparse
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from allocation import UNASSIGNED_COST_M, allocate
+from ranking import haversine_matrix_m
+
+SEARCH_RADIUS_METERS = 50000
+
+
+def dense_optimum(p_lat, p_lon, h_lat, h_lon, capacities, suitable) -> float:
+    """Total distance of the optimal assignment, solved without pruning."""
+    distances = haversine_matrix_m(p_lat, p_lon, h_lat, h_lon)
+    slot_hospital = np.repeat(np.arange(len(h_lat)), np.minimum(capacities, len(p_lat)))
+    allowed = suitable & (distances <= SEARCH_RADIUS_METERS)
+    cost = np.where(allowed[:, slot_hospital], distances[:, slot_hospital], UNASSIGNED_COST_M)
+    rows, cols = linear_sum_assignment(cost)
+    matched = cost[rows, cols]
+    return float(matched[matched < UNASSIGNED_COST_M].sum())
+
+
+def run(n_patients: int, n_hospitals: int, spread_deg: float, max_beds: int, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    p_lat = 19.0 + rng.normal(0, spread_deg, n_patients)
+    p_lon = 72.85 + rng.normal(0, spread_deg, n_patients)
+    h_lat = rng.uniform(18.85, 19.35, n_hospitals)
+    h_lon = rng.uniform(72.75, 73.20, n_hospitals)
+    capacities = rng.integers(0, max_beds + 1, n_hospitals)
+    suitable = rng.random((n_patients, n_hospitals)) < 0.6
+
+    result = allocate(p_lat, p_lon, h_lat, h_lon, capacities, suitable, SEARCH_RADIUS_METERS)
+    total = sum(d for d in result.distances_m if d is not None)
+    optimum = dense_optimum(p_lat, p_lon, h_lat, h_lon, capacities, suitable)
+    assigned = sum(1 for h in result.hospitals if h is not None)
+    print(f"{n_patients} patients x {n_hospitals} hospitals | spread {spread_deg:.2f} deg | beds 0-{max_beds} | "
+          f"solver {result.solver_ms:7.1f} ms | assigned {assigned} | total {total / 1000:10.2f} km | "
+          f"{'optimal' if abs(total - optimum) < 1e-3 * max(optimum, 1) else f'OFF (optimum {optimum / 1000:.2f} km)'}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=500)
+    parser.add_argument("--hospitals", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for spread_deg, max_beds in ((0.01, 1), (0.01, 7), (0.01, 20), (0.10, 7)):
+        run(args.patients, args.hospitals, spread_deg, max_beds, args.seed)
+
+
+if __name__ == "__main__":
+    main()
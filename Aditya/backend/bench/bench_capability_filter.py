@@ -0,0 +1,57 @@
+# bench/bench_capability_filter.py
+"""
+Micro-benchmark: capability filter cost per candidate hospital.
+
+Compares the string-based `$in` semantics (geo_index.matches_filters) with the
+bitmask filter from capabilities.py on synthetic datasets, and checks both
+select exactly the same hospitals.
+
+Usage (from Aditya/backend):
+    python -m bench.bench_capability_filter --sizes 30 10000 1000000
+"""
+
+import argparse
+import random
+import time
+
+from bench.synthetic import generate_hospitals, random_filters
+from capabilities import CapabilityIndex
+from geo_index import matches_filters
+
+
+def run(size: int, n_filters: int, seed: int) -> None:
+    docs = list(generate_hospitals(size, seed=seed))
+    capabilities = CapabilityIndex()
+    masks = capabilities.encode_all(docs)
+    rng = random.Random(seed)
+    filter_sets = [random_filters(rng) for _ in range(n_filters)]
+
+    start = time.perf_counter()
+    string_hits = [sum(1 for doc in docs if matches_filters(doc, **f)) for f in filter_sets]
+    string_ns = (time.perf_counter() - start) * 1e9 / (size * n_filters)
+
+    start = time.perf_counter()
+    bitmask_hits = []
+    for f in filter_sets:
+        matches = capabilities.compile(**f).matches
+        bitmask_hits.append(sum(1 for mask in masks if matches(mask)))
+    bitmask_ns = (time.perf_counter() - start) * 1e9 / (size * n_filters)
+
+    assert string_hits == bitmask_hits, "bitmask filter disagrees with $in semantics"
+    print(f"{size:>9} hospitals | {len(capabilities):>3} capability bits | "
+          f"$in strings: {string_ns:8.1f} ns/candidate | bitmask: {bitmask_ns:8.1f} ns/candidate | "
+          f"speed-up x{string_ns / bitmask_ns:.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[30, 10_000, 1_000_000])
+    parser.add_argument("--filters", type=int, default=20, help="Random filter sets evaluated per size")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.filters, args.seed)
+
+
+if __name__ == "__main__":
+    main()
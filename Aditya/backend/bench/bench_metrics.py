@@ -0,0 +1,151 @@
+# bench/bench_metrics.py
+"""
+Benchmark: cost of the request instrumentation (metrics.py).
+
+1. Primitives: counter increment, histogram observation, observe_stage (with
+   and without a Server-Timing list to append to) and a /metrics render.
+2. MetricsMiddleware around a no-op ASGI app, on vs off (its own cost, without
+   the noise of a real request).
+3. Whole requests through main.app's ASGI stack (no HTTP client or socket),
+   alternating blocks with metrics off, on, and on with the Server-Timing
+   header, for `GET /` (middleware only) and `GET /api/find-suitable` (middleware
+   plus the stage timings of an in-memory search). The difference between the
+   medians of the per-block means is the per-request overhead.
+
+Usage (from Aditya/backend):
+    python -m bench.bench_metrics
+    python -m bench.bench_metrics --requests 20000 --blocks 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+from bson import ObjectId
+
+import main
+import metrics
+from bench.synthetic import generate_hospitals
+from geo_index import HospitalIndex
+
+
+def time_ns(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e9
+
+
+def bench_primitives(repeat: int) -> None:
+    registry = metrics.Registry()
+    counter = metrics.Counter("bench_total", "Bench counter.", ["path"], registry=registry)
+    histogram = metrics.Histogram("bench_seconds", "Bench histogram.", ["stage"], registry=registry)
+    child = histogram.labels("db_aggregation")
+    print(f"counter.labels().inc()        {time_ns(lambda: counter.labels('/api/find-suitable').inc(), repeat):7.0f} ns")
+    print(f"histogram child observe()     {time_ns(lambda: child.observe(0.0021), repeat):7.0f} ns")
+    print(f"observe_stage()               {time_ns(lambda: metrics.observe_stage('filter_build', 0.0), repeat):7.0f} ns")
+    token = metrics._request_timings.set([])
+    print(f"observe_stage() + timings     {time_ns(lambda: metrics.observe_stage('filter_build', 0.0), repeat):7.0f} ns")
+    metrics._request_timings.reset(token)
+    start = time.perf_counter()
+    body = metrics.REGISTRY.render()
+    print(f"/metrics render               {(time.perf_counter() - start) * 1e6:7.0f} us ({len(body)} bytes)")
+
+
+async def noop_endpoint(scope, receive, send):
+    scope["endpoint"] = noop_endpoint # As the router does
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+class NoopRoute:
+    endpoint = noop_endpoint
+    path = "/noop"
+
+
+async def bench_middleware(repeat: int) -> None:
+    async def send(message):
+        pass
+
+    middleware = metrics.MetricsMiddleware(noop_endpoint, [NoopRoute()])
+    scope = {"type": "http", "method": "GET"}
+    means = {"off": [], "on": [], "on + Server-Timing": []}
+    for _ in range(5):
+        for mode in means:
+            metrics.ENABLED, middleware.server_timing_header = mode != "off", mode == "on + Server-Timing"
+            start = time.perf_counter()
+            for _ in range(repeat // 5):
+                await middleware(scope, None, send)
+            means[mode].append((time.perf_counter() - start) / (repeat // 5) * 1e9)
+    off = statistics.median(means["off"])
+    print("middleware (no-op app)        " + " | ".join(
+        f"{mode} {statistics.median(values):5.0f} ns ({statistics.median(values) - off:+.0f})" for mode, values in means.items()))
+    metrics.ENABLED = True
+
+
+def find_middleware(app) -> metrics.MetricsMiddleware:
+    if app.middleware_stack is None:
+        app.middleware_stack = app.build_middleware_stack()
+    layer = app.middleware_stack
+    while not isinstance(layer, metrics.MetricsMiddleware):
+        layer = layer.app
+    return layer
+
+
+async def call(app, path: str, query: bytes) -> None:
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": query,
+             "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80)}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def bench_requests(args) -> None:
+    main.hospital_index = HospitalIndex.from_documents(
+        {"_id": ObjectId(), **doc} for doc in generate_hospitals(args.hospitals, seed=1))
+    middleware = find_middleware(main.app)
+    modes = {"off": (False, False), "on": (True, False), "on + Server-Timing": (True, True)}
+    targets = [("/", b""), ("/api/find-suitable", b"lat=19.07&lon=72.87&needsICU=true&specialist=cardiologist")]
+
+    for path, query in targets:
+        for _ in range(args.requests // 10): # Warm up (caches, route table)
+            await call(main.app, path, query)
+        means = {mode: [] for mode in modes}
+        for _ in range(args.blocks):
+            for mode, (enabled, header) in modes.items():
+                metrics.ENABLED, middleware.server_timing_header = enabled, header
+                start = time.perf_counter()
+                for _ in range(args.requests // args.blocks):
+                    await call(main.app, path, query)
+                means[mode].append((time.perf_counter() - start) / (args.requests // args.blocks) * 1e6)
+        off = statistics.median(means["off"])
+        cells = [f"{mode} {statistics.median(values):7.1f} us ({statistics.median(values) - off:+.2f})"
+                 for mode, values in means.items()]
+        print(f"{path:20s} | " + " | ".join(cells))
+    metrics.ENABLED = True
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200000, help="Iterations per primitive")
+    parser.add_argument("--requests", type=int, default=10000, help="Requests per mode and path")
+    parser.add_argument("--blocks", type=int, default=10, help="Alternating blocks per mode")
+    parser.add_argument("--hospitals", type=int, default=2000)
+    args = parser.parse_args()
+    bench_primitives(args.repeat)
+    asyncio.run(bench_middleware(args.repeat))
+    asyncio.run(bench_requests(args))
+
+
+if __name__ == "__main__":
+    cli()
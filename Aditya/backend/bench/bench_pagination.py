@@ -0,0 +1,121 @@
+# bench/bench_pagination.py
+"""
+Checks and benchmarks cursor pagination and streaming of search results
+(HospitalIndex.search_page / iter_nearest behind /api/find-suitable/page and
+/api/find-suitable/stream).
+
+1. For random searches, walks every page through encoded cursors and checks
+   the concatenation equals one unlimited search: same hospitals, same order,
+   no repeats or gaps (also with many hospitals at identical coordinates, so
+   page boundaries fall inside groups of equal distances).
+2. Reports per-page latency by page number, and for the stream the time to
+   the first hospital vs materializing the whole list, with peak Python
+   memory of each (tracemalloc).
+
+Usage (from Aditya/backend):
+    python -m bench.bench_pagination
+    python -m bench.bench_pagination --hospitals 100000 --page-size 50 --radius-km 100
+"""
+
+import argparse
+import random
+import statistics
+import time
+import tracemalloc
+
+from bson import ObjectId
+
+from bench.synthetic import MUMBAI_REGION, generate_hospitals, random_filters
+from geo_index import HospitalIndex, doc_key
+from pagination import decode_cursor, encode_cursor, search_fingerprint
+
+
+def make_index(n: int, duplicates: int, seed: int) -> HospitalIndex:
+    """`n` synthetic hospitals, `duplicates` of them sharing the coordinates of another one."""
+    rng = random.Random(seed)
+    docs = [{"_id": ObjectId(), **doc} for doc in generate_hospitals(n, seed=seed)]
+    for doc in rng.sample(docs, min(duplicates, len(docs))):
+        doc["location"] = rng.choice(docs[:10])["location"]
+    return HospitalIndex.from_documents(docs)
+
+
+def walk_pages(index: HospitalIndex, lat: float, lon: float, filters, radius_m: float, page_size: int):
+    """Every page of a search, following cursors like a client would; returns (results, per-page ms)."""
+    fingerprint = search_fingerprint(lat, lon, sorted(filters.items(), key=str), radius_m)
+    results, page_ms, token = [], [], None
+    while True:
+        start = time.perf_counter()
+        after = decode_cursor(token, fingerprint) if token else None
+        page, distances = index.search_page(lat, lon, **filters, max_distance_m=radius_m, limit=page_size + 1, after=after)
+        token = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            token = encode_cursor(fingerprint, distances[page_size - 1], doc_key(page[-1]))
+        page_ms.append((time.perf_counter() - start) * 1000)
+        results.extend(page)
+        if token is None:
+            return results, page_ms
+
+
+def main_bench(args) -> None:
+    rng = random.Random(args.seed)
+    index = make_index(args.hospitals, args.duplicates, args.seed)
+    lat_min, lat_max, lon_min, lon_max = MUMBAI_REGION
+    radius_m = args.radius_km * 1000
+    mismatches, pages, by_page = 0, 0, {}
+    first_ms, full_ms, stream_peak, list_peak = [], [], [], []
+    for _ in range(args.queries):
+        lat, lon = rng.uniform(lat_min, lat_max), rng.uniform(lon_min, lon_max)
+        filters = random_filters(rng)
+        paged, page_ms = walk_pages(index, lat, lon, filters, radius_m, args.page_size)
+        pages += len(page_ms)
+        for number, ms in enumerate(page_ms):
+            by_page.setdefault(min(number, 9), []).append(ms)
+
+        streamed = list(index.iter_nearest(lat, lon, **filters, max_distance_m=radius_m))
+        want = index.search(lat, lon, **filters, max_distance_m=radius_m, limit=len(index))
+        key = lambda d: (d["distance_km"], str(d["_id"]))
+        ordered = all(a["distance_km"] <= b["distance_km"] for a, b in zip(paged, paged[1:]))
+        unique = len({doc_key(d) for d in paged}) == len(paged)
+        if not ordered or not unique or sorted(map(key, paged)) != sorted(map(key, want)) \
+                or sorted(map(key, streamed)) != sorted(map(key, want)):
+            mismatches += 1
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        stream = index.iter_nearest(lat, lon, **filters, max_distance_m=radius_m)
+        next(stream, None)
+        first_ms.append((time.perf_counter() - start) * 1000)
+        for _ in stream:
+            pass
+        stream_peak.append(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        index.search(lat, lon, **filters, max_distance_m=radius_m, limit=len(index))
+        full_ms.append((time.perf_counter() - start) * 1000)
+        list_peak.append(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+
+    print(f"hospitals {len(index)} ({args.duplicates} at shared coordinates) | radius {args.radius_km:g} km | "
+          f"page size {args.page_size} | {args.queries} searches, {pages} pages")
+    print(f"mismatches (order, repeats, gaps) vs one unlimited search: {mismatches}/{args.queries}")
+    for number in sorted(by_page):
+        label = f"page {number + 1}" if number < 9 else "page 10+"
+        print(f"{label:9} | p50 {statistics.median(by_page[number]):7.2f} ms | n={len(by_page[number])}")
+    print(f"stream first hospital p50 {statistics.median(first_ms):7.2f} ms | full list p50 {statistics.median(full_ms):7.2f} ms")
+    print(f"peak Python memory p50: stream {statistics.median(stream_peak):8.1f} KiB | full list {statistics.median(list_peak):8.1f} KiB")
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hospitals", type=int, default=20000)
+    parser.add_argument("--duplicates", type=int, default=500, help="Hospitals moved onto another's coordinates")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--page-size", type=int, default=25)
+    parser.add_argument("--radius-km", type=float, default=50.0)
+    parser.add_argument("--seed", type=int, default=1)
+    main_bench(parser.parse_args())
+
+
+if __name__ == "__main__":
+    cli()
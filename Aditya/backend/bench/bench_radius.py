@@ -0,0 +1,122 @@
+# bench/bench_radius.py
+"""
+Compares adaptive radius expansion (radiusMode=adaptive,
+HospitalIndex.search_expanding) with the fixed 50 km search.
+
+Hospitals are modelled on data/hospitals_sample.ndjson (dense clusters around
+the real ones, see bench.synthetic). Patients are drawn from three groups:
+- dense:  around the sample hospitals (South Mumbai / Panvel)
+- region: uniform over the Mumbai region
+- rural:  60-150 km outside the region, where the fixed radius often finds nothing
+
+For each group it reports the hospitals in the grid cells each mode scans
+(summed over every radius tried for adaptive), latency, how often a search
+returns no hospitals, and checks that adaptive results equal the fixed-radius
+ones whenever the fixed search found a full page (same nearest hospitals).
+
+Usage (from Aditya/backend):
+    python -m bench.bench_radius
+    python -m bench.bench_radius --hospitals 100000 --queries 2000 --start-km 1 --max-km 300
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import time
+
+from bson import ObjectId
+
+from bench.synthetic import MUMBAI_REGION, clustered_points, generate_realistic_hospitals, random_filters
+from geo_index import HospitalIndex, expansion_radii
+
+FIXED_RADIUS_M = 50000
+LIMIT = 15
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "hospitals_sample.ndjson")
+
+
+def load_sample():
+    with open(SAMPLE_FILE, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def rural_points(rng: random.Random, n: int):
+    """Points 60-150 km from the centre of the Mumbai region, in random directions."""
+    lat_min, lat_max, lon_min, lon_max = MUMBAI_REGION
+    center_lat, center_lon = (lat_min + lat_max) / 2, (lon_min + lon_max) / 2
+    points = []
+    for _ in range(n):
+        distance_km, bearing = rng.uniform(60, 150), rng.uniform(0, 2 * math.pi)
+        lat = center_lat + distance_km * math.cos(bearing) / 111.32
+        lon = center_lon + distance_km * math.sin(bearing) / (111.32 * math.cos(math.radians(center_lat)))
+        points.append((lat, lon))
+    return points
+
+
+def percentiles(samples):
+    cuts = statistics.quantiles(samples, n=100) if len(samples) > 1 else [samples[0] if samples else 0.0] * 99
+    return f"p50 {cuts[49]:9.1f} | p99 {cuts[98]:9.1f}"
+
+
+def run_group(name: str, index: HospitalIndex, points, rng: random.Random, args) -> None:
+    start_m, max_m = args.start_km * 1000, args.max_km * 1000
+    fixed_scanned, adaptive_scanned, fixed_us, adaptive_us, expansions = [], [], [], [], []
+    fixed_empty = adaptive_empty = mismatches = compared = 0
+    for lat, lon in points:
+        filters = random_filters(rng)
+        start = time.perf_counter()
+        fixed = index.search(lat, lon, **filters, max_distance_m=FIXED_RADIUS_M, limit=LIMIT)
+        fixed_us.append((time.perf_counter() - start) * 1e6)
+        start = time.perf_counter()
+        adaptive, radius = index.search_expanding(lat, lon, **filters, start_radius_m=start_m, max_radius_m=max_m, limit=LIMIT)
+        adaptive_us.append((time.perf_counter() - start) * 1e6)
+
+        fixed_scanned.append(index.count_candidates(lat, lon, FIXED_RADIUS_M))
+        tried = expansion_radii(start_m, max_m)[:radius.expansions + 1]
+        adaptive_scanned.append(sum(index.count_candidates(lat, lon, r) for r in tried))
+        expansions.append(radius.expansions)
+        fixed_empty += not fixed
+        adaptive_empty += not adaptive
+        if len(fixed) == LIMIT:
+            compared += 1
+            # Equal distances may be ordered differently at the page boundary
+            if sorted((d["distance_km"], str(d["_id"])) for d in fixed) != sorted((d["distance_km"], str(d["_id"])) for d in adaptive):
+                mismatches += 1
+
+    print(f"--- {name} ({len(points)} searches) ---")
+    print(f"cells scanned, hospitals | fixed    {percentiles(fixed_scanned)} | total {sum(fixed_scanned):>12,}")
+    print(f"                         | adaptive {percentiles(adaptive_scanned)} | total {sum(adaptive_scanned):>12,}")
+    print(f"latency, us              | fixed    {percentiles(fixed_us)}")
+    print(f"                         | adaptive {percentiles(adaptive_us)}")
+    print(f"expansions p50 {statistics.median(expansions):.0f} / max {max(expansions)} | "
+          f"no results: fixed {fixed_empty}, adaptive {adaptive_empty} | "
+          f"mismatches on full fixed pages: {mismatches}/{compared}")
+
+
+def main_bench(args) -> None:
+    rng = random.Random(args.seed)
+    sample = load_sample()
+    docs = [{"_id": ObjectId(), **doc} for doc in generate_realistic_hospitals(args.hospitals, sample, seed=args.seed)]
+    index = HospitalIndex.from_documents(docs)
+    centers = [(doc["location"]["coordinates"][1], doc["location"]["coordinates"][0]) for doc in sample]
+    print(f"hospitals {len(index)} | fixed radius {FIXED_RADIUS_M / 1000:g} km | adaptive {args.start_km:g} km "
+          f"doubling to {args.max_km:g} km | limit {LIMIT}")
+    run_group("dense", index, clustered_points(rng, args.queries, centers, sigma_km=2.0, background=0.0), rng, args)
+    run_group("region", index, clustered_points(rng, args.queries, [], background=1.0), rng, args)
+    run_group("rural", index, rural_points(rng, args.queries), rng, args)
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hospitals", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=1000, help="Searches per group")
+    parser.add_argument("--start-km", type=float, default=2.0, help="ADAPTIVE_START_RADIUS_METERS / 1000")
+    parser.add_argument("--max-km", type=float, default=200.0, help="ADAPTIVE_MAX_RADIUS_METERS / 1000")
+    parser.add_argument("--seed", type=int, default=1)
+    main_bench(parser.parse_args())
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,105 @@
+# bench/bench_ranking.py
+"""
+Benchmark: nearest-15-within-50-km ranking engines.
+
+Compares, per query, on synthetic hospitals around Mumbai / Panvel:
+- python:   pure-Python loop (geo_index.haversine_m over every hospital + sort)
+- numpy:    ranking.HaversineRanker full scan with argpartition top-k
+- index:    geo_index.HospitalIndex (grid cells + NumPy ranking)
+- geoNear:  MongoDB $geoNear on a 2dsphere index (only with --mongo-uri;
+            data goes into a temporary collection that is dropped afterwards)
+
+Usage (from Aditya/backend):
+    python -m bench.bench_ranking --sizes 30 10000 1000000
+    python -m bench.bench_ranking --sizes 30 10000 1000000 --mongo-uri mongodb://localhost:27017
+"""
+
+import argparse
+import random
+import time
+
+from bench.synthetic import MUMBAI_REGION, generate_hospitals
+from geo_index import HospitalIndex, haversine_m
+from ranking import HaversineRanker
+
+SEARCH_RADIUS_METERS = 50000
+MAX_RESULTS = 15
+PYTHON_LOOP_BUDGET = 2_000_000 # Max distance evaluations for the slow pure-Python engine
+
+
+def python_top_k(coords, lat, lon):
+    hits = []
+    for position, (h_lon, h_lat) in enumerate(coords):
+        distance_m = haversine_m(lon, lat, h_lon, h_lat)
+        if distance_m <= SEARCH_RADIUS_METERS:
+            hits.append((distance_m, position))
+    hits.sort()
+    return [position for _, position in hits[:MAX_RESULTS]]
+
+
+def time_per_query(fn, queries) -> float:
+    start = time.perf_counter()
+    for lat, lon in queries:
+        fn(lat, lon)
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def run(size: int, n_queries: int, seed: int, mongo_uri: str) -> None:
+    docs = list(generate_hospitals(size, seed=seed))
+    coords = [tuple(doc["location"]["coordinates"]) for doc in docs]
+    ranker = HaversineRanker([lat for _, lat in coords], [lon for lon, _ in coords])
+    index = HospitalIndex.from_documents(docs)
+
+    rng = random.Random(seed)
+    min_lat, max_lat, min_lon, max_lon = MUMBAI_REGION
+    queries = [(rng.uniform(min_lat, max_lat), rng.uniform(min_lon, max_lon)) for _ in range(n_queries)]
+
+    # Sanity check: every engine returns the same hospitals
+    for lat, lon in queries[:5]:
+        expected = python_top_k(coords, lat, lon)
+        assert ranker.top_k(lat, lon, SEARCH_RADIUS_METERS, MAX_RESULTS)[0].tolist() == expected
+        assert [r["id"] - 1 for r in index.search(lat, lon)] == expected
+
+    python_queries = queries[:max(1, min(n_queries, PYTHON_LOOP_BUDGET // size))]
+    timings = {
+        "python": time_per_query(lambda lat, lon: python_top_k(coords, lat, lon), python_queries),
+        "numpy": time_per_query(lambda lat, lon: ranker.top_k(lat, lon, SEARCH_RADIUS_METERS, MAX_RESULTS), queries),
+        "index": time_per_query(lambda lat, lon: index.search(lat, lon), queries),
+    }
+
+    if mongo_uri:
+        from pymongo import GEOSPHERE, MongoClient
+        client = MongoClient(mongo_uri)
+        collection = client["chetak_bench"][f"ranking_{size}"]
+        collection.drop()
+        for start in range(0, size, 10000):
+            collection.insert_many([dict(doc) for doc in docs[start:start + 10000]], ordered=False)
+        collection.create_index([("location", GEOSPHERE)])
+
+        def geo_near(lat, lon):
+            return list(collection.aggregate([
+                {"$geoNear": {"near": {"type": "Point", "coordinates": [lon, lat]}, "distanceField": "distance_meters",
+                              "maxDistance": SEARCH_RADIUS_METERS, "spherical": True}},
+                {"$limit": MAX_RESULTS}, {"$project": {"id": 1}},
+            ]))
+
+        timings["geoNear"] = time_per_query(geo_near, queries)
+        collection.drop()
+        client.close()
+
+    print(f"{size:>9} hospitals | " + " | ".join(f"{name}: {ms:9.3f} ms/query" for name, ms in timings.items()))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[30, 10_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--mongo-uri", default=None, help="Local mongod to include $geoNear in the comparison")
+    args = parser.parse_args()
+    for size in args.sizes:
+        run(size, args.queries, args.seed, args.mongo_uri)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# bench/bench_regions.py
+"""
+Search latency on the single hospitals collection against region
+collections (regions.py, HOSPITAL_REGION_PRECISION) as a national dataset
+grows, on a local mongod.
+
+Synthetic hospitals (bench.synthetic) at a constant density cover a share of
+India proportional to the dataset size (--growth national: the rollout adds
+regions), or all of it at every size (--growth dense). Each dataset is loaded
+twice into --bench-db with load_data.load_files: into one collection and
+into region collections of --precision. The same --queries searches (the
+$geoNear path of /api/find-suitable via main.execute_search, random filters,
+50 km, top 15, from points next to hospitals) then run on each layout,
+--concurrency at a time. Per dataset x layout it reports the load time, the
+p50 / p99 search latency, the regions each search was routed to, and the
+searches whose results differ between the layouts.
+
+The database is dropped afterwards unless --keep.
+
+Usage (from Aditya/backend, with mongod running):
+    python -m bench.bench_regions
+    python -m bench.bench_regions --sizes 100000 300000 1000000 --precision 3 --queries 2000
+    python -m bench.bench_regions --mongo-uri mongodb://localhost:27017 --growth dense
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+import numpy as np
+from pymongo import AsyncMongoClient, MongoClient
+
+import main
+from bench.synthetic import generate_hospitals, random_filters
+from load_data import ensure_indexes, load_files
+from regions import RegionCollections, region_names
+
+INDIA_REGION = (8.0, 35.5, 68.0, 97.5) # (min_lat, max_lat, min_lon, max_lon)
+LAYOUTS = ("single", "regions")
+
+
+def make_dataset(size: int, largest: int, growth: str, seed: int) -> List[Dict[str, Any]]:
+    min_lat, max_lat, min_lon, max_lon = INDIA_REGION
+    if growth == "national":
+        max_lon = min_lon + (max_lon - min_lon) * size / largest # Same density, more of the country
+    return list(generate_hospitals(size, seed=seed, region=(min_lat, max_lat, min_lon, max_lon)))
+
+
+def load(db, docs: List[Dict[str, Any]], layout: str, precision: int) -> float:
+    """Loads the dataset in one layout (replacing what the bench database held); returns the seconds taken."""
+    for name in db.list_collection_names():
+        if name == main.COLLECTION_NAME or region_names([name]):
+            db[name].drop()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "hospitals.ndjson")
+        with open(path, "w") as f:
+            for doc in docs:
+                f.write(json.dumps(doc) + "\n")
+        start = time.perf_counter()
+        if layout == "regions":
+            load_files(db, [path], progress_every=len(docs) + 1, region_precision=precision)
+        else:
+            collection = db[main.COLLECTION_NAME]
+            ensure_indexes(collection)
+            load_files(collection, [path], progress_every=len(docs) + 1)
+        return time.perf_counter() - start
+
+
+async def search_all(queries, concurrency: int) -> Tuple[List[float], List[List[Any]]]:
+    """Runs every search through main.execute_search; returns latencies (ms) and result ids in query order."""
+    latencies: List[float] = [0.0] * len(queries)
+    ids: List[List[Any]] = [[] for _ in queries]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(n: int, lat: float, lon: float, filters: Dict[str, Any]) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            results = await main.execute_search(lat, lon, filters["needs_icu"], filters["specialist"], filters["equipment"])
+            latencies[n] = (time.perf_counter() - start) * 1000
+            ids[n] = [doc["id"] for doc in results]
+
+    await asyncio.gather(*(one(n, *query) for n, query in enumerate(queries)))
+    return latencies, ids
+
+
+async def measure(args, size: int, docs: List[Dict[str, Any]], sync_db, async_db) -> None:
+    rng = random.Random(args.seed)
+    queries = []
+    for doc in rng.sample(docs, min(args.queries, len(docs))):
+        lon, lat = doc["location"]["coordinates"]
+        queries.append((lat + rng.uniform(-0.05, 0.05), lon + rng.uniform(-0.05, 0.05), random_filters(rng)))
+
+    found: Dict[str, List[List[Any]]] = {}
+    for layout in LAYOUTS:
+        loaded_s = load(sync_db, docs, layout, args.precision)
+        if layout == "regions":
+            collection = RegionCollections(async_db, args.precision)
+            await collection.refresh()
+        else:
+            collection = async_db[main.COLLECTION_NAME]
+        main.hospitals_collection = collection
+        await search_all(queries[:args.warmup], args.concurrency)
+        if layout == "regions":
+            collection.searches = collection.regions_queried = collection.straddling = 0
+        latencies, found[layout] = await search_all(queries, args.concurrency)
+        p50, p99 = np.percentile(latencies, [50, 99])
+        routing = (f"{len(collection.regions):7} {collection.regions_queried / collection.searches:9.2f} "
+                   f"{collection.straddling / collection.searches:9.1%}") if layout == "regions" else f"{1:7} {1:9.2f} {'-':>9}"
+        differing = sum(set(a) != set(b) for a, b in zip(found["single"], found[layout]))
+        print(f"{size:>9} {layout:<8} {routing} {loaded_s:8.1f} {p50:8.2f} {p99:8.2f} {differing:9}", flush=True)
+
+
+async def run(args) -> None:
+    print(f"growth {args.growth} | precision {args.precision} | {args.queries} searches, {args.concurrency} at a time")
+    print(f"{'dataset':>9} {'layout':<8} {'colls':>7} {'colls/q':>9} {'straddle':>9} {'load s':>8} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'differing':>9}")
+    sync_client = MongoClient(args.mongo_uri, serverSelectionTimeoutMS=5000)
+    async_client = AsyncMongoClient(args.mongo_uri, serverSelectionTimeoutMS=5000, maxPoolSize=max(100, args.concurrency))
+    main.client, main.hospital_index, main.search_cache = async_client, None, None
+    try:
+        for size in args.sizes:
+            docs = make_dataset(size, max(args.sizes), args.growth, args.seed)
+            await measure(args, size, docs, sync_client[args.bench_db], async_client[args.bench_db])
+    finally:
+        if not args.keep:
+            sync_client.drop_database(args.bench_db)
+        sync_client.close()
+        await async_client.close()
+        main.client = main.hospitals_collection = None
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50000, 200000, 800000], help="Hospitals per dataset")
+    parser.add_argument("--growth", choices=["national", "dense"], default="national")
+    parser.add_argument("--precision", type=int, default=3, help="Geohash length of the region collections")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=100, help="Searches run before timing each layout")
+    parser.add_argument("--concurrency", type=int, default=16, help="Searches in flight")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017", help="Local mongod")
+    parser.add_argument("--bench-db", default="chetakBenchRegions", help="Database the datasets are loaded into")
+    parser.add_argument("--keep", action="store_true", help="Keep the bench database")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    if args.bench_db == main.DB_NAME:
+        parser.error(f"--bench-db must not be the API's database ('{main.DB_NAME}'): it is dropped and reloaded")
+    logging.disable(logging.INFO)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    cli()
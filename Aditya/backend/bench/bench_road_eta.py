@@ -0,0 +1,163 @@
+# bench/bench_road_eta.py
+"""
+Benchmark / demo: drive-time ranking (road_eta.py) vs straight-line ranking.
+
+Without --osm, writes a synthetic OSM XML city: a grid of residential streets
+with a few primary roads, cut in two by a north-south creek that is only
+crossed by one bridge at the southern end (the harbour / creek situation
+that misranks hospitals in Mumbai). Hospitals are scattered on both banks and
+patients are clustered around a few incident sites.
+
+Reports graph build / cache load time, tree precompute time, per-query
+re-rank latency for cold and cached origin cells, the cache hit ratio, and how
+often (and by how many minutes) the straight-line nearest hospital is not the
+fastest one to reach.
+
+With --osm, runs the same measurements on a real extract (e.g. a Mumbai
+.osm.pbf / .osm file) with the 30 sample hospitals.
+
+Usage (from Aditya/backend):
+    python -m bench.bench_road_eta
+    python -m bench.bench_road_eta --grid 300 --hospitals 200 --queries 5000
+    python -m bench.bench_road_eta --osm mumbai.osm.pbf
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from bson import ObjectId
+
+from geo_index import HospitalIndex
+from road_eta import EtaRanker, RoadGraph
+
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "hospitals_sample.ndjson")
+ORIGIN_LAT, ORIGIN_LON = 19.0, 72.8
+SPACING_DEG = 0.001 # ~110 m between intersections
+
+
+def write_synthetic_osm(path: str, grid: int) -> None:
+    """Grid city with a creek between columns creek_col and creek_col+1, bridged only on row 0."""
+    creek_col = grid // 2
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6">\n')
+        for row in range(grid):
+            for col in range(grid):
+                f.write(f'<node id="{row * grid + col + 1}" lat="{ORIGIN_LAT + row * SPACING_DEG:.6f}" '
+                        f'lon="{ORIGIN_LON + col * SPACING_DEG:.6f}"/>\n')
+        way_id = 1
+
+        def way(refs, highway):
+            nonlocal way_id
+            f.write(f'<way id="{way_id}">' + "".join(f'<nd ref="{r}"/>' for r in refs)
+                    + f'<tag k="highway" v="{highway}"/></way>\n')
+            way_id += 1
+
+        for row in range(grid): # East-west streets, broken at the creek except on the bridge row
+            highway = "primary" if row % 10 == 0 else "residential"
+            west = [row * grid + col + 1 for col in range(creek_col + 1)]
+            east = [row * grid + col + 1 for col in range(creek_col + 1, grid)]
+            if row == 0:
+                way(west + east, "primary")
+            else:
+                way(west, highway)
+                way(east, highway)
+        for col in range(grid): # North-south streets
+            way([row * grid + col + 1 for row in range(grid)], "primary" if col % 10 == 0 else "residential")
+        f.write("</osm>\n")
+
+
+def synthetic_hospitals(n: int, grid: int, rng: random.Random):
+    span = grid * SPACING_DEG
+    return [{"_id": ObjectId(), "id": i + 1, "name": f"Hospital {i + 1}",
+             "location": {"type": "Point", "coordinates": [ORIGIN_LON + rng.uniform(0, span), ORIGIN_LAT + rng.uniform(0, span)]},
+             "hasICU": True, "specialists": ["emergency"], "equipment": []} for i in range(n)]
+
+
+def main_bench(args) -> None:
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.osm:
+            osm_path = args.osm
+            with open(SAMPLE_FILE, encoding="utf-8") as f:
+                hospitals = [{"_id": ObjectId(), **json.loads(line)} for line in f if line.strip()]
+        else:
+            osm_path = os.path.join(tmp, "synthetic_city.osm")
+            write_synthetic_osm(osm_path, args.grid)
+            hospitals = synthetic_hospitals(args.hospitals, args.grid, rng)
+
+        start = time.perf_counter()
+        road_graph = RoadGraph.load(osm_path)
+        build_s = time.perf_counter() - start
+        start = time.perf_counter()
+        RoadGraph.load(osm_path) # From <extract>.graph.npz this time
+        cached_s = time.perf_counter() - start
+        if not args.osm:
+            os.remove(osm_path + ".graph.npz")
+
+        ranker = EtaRanker(road_graph, max_eta_s=args.max_eta_min * 60, cell_size_deg=args.cell_deg,
+                           tree_cache_size=max(512, len(hospitals)))
+        start = time.perf_counter()
+        ranker.precompute(hospitals)
+        precompute_s = time.perf_counter() - start
+
+        index = HospitalIndex.from_documents(hospitals)
+        lats = road_graph.lats[road_graph.snap_nodes]
+        lons = road_graph.lons[road_graph.snap_nodes]
+        sites = [(float(lats[i]), float(lons[i])) for i in rng.sample(range(len(lats)), args.sites)]
+
+        cold, warm, misranked, penalty_min = [], [], 0, []
+        for _ in range(args.queries):
+            site_lat, site_lon = rng.choice(sites)
+            lat = site_lat + rng.gauss(0, 0.0005) # Patients around an incident site (~50 m spread)
+            lon = site_lon + rng.gauss(0, 0.0005)
+            candidates = index.search(lat, lon, max_distance_m=args.radius_km * 1000, limit=args.candidates)
+            misses = ranker.cache_misses
+            start = time.perf_counter()
+            ranker.rank(lat, lon, candidates, 15)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            (cold if ranker.cache_misses > misses else warm).append(elapsed_ms)
+            if candidates:
+                # Drive time to the straight-line nearest hospital vs the fastest candidate (all cached by now)
+                etas = [math.inf if eta is None else eta for eta in ranker.etas_s(lat, lon, candidates)]
+                if etas[0] > min(etas):
+                    misranked += 1
+                    penalty_min.append((etas[0] - min(etas)) / 60)
+
+    stats = ranker.stats()
+    print(f"road graph: {stats['nodes']:,} nodes ({stats['routable_nodes']:,} routable), {road_graph.graph.nnz:,} edges | "
+          f"build {build_s:.2f}s, from cache {cached_s:.2f}s")
+    print(f"hospitals: {len(hospitals)} | trees precomputed in {precompute_s:.2f}s "
+          f"({precompute_s / max(1, len(hospitals)) * 1000:.1f} ms each)")
+    for label, samples in (("cold origin cell", cold), ("cached origin cell", warm)):
+        if len(samples) > 1:
+            cuts = statistics.quantiles(samples, n=100)
+            print(f"{label:<18} | {len(samples):6d} queries | p50 {cuts[49]:.3f} ms | p99 {cuts[98]:.3f} ms")
+    print(f"ETA cache hit ratio: {len(warm) / max(1, len(cold) + len(warm)):.3f}")
+    print(f"straight-line nearest was not the fastest in {misranked}/{args.queries} queries"
+          + (f" (it was slower by median {statistics.median(penalty_min):.1f} min, p95 "
+             f"{statistics.quantiles(penalty_min, n=20)[18]:.1f} min)" if len(penalty_min) > 1 else ""))
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--osm", help="Real OSM extract instead of the synthetic city")
+    parser.add_argument("--grid", type=int, default=200, help="Synthetic city: intersections per side")
+    parser.add_argument("--hospitals", type=int, default=60, help="Synthetic hospitals")
+    parser.add_argument("--queries", type=int, default=3000)
+    parser.add_argument("--sites", type=int, default=50, help="Incident sites patients cluster around")
+    parser.add_argument("--candidates", type=int, default=60, help="Straight-line candidates re-ranked")
+    parser.add_argument("--radius-km", type=float, default=50)
+    parser.add_argument("--max-eta-min", type=float, default=120)
+    parser.add_argument("--cell-deg", type=float, default=0.001)
+    parser.add_argument("--seed", type=int, default=1)
+    main_bench(parser.parse_args())
+
+
+if __name__ == "__main__":
+    cli()
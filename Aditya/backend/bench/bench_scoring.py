@@ -0,0 +1,130 @@
+# bench/bench_scoring.py
+"""
+Times weighted multi-criteria scoring (rankBy=score, scoring.py) of a
+candidate set against the distance-only top-k it replaces.
+
+Every hospital of a --candidates sized synthetic dataset (modelled on
+data/hospitals_sample.ndjson, see bench.synthetic) is a candidate, so each
+step runs over the whole set: distances come from the index's coordinates,
+capabilities from its packed bitmasks. Per search it times
+    distance   select_nearest on the distances (the rankBy=distance top-k)
+    score      distance_scores + capability_scores + top_scored
+    score+live the same with the live ICU bed term, read from an IcuBedColumn
+               of a StatusTable where --live-share of the hospitals report free beds
+and reports p50 / p99 in microseconds against the --target-ms budget (1 ms),
+cycling through the condition profiles and their weights. It also times
+HospitalIndex.search_scored end to end (grid cells, filters and documents
+included) next to HospitalIndex.search over the same radius.
+
+Usage (from Aditya/backend):
+    python -m bench.bench_scoring
+    python -m bench.bench_scoring --candidates 100000 --queries 2000 --live-share 0.5
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+
+import numpy as np
+from bson import ObjectId
+
+from bench.synthetic import clustered_points, generate_realistic_hospitals
+from condition_profiles import CONDITION_PROFILES
+from geo_index import HospitalIndex
+from live_status import IcuBedColumn, StatusTable
+from ranking import select_nearest
+from scoring import CONDITION_WEIGHTS, capability_scores, distance_scores, top_scored
+
+LIMIT = 15
+RADIUS_M = 50000
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "hospitals_sample.ndjson")
+
+
+def load_sample():
+    with open(SAMPLE_FILE, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentiles(samples, target_us: float) -> str:
+    cuts = statistics.quantiles(samples, n=100) if len(samples) > 1 else [samples[0]] * 99
+    verdict = "within" if cuts[98] <= target_us else "OVER"
+    return f"p50 {cuts[49]:8.1f} | p99 {cuts[98]:8.1f} us | p99 {verdict} {target_us / 1000:g} ms"
+
+
+def main_bench(args) -> None:
+    rng = random.Random(args.seed)
+    sample = load_sample()
+    docs = [{"_id": ObjectId(), **doc} for doc in generate_realistic_hospitals(args.candidates, sample, seed=args.seed)]
+    index = HospitalIndex.from_documents(docs)
+    live = StatusTable(max_hospitals=len(docs))
+    for doc in docs:
+        live.update(doc["_id"], icu_beds=rng.randint(1, 5) if rng.random() < args.live_share else 0)
+    column = IcuBedColumn(live)
+    column.sync(index)
+    bonus = column.values # Positions of the index, as main.indexed_icu_bed_bonus
+
+    positions = np.arange(len(index))
+    words = index._mask_words[positions]
+    centers = [(doc["location"]["coordinates"][1], doc["location"]["coordinates"][0]) for doc in sample]
+    points = clustered_points(rng, args.queries, centers, sigma_km=3.0, background=0.2)
+    profiles = list(CONDITION_PROFILES.items())
+    target_us = args.target_ms * 1000
+
+    timings = {"distance": [], "score": [], "score+live": [], "search": [], "search_scored": []}
+    changed = 0
+    for n, (lat, lon) in enumerate(points):
+        name, profile = profiles[n % len(profiles)]
+        weights, equipment = CONDITION_WEIGHTS[name], list(profile.equipment)
+        distances = index._ranker.distances_m(lat, lon, positions)
+
+        start = time.perf_counter()
+        nearest = select_nearest(distances, np.inf, LIMIT, positions)
+        timings["distance"].append((time.perf_counter() - start) * 1e6)
+
+        start = time.perf_counter()
+        scores = distance_scores(distances, weights) + capability_scores(
+            index.capabilities, words, weights, profile.specialist, equipment)
+        chosen, _ = top_scored(scores, distances, positions, LIMIT)
+        timings["score"].append((time.perf_counter() - start) * 1e6)
+
+        start = time.perf_counter()
+        scores = distance_scores(distances, weights) + capability_scores(
+            index.capabilities, words, weights, profile.specialist, equipment)
+        top_scored(scores, distances, positions, LIMIT, bonus, weights.icu_beds)
+        timings["score+live"].append((time.perf_counter() - start) * 1e6)
+        changed += set(chosen.tolist()) != set(nearest.tolist())
+
+        filters = {"needs_icu": profile.needs_icu, "specialist": profile.specialist, "equipment": equipment}
+        start = time.perf_counter()
+        index.search(lat, lon, **filters, max_distance_m=RADIUS_M, limit=LIMIT)
+        timings["search"].append((time.perf_counter() - start) * 1e6)
+        start = time.perf_counter()
+        index.search_scored(lat, lon, weights, **filters, max_distance_m=RADIUS_M, limit=LIMIT, bonus=bonus)
+        timings["search_scored"].append((time.perf_counter() - start) * 1e6)
+
+    print(f"candidates {len(index)} | searches {len(points)} | top {LIMIT} | "
+          f"{args.live_share:.0%} of hospitals reporting free ICU beds")
+    print("ranking the whole candidate set")
+    for stage in ("distance", "score", "score+live"):
+        print(f"  {stage:12} {percentiles(timings[stage], target_us)}")
+    print(f"  top {LIMIT} differs from distance-only in {changed}/{len(points)} searches")
+    print(f"end to end, filters applied, {RADIUS_M / 1000:g} km radius")
+    for stage in ("search", "search_scored"):
+        print(f"  {stage:12} {percentiles(timings[stage], target_us)}")
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, default=10000, help="Hospitals, all scored per search")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--live-share", type=float, default=0.3, help="Share of hospitals reporting a free ICU bed")
+    parser.add_argument("--target-ms", type=float, default=1.0, help="Latency budget the p99 is checked against")
+    parser.add_argument("--seed", type=int, default=1)
+    main_bench(parser.parse_args())
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,108 @@
+# bench/bench_serialization.py
+"""
+Benchmark: response serialization cost for /api/find-suitable.
+
+Compares, for one response of N results (default 15):
+- response_model: FastAPI's own path (validate every result against
+  List[HospitalResponse] via the route's response field, then JSONResponse)
+- pre-serialized: fast_json.HospitalEncoder (cached hospital bytes + spliced
+  distance_km, raw Response)
+
+and checks both produce identical bytes. Results come from the in-memory
+engine over the sample hospitals (or --hospitals synthetic ones).
+
+Usage (from Aditya/backend):
+    python -m bench.bench_serialization
+    python -m bench.bench_serialization --hospitals 10000 --results 15 --iterations 5000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+
+import main
+from bench.synthetic import MUMBAI_REGION, generate_hospitals
+from fast_json import HospitalEncoder, json_response
+from geo_index import HospitalIndex
+
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "hospitals_sample.ndjson")
+
+
+def load_docs(n_hospitals: int):
+    if n_hospitals:
+        return [{"_id": ObjectId(), **doc} for doc in generate_hospitals(n_hospitals, seed=1)]
+    with open(SAMPLE_FILE, encoding="utf-8") as f:
+        return [{"_id": ObjectId(), **json.loads(line)} for line in f if line.strip()]
+
+
+def response_field():
+    for route in main.app.routes:
+        if getattr(route, "path", None) == "/api/find-suitable":
+            return route.response_field
+    raise RuntimeError("/api/find-suitable route not found")
+
+
+async def run(args) -> None:
+    index = HospitalIndex.from_documents(load_docs(args.hospitals))
+    rng = random.Random(args.seed)
+    lat_min, lat_max, lon_min, lon_max = MUMBAI_REGION
+    responses = []
+    for _ in range(10000):
+        results = index.search(rng.uniform(lat_min, lat_max), rng.uniform(lon_min, lon_max),
+                               max_distance_m=100000, limit=args.results)
+        if len(results) == args.results:
+            responses.append(results)
+        if len(responses) == 50:
+            break
+    if not responses:
+        raise SystemExit("No search returned enough results")
+    field = response_field()
+
+    async def via_response_model(results):
+        content = await serialize_response(field=field, response_content=results)
+        return JSONResponse(content=content).body
+
+    encoder = HospitalEncoder()
+
+    def via_encoder(results):
+        return json_response(encoder.encode_results(results)).body
+
+    for results in responses: # Same bytes, and warms the encoder cache like a running server
+        before, after = await via_response_model(results), via_encoder(results)
+        assert before == after, f"Serialized bodies differ:\n{before[:200]}\n{after[:200]}"
+
+    start = time.perf_counter()
+    for i in range(args.iterations):
+        await via_response_model(responses[i % len(responses)])
+    before_us = (time.perf_counter() - start) / args.iterations * 1e6
+
+    start = time.perf_counter()
+    for i in range(args.iterations):
+        via_encoder(responses[i % len(responses)])
+    after_us = (time.perf_counter() - start) / args.iterations * 1e6
+
+    print(f"{args.results} results per response, {len(index)} hospitals, {args.iterations} iterations (identical bytes)")
+    print(f"response_model  | {before_us:8.1f} us/response")
+    print(f"pre-serialized  | {after_us:8.1f} us/response | {before_us / after_us:.1f}x faster")
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hospitals", type=int, default=0, help="Synthetic hospitals (default: the 30 sample ones)")
+    parser.add_argument("--results", type=int, default=15, help="Results per response")
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,147 @@
+# bench/bench_shards.py
+"""
+Measures the static shard export (static_shards.py / export_shards.py) on a
+national-scale synthetic dataset.
+
+Hospitals are spread uniformly over India, with --metro-share of them
+clustered around the real Mumbai ones (bench.synthetic). It reports
+- full export: time, shard count and gzipped sizes, against one gzipped file
+  holding every hospital
+- incremental export (--update) after --changed of the hospitals moved a
+  little or changed their ICU flag: time and shards rewritten
+- client side: bytes fetched for the shards around random users (half near
+  hospitals), and whether the nearest suitable hospitals found in them match
+  HospitalIndex.search over the whole dataset
+
+Usage (from Aditya/backend):
+    python -m bench.bench_shards
+    python -m bench.bench_shards --hospitals 1000000 --precision 4 --queries 500
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from bench.synthetic import generate_hospitals, generate_realistic_hospitals, random_filters
+from geo_index import HospitalIndex, haversine_m, matches_filters
+from static_shards import MANIFEST_FILE, decode_shard, encode_shard, export_shards, shards_around
+
+INDIA_REGION = (8.0, 35.5, 68.0, 97.5) # (min_lat, max_lat, min_lon, max_lon)
+RADIUS_M = 50000
+LIMIT = 15
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "hospitals_sample.ndjson")
+
+
+def load_sample():
+    with open(SAMPLE_FILE, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def make_dataset(args):
+    metro = int(args.hospitals * args.metro_share)
+    docs = list(generate_hospitals(args.hospitals - metro, seed=args.seed, region=INDIA_REGION))
+    docs += generate_realistic_hospitals(metro, load_sample(), seed=args.seed)
+    for hospital_id, doc in enumerate(docs, start=1):
+        doc["id"] = hospital_id
+    return docs
+
+
+def change_some(rng: random.Random, docs, share: float) -> int:
+    """Moves `share` of the hospitals by up to ~1 km or flips their ICU flag (new dicts, like a re-read)."""
+    changed = rng.sample(range(len(docs)), int(len(docs) * share))
+    for i in changed:
+        doc = dict(docs[i])
+        if rng.random() < 0.5:
+            lon, lat = doc["location"]["coordinates"]
+            doc["location"] = {"type": "Point", "coordinates": [lon + rng.uniform(-0.01, 0.01), lat + rng.uniform(-0.01, 0.01)]}
+        else:
+            doc["hasICU"] = not doc["hasICU"]
+        docs[i] = doc
+    return len(changed)
+
+
+def shard_search(directory: str, manifest, lat: float, lon: float, filters):
+    """What map-script.js does offline: the shards around the user, filtered and ranked. Returns (ids, bytes fetched)."""
+    fetched, found = 0, []
+    for prefix in shards_around(lat, lon, manifest["precision"]):
+        entry = manifest["shards"].get(prefix)
+        if entry is None:
+            continue
+        with open(os.path.join(directory, entry["file"]), "rb") as f:
+            data = f.read()
+        fetched += len(data)
+        for doc in decode_shard(data):
+            if matches_filters(doc, **filters):
+                hospital_lon, hospital_lat = doc["location"]["coordinates"]
+                distance = haversine_m(lon, lat, hospital_lon, hospital_lat)
+                if distance <= RADIUS_M:
+                    found.append((distance, doc["id"]))
+    return [hospital_id for _, hospital_id in sorted(found)[:LIMIT]], fetched
+
+
+def main_bench(args) -> None:
+    rng = random.Random(args.seed)
+    docs = make_dataset(args)
+    directory = tempfile.mkdtemp(prefix="chetak-shards-")
+    try:
+        start = time.perf_counter()
+        manifest, reports, timings = export_shards(docs, directory, args.precision)
+        full_seconds = time.perf_counter() - start
+        sizes = [r.gzip_bytes for r in reports]
+        whole = len(gzip.compress(encode_shard("", docs), compresslevel=9, mtime=0))
+        print(f"hospitals {len(docs)} ({args.metro_share:.0%} around Mumbai) | precision {args.precision} | "
+              f"coverage {manifest['coverage_km']} km")
+        print(f"full export        {full_seconds:7.2f} s | {len(sizes)} shards | gzipped total {sum(sizes) / 1e6:.2f} MB, "
+              f"median {statistics.median(sizes) / 1024:.1f} KB, largest {max(sizes) / 1024:.1f} KB "
+              f"| whole dataset in one file {whole / 1e6:.2f} MB")
+        print(f"                   partition {timings['partition']:.2f} s, encode {timings['encode']:.2f} s, "
+              f"write {timings['write']:.2f} s | manifest {os.path.getsize(os.path.join(directory, MANIFEST_FILE)) / 1024:.1f} KB")
+
+        changed = change_some(rng, docs, args.changed)
+        start = time.perf_counter()
+        manifest, reports, _ = export_shards(docs, directory, args.precision, update=True)
+        written = sum(r.status == "written" for r in reports)
+        print(f"incremental export {time.perf_counter() - start:7.2f} s | {changed} hospitals changed -> "
+              f"{written}/{len(manifest['shards'])} shards rewritten")
+
+        index = HospitalIndex.from_documents(docs)
+        hospital_points = [(doc["location"]["coordinates"][1], doc["location"]["coordinates"][0])
+                           for doc in rng.sample(docs, args.queries // 2)]
+        min_lat, max_lat, min_lon, max_lon = INDIA_REGION
+        points = hospital_points + [(rng.uniform(min_lat, max_lat), rng.uniform(min_lon, max_lon))
+                                    for _ in range(args.queries - len(hospital_points))]
+        fetched, mismatches = [], 0
+        for lat, lon in points:
+            filters = random_filters(rng)
+            ids, size = shard_search(directory, manifest, lat, lon, filters)
+            fetched.append(size)
+            expected = [doc["id"] for doc in index.search(lat, lon, **filters, max_distance_m=RADIUS_M, limit=LIMIT)]
+            # Coordinates are rounded to ~1 m in the shards: equal-distance ties may swap
+            mismatches += set(ids) != set(expected)
+        cuts = statistics.quantiles(fetched, n=100)
+        print(f"client fetch       p50 {cuts[49] / 1024:.1f} KB | p99 {cuts[98] / 1024:.1f} KB | max {max(fetched) / 1024:.1f} KB "
+              f"({max(fetched) / whole:.1%} of the whole dataset) | results differing from the full search: "
+              f"{mismatches}/{len(points)}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hospitals", type=int, default=100000)
+    parser.add_argument("--metro-share", type=float, default=0.2, help="Share of hospitals clustered around Mumbai")
+    parser.add_argument("--precision", type=int, default=3, help="Geohash prefix length of a shard")
+    parser.add_argument("--changed", type=float, default=0.01, help="Share of hospitals changed before the incremental export")
+    parser.add_argument("--queries", type=int, default=300, help="Simulated offline clients")
+    parser.add_argument("--seed", type=int, default=1)
+    main_bench(parser.parse_args())
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,161 @@
+# bench/bench_snapshot.py
+"""
+Checks and benchmarks the shared, memory-mapped hospital snapshot
+(hospital_snapshot.py) used by SEARCH_ENGINE=shared.
+
+1. Builds a HospitalIndex for N synthetic hospitals, streams random writes
+   through it (so it has tombstones, like the loader's index) and publishes it.
+2. Attaches the snapshot and checks searches and batch candidates against the
+   index it was written from.
+3. Starts 1, 2, 4, ... worker processes that either attach the snapshot
+   ("shared") or build a private HospitalIndex from the documents ("private",
+   what each worker does with SEARCH_ENGINE=memory minus the DB fetch), run
+   searches, and report cold start time and proportional memory (PSS: shared
+   pages are split between the processes mapping them). Linux only.
+4. Publishes a new generation and times re-attaching to it.
+
+Usage (from Aditya/backend):
+    python -m bench.bench_snapshot
+    python -m bench.bench_snapshot --hospitals 200000 --workers 1 2 4 8
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from bson import ObjectId
+
+from bench.sync_check import random_writes
+from bench.synthetic import MUMBAI_REGION, generate_hospitals, random_filters
+from geo_index import HospitalIndex
+from hospital_snapshot import SnapshotIndex, write_snapshot
+
+RADIUS_M = 50000
+LIMIT = 15
+
+
+def pss_mb() -> float:
+    """Proportional set size of this process in MB (0 where /proc isn't available)."""
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def random_queries(seed: int, n: int):
+    rng = random.Random(seed)
+    lat_min, lat_max, lon_min, lon_max = MUMBAI_REGION
+    return [(rng.uniform(lat_min, lat_max), rng.uniform(lon_min, lon_max), random_filters(rng)) for _ in range(n)]
+
+
+def check(snapshot: SnapshotIndex, index: HospitalIndex, queries) -> int:
+    """Returns how many searches / candidate lookups differ between the snapshot and the index."""
+    mismatches = 0
+    for lat, lon, filters in queries:
+        got = [(d["distance_km"], str(d["_id"])) for d in snapshot.search(lat, lon, **filters, max_distance_m=RADIUS_M, limit=LIMIT)]
+        want = [(d["distance_km"], str(d["_id"])) for d in index.search(lat, lon, **filters, max_distance_m=RADIUS_M, limit=LIMIT)]
+        # Equal distances may be ordered differently (positions are compacted in the snapshot)
+        if sorted(got) != sorted(want):
+            mismatches += 1
+        got = {str(d["_id"]) for d in snapshot.candidates([(lat, lon)], RADIUS_M, **filters)}
+        want = {str(d["_id"]) for d in index.candidates([(lat, lon)], RADIUS_M, **filters)}
+        if got != want:
+            mismatches += 1
+    return mismatches
+
+
+def worker(mode: str, directory: str, docs, seed: int, queries: int, ready, results) -> None:
+    start = time.perf_counter()
+    index = SnapshotIndex.attach(directory) if mode == "shared" else HospitalIndex.from_documents(docs)
+    cold_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    for lat, lon, filters in random_queries(seed, queries):
+        index.search(lat, lon, **filters, max_distance_m=RADIUS_M, limit=LIMIT)
+    search_ms = (time.perf_counter() - start) * 1000 / max(1, queries)
+    results.put((cold_ms, search_ms, pss_mb()))
+    ready.wait() # Keep the mapping alive until every worker has measured its memory
+
+
+def run_workers(mode: str, n: int, directory: str, docs, args):
+    context = multiprocessing.get_context("spawn") # Fresh interpreters, like uvicorn's workers
+    ready, results = context.Event(), context.Queue()
+    processes = [context.Process(target=worker, args=(mode, directory, docs if mode == "private" else None,
+                                                      args.seed + i, args.queries, ready, results))
+                 for i in range(n)]
+    for process in processes:
+        process.start()
+    measured = [results.get() for _ in processes]
+    ready.set()
+    for process in processes:
+        process.join()
+    cold = statistics.median(m[0] for m in measured)
+    search_us = statistics.median(m[1] for m in measured) * 1000
+    total_pss = sum(m[2] for m in measured)
+    print(f"{mode:7} x{n:<2} | cold start p50 {cold:9.1f} ms | search p50 {search_us:6.1f} us | "
+          f"PSS total {total_pss:7.1f} MB ({total_pss / n:6.1f} MB/worker)")
+
+
+def main_bench(args) -> None:
+    rng = random.Random(args.seed)
+    docs = {}
+    for doc in generate_hospitals(args.hospitals, seed=args.seed):
+        doc = {"_id": ObjectId(), **doc}
+        docs[doc["_id"]] = doc
+    index = HospitalIndex.from_documents(docs.values())
+    for op, payload in random_writes(rng, docs, args.writes):
+        index.apply_changes([payload], []) if op == "upsert" else index.apply_changes([], [payload])
+
+    with tempfile.TemporaryDirectory(dir="/dev/shm" if os.path.isdir("/dev/shm") else None) as directory:
+        start = time.perf_counter()
+        generation = write_snapshot(directory, index)
+        write_ms = (time.perf_counter() - start) * 1000
+        size_mb = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory)) / 1e6
+        start = time.perf_counter()
+        snapshot = SnapshotIndex.attach(directory)
+        attach_ms = (time.perf_counter() - start) * 1000
+        print(f"hospitals {len(index)} | publish {write_ms:.1f} ms | {size_mb:.1f} MB | attach {attach_ms:.2f} ms "
+              f"(generation {generation})")
+        mismatches = check(snapshot, index, random_queries(args.seed, args.checks))
+        print(f"mismatches vs source index: {mismatches}/{2 * args.checks}")
+
+        plain = list(docs.values())
+        for n in args.workers:
+            run_workers("shared", n, directory, None, args)
+            if not args.skip_private:
+                run_workers("private", n, directory, plain, args)
+
+        for op, payload in random_writes(rng, docs, args.writes):
+            index.apply_changes([payload], []) if op == "upsert" else index.apply_changes([], [payload])
+        start = time.perf_counter()
+        generation = write_snapshot(directory, index)
+        write_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        snapshot = SnapshotIndex.attach(directory)
+        attach_ms = (time.perf_counter() - start) * 1000
+        mismatches = check(snapshot, index, random_queries(args.seed + 1, args.checks))
+        print(f"generation {snapshot.generation} after {args.writes} writes | publish {write_ms:.1f} ms | "
+              f"re-attach {attach_ms:.2f} ms | mismatches: {mismatches}/{2 * args.checks}")
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hospitals", type=int, default=50000)
+    parser.add_argument("--writes", type=int, default=2000, help="Random writes applied before each publish")
+    parser.add_argument("--checks", type=int, default=500, help="Searches compared against the source index")
+    parser.add_argument("--queries", type=int, default=500, help="Searches run by each worker")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--skip-private", action="store_true", help="Only measure shared-snapshot workers")
+    parser.add_argument("--seed", type=int, default=1)
+    main_bench(parser.parse_args())
+
+
+if __name__ == "__main__":
+    cli()
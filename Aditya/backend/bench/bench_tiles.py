@@ -0,0 +1,125 @@
+# bench/bench_tiles.py
+"""
+Checks and benchmarks the precomputed condition-profile tiles (hospital_tiles.py).
+
+1. Builds tiles for N synthetic hospitals, saves and memory-maps them back.
+2. Runs random condition-profile searches over the region on the tiles and on
+   the in-memory index (geo_index.HospitalIndex) and checks they agree.
+3. Streams random hospital writes (moves, capability changes, inserts,
+   deletes; see bench.sync_check) through TileSet.apply_changes, checks the
+   searches again against a rebuilt index and reports update cost.
+
+Reports build time and size, per-query latency of a tile hit vs an index
+search, and how often a cell couldn't guarantee the answer (fallbacks).
+
+Usage (from Aditya/backend):
+    python -m bench.bench_tiles
+    python -m bench.bench_tiles --hospitals 10000 --queries 20000 --writes 2000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from bson import ObjectId
+
+from bench.sync_check import random_writes
+from bench.synthetic import MUMBAI_REGION, generate_hospitals
+from condition_profiles import CONDITION_PROFILES
+from geo_index import HospitalIndex
+from hospital_tiles import TileSet
+
+RADIUS_M = 50000
+LIMIT = 15
+
+
+def check(tiles: TileSet, index: HospitalIndex, rng: random.Random, queries: int):
+    """Returns (mismatches, tile hit latencies ms, index search latencies ms)."""
+    lat_min, lat_max, lon_min, lon_max = MUMBAI_REGION
+    names = list(CONDITION_PROFILES)
+    mismatches, tile_ms, index_ms = 0, [], []
+    for _ in range(queries):
+        lat, lon = rng.uniform(lat_min, lat_max), rng.uniform(lon_min, lon_max)
+        name = rng.choice(names)
+        profile = CONDITION_PROFILES[name]
+        start = time.perf_counter()
+        got = tiles.search(name, lat, lon, LIMIT)
+        elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        want = index.search(lat, lon, needs_icu=profile.needs_icu, specialist=profile.specialist,
+                            equipment=list(profile.equipment), max_distance_m=RADIUS_M, limit=LIMIT)
+        index_ms.append((time.perf_counter() - start) * 1000)
+        if got is None:
+            continue
+        tile_ms.append(elapsed * 1000)
+        # Equal distances may be ordered differently (slot vs index position)
+        if sorted((d["distance_km"], str(d["_id"])) for d in got) != sorted((d["distance_km"], str(d["_id"])) for d in want):
+            mismatches += 1
+    return mismatches, tile_ms, index_ms
+
+
+def percentiles(samples):
+    cuts = statistics.quantiles(samples, n=100) if len(samples) > 1 else [samples[0] if samples else 0.0] * 99
+    return f"p50 {cuts[49] * 1000:7.1f} us | p99 {cuts[98] * 1000:7.1f} us"
+
+
+def main_bench(args) -> None:
+    rng = random.Random(args.seed)
+    docs = {}
+    for doc in generate_hospitals(args.hospitals, seed=args.seed):
+        doc = {"_id": ObjectId(), **doc}
+        docs[doc["_id"]] = doc
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        built = TileSet.build(docs.values(), RADIUS_M, k=args.candidates, cell_size_deg=args.cell_deg)
+        build_s = time.perf_counter() - start
+        built.save(directory)
+        size_mb = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory)) / 1e6
+        start = time.perf_counter()
+        tiles = TileSet.open(directory)
+        open_ms = (time.perf_counter() - start) * 1000
+
+        print(f"hospitals {len(docs)} | {len(tiles.profiles)} profiles x {tiles.grid.rows}x{tiles.grid.cols} cells, "
+              f"k={tiles.k} | build {build_s:.2f}s | {size_mb:.1f} MB on disk | open (mmap) {open_ms:.1f} ms")
+
+        index = HospitalIndex.from_documents(docs.values())
+        mismatches, tile_ms, index_ms = check(tiles, index, rng, args.queries)
+        stats = tiles.stats()
+        print(f"tile hit      | {percentiles(tile_ms)}")
+        print(f"index search  | {percentiles(index_ms)}")
+        print(f"tile hit ratio {stats['hit_ratio']:.3f} ({stats['fallbacks']} fallbacks, {stats['outside_grid']} outside grid) | "
+              f"mismatches vs index: {mismatches}/{len(tile_ms)}")
+
+        writes = random_writes(rng, docs, args.writes)
+        cells, update_ms = 0, []
+        for op, payload in writes:
+            start = time.perf_counter()
+            cells += tiles.apply_changes([payload], []) if op == "upsert" else tiles.apply_changes([], [payload])
+            update_ms.append((time.perf_counter() - start) * 1000)
+        total_cells = len(tiles.profiles) * tiles.grid.rows * tiles.grid.cols
+        print(f"{len(writes)} writes applied | {percentiles(update_ms)} per write | "
+              f"{cells / max(1, len(writes)):.0f} of {total_cells} cells touched per write on average")
+
+        tiles.hits = tiles.fallbacks = tiles.outside = 0
+        mismatches, tile_ms, _ = check(tiles, HospitalIndex.from_documents(docs.values()), rng, args.queries)
+        print(f"after writes: tile hit ratio {tiles.stats()['hit_ratio']:.3f} | mismatches vs rebuilt index: "
+              f"{mismatches}/{len(tile_ms)}")
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hospitals", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--writes", type=int, default=1000)
+    parser.add_argument("--candidates", type=int, default=32, help="Hospitals kept per cell and profile")
+    parser.add_argument("--cell-deg", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=1)
+    main_bench(parser.parse_args())
+
+
+if __name__ == "__main__":
+    cli()
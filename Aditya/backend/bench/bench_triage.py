@@ -0,0 +1,140 @@
+# bench/bench_triage.py
+"""
+Checks and benchmarks the server-side condition assessment (triage.py).
+
+1. Parity: random condition ids x generated descriptions (keywords, modifiers,
+   keywords inside other words, mixed case) are assessed by triage.assess and
+   by `reference_assess`, a line-by-line port of analyzePatientCondition from
+   map-script.js; every result must be identical.
+2. Speed on long transcripts: keyword detection per engine (one `in` scan per
+   keyword vs the Aho-Corasick automaton, if pyahocorasick is installed) for
+   transcripts of increasing length, and for a vocabulary grown with extra
+   terms (to show how each engine scales with the number of keywords).
+
+Usage (from Aditya/backend):
+    python -m bench.bench_triage
+    python -m bench.bench_triage --sizes 1000 10000 100000 --extra-terms 1000
+"""
+
+import argparse
+import random
+import time
+
+from triage import MATCHER, KeywordMatcher, assess, format_name, ahocorasick
+
+CONDITIONS = [None, "", "other", "cardiac", "stroke", "accident", "allergy", "labor", "burns", "Cardiac"]
+FILLER = ("the patient was walking near the station when he suddenly felt dizzy and fell his wife says "
+          "he has a history of high blood pressure and diabetes please hurry we are near the main road").split()
+PHRASES = ["chest pain", "heart attack", "stroke symptoms", "numbness", "broken", "fracture", "breathing",
+           "breathe", "pregnant", "labor", "contractions", "allergic", "allergy", "burn", "severe", "bleeding",
+           "anaphylaxis", "breathing difficulty", "distress", "heartburn", "laboratory", "CHEST PAIN", "Severe"]
+
+
+def reference_assess(condition, details):
+    """analyzePatientCondition from map-script.js, transliterated statement by statement."""
+    needs = {"needsICU": False, "needsSpecialist": None, "urgencyLevel": 1,
+             "requiredEquipment": [], "conditionLabel": "General Checkup"}
+    if condition and condition != "other":
+        needs["conditionLabel"] = format_name(condition)
+    elif details:
+        needs["conditionLabel"] = "Described Condition"
+
+    if condition == "cardiac":
+        needs.update(needsICU=True, needsSpecialist="cardiologist", urgencyLevel=5, requiredEquipment=["defibrillator", "cardiac_monitor", "ecg"])
+    elif condition == "stroke":
+        needs.update(needsICU=True, needsSpecialist="neurologist", urgencyLevel=5, requiredEquipment=["ct_scanner", "mri"])
+    elif condition == "accident":
+        needs.update(needsICU=True, needsSpecialist="orthopedic", urgencyLevel=4,
+                     requiredEquipment=["x_ray", "orthopedic_tools", "trauma_equipment", "ct_scanner"], conditionLabel="Accident / Trauma")
+    elif condition == "allergy":
+        needs.update(needsICU=False, needsSpecialist="allergist", urgencyLevel=3,
+                     requiredEquipment=["allergy_test_kits", "epinephrine"], conditionLabel="Allergic Reaction")
+        if details and ("breathing difficulty" in details.lower() or "anaphylaxis" in details.lower()):
+            needs.update(needsICU=True, urgencyLevel=5, needsSpecialist="emergency")
+    elif condition == "labor":
+        needs.update(needsICU=False, needsSpecialist="obstetrician", urgencyLevel=4,
+                     requiredEquipment=["obstetric_ultrasound", "fetal_monitor"], conditionLabel="Labor / Pregnancy")
+        if details and ("bleeding" in details.lower() or "distress" in details.lower()):
+            needs.update(needsICU=True, urgencyLevel=5)
+    else:
+        needs["urgencyLevel"] = 2
+        if details:
+            d = details.lower()
+            if "chest pain" in d or "heart attack" in d:
+                needs.update(needsSpecialist="cardiologist", urgencyLevel=5, requiredEquipment=["cardiac_monitor", "ecg"], needsICU=True, conditionLabel="Suspected Cardiac Event")
+            if "stroke symptoms" in d or "numbness" in d:
+                needs.update(needsSpecialist="neurologist", urgencyLevel=5, requiredEquipment=["ct_scanner", "mri"], needsICU=True, conditionLabel="Suspected Stroke")
+            if "broken" in d or "fracture" in d:
+                needs.update(needsSpecialist="orthopedic", urgencyLevel=4, requiredEquipment=["x_ray", "orthopedic_tools"], needsICU="severe" in d, conditionLabel="Injury / Fracture")
+            if "breathing" in d or "breathe" in d:
+                needs.update(needsICU=True, urgencyLevel=5, requiredEquipment=["ventilator", "pulse_oximeter"], needsSpecialist="pulmonologist", conditionLabel="Breathing Difficulty")
+            if "pregnant" in d or "labor" in d or "contractions" in d:
+                needs.update(needsSpecialist="obstetrician", urgencyLevel=4, requiredEquipment=["obstetric_ultrasound", "fetal_monitor"], needsICU="bleeding" in d, conditionLabel="Pregnancy / Labor")
+            if "allergic" in d or "allergy" in d:
+                needs.update(needsSpecialist="allergist", urgencyLevel=3, requiredEquipment=["epinephrine"], needsICU="anaphylaxis" in d, conditionLabel="Allergic Reaction")
+            if "burn" in d:
+                needs.update(needsSpecialist="general_surgeon", urgencyLevel=4, requiredEquipment=["burn_dressings"], needsICU="severe" in d, conditionLabel="Burn Injury")
+        elif condition == "other":
+            needs.update(conditionLabel="Unspecified Condition", urgencyLevel=1)
+    if not needs["needsSpecialist"] and needs["urgencyLevel"] >= 4:
+        needs["needsSpecialist"] = "emergency"
+    if not needs["needsSpecialist"] and needs["urgencyLevel"] < 3:
+        needs["needsSpecialist"] = "general"
+    return needs
+
+
+def transcript(rng: random.Random, words: int, phrases: int) -> str:
+    tokens = [rng.choice(FILLER) for _ in range(words)]
+    for _ in range(phrases):
+        tokens.insert(rng.randrange(len(tokens) + 1), rng.choice(PHRASES))
+    return " ".join(tokens)
+
+
+def time_us(fn, text: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main_bench(args) -> None:
+    rng = random.Random(args.seed)
+    engines = ["substring"] + (["automaton"] if ahocorasick is not None else [])
+    matchers = {engine: KeywordMatcher(MATCHER.keywords, engine) for engine in engines}
+
+    mismatches = 0
+    for _ in range(args.cases):
+        condition = rng.choice(CONDITIONS)
+        details = rng.choice([None, "", transcript(rng, rng.randint(0, 40), rng.randint(0, 4))])
+        want = reference_assess(condition, details)
+        for matcher in matchers.values():
+            if assess(condition, details, matcher) != want:
+                mismatches += 1
+    print(f"parity with analyzePatientCondition: {mismatches} mismatches in {args.cases} cases x {len(engines)} engines")
+    if ahocorasick is None:
+        print("(pyahocorasick not installed: automaton engine skipped)")
+
+    extra = [f"symptom term {i}" for i in range(args.extra_terms)]
+    print(f"{'chars':>8} | " + " | ".join(f"{engine:>12} ({len(MATCHER.keywords)} kw)" for engine in engines)
+          + " | " + " | ".join(f"{engine:>12} (+{args.extra_terms} kw)" for engine in engines) + " | assess()")
+    big = {engine: KeywordMatcher(list(MATCHER.keywords) + extra, engine) for engine in engines}
+    for size in args.sizes:
+        text = transcript(rng, max(1, size // 6), max(1, size // 2000)).lower()[:size]
+        repeat = max(3, 2_000_000 // max(1, size))
+        cells = [f"{time_us(matchers[e].find, text, repeat):12.1f} us     " for e in engines]
+        cells += [f"{time_us(big[e].find, text, max(3, repeat // 10)):12.1f} us        " for e in engines]
+        assess_us = time_us(lambda t: assess("other", t), text, repeat)
+        print(f"{len(text):8d} | " + " | ".join(cells) + f" | {assess_us:.1f} us")
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=20000, help="Random parity cases")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 2000, 20000, 200000], help="Transcript lengths (chars)")
+    parser.add_argument("--extra-terms", type=int, default=500, help="Extra vocabulary for the scaling run")
+    parser.add_argument("--seed", type=int, default=1)
+    main_bench(parser.parse_args())
+
+
+if __name__ == "__main__":
+    cli()
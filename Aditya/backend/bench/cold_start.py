@@ -0,0 +1,254 @@
+# bench/cold_start.py
+"""
+Measures API cold start against a local stub database.
+
+The stub speaks just enough of the MongoDB wire protocol (OP_QUERY / OP_MSG)
+for the API's startup and searches: handshake, ping, createIndexes, a
+change-stream attempt (refused, as on a standalone server, so the API falls
+back to polling), find, and $geoNear aggregations answered by an exact
+in-process search over data/hospitals_sample.ndjson (or N synthetic
+hospitals). Every command can be delayed (--rtt-ms) and the stub can start
+listening late (--db-delay-ms), like a database still coming up.
+
+For each startup mode (STARTUP_MODE=blocking / background) and engine it
+starts `uvicorn main:app` in a fresh process and reports, from the moment the
+process was spawned:
+    live         first 200 from /healthz
+    ready        first 200 from /readyz
+    first query  first 200 from /api/find-suitable
+plus the API's own chetak_import_seconds, chetak_time_to_first_query_seconds
+and startup phase timings from /metrics. It fails (exit code 1) if a mode
+never becomes ready or a first query never succeeds.
+
+Usage (from Aditya/backend):
+    python -m bench.cold_start
+    python -m bench.cold_start --db-delay-ms 3000 --rtt-ms 20 --engines mongo memory --hospitals 100000 --runs 3
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import bson
+import httpx
+from bson import Int64, ObjectId
+
+from bench.synthetic import generate_hospitals
+from geo_index import HospitalIndex
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_FILE = os.path.join(BACKEND_DIR, "data", "hospitals_sample.ndjson")
+OP_REPLY, OP_QUERY, OP_MSG = 1, 2004, 2013
+HELLO_COMMANDS = {"hello", "ismaster", "isMaster"}
+
+
+class StubMongo:
+    """Minimal single-node MongoDB stand-in serving one hospitals collection, on its own thread."""
+
+    def __init__(self, docs: List[Dict[str, Any]], rtt_s: float = 0.0, delay_s: float = 0.0):
+        self.docs = docs
+        self.index = HospitalIndex.from_documents(docs)
+        self.rtt_s = rtt_s
+        self.delay_s = delay_s
+        self.port = self._free_port()
+        self.commands: Dict[str, int] = {}
+        self._loop = asyncio.new_event_loop()
+        self._connections = 0
+
+    @staticmethod
+    def _free_port() -> int:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
+    def start(self) -> None:
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self._serve(), self._loop)
+
+    def stop(self) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    async def _serve(self) -> None:
+        await asyncio.sleep(self.delay_s) # Connections are refused until then
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", self.port)
+
+    # --- Commands ---
+
+    def _hello(self) -> Dict[str, Any]:
+        self._connections += 1
+        return {"helloOk": True, "ismaster": True, "isWritablePrimary": True, "maxBsonObjectSize": 16 * 1024 * 1024,
+                "maxMessageSizeBytes": 48000000, "maxWriteBatchSize": 100000, "localTime": datetime.now(timezone.utc),
+                "minWireVersion": 0, "maxWireVersion": 17, "readOnly": False, "connectionId": self._connections, "ok": 1.0}
+
+    @staticmethod
+    def _cursor(namespace: str, docs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {"cursor": {"firstBatch": docs, "id": Int64(0), "ns": namespace}, "ok": 1.0}
+
+    def _aggregate(self, command: Dict[str, Any], namespace: str) -> Dict[str, Any]:
+        pipeline = command.get("pipeline") or [{}]
+        if "$changeStream" in pipeline[0]:
+            return {"ok": 0.0, "errmsg": "The $changeStream stage is only supported on replica sets",
+                    "code": 40573, "codeName": "Location40573"}
+        geo_near = pipeline[0].get("$geoNear")
+        if geo_near is None:
+            return self._cursor(namespace, [])
+        lon, lat = geo_near["near"]["coordinates"]
+        query = geo_near.get("query", {})
+        limit = next((stage["$limit"] for stage in pipeline if "$limit" in stage), len(self.docs))
+        docs = self.index.search(lat, lon, needs_icu=query.get("hasICU"),
+                                 specialist=(query.get("specialists", {}).get("$in") or [None])[0],
+                                 equipment=query.get("equipment", {}).get("$in"),
+                                 max_distance_m=geo_near["maxDistance"], limit=limit)
+        for doc in docs:
+            doc["distance_meters"] = doc["distance_km"] * 1000
+        return self._cursor(namespace, docs)
+
+    def _command(self, command: Dict[str, Any], db: str) -> Dict[str, Any]:
+        name = next(iter(command))
+        self.commands[name] = self.commands.get(name, 0) + 1
+        if name in HELLO_COMMANDS:
+            return self._hello()
+        namespace = f"{db}.{command[name]}"
+        if name == "aggregate":
+            return self._aggregate(command, namespace)
+        if name == "find":
+            # A full read loads the index; filtered reads (polling watermarks) find nothing new
+            return self._cursor(namespace, self.docs if not command.get("filter") else [])
+        if name == "createIndexes":
+            return {"numIndexesBefore": 2, "numIndexesAfter": 2, "createdCollectionAutomatically": False, "ok": 1.0}
+        return {"ok": 1.0} # ping, endSessions, killCursors, ...
+
+    # --- Wire protocol ---
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                header = await reader.readexactly(16)
+                length, request_id, _, op_code = struct.unpack("<iiii", header)
+                body = await reader.readexactly(length - 16)
+                if self.rtt_s:
+                    await asyncio.sleep(self.rtt_s)
+                if op_code == OP_QUERY:
+                    name_end = body.index(b"\x00", 4)
+                    db = body[4:name_end].decode().split(".")[0]
+                    offset = name_end + 1 + 8 # numberToSkip, numberToReturn
+                    doc_length = struct.unpack_from("<i", body, offset)[0]
+                    reply = bson.encode(self._command(bson.decode(body[offset:offset + doc_length]), db))
+                    payload = struct.pack("<iqii", 0, 0, 0, 1) + reply
+                    writer.write(struct.pack("<iiii", 16 + len(payload), 0, request_id, OP_REPLY) + payload)
+                elif op_code == OP_MSG:
+                    doc_length = struct.unpack_from("<i", body, 5)[0] # flagBits, then section kind 0
+                    command = bson.decode(body[5:5 + doc_length])
+                    reply = bson.encode(self._command(command, command.get("$db", "admin")))
+                    payload = struct.pack("<I", 0) + b"\x00" + reply
+                    writer.write(struct.pack("<iiii", 16 + len(payload), 0, request_id, OP_MSG) + payload)
+                else:
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def load_docs(n_hospitals: int) -> List[Dict[str, Any]]:
+    if n_hospitals:
+        return [{"_id": ObjectId(), **doc} for doc in generate_hospitals(n_hospitals, seed=1)]
+    with open(SAMPLE_FILE, encoding="utf-8") as f:
+        return [{"_id": ObjectId(), **json.loads(line)} for line in f if line.strip()]
+
+
+def parse_metrics(text: str) -> Dict[str, float]:
+    values = {}
+    for line in text.splitlines():
+        if line.startswith(("chetak_import_seconds", "chetak_time_to_first_query_seconds", "chetak_startup_phase_seconds")):
+            name, value = line.rsplit(" ", 1)
+            values[name] = float(value)
+    return values
+
+
+def phase_label(metric: str) -> str:
+    return metric.split('"')[1] # chetak_startup_phase_seconds{phase="connect"} -> connect
+
+
+def start_api(stub: StubMongo, mode: str, engine: str, port: int) -> subprocess.Popen:
+    env = {**os.environ, "MONGO_URI": f"mongodb://127.0.0.1:{stub.port}/?directConnection=true",
+           "DB_NAME": "coldStartBench", "STARTUP_MODE": mode, "SEARCH_ENGINE": engine,
+           "METRICS_ENABLED": "true", "SNAPSHOT_SYNC": "auto", "MONGO_MIN_POOL_SIZE": "0"}
+    return subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+                             "--log-level", "warning"], cwd=BACKEND_DIR, env=env)
+
+
+def measure(mode: str, engine: str, args) -> Dict[str, Any]:
+    """One cold start: seconds from spawn to live / ready / first query, plus the API's own metrics."""
+    stub = StubMongo(load_docs(args.hospitals), rtt_s=args.rtt_ms / 1000, delay_s=args.db_delay_ms / 1000)
+    stub.start()
+    port = StubMongo._free_port()
+    base = f"http://127.0.0.1:{port}"
+    spawned = time.perf_counter()
+    process = start_api(stub, mode, engine, port)
+    times: Dict[str, Optional[float]] = {"live": None, "ready": None, "first_query": None}
+    query = {"lat": 19.0760, "lon": 72.8777, "needsICU": "true", "specialist": "neurologist"}
+    try:
+        with httpx.Client(timeout=2.0) as http:
+            while time.perf_counter() - spawned < args.timeout and None in times.values():
+                for name, path, params in (("live", "/healthz", None), ("ready", "/readyz", None),
+                                           ("first_query", "/api/find-suitable", query)):
+                    if times[name] is not None:
+                        continue
+                    try:
+                        if http.get(base + path, params=params).status_code == 200:
+                            times[name] = time.perf_counter() - spawned
+                    except httpx.TransportError:
+                        pass # Not listening yet
+                time.sleep(0.005)
+            api_metrics = parse_metrics(http.get(base + "/metrics").text) if times["live"] is not None else {}
+    finally:
+        process.terminate()
+        process.wait()
+        stub.stop()
+    return {**times, "metrics": api_metrics}
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["blocking", "background"], choices=["blocking", "background"])
+    parser.add_argument("--engines", nargs="+", default=["mongo", "memory"], choices=["mongo", "memory"])
+    parser.add_argument("--hospitals", type=int, default=0, help="Synthetic hospitals (default: the 30 sample ones)")
+    parser.add_argument("--db-delay-ms", type=float, default=1000, help="Stub database starts listening this late")
+    parser.add_argument("--rtt-ms", type=float, default=5, help="Delay per database command")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60, help="Give up on a start after this many seconds")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"stub database: {args.hospitals or 'sample'} hospitals, up after {args.db_delay_ms:g} ms, {args.rtt_ms:g} ms per command")
+    for engine in args.engines:
+        for mode in args.modes:
+            runs = [measure(mode, engine, args) for _ in range(args.runs)]
+            def median(name: str) -> str:
+                values = [run[name] for run in runs if run[name] is not None]
+                if len(values) < len(runs):
+                    return "   never"
+                return f"{statistics.median(values) * 1000:6.0f}ms"
+            failed = failed or any(run["ready"] is None or run["first_query"] is None for run in runs)
+            api = runs[-1]["metrics"]
+            phases = ", ".join(f"{phase_label(name)} {value * 1000:.0f}ms" for name, value in api.items()
+                               if name.startswith("chetak_startup_phase_seconds"))
+            print(f"{engine:6} {mode:10} | live {median('live')} | ready {median('ready')} | first query {median('first_query')} | "
+                  f"import {api.get('chetak_import_seconds', 0) * 1000:.0f}ms | {phases}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    cli()
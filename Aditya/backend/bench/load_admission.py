@@ -0,0 +1,125 @@
+# bench/load_admission.py
+"""
+Overload test for admission control (admission.py): dispatcher and public
+searches at 10x what the database can serve.
+
+The app runs in-process on load_api's mongomock backend with the `mongo`
+config (no cache, every search is a database round-trip). Each round-trip
+holds one of --pool-size connections for --db-ms, so the database serves at
+most pool size / db time searches per second (50/s by default); beyond that
+searches queue for a connection, as they do on an exhausted driver pool.
+Searches are load_api's request mix, open loop, --dispatch-share of them
+sent by dispatcher consoles (X-Dispatch-Key).
+
+Phases, --duration seconds each:
+    baseline     0.5x capacity, admission control on
+    unbounded    --overload x capacity, admission control off (every search queues for the pool)
+    admission    --overload x capacity, admission control on (ADMISSION_* settings below)
+For each class it reports searches/s answered, p50 / p99 latency of the
+answered ones (degraded answers included), and how many were degraded
+(last results near the caller), refused (503) or timed out. The baseline
+phase also records the results that later degraded answers come from.
+
+Usage (from Aditya/backend):
+    python -m bench.load_admission
+    python -m bench.load_admission --pool-size 10 --db-ms 50 --overload 10 --duration 20
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+from typing import Any, Dict
+
+import httpx
+import numpy as np
+
+import main
+from admission import AdmissionController
+from bench.load_api import apply_config, build_requests, load_mongomock, load_sample, make_dataset, open_loop, unload
+from search_cache import LastResults
+
+DISPATCH_KEY = "bench-dispatch"
+PHASES = (("baseline", 0.5, True), ("unbounded", None, False), ("admission", None, True))
+
+
+def describe(run: Dict[str, Any]) -> str:
+    ok = len(run["latencies"])
+    statuses = run["statuses"]
+    p50, p99 = np.percentile(np.array(run["latencies"]) * 1000, [50, 99]) if ok else (float("nan"), float("nan"))
+    return (f"{ok / run['elapsed']:6.1f}/s p50 {p50:8.1f} p99 {p99:8.1f} ms | degraded {statuses['degraded']:5} "
+            f"503 {statuses['503']:5} timeout {statuses['timeout']:5} of {run['sent']}")
+
+
+def controller(args) -> AdmissionController:
+    return AdmissionController(args.pool_size, args.max_queue,
+                               {"dispatch": args.dispatch_queue_seconds, "public": args.public_queue_seconds},
+                               args.reserved)
+
+
+async def run_phase(http: httpx.AsyncClient, name: str, rate: float, admission: bool, requests, args) -> None:
+    main.admission_control = controller(args) if admission else None
+    dispatch_rate = rate * args.dispatch_share
+    runs = await asyncio.gather(
+        open_loop(http, requests, dispatch_rate, args.duration, args.timeout, args.max_in_flight,
+                  random.Random(args.seed), headers={"X-Dispatch-Key": DISPATCH_KEY}),
+        open_loop(http, requests, rate - dispatch_rate, args.duration, args.timeout, args.max_in_flight,
+                  random.Random(args.seed + 1)),
+    )
+    print(f"{name:9} {rate:6.0f}/s offered, admission {'on' if admission else 'off'}")
+    for priority, result in zip(("dispatch", "public"), runs):
+        print(f"  {priority:8} {describe(result)}")
+    if main.admission_control is not None:
+        stats = main.admission_control.stats()
+        print(f"  shed {stats['shed']} | degraded {stats['degraded']}")
+    await asyncio.sleep(args.db_ms / 1000 * 2) # Let the pool drain before the next phase
+
+
+async def run(args) -> None:
+    sample = load_sample()
+    centers = [(doc["location"]["coordinates"][1], doc["location"]["coordinates"][0]) for doc in sample]
+    requests = build_requests(random.Random(args.seed), args.distinct_requests, centers, args.triage_share)
+    capacity = args.pool_size / (args.db_ms / 1000)
+    print(f"database capacity {capacity:.0f} searches/s ({args.pool_size} connections x {args.db_ms:g} ms) | "
+          f"{args.dispatch_share:.0%} dispatch | {args.duration:g}s per phase")
+
+    args.mock_rtt_ms = args.db_ms
+    load_mongomock(make_dataset(args.hospitals, sample, args.seed), args)
+    main.hospitals_collection.pool = asyncio.Semaphore(args.pool_size)
+    apply_config("mongo", None, None)
+    main.DISPATCH_API_KEYS = [DISPATCH_KEY]
+    main.last_results = LastResults(main.LAST_RESULTS_SIZE)
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as http:
+            for name, load, admission in PHASES:
+                await run_phase(http, name, capacity * (load or args.overload), admission, requests, args)
+    finally:
+        await unload(args)
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hospitals", type=int, default=10000)
+    parser.add_argument("--pool-size", type=int, default=5, help="Database connections (also the admission limit)")
+    parser.add_argument("--db-ms", type=float, default=100.0, help="Time a search holds a connection")
+    parser.add_argument("--overload", type=float, default=10.0, help="Offered load of the overload phases, x capacity")
+    parser.add_argument("--dispatch-share", type=float, default=0.05, help="Share of searches from dispatcher consoles")
+    parser.add_argument("--reserved", type=int, default=main.ADMISSION_DISPATCH_RESERVED, help="ADMISSION_DISPATCH_RESERVED")
+    parser.add_argument("--max-queue", type=int, default=main.ADMISSION_MAX_QUEUE, help="ADMISSION_MAX_QUEUE")
+    parser.add_argument("--dispatch-queue-seconds", type=float, default=main.ADMISSION_DISPATCH_QUEUE_SECONDS)
+    parser.add_argument("--public-queue-seconds", type=float, default=main.ADMISSION_PUBLIC_QUEUE_SECONDS)
+    parser.add_argument("--bench-db", default="chetakBench", help="mongomock database the hospitals are loaded into")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per phase")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Per-request timeout (counted as an error)")
+    parser.add_argument("--max-in-flight", type=int, default=4000, help="Requests beyond this are dropped (errors)")
+    parser.add_argument("--triage-share", type=float, default=0.1, help="Share of searches sent to /api/triage-search")
+    parser.add_argument("--distinct-requests", type=int, default=20000, help="Search specs generated (then cycled)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    args.backend = "mongomock"
+    logging.disable(logging.INFO)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    cli()
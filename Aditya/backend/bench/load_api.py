@@ -0,0 +1,472 @@
+# bench/load_api.py
+"""
+Load test / benchmark harness for the Chetak API.
+
+Datasets (--datasets, hospital counts):
+- 30 is data/hospitals_sample.ndjson itself; other sizes are synthetic
+  hospitals modelled on it (bench.synthetic.generate_realistic_hospitals:
+  load_data.py's vocabulary at the sample's term frequencies, locations
+  clustered around the real hospitals).
+
+Backends (--backend):
+- mongomock (default, no server needed): documents are validated with
+  load_data.normalize_record and inserted. Mongomock has no geo operators, so
+  the `mongo` engine's $geoNear is answered by an exact in-process search
+  after a simulated round-trip (--mock-rtt-ms): its numbers measure the API
+  around a database call, not a database.
+- mongod: a local server at --mongo-uri. The dataset is loaded into
+  --bench-db (dropped afterwards unless --keep) with load_data.py's bulk
+  upserts and indexes.
+
+Configs (--configs), switched in-process on main's globals, one event loop =
+one uvicorn worker:
+    mongo         $geoNear on every request
+    mongo+cache   search cache in front of $geoNear (the default deployment)
+    memory        in-process index (SEARCH_ENGINE=memory)
+    memory+cache
+    tiles         condition-profile tiles in front of mongo+cache (TILES_DIR)
+
+Load is open loop: Poisson arrivals at --rate req/s for --duration s, each
+request sent at its scheduled time whether or not earlier ones have finished,
+and latency counted from that scheduled time (so a stalled server shows up
+as latency, not as a lower send rate). Patients cluster around the sample
+hospitals (plus a uniform background), some requests repeat a recent
+incident's location, and needs follow the frontend's condition profiles;
+--triage-share of the requests go to /api/triage-search.
+
+Per dataset x config it reports throughput, p50/p95/p99 latency and error
+rate. --out writes them as JSON (sorted keys) to diff runs; --diff prints the
+change between two result files. --url drives an already running server
+instead (config "external"; datasets and configs are then up to that server).
+
+Usage (from Aditya/backend):
+    python -m bench.load_api
+    python -m bench.load_api --datasets 30 10000 1000000 --configs memory+cache tiles --rate 500 --out before.json
+    python -m bench.load_api --backend mongod --mongo-uri mongodb://localhost:27017 --out after.json
+    python -m bench.load_api --url http://127.0.0.1:8080 --rate 200 --duration 30
+    python -m bench.load_api --diff before.json after.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+import httpx
+import numpy as np
+
+import main
+from bench.synthetic import MUMBAI_REGION, clustered_points, generate_realistic_hospitals
+from condition_profiles import CONDITION_PROFILES
+from fast_json import HospitalEncoder
+from geo_index import HospitalIndex
+from hospital_tiles import TileSet
+from load_data import ensure_indexes, load_files, normalize_record, read_records
+from search_cache import SearchCache
+
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "hospitals_sample.ndjson")
+RESULTS_VERSION = 1
+
+# (in-memory index, search cache, tiles)
+CONFIGS = {
+    "mongo": (False, False, False),
+    "mongo+cache": (False, True, False),
+    "memory": (True, False, False),
+    "memory+cache": (True, True, False),
+    "tiles": (False, True, True),
+}
+# Relative frequency of what the frontend asks for (None = no filters)
+CONDITION_WEIGHTS = {"cardiac": 3, "stroke": 2, "accident": 3, "allergy": 1, "labor": 1, None: 2}
+REPEAT_SHARE = 0.1 # Requests repeating a recent incident's location (several calls about one emergency)
+
+
+# --- Datasets ---
+
+def load_sample() -> List[Dict[str, Any]]:
+    """The sample hospitals as load_data.py would store them."""
+    docs = []
+    for raw in read_records(SAMPLE_FILE):
+        doc = normalize_record(raw)
+        doc.pop("_id", None)
+        docs.append(doc)
+    return docs
+
+
+def make_dataset(size: int, sample: List[Dict[str, Any]], seed: int) -> List[Dict[str, Any]]:
+    if size <= len(sample):
+        return [dict(doc) for doc in sample[:size]]
+    return list(generate_realistic_hospitals(size, sample, seed=seed))
+
+
+class _ListCursor:
+    """Async cursor over an already materialized result list."""
+
+    def __init__(self, docs):
+        self._docs = docs
+
+    def limit(self, limit):
+        return _ListCursor(self._docs[:limit])
+
+    async def to_list(self, length=None):
+        return self._docs
+
+
+class MockAsyncCollection:
+    """
+    AsyncCollection stand-in over a mongomock collection. $geoNear pipelines
+    (which mongomock can't run) are answered by an exact search over the
+    collection's documents after `rtt_s` of simulated round-trip. With a
+    `pool` semaphore each round-trip holds one of its connections, modelling a
+    database that serves at most pool size / rtt_s searches per second.
+    """
+
+    def __init__(self, collection, docs: List[Dict[str, Any]], rtt_s: float, pool: Optional[asyncio.Semaphore] = None):
+        self.collection = collection
+        self.rtt_s = rtt_s
+        self.pool = pool
+        self._index = HospitalIndex.from_documents(docs)
+        self._by_field = {(field, doc[field]): doc for doc in docs for field in ("_id", "id") if field in doc}
+
+    async def aggregate(self, pipeline):
+        geo_near = pipeline[0]["$geoNear"]
+        lon, lat = geo_near["near"]["coordinates"]
+        query = geo_near["query"]
+        if self.pool is not None:
+            async with self.pool: # Queues for a connection like the driver's wait queue (no timeout)
+                await asyncio.sleep(self.rtt_s)
+        elif self.rtt_s:
+            await asyncio.sleep(self.rtt_s)
+        docs = self._index.search(lat, lon, needs_icu=query.get("hasICU"),
+                                  specialist=(query.get("specialists", {}).get("$in") or [None])[0],
+                                  equipment=query.get("equipment", {}).get("$in"),
+                                  max_distance_m=geo_near["maxDistance"], limit=pipeline[2]["$limit"])
+        return _ListCursor(docs)
+
+    def find(self, query, projection=None):
+        """One hospital by `_id` or `id` (status push lookups), from the documents held here."""
+        (field, value), = query.items()
+        doc = self._by_field.get((field, value))
+        return _ListCursor([doc] if doc is not None else [])
+
+    async def bulk_write(self, requests, ordered=True):
+        """Acknowledged after the simulated round-trip, not applied (live status flushes)."""
+        if self.rtt_s:
+            await asyncio.sleep(self.rtt_s)
+        return SimpleNamespace(matched_count=len(requests), modified_count=len(requests))
+
+
+def load_mongomock(docs: List[Dict[str, Any]], args) -> List[Dict[str, Any]]:
+    """Inserts the dataset into mongomock and points main at it; returns the stored documents."""
+    import mongomock # Optional: pip install mongomock
+    collection = mongomock.MongoClient()[args.bench_db][main.COLLECTION_NAME]
+    records = [{k: v for k, v in normalize_record(doc).items() if k != "_id"} for doc in docs]
+    collection.insert_many(records) # Fresh collection: plain inserts (mongomock's bulk_write lags behind pymongo)
+    # insert_many set each record's _id; reading them back through mongomock's find() is far slower
+    stored = [{field: record[field] for field in main.HOSPITAL_PROJECTION if field in record} for record in records]
+    main.client = object() # Only checked for availability
+    main.hospitals_collection = MockAsyncCollection(collection, stored, args.mock_rtt_ms / 1000)
+    return stored
+
+
+def load_mongod(docs: List[Dict[str, Any]], args) -> List[Dict[str, Any]]:
+    """Loads the dataset into the bench database with load_data.py and points main at it."""
+    from pymongo import AsyncMongoClient, MongoClient
+    collection = MongoClient(args.mongo_uri, serverSelectionTimeoutMS=5000)[args.bench_db][main.COLLECTION_NAME]
+    collection.drop()
+    ensure_indexes(collection)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "hospitals.ndjson")
+        with open(path, "w") as f:
+            for doc in docs:
+                f.write(json.dumps(doc) + "\n")
+        load_files(collection, [path], progress_every=max(10000, len(docs) // 10))
+    stored = list(collection.find({}, main.HOSPITAL_PROJECTION))
+    main.client = AsyncMongoClient(args.mongo_uri, serverSelectionTimeoutMS=5000,
+                                   maxPoolSize=main.MONGO_MAX_POOL_SIZE, minPoolSize=main.MONGO_MIN_POOL_SIZE,
+                                   waitQueueTimeoutMS=main.MONGO_WAIT_QUEUE_TIMEOUT_MS)
+    main.hospitals_collection = main.client[args.bench_db][main.COLLECTION_NAME]
+    return stored
+
+
+async def unload(args) -> None:
+    if args.backend == "mongod":
+        if not args.keep:
+            await main.hospitals_collection.drop()
+        await main.client.close()
+    main.client = main.hospitals_collection = None
+
+
+def apply_config(name: str, index: Optional[HospitalIndex], tiles: Optional[TileSet]) -> None:
+    """Sets main's engines as the API would run with that configuration (fresh caches)."""
+    use_index, use_cache, use_tiles = CONFIGS[name]
+    main.hospital_index = index if use_index else None
+    main.search_cache = (SearchCache(main.SEARCH_CACHE_SIZE, main.SEARCH_CACHE_TTL_SECONDS, main.SEARCH_CACHE_CELL_DEG)
+                         if use_cache else None)
+    main.hospital_tiles = tiles if use_tiles else None
+    main.hospital_encoder = HospitalEncoder() if main.FAST_JSON_RESPONSES else None
+
+
+# --- Load Generation ---
+
+def build_requests(rng: random.Random, n: int, centers: List[Tuple[float, float]],
+                   triage_share: float) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """(method, path, query params or JSON body) for `n` requests, as the frontend would send them."""
+    conditions, weights = list(CONDITION_WEIGHTS), list(CONDITION_WEIGHTS.values())
+    recent: deque = deque(maxlen=50)
+    requests = []
+    for lat, lon in clustered_points(rng, n, centers, sigma_km=2.5, background=0.2):
+        if recent and rng.random() < REPEAT_SHARE:
+            lat, lon = rng.choice(recent)
+            lat, lon = round(lat + rng.gauss(0, 0.001), 6), round(lon + rng.gauss(0, 0.001), 6) # ~100 m
+        recent.append((lat, lon))
+        condition = rng.choices(conditions, weights)[0]
+        if rng.random() < triage_share:
+            requests.append(("POST", "/api/triage-search", {"lat": lat, "lon": lon, "condition": condition or "other"}))
+            continue
+        params: Dict[str, Any] = {"lat": lat, "lon": lon}
+        if condition is not None:
+            profile = CONDITION_PROFILES[condition]
+            if profile.needs_icu:
+                params["needsICU"] = "true"
+            params["specialist"] = profile.specialist
+            params["equipment"] = list(profile.equipment)
+        requests.append(("GET", "/api/find-suitable", params))
+    return requests
+
+
+async def open_loop(http: httpx.AsyncClient, requests, rate: float, duration: float, timeout: float,
+                    max_in_flight: int, rng: random.Random, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Sends requests at Poisson arrival times for `duration` seconds; returns the raw measurements.
+    Requests are (method, path, payload), or with their own headers (method, path, payload, headers).
+    Answers flagged X-Degraded (shed by admission control) are also counted under "degraded".
+    """
+    loop = asyncio.get_running_loop()
+    offsets, t = [], rng.expovariate(rate)
+    while t < duration:
+        offsets.append(t)
+        t += rng.expovariate(rate)
+
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    in_flight = 0
+
+    async def fire(request: Tuple, scheduled: float):
+        nonlocal in_flight
+        in_flight += 1
+        method, path, payload, *own_headers = request
+        sent_headers = {**(headers or {}), **(own_headers[0] if own_headers else {})}
+        try:
+            remaining = scheduled + timeout - loop.time() # The client gives up `timeout` after it meant to send
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            send = (http.get(path, params=payload, headers=sent_headers) if method == "GET"
+                    else http.post(path, json=payload, headers=sent_headers))
+            response = await asyncio.wait_for(send, remaining)
+            if loop.time() - scheduled > timeout:
+                raise asyncio.TimeoutError # Answered, but only after a blocked event loop let it through
+            statuses[str(response.status_code)] += 1
+            if "x-degraded" in response.headers:
+                statuses["degraded"] += 1
+            if response.status_code < 400:
+                latencies.append(loop.time() - scheduled)
+        except asyncio.TimeoutError:
+            statuses["timeout"] += 1
+        except httpx.HTTPError as err:
+            statuses[type(err).__name__] += 1
+        finally:
+            in_flight -= 1
+
+    start = loop.time()
+    tasks = []
+    for i, offset in enumerate(offsets):
+        scheduled = start + offset
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if in_flight >= max_in_flight:
+            statuses["dropped"] += 1 # Client-side cap, counted as an error
+            continue
+        tasks.append(asyncio.create_task(fire(requests[i % len(requests)], scheduled)))
+    await asyncio.gather(*tasks)
+    return {"sent": len(offsets), "elapsed": loop.time() - start, "latencies": latencies, "statuses": statuses}
+
+
+def summarize(dataset, config: str, args, run: Dict[str, Any]) -> Dict[str, Any]:
+    latencies = np.array(run["latencies"]) * 1000
+    ok = len(latencies)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if ok else (None, None, None)
+    return {
+        "dataset": dataset,
+        "config": config,
+        "backend": "external" if args.url else args.backend,
+        "offered_rps": args.rate,
+        "duration_s": args.duration,
+        "sent": run["sent"],
+        "ok": ok,
+        "errors": run["sent"] - ok,
+        "error_rate": round((run["sent"] - ok) / run["sent"], 6) if run["sent"] else 0.0,
+        "throughput_rps": round(ok / run["elapsed"], 2) if run["elapsed"] else 0.0,
+        "latency_ms": {"p50": _round(p50), "p95": _round(p95), "p99": _round(p99),
+                       "mean": _round(latencies.mean()) if ok else None, "max": _round(latencies.max()) if ok else None},
+        "statuses": dict(sorted(run["statuses"].items())),
+    }
+
+
+def _order(key: Tuple[str, str]) -> Tuple[int, str, str]:
+    """Sorts (dataset, config) keys with numeric dataset sizes in numeric order."""
+    return (len(key[0]), key[0], key[1])
+
+
+def _round(value) -> Optional[float]:
+    return None if value is None else round(float(value), 3)
+
+
+async def measure(http: httpx.AsyncClient, requests, args, seed: int) -> Dict[str, Any]:
+    if args.warmup > 0:
+        await open_loop(http, requests, args.rate, args.warmup, args.timeout, args.max_in_flight, random.Random(seed + 1))
+    return await open_loop(http, requests, args.rate, args.duration, args.timeout, args.max_in_flight, random.Random(seed))
+
+
+# --- Runs ---
+
+def print_row(result: Dict[str, Any]) -> None:
+    latency = result["latency_ms"]
+    cell = lambda value: f"{value:9.2f}" if value is not None else f"{'-':>9}"
+    print(f"{str(result['dataset']):>9} {result['config']:<13} {result['offered_rps']:8.0f} {result['throughput_rps']:9.1f}"
+          f" {cell(latency['p50'])} {cell(latency['p95'])} {cell(latency['p99'])} {result['error_rate'] * 100:7.2f}%", flush=True)
+
+
+def print_header() -> None:
+    print(f"{'dataset':>9} {'config':<13} {'offered':>8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>8}")
+
+
+async def run(args) -> List[Dict[str, Any]]:
+    sample = load_sample()
+    centers = [(doc["location"]["coordinates"][1], doc["location"]["coordinates"][0]) for doc in sample]
+    requests = build_requests(random.Random(args.seed), args.distinct_requests, centers, args.triage_share)
+    results = []
+    print_header()
+
+    if args.url:
+        limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+        async with httpx.AsyncClient(base_url=args.url, limits=limits) as http:
+            result = summarize("external", "external", args, await measure(http, requests, args, args.seed))
+        print_row(result)
+        return [result]
+
+    for size in args.datasets:
+        start = time.perf_counter()
+        docs = make_dataset(size, sample, args.seed)
+        stored = (load_mongod if args.backend == "mongod" else load_mongomock)(docs, args)
+        loaded_s, start = time.perf_counter() - start, time.perf_counter()
+        index = HospitalIndex.from_documents(stored) if any(CONFIGS[c][0] for c in args.configs) else None
+        tiles = TileSet.build(stored, main.SEARCH_RADIUS_METERS, region=MUMBAI_REGION) if "tiles" in args.configs else None
+        print(f"# dataset {size}: {len(stored)} hospitals loaded into {args.backend} in {loaded_s:.1f}s, "
+              f"index / tiles built in {time.perf_counter() - start:.1f}s", flush=True)
+        try:
+            for config in args.configs:
+                apply_config(config, index, tiles)
+                async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as http:
+                    result = summarize(size, config, args, await measure(http, requests, args, args.seed))
+                results.append(result)
+                print_row(result)
+        finally:
+            await unload(args)
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path: str, results: List[Dict[str, Any]], args) -> None:
+    document = {
+        "version": RESULTS_VERSION,
+        "meta": {"created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"), "git_commit": git_commit(),
+                 "python": platform.python_version(), "platform": platform.platform(),
+                 "args": {k: v for k, v in sorted(vars(args).items()) if k not in ("out", "diff")}},
+        "results": sorted(results, key=lambda r: _order((str(r["dataset"]), r["config"]))),
+    }
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def diff_results(base_path: str, new_path: str) -> None:
+    """Prints throughput / latency / error-rate changes per dataset x config between two result files."""
+    with open(base_path) as f:
+        base = {(str(r["dataset"]), r["config"]): r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = {(str(r["dataset"]), r["config"]): r for r in json.load(f)["results"]}
+
+    def change(old, current) -> str:
+        if old is None or current is None:
+            return f"{'-':>17}"
+        percent = (current - old) / old * 100 if old else 0.0
+        return f"{current:9.2f} ({percent:+5.0f}%)"
+
+    print(f"{'dataset':>9} {'config':<13} {'req/s':>17} {'p50 ms':>17} {'p95 ms':>17} {'p99 ms':>17} {'errors':>8}")
+    for key in sorted(base.keys() | new.keys(), key=_order):
+        if key not in base or key not in new:
+            print(f"{key[0]:>9} {key[1]:<13} only in {base_path if key in base else new_path}")
+            continue
+        old, current = base[key], new[key]
+        cells = [change(old["throughput_rps"], current["throughput_rps"])]
+        cells += [change(old["latency_ms"][p], current["latency_ms"][p]) for p in ("p50", "p95", "p99")]
+        print(f"{key[0]:>9} {key[1]:<13} " + " ".join(cells) + f" {current['error_rate'] * 100:7.2f}%")
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--datasets", type=int, nargs="+", default=[30, 10000], help="Hospital counts (30 = the sample file)")
+    parser.add_argument("--configs", nargs="+", choices=list(CONFIGS), default=list(CONFIGS))
+    parser.add_argument("--backend", choices=["mongomock", "mongod"], default="mongomock")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017", help="Local mongod (--backend mongod)")
+    parser.add_argument("--bench-db", default="chetakBench", help="Database the datasets are loaded into")
+    parser.add_argument("--keep", action="store_true", help="Keep the loaded collection (mongod)")
+    parser.add_argument("--mock-rtt-ms", type=float, default=1.0, help="Simulated $geoNear round-trip (mongomock)")
+    parser.add_argument("--url", help="Drive a running server instead of the in-process app")
+    parser.add_argument("--rate", type=float, default=200.0, help="Offered load, requests/s")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per dataset x config")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds before each run")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Per-request timeout (counted as an error)")
+    parser.add_argument("--max-in-flight", type=int, default=2000, help="Requests beyond this are dropped (errors)")
+    parser.add_argument("--triage-share", type=float, default=0.2, help="Share of requests sent to /api/triage-search")
+    parser.add_argument("--distinct-requests", type=int, default=20000, help="Request specs generated (then cycled)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="Write the results as JSON")
+    parser.add_argument("--diff", nargs=2, metavar=("BASE", "NEW"), help="Compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.diff:
+        diff_results(*args.diff)
+        return
+    if args.bench_db == main.DB_NAME:
+        parser.error(f"--bench-db must not be the API's database ('{main.DB_NAME}'): it is dropped and reloaded")
+    logging.disable(logging.INFO) # Startup / loader logs would interleave with the table
+    results = asyncio.run(run(args))
+    if args.out:
+        write_results(args.out, results, args)
+        print(f"# results written to {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    cli()
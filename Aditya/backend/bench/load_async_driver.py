@@ -0,0 +1,189 @@
+# bench/load_async_driver.py
+"""
+Load test: blocking vs async MongoDB driver inside one API worker.
+
+Drives /api/find-suitable in-process (one event loop = one uvicorn worker)
+with N concurrent clients, once with a blocking driver call in the handler
+(the old `pymongo.MongoClient` behaviour) and once with the async client.
+Reports throughput, latency percentiles and how many database round-trips
+were actually in flight at the same time.
+
+Backends:
+- default:     local mongod at MONGO_URI (load it with load_data.py first)
+- --stand-in:  no database; searches run on the in-memory engine behind a
+               simulated round-trip of --rtt-ms (time.sleep for the blocking
+               driver, asyncio.sleep for the async one)
+
+Usage (from Aditya/backend):
+    python -m bench.load_async_driver --stand-in --rtt-ms 20 --concurrency 50 --requests 1000
+    MONGO_URI=mongodb://localhost:27017 python -m bench.load_async_driver --concurrency 50
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+
+import httpx
+from bson import ObjectId
+
+import main
+from bench.synthetic import generate_hospitals
+from geo_index import HospitalIndex
+
+
+class _ListCursor:
+    """Async cursor over an already materialized result list."""
+
+    def __init__(self, docs):
+        self._docs = docs
+
+    async def to_list(self, length=None):
+        return self._docs
+
+
+class InFlightCounter:
+    """Tracks how many database round-trips overlap in time."""
+
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+
+    def __enter__(self):
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+
+    def __exit__(self, *exc):
+        self.current -= 1
+
+
+class StandInCollection:
+    """Answers $geoNear pipelines from an in-memory index after a simulated round-trip."""
+
+    def __init__(self, index: HospitalIndex, rtt_s: float, blocking: bool, counter: InFlightCounter):
+        self.index = index
+        self.rtt_s = rtt_s
+        self.blocking = blocking
+        self.counter = counter
+
+    async def aggregate(self, pipeline):
+        geo_near = pipeline[0]["$geoNear"]
+        lon, lat = geo_near["near"]["coordinates"]
+        query = geo_near["query"]
+        with self.counter:
+            if self.blocking:
+                time.sleep(self.rtt_s) # Blocks the event loop, like a synchronous driver call
+            else:
+                await asyncio.sleep(self.rtt_s)
+            docs = self.index.search(lat, lon, needs_icu=query.get("hasICU"),
+                                     specialist=(query.get("specialists", {}).get("$in") or [None])[0],
+                                     equipment=query.get("equipment", {}).get("$in"),
+                                     max_distance_m=geo_near["maxDistance"], limit=pipeline[2]["$limit"])
+        return _ListCursor(docs)
+
+
+class BlockingMongoCollection:
+    """Wraps a synchronous pymongo collection so the handler blocks on each call (old behaviour)."""
+
+    def __init__(self, collection, counter: InFlightCounter):
+        self.collection = collection
+        self.counter = counter
+
+    async def aggregate(self, pipeline):
+        with self.counter:
+            return _ListCursor(list(self.collection.aggregate(pipeline)))
+
+
+class CountingAsyncCollection:
+    """Wraps an AsyncCollection to count overlapping round-trips."""
+
+    def __init__(self, collection, counter: InFlightCounter):
+        self.collection = collection
+        self.counter = counter
+
+    async def aggregate(self, pipeline):
+        with self.counter:
+            cursor = await self.collection.aggregate(pipeline)
+            return _ListCursor(await cursor.to_list(None))
+
+
+async def drive(n_requests: int, concurrency: int, seed: int):
+    """Sends n_requests from `concurrency` clients; returns (elapsed_s, latencies_s, errors)."""
+    rng = random.Random(seed)
+    queue = asyncio.Queue()
+    for _ in range(n_requests):
+        queue.put_nowait({"lat": rng.uniform(18.95, 19.20), "lon": rng.uniform(72.80, 73.10),
+                          "needsICU": "true", "specialist": rng.choice(["cardiologist", "neurologist", "orthopedic"])})
+    latencies, errors = [], 0
+
+    async def client_loop(http: httpx.AsyncClient):
+        nonlocal errors
+        while not queue.empty():
+            params = queue.get_nowait()
+            start = time.perf_counter()
+            response = await http.get("/api/find-suitable", params=params)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(http) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return elapsed, latencies, errors
+
+
+def report(label: str, elapsed: float, latencies: list, errors: int, counter: InFlightCounter) -> None:
+    cuts = statistics.quantiles(latencies, n=100)
+    print(f"{label:<9} | {len(latencies) / elapsed:8.1f} req/s | p50 {cuts[49] * 1000:7.1f} ms | "
+          f"p95 {cuts[94] * 1000:7.1f} ms | p99 {cuts[98] * 1000:7.1f} ms | errors {errors} | "
+          f"peak concurrent DB round-trips {counter.peak}")
+
+
+async def run(args) -> None:
+    main.search_cache = None # Every request must reach the database
+    main.hospital_index = None
+    main.client = object() # Only checked for availability
+
+    if args.stand_in:
+        docs = [{"_id": ObjectId(), **doc} for doc in generate_hospitals(args.hospitals, seed=args.seed)]
+        index = HospitalIndex.from_documents(docs)
+        make_blocking = lambda counter: StandInCollection(index, args.rtt_ms / 1000, True, counter)
+        make_async = lambda counter: StandInCollection(index, args.rtt_ms / 1000, False, counter)
+    else:
+        from pymongo import MongoClient, AsyncMongoClient
+        sync_collection = MongoClient(main.MONGO_URI)[main.DB_NAME][main.COLLECTION_NAME]
+        async_client = AsyncMongoClient(main.MONGO_URI, maxPoolSize=main.MONGO_MAX_POOL_SIZE,
+                                        minPoolSize=main.MONGO_MIN_POOL_SIZE)
+        async_collection = async_client[main.DB_NAME][main.COLLECTION_NAME]
+        make_blocking = lambda counter: BlockingMongoCollection(sync_collection, counter)
+        make_async = lambda counter: CountingAsyncCollection(async_collection, counter)
+
+    for label, factory in (("blocking", make_blocking), ("async", make_async)):
+        counter = InFlightCounter()
+        main.hospitals_collection = factory(counter)
+        elapsed, latencies, errors = await drive(args.requests, args.concurrency, args.seed)
+        report(label, elapsed, latencies, errors, counter)
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stand-in", action="store_true", help="Use the simulated database instead of mongod")
+    parser.add_argument("--rtt-ms", type=float, default=20.0, help="Simulated round-trip time (stand-in only)")
+    parser.add_argument("--hospitals", type=int, default=30, help="Synthetic hospitals (stand-in only)")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.disable(logging.INFO) # Per-request API logs would dominate the measurement
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    cli()
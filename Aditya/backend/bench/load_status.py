@@ -0,0 +1,194 @@
+# bench/load_status.py
+"""
+Load test for live availability ingestion (POST /api/hospitals/{id}/status)
+alongside search traffic.
+
+Every simulated hospital pushes its free ICU beds / ventilators / ER load
+every --update-interval seconds (10,000 hospitals every 5 s = 2,000 updates/s
+offered), open loop like bench.load_api: each push is sent at its scheduled
+time and its latency counted from then. Searches are load_api's request mix
+at --search-rate, --availability-share of them with minIcuBeds=1.
+
+Three phases, --duration seconds each, on one dataset x config:
+    searches   searches only (baseline)
+    updates    status pushes only
+    mixed      both at once
+For each it reports pushes/s and searches/s served, their p50/p99 latency and
+error rate, and how many MongoDB writes the pushes turned into (bulk writes
+and statuses written after per-hospital coalescing, from /api/status-stats),
+plus the largest backlog of unwritten statuses seen.
+
+In-process (default) the app runs on this event loop with load_api's
+mongomock backend: flushes are acknowledged after --mock-rtt-ms and not
+applied, so the numbers measure the API side of ingestion. --backend mongod
+writes to a real local server; --url drives a running deployment (it must
+already hold hospitals with ids 1..--hospitals, and --keys-file must be its
+HOSPITAL_STATUS_KEYS_FILE). In-process, every hospital gets a generated push key.
+
+Usage (from Aditya/backend):
+    python -m bench.load_status
+    python -m bench.load_status --hospitals 10000 --update-interval 5 --search-rate 200 --config mongo+cache
+    python -m bench.load_status --backend mongod --mongo-uri mongodb://localhost:27017
+    python -m bench.load_status --url http://127.0.0.1:8080 --keys-file status_keys.json --duration 60
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import secrets
+from typing import Any, Dict, List, Tuple
+
+import httpx
+import numpy as np
+
+import main
+from bench.load_api import (CONFIGS, apply_config, build_requests, load_mongod, load_mongomock, load_sample,
+                            make_dataset, open_loop, unload)
+from geo_index import HospitalIndex
+from live_status import StatusTable, StatusWriter, load_status_keys
+
+PHASES = ("searches", "updates", "mixed")
+
+
+def build_pushes(rng: random.Random, hospital_ids: List[Any], keys: Dict[str, str],
+                 rounds: int = 3) -> List[Tuple[str, str, Dict[str, Any], Dict[str, str]]]:
+    """Status pushes cycling through every hospital (`rounds` different statuses each), in a shuffled order, with its key."""
+    pushes = []
+    for _ in range(rounds):
+        order = list(hospital_ids)
+        rng.shuffle(order)
+        for hospital_id in order:
+            beds = rng.choice([0, 0, 1, 2, 3, 5, 8])
+            pushes.append(("POST", f"/api/hospitals/{hospital_id}/status",
+                           {"icuBedsAvailable": beds, "ventilatorsAvailable": rng.randint(0, 4),
+                            "erLoad": round(rng.uniform(20, 100), 1)},
+                           {"X-Hospital-Key": keys.get(str(hospital_id), "")}))
+    return pushes
+
+
+def add_availability(rng: random.Random, requests, share: float):
+    """Adds minIcuBeds=1 to `share` of the /api/find-suitable requests."""
+    for method, path, params in requests:
+        if path == "/api/find-suitable" and rng.random() < share:
+            params = {**params, "minIcuBeds": 1}
+        yield method, path, params
+
+
+def describe(run: Dict[str, Any]) -> str:
+    ok = len(run["latencies"])
+    if not run["sent"]:
+        return f"{'-':>38}"
+    p50, p99 = np.percentile(np.array(run["latencies"]) * 1000, [50, 99]) if ok else (float("nan"), float("nan"))
+    errors = (run["sent"] - ok) / run["sent"] * 100
+    return f"{ok / run['elapsed']:8.0f}/s p50 {p50:7.2f} p99 {p99:8.2f} ms {errors:5.1f}% err"
+
+
+async def watch_pending(http: httpx.AsyncClient, peak: Dict[str, int], stop: asyncio.Event) -> None:
+    """Samples the unwritten-status backlog while a phase runs."""
+    while not stop.is_set():
+        stats = (await http.get("/api/status-stats")).json()
+        peak["pending"] = max(peak["pending"], stats["pending"])
+        await asyncio.sleep(0.25)
+
+
+async def run_phase(http: httpx.AsyncClient, phase: str, searches, pushes, args) -> None:
+    before = (await http.get("/api/status-stats")).json()
+    peak, stop = {"pending": 0}, asyncio.Event()
+    watcher = asyncio.create_task(watch_pending(http, peak, stop))
+    push_rate = args.hospitals / args.update_interval
+    idle = {"sent": 0, "elapsed": 0.0, "latencies": []}
+    runs = await asyncio.gather(
+        open_loop(http, searches, args.search_rate, args.duration, args.timeout, args.max_in_flight, random.Random(args.seed))
+        if phase != "updates" else asyncio.sleep(0, idle),
+        open_loop(http, pushes, push_rate, args.duration, args.timeout, args.max_in_flight, random.Random(args.seed + 1))
+        if phase != "searches" else asyncio.sleep(0, idle),
+    )
+    await asyncio.sleep(args.flush_seconds * 2) # Let the last pushes be written
+    stop.set()
+    await watcher
+    after = (await http.get("/api/status-stats")).json()
+    updates = after["updates"] - before["updates"]
+    written = after.get("written", 0) - before.get("written", 0)
+    flushes = after.get("flushes", 0) - before.get("flushes", 0)
+    print(f"{phase:8} | searches {describe(runs[0])} | pushes {describe(runs[1])}")
+    if updates:
+        print(f"{'':8} | {updates} updates -> {written} statuses written in {flushes} bulk writes "
+              f"({updates / max(written, 1):.1f} updates per write) | peak pending {peak['pending']} | "
+              f"flush errors {after.get('errors', 0) - before.get('errors', 0)}")
+
+
+def start_writer(args) -> None:
+    """Stands in for the app's startup: a fresh status table and its writer on this event loop."""
+    main.live_status = StatusTable(main.LIVE_STATUS_MAX_AGE_SECONDS, main.LIVE_STATUS_MAX_HOSPITALS)
+    # mongomock can't answer the read-back of other workers' statuses (and there is only this one)
+    refresh_seconds = main.LIVE_STATUS_REFRESH_SECONDS if args.backend == "mongod" else 0
+    main.status_writer = StatusWriter(main.live_status, main.hospitals_collection, args.flush_seconds,
+                                      main.LIVE_STATUS_BATCH_SIZE, refresh_seconds)
+    main.status_writer.start()
+
+
+async def run(args) -> None:
+    sample = load_sample()
+    centers = [(doc["location"]["coordinates"][1], doc["location"]["coordinates"][0]) for doc in sample]
+    rng = random.Random(args.seed)
+    searches = list(add_availability(rng, build_requests(rng, args.distinct_requests, centers, args.triage_share),
+                                     args.availability_share))
+    print(f"{args.hospitals} hospitals pushing every {args.update_interval:g}s ({args.hospitals / args.update_interval:.0f} "
+          f"updates/s offered) | searches {args.search_rate:g}/s | {args.duration:g}s per phase")
+
+    if args.url:
+        keys = load_status_keys(args.keys_file) if args.keys_file else {}
+        pushes = build_pushes(rng, list(range(1, args.hospitals + 1)), keys)
+        limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+        async with httpx.AsyncClient(base_url=args.url, limits=limits) as http:
+            for phase in PHASES:
+                await run_phase(http, phase, searches, pushes, args)
+        return
+
+    stored = (load_mongod if args.backend == "mongod" else load_mongomock)(make_dataset(args.hospitals, sample, args.seed), args)
+    main.hospital_status_keys = {str(doc["id"]): secrets.token_hex(16) for doc in stored}
+    pushes = build_pushes(rng, [doc["id"] for doc in stored], main.hospital_status_keys)
+    apply_config(args.config, HospitalIndex.from_documents(stored) if CONFIGS[args.config][0] else None, None)
+    start_writer(args)
+    print(f"config {args.config} | backend {args.backend}")
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as http:
+            for phase in PHASES:
+                await run_phase(http, phase, searches, pushes, args)
+    finally:
+        await main.status_writer.stop()
+        main.status_writer = None
+        await unload(args)
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hospitals", type=int, default=10000, help="Simulated hospitals pushing their status")
+    parser.add_argument("--update-interval", type=float, default=5.0, help="Seconds between two pushes of one hospital")
+    parser.add_argument("--search-rate", type=float, default=200.0, help="Offered searches/s")
+    parser.add_argument("--availability-share", type=float, default=0.5, help="Share of searches with minIcuBeds=1")
+    parser.add_argument("--config", choices=[name for name in CONFIGS if name != "tiles"], default="mongo+cache")
+    parser.add_argument("--flush-seconds", type=float, default=main.LIVE_STATUS_FLUSH_SECONDS, help="LIVE_STATUS_FLUSH_SECONDS")
+    parser.add_argument("--backend", choices=["mongomock", "mongod"], default="mongomock")
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017", help="Local mongod (--backend mongod)")
+    parser.add_argument("--bench-db", default="chetakBench", help="Database the hospitals are loaded into")
+    parser.add_argument("--keep", action="store_true", help="Keep the loaded collection (mongod)")
+    parser.add_argument("--mock-rtt-ms", type=float, default=1.0, help="Simulated database round-trip (mongomock)")
+    parser.add_argument("--url", help="Drive a running server instead of the in-process app")
+    parser.add_argument("--keys-file", help="The running server's HOSPITAL_STATUS_KEYS_FILE (--url)")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per phase")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Per-request timeout (counted as an error)")
+    parser.add_argument("--max-in-flight", type=int, default=4000, help="Requests beyond this are dropped (errors)")
+    parser.add_argument("--triage-share", type=float, default=0.1, help="Share of searches sent to /api/triage-search")
+    parser.add_argument("--distinct-requests", type=int, default=20000, help="Search specs generated (then cycled)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    if args.bench_db == main.DB_NAME:
+        parser.error(f"--bench-db must not be the API's database ('{main.DB_NAME}'): it is dropped and reloaded")
+    logging.disable(logging.INFO)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,128 @@
+# bench/parity_check.py
+"""
+Parity check between the MongoDB ($geoNear) and in-memory search engines.
+
+Runs the same randomized queries (points around Mumbai / Panvel, random
+ICU / specialist / equipment filters) through both engines and reports any
+query whose results differ, in content or order (hospitals at the same
+rounded distance may come in either order). Needs MONGO_URI pointing at a
+database loaded by load_data.py.
+
+With --offline no database is needed: the in-memory engine is checked on
+--data (the bundled sample by default) against an exact scan that applies
+each search pipeline the way $geoNear does (the pipeline's query filter,
+maxDistance and $limit, nearest first).
+
+Usage (from Aditya/backend):
+    python -m bench.parity_check --queries 500 --seed 42
+    python -m bench.parity_check --offline
+"""
+
+import argparse
+import random
+import sys
+from itertools import groupby
+from typing import Any, Dict, List
+
+from pymongo import MongoClient
+
+import main
+from geo_index import HospitalIndex, haversine_m
+from load_data import DEFAULT_DATA_FILE, normalize_record, read_records
+
+# Sampling boxes as (min_lat, max_lat, min_lon, max_lon)
+REGIONS = {
+    "mumbai": (18.90, 19.30, 72.78, 73.00),
+    "panvel": (18.95, 19.05, 73.05, 73.16),
+}
+SPECIALISTS = ["cardiologist", "neurologist", "orthopedic", "obstetrician", "pulmonologist",
+               "pediatrician", "allergist", "general_surgeon", "emergency"]
+EQUIPMENT = ["defibrillator", "cardiac_monitor", "ecg", "ct_scanner", "mri", "x_ray", "ventilator",
+             "obstetric_ultrasound", "fetal_monitor", "epinephrine", "trauma_equipment"]
+
+
+def random_query(rng: random.Random) -> dict:
+    min_lat, max_lat, min_lon, max_lon = REGIONS[rng.choice(list(REGIONS))]
+    return {
+        "lat": rng.uniform(min_lat, max_lat),
+        "lon": rng.uniform(min_lon, max_lon),
+        "needsICU": rng.choice([None, True, False]),
+        "specialist": rng.choice([None] + SPECIALISTS),
+        "equipment": rng.sample(EQUIPMENT, rng.randint(0, 3)) or None,
+    }
+
+
+def result_key(results: list) -> list:
+    """(distance_km, ids) in result order; only the ids at one distance are sorted (ties may come in either order)."""
+    return [(distance, sorted(r["id"] for r in tied)) for distance, tied in groupby(results, key=lambda r: r["distance_km"])]
+
+
+def _matches(doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    """MongoDB query semantics for the pipeline's filter: equality or $in, on a scalar or any array element."""
+    for field, condition in query.items():
+        value = doc.get(field)
+        values = value if isinstance(value, list) else [value]
+        wanted = condition["$in"] if isinstance(condition, dict) else [condition]
+        if not any(v in wanted for v in values):
+            return False
+    return True
+
+
+def scan_pipeline(docs: List[Dict[str, Any]], pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Exact answer to a search pipeline over `docs`: its $geoNear filter and radius, nearest first, its $limit."""
+    geo_near = pipeline[0]["$geoNear"]
+    lon, lat = geo_near["near"]["coordinates"]
+    limit = next((stage["$limit"] for stage in pipeline if "$limit" in stage), None)
+    found = []
+    for doc in docs:
+        distance = haversine_m(lon, lat, *doc["location"]["coordinates"])
+        if distance <= geo_near["maxDistance"] and _matches(doc, geo_near["query"]):
+            found.append((distance, doc["id"], doc))
+    found.sort(key=lambda hit: hit[:2])
+    return [{**doc, "distance_km": round(distance / 1000, 2)} for distance, _, doc in found[:limit]]
+
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=500, help="Number of random queries to compare")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--offline", action="store_true", help="Compare against an exact scan of --data instead of MongoDB")
+    parser.add_argument("--data", default=DEFAULT_DATA_FILE, help="Hospitals file for --offline")
+    args = parser.parse_args()
+
+    if args.offline:
+        client = None
+        docs = [normalize_record(raw) for raw in read_records(args.data)]
+        reference = lambda pipeline: scan_pipeline(docs, pipeline)
+        reference_name = "scan"
+    else:
+        client = MongoClient(main.MONGO_URI, serverSelectionTimeoutMS=5000)
+        collection = client[main.DB_NAME][main.COLLECTION_NAME]
+        docs = collection.find({})
+        reference = lambda pipeline: list(collection.aggregate(pipeline))
+        reference_name = "mongo"
+    index = HospitalIndex.from_documents(docs)
+
+    rng = random.Random(args.seed)
+    mismatches = 0
+    for _ in range(args.queries):
+        query = random_query(rng)
+        pipeline = main.build_search_pipeline(query["lat"], query["lon"], query["needsICU"],
+                                              query["specialist"], query["equipment"])
+        reference_results = reference(pipeline)
+        memory_results = index.search(query["lat"], query["lon"], needs_icu=query["needsICU"],
+                                      specialist=query["specialist"], equipment=query["equipment"],
+                                      max_distance_m=main.SEARCH_RADIUS_METERS, limit=main.MAX_RESULTS)
+        if result_key(reference_results) != result_key(memory_results):
+            mismatches += 1
+            print(f"MISMATCH for {query}:\n  {reference_name}:  {result_key(reference_results)}\n"
+                  f"  memory: {result_key(memory_results)}")
+
+    if client is not None:
+        client.close()
+    print(f"{args.queries - mismatches}/{args.queries} queries identical across engines.")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,197 @@
+# bench/sync_check.py
+"""
+Checks and measures the incremental snapshot sync (hospital_sync.py).
+
+Streams random inserts, updates (moved hospitals, changed ICU / specialists /
+equipment, brand-new capability strings) and deletes through a change feed
+into a HospitalIndex, then verifies that searches on the incrementally updated
+index match an index rebuilt from scratch. Reports apply throughput and the
+staleness lag seen while the writes were flowing.
+
+Sources:
+- default:  FakeChangeFeed (no database)
+- --mongo:  real change stream / polling against MONGO_URI (a local replica set,
+            e.g. `mongod --replSet rs0`, for change streams); uses a scratch collection
+
+Usage (from Aditya/backend):
+    python -m bench.sync_check --hospitals 20000 --writes 20000
+    MONGO_URI=mongodb://localhost:27017/?replicaSet=rs0 python -m bench.sync_check --mongo --writes 2000
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+
+from bson import ObjectId
+
+from bench.synthetic import EQUIPMENT, MUMBAI_REGION, SPECIALISTS, generate_hospitals, random_filters
+from geo_index import HospitalIndex, RESULT_FIELDS, doc_key
+from hospital_sync import FakeChangeFeed, HospitalSync, open_source
+
+
+def random_writes(rng: random.Random, docs: dict, n: int) -> list:
+    """
+    Returns `n` ("upsert", doc) / ("delete", key) writes and applies them to
+    `docs`, which then holds the expected final state.
+    """
+    keys = list(docs)
+    writes = []
+    for _ in range(n):
+        roll = rng.random()
+        if roll < 0.1 and keys:
+            position = rng.randrange(len(keys))
+            keys[position], keys[-1] = keys[-1], keys[position]
+            key = keys.pop()
+            del docs[key]
+            writes.append(("delete", key))
+            continue
+        if roll < 0.25 or not keys:
+            lat_min, lat_max, lon_min, lon_max = MUMBAI_REGION
+            doc = {"_id": ObjectId(), "id": rng.randrange(1 << 30), "name": "New Hospital",
+                   "location": {"type": "Point", "coordinates": [rng.uniform(lon_min, lon_max), rng.uniform(lat_min, lat_max)]},
+                   "hasICU": rng.random() < 0.5, "specialists": rng.sample(SPECIALISTS, 3), "equipment": rng.sample(EQUIPMENT, 3)}
+            keys.append(doc_key(doc))
+        else:
+            doc = dict(docs[rng.choice(keys)])
+            change = rng.random()
+            if change < 0.3:
+                lon, lat = doc["location"]["coordinates"]
+                doc["location"] = {"type": "Point", "coordinates": [lon + rng.uniform(-0.3, 0.3), lat + rng.uniform(-0.3, 0.3)]}
+            elif change < 0.5:
+                doc["hasICU"] = not doc["hasICU"]
+            elif change < 0.8:
+                doc["equipment"] = rng.sample(EQUIPMENT, rng.randint(0, 4)) + [f"device_{rng.randrange(50)}"]
+            else:
+                doc["specialists"] = rng.sample(SPECIALISTS, rng.randint(0, 4))
+        docs[doc_key(doc)] = doc
+        writes.append(("upsert", doc))
+    return writes
+
+
+def compare(index: HospitalIndex, docs: dict, rng: random.Random, queries: int) -> int:
+    """Searches the synced index and a freshly built one; returns how many results differ."""
+    rebuilt = HospitalIndex.from_documents(docs.values())
+    lat_min, lat_max, lon_min, lon_max = MUMBAI_REGION
+    mismatches = 0
+    for _ in range(queries):
+        lat, lon = rng.uniform(lat_min, lat_max), rng.uniform(lon_min, lon_max)
+        filters = random_filters(rng)
+        got = [(d["_id"], d["distance_km"]) for d in index.search(lat, lon, **filters)]
+        want = [(d["_id"], d["distance_km"]) for d in rebuilt.search(lat, lon, **filters)]
+        # Equal distances may be ordered differently (positions differ after updates)
+        if sorted(got, key=lambda r: (r[1], str(r[0]))) != sorted(want, key=lambda r: (r[1], str(r[0]))):
+            mismatches += 1
+    return mismatches
+
+
+async def run_fake(args) -> None:
+    rng = random.Random(args.seed)
+    docs = {}
+    for doc in generate_hospitals(args.hospitals, seed=args.seed):
+        doc = {"_id": ObjectId(), **doc}
+        docs[doc["_id"]] = doc
+    index = HospitalIndex.from_documents(docs.values())
+
+    async def apply(upserts, deletes):
+        return index.apply_changes(upserts, deletes)
+
+    async def reload():
+        index.load(docs.values())
+
+    feed = FakeChangeFeed(wait_seconds=0.01)
+    sync = HospitalSync(feed, apply, reload)
+    sync.start()
+
+    writes = random_writes(rng, docs, args.writes)
+    staleness = []
+    start = time.perf_counter()
+    for written, (op, payload) in enumerate(writes, 1):
+        feed.upsert(payload) if op == "upsert" else feed.delete(payload)
+        if written % args.burst == 0:
+            await asyncio.sleep(0) # Let the sync task run between bursts of writes
+            staleness.append(sync.staleness_seconds())
+    while feed.pending():
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(0.05) # One idle poll: caught up
+    drained_staleness = sync.staleness_seconds()
+    await sync.stop()
+
+    mismatches = compare(index, docs, rng, args.queries)
+    cuts = statistics.quantiles(staleness, n=100) if len(staleness) > 1 else [0.0] * 99
+    print(f"hospitals {len(docs)} | writes {args.writes} | {args.writes / elapsed:,.0f} writes/s applied | "
+          f"{sync.changes_applied} changes, {sync.reloads} reloads, {sync.errors} errors")
+    print(f"staleness while writing: p50 {cuts[49] * 1000:.1f} ms | p99 {cuts[98] * 1000:.1f} ms | "
+          f"after drain {drained_staleness * 1000:.1f} ms")
+    print(f"search mismatches vs full rebuild: {mismatches}/{args.queries}")
+
+
+async def run_mongo(args) -> None:
+    from pymongo import AsyncMongoClient
+    client = AsyncMongoClient(os.environ["MONGO_URI"])
+    collection = client[os.getenv("DB_NAME", "chetakDB")]["hospitals_sync_check"]
+    await collection.drop()
+    rng = random.Random(args.seed)
+    docs = {}
+    for doc in generate_hospitals(args.hospitals, seed=args.seed):
+        doc = {"_id": ObjectId(), **doc}
+        docs[doc["_id"]] = doc
+    if docs:
+        await collection.insert_many(list(docs.values()))
+
+    index = None
+    projection = {field: 1 for field in RESULT_FIELDS}
+
+    async def apply(upserts, deletes):
+        return index.apply_changes(upserts, deletes)
+
+    async def reload():
+        nonlocal index
+        index = HospitalIndex.from_documents(await collection.find({}, projection).to_list(None))
+
+    source = await open_source(collection, args.mode, lambda: index.keys(), projection,
+                               interval_seconds=0.2, reconcile_every=5)
+    await reload()
+    sync = HospitalSync(source, apply, reload)
+    sync.start()
+
+    lags = []
+    for op, payload in random_writes(rng, docs, args.writes):
+        if op == "delete":
+            await collection.delete_one({"_id": payload})
+        else:
+            await collection.replace_one({"_id": payload["_id"]}, {**payload, "updatedAt": datetime.now(timezone.utc)}, upsert=True)
+        lags.append(sync.staleness_seconds())
+    await asyncio.sleep(3 * max(source.pause_seconds, 0.5) + 1)
+    await sync.stop()
+
+    mismatches = compare(index, docs, rng, args.queries)
+    cuts = statistics.quantiles(lags, n=100) if len(lags) > 1 else [0.0] * 99
+    print(f"mode {source.mode} | writes {args.writes} | {sync.changes_applied} changes applied | errors {sync.errors}")
+    print(f"staleness while writing: p50 {cuts[49] * 1000:.1f} ms | p99 {cuts[98] * 1000:.1f} ms")
+    print(f"search mismatches vs full rebuild: {mismatches}/{args.queries}")
+    await collection.drop()
+    await client.close()
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo", action="store_true", help="Use MONGO_URI instead of the fake change feed")
+    parser.add_argument("--mode", default="auto", choices=["auto", "change_stream", "poll"], help="Change feed (--mongo only)")
+    parser.add_argument("--hospitals", type=int, default=5000)
+    parser.add_argument("--writes", type=int, default=10000)
+    parser.add_argument("--burst", type=int, default=50, help="Writes pushed between sync turns (fake feed)")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(run_mongo(args) if args.mongo else run_fake(args))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,151 @@
+# bench/synthetic.py
+"""
+Synthetic hospital datasets for benchmarks.
+
+Documents have the same shape as the ones inserted by load_data.py and draw
+their specialists / equipment from the same vocabulary. Capability lists are
+taken from a fixed pool of profiles so million-hospital datasets stay small in
+memory (the lists are shared between documents).
+
+`generate_realistic_hospitals` derives everything from real loader input
+(data/hospitals_sample.ndjson): capability profiles are perturbed copies of
+real hospitals (keeping which specialists / equipment go together, and how
+often each term occurs) and locations cluster around the real ones.
+`clustered_points` draws patient locations the same way.
+"""
+
+import math
+import random
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+SPECIALISTS = ["cardiologist", "neurologist", "oncologist", "general_surgeon", "obstetrician", "emergency",
+               "orthopedic", "pulmonologist", "pediatrician", "general", "trauma_surgeon", "radiologist",
+               "gastroenterologist", "transplant_surgeon", "neonatologist", "pediatric_cardiologist",
+               "pediatric_surgeon"]
+EQUIPMENT = ["mri", "ct_scanner", "cardiac_monitor", "ventilator", "defibrillator", "ecg", "ultrasound", "x_ray",
+             "dialysis_machine", "pet_scanner", "radiotherapy", "endoscopy", "incubator", "pediatric_ventilator",
+             "fetal_monitor", "obstetric_ultrasound", "robotics"]
+# Service region used for coordinates: (min_lat, max_lat, min_lon, max_lon) around Mumbai / Panvel
+MUMBAI_REGION = (18.85, 19.35, 72.75, 73.20)
+PROFILE_POOL_SIZE = 512
+
+
+def _profiles(rng: random.Random) -> List[Dict[str, Any]]:
+    """Capability profiles: most hospitals have a few specialists, big ones many."""
+    profiles = []
+    for _ in range(PROFILE_POOL_SIZE):
+        size = rng.choice(["clinic", "clinic", "general", "general", "tertiary"])
+        n_spec = {"clinic": (1, 3), "general": (3, 6), "tertiary": (6, 10)}[size]
+        n_equip = {"clinic": (1, 3), "general": (3, 7), "tertiary": (6, 10)}[size]
+        profiles.append({
+            "hasICU": size == "tertiary" or (size == "general" and rng.random() < 0.5),
+            "specialists": rng.sample(SPECIALISTS, rng.randint(*n_spec)),
+            "equipment": rng.sample(EQUIPMENT, rng.randint(*n_equip)),
+        })
+    return profiles
+
+
+def generate_hospitals(n: int, seed: int = 0, region=MUMBAI_REGION) -> Iterator[Dict[str, Any]]:
+    """Yields `n` synthetic hospital documents with ids 1..n spread over `region`."""
+    rng = random.Random(seed)
+    profiles = _profiles(rng)
+    min_lat, max_lat, min_lon, max_lon = region
+    for hospital_id in range(1, n + 1):
+        profile = rng.choice(profiles)
+        yield {
+            "id": hospital_id,
+            "name": f"Synthetic Hospital {hospital_id}",
+            "location": {"type": "Point",
+                         "coordinates": [round(rng.uniform(min_lon, max_lon), 6), round(rng.uniform(min_lat, max_lat), 6)]},
+            "hasICU": profile["hasICU"],
+            "specialists": profile["specialists"],
+            "equipment": profile["equipment"],
+        }
+
+
+def random_filters(rng: random.Random) -> Dict[str, Any]:
+    """Random needsICU / specialist / equipment combination, as sent by the frontend."""
+    return {
+        "needs_icu": rng.choice([None, True]),
+        "specialist": rng.choice([None] + SPECIALISTS),
+        "equipment": rng.sample(EQUIPMENT, rng.randint(0, 4)) or None,
+    }
+
+
+# --- Datasets derived from real hospitals ---
+
+KM_PER_DEG_LAT = 111.32
+
+
+def _jitter(rng: random.Random, lat: float, lon: float, sigma_km: float) -> Tuple[float, float]:
+    """A point normally distributed (sigma_km on each axis) around (lat, lon)."""
+    lat += rng.gauss(0.0, sigma_km) / KM_PER_DEG_LAT
+    lon += rng.gauss(0.0, sigma_km) / (KM_PER_DEG_LAT * max(0.01, math.cos(math.radians(lat))))
+    return lat, lon
+
+
+def clustered_points(rng: random.Random, n: int, centers: Sequence[Tuple[float, float]], sigma_km: float = 3.0,
+                     background: float = 0.2, region=MUMBAI_REGION) -> List[Tuple[float, float]]:
+    """
+    `n` (lat, lon) points: a share `background` uniform over `region`, the rest
+    normally distributed around randomly chosen `centers` (clipped to the region).
+    """
+    min_lat, max_lat, min_lon, max_lon = region
+    points = []
+    for _ in range(n):
+        if not centers or rng.random() < background:
+            lat, lon = rng.uniform(min_lat, max_lat), rng.uniform(min_lon, max_lon)
+        else:
+            lat, lon = _jitter(rng, *rng.choice(centers), sigma_km)
+            lat, lon = min(max(lat, min_lat), max_lat), min(max(lon, min_lon), max_lon)
+        points.append((round(lat, 6), round(lon, 6)))
+    return points
+
+
+def _realistic_profiles(rng: random.Random, sample: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Capability profiles: a real hospital's lists with terms dropped / added at the sample's term frequencies."""
+    specialist_freq = Counter(s for doc in sample for s in doc["specialists"])
+    equipment_freq = Counter(e for doc in sample for e in doc["equipment"])
+    icu_rate = sum(1 for doc in sample if doc["hasICU"]) / len(sample)
+
+    def perturb(terms: List[str], freq: Counter) -> List[str]:
+        kept = [t for t in terms if rng.random() > 0.2]
+        vocabulary, weights = list(freq), list(freq.values())
+        for _ in range(rng.choice([0, 0, 1, 1, 2])):
+            term = rng.choices(vocabulary, weights)[0]
+            if term not in kept:
+                kept.append(term)
+        return kept or [rng.choices(vocabulary, weights)[0]]
+
+    profiles = []
+    for _ in range(PROFILE_POOL_SIZE):
+        template = rng.choice(sample)
+        has_icu = template["hasICU"] if rng.random() < 0.9 else rng.random() < icu_rate
+        profiles.append({"hasICU": has_icu,
+                         "specialists": perturb(template["specialists"], specialist_freq),
+                         "equipment": perturb(template["equipment"], equipment_freq)})
+    return profiles
+
+
+def generate_realistic_hospitals(n: int, sample: Sequence[Dict[str, Any]], seed: int = 0, sigma_km: float = 4.0,
+                                 background: float = 0.15, region: Optional[Tuple[float, float, float, float]] = MUMBAI_REGION
+                                 ) -> Iterator[Dict[str, Any]]:
+    """
+    Yields `n` hospitals modelled on `sample` (normalized loader records): ids
+    1..n, capabilities from perturbed copies of the sample's, locations around
+    the sample hospitals with a uniform `background` share over `region`.
+    """
+    rng = random.Random(seed)
+    profiles = _realistic_profiles(rng, sample)
+    centers = [(doc["location"]["coordinates"][1], doc["location"]["coordinates"][0]) for doc in sample]
+    for hospital_id, (lat, lon) in enumerate(clustered_points(rng, n, centers, sigma_km, background, region), start=1):
+        profile = rng.choice(profiles)
+        yield {
+            "id": hospital_id,
+            "name": f"Synthetic Hospital {hospital_id}",
+            "location": {"type": "Point", "coordinates": [lon, lat]},
+            "hasICU": profile["hasICU"],
+            "specialists": profile["specialists"],
+            "equipment": profile["equipment"],
+        }
@@ -0,0 +1,118 @@
+# build_tiles.py
+"""
+Offline build of the nearest-suitable-hospital tiles (hospital_tiles.py).
+
+For each condition profile (condition_profiles.py) the service region is
+rasterized into a grid and the top-k suitable hospitals of every cell are
+written to memory-mappable .npy files. Point the API at the output with
+TILES_DIR; it applies later hospital changes to its own copy on the fly.
+
+Usage:
+    python build_tiles.py                                        # hospitals from MongoDB -> data/tiles
+    python build_tiles.py --from data/hospitals_sample.ndjson    # hospitals from a loader input file
+    python build_tiles.py --update                               # only recompute cells affected by changes
+    python build_tiles.py --cell-deg 0.005 --candidates 48 --region 18.85 19.35 72.75 73.20
+
+--update re-reads the hospitals, diffs them against the stored table and
+applies only the differences (moved hospitals, changed ICU / specialists /
+equipment, inserts and deletes), keeping the existing grid.
+"""
+
+import os
+import time
+import logging
+import argparse
+from typing import Any, Dict, List
+
+from pymongo import MongoClient
+from pymongo.errors import ConnectionFailure
+from dotenv import load_dotenv
+
+from geo_index import RESULT_FIELDS
+from hospital_tiles import DEFAULT_CANDIDATES, DEFAULT_CELL_SIZE_DEG, DEFAULT_MARGIN_DEG, TileSet
+from load_data import InvalidRecord, normalize_record, read_records
+from regions import REGION_PREFIX, collection_name, region_names
+
+# --- Logging Setup ---
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+load_dotenv()
+MONGO_URI = os.getenv("MONGO_URI")
+DB_NAME = os.getenv("DB_NAME", "chetakDB")
+COLLECTION_NAME = "hospitals"
+REGION_PRECISION = int(os.getenv("HOSPITAL_REGION_PRECISION", "0")) # Same as main.py: read the region collections
+DEFAULT_TILES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tiles")
+SEARCH_RADIUS_METERS = 50000 # Same as main.SEARCH_RADIUS_METERS; the API ignores tiles built for another radius
+
+
+def hospitals_from_file(path: str) -> List[Dict[str, Any]]:
+    """Hospitals from a CSV / NDJSON / GeoJSON loader input (invalid records are skipped, as by load_data.py)."""
+    docs = []
+    for raw in read_records(path):
+        try:
+            doc = normalize_record(raw)
+        except InvalidRecord as err:
+            logger.warning(f"Skipping invalid record {raw.get('id')!r}: {err}")
+            continue
+        doc.pop("_id", None) # Keyed on `id`, like the documents the loader upserts
+        docs.append(doc)
+    return docs
+
+
+def hospitals_from_mongo() -> List[Dict[str, Any]]:
+    if not MONGO_URI:
+        logger.critical("FATAL ERROR: MONGO_URI not found in environment variables. Check your .env file.")
+        exit("MONGO_URI not set.")
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+    try:
+        client.admin.command('ping')
+        db = client[DB_NAME]
+        projection = {field: 1 for field in RESULT_FIELDS}
+        if REGION_PRECISION:
+            regions = region_names(db.list_collection_names())
+            logger.info(f"Reading hospitals from database '{DB_NAME}', {len(regions)} region collections '{REGION_PREFIX}<geohash>'.")
+            return [doc for region in regions for doc in db[collection_name(region)].find({}, projection)]
+        logger.info(f"Reading hospitals from database '{DB_NAME}', collection '{COLLECTION_NAME}'.")
+        return list(db[COLLECTION_NAME].find({}, projection))
+    finally:
+        client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from", dest="source", help="Read hospitals from this file instead of MongoDB")
+    parser.add_argument("--out", default=DEFAULT_TILES_DIR, help="Tiles directory")
+    parser.add_argument("--update", action="store_true", help="Incrementally update an existing tile set")
+    parser.add_argument("--cell-deg", type=float, default=DEFAULT_CELL_SIZE_DEG, help="Grid cell size in degrees")
+    parser.add_argument("--candidates", type=int, default=DEFAULT_CANDIDATES, help="Hospitals kept per cell and profile")
+    parser.add_argument("--margin-deg", type=float, default=DEFAULT_MARGIN_DEG, help="Grid margin around the hospitals")
+    parser.add_argument("--region", type=float, nargs=4, metavar=("MIN_LAT", "MAX_LAT", "MIN_LON", "MAX_LON"),
+                        help="Grid region (default: hospitals' bounding box plus the margin)")
+    args = parser.parse_args()
+
+    try:
+        docs = hospitals_from_file(args.source) if args.source else hospitals_from_mongo()
+    except ConnectionFailure as e:
+        logger.critical(f"Could not connect to MongoDB: {e}")
+        return
+    logger.info(f"{len(docs)} hospitals read.")
+
+    start = time.perf_counter()
+    if args.update:
+        tiles = TileSet.open(args.out)
+        changed = tiles.sync_with(docs)
+        logger.info(f"Updated {changed} cells in {time.perf_counter() - start:.2f}s.")
+    else:
+        tiles = TileSet.build(docs, SEARCH_RADIUS_METERS, k=args.candidates, cell_size_deg=args.cell_deg,
+                              region=tuple(args.region) if args.region else None, margin_deg=args.margin_deg)
+        logger.info(f"Built {len(tiles.profiles)} profiles x {tiles.grid.rows}x{tiles.grid.cols} cells "
+                    f"in {time.perf_counter() - start:.2f}s.")
+    tiles.save(args.out)
+    size = sum(os.path.getsize(os.path.join(args.out, f)) for f in os.listdir(args.out))
+    logger.info(f"Wrote {args.out} (generation {tiles.generation}, {size / 1e6:.1f} MB).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# capabilities.py
+"""
+Bitset capability index for ICU / specialist / equipment filtering.
+
+Every distinct specialist and equipment string seen in the hospital data gets
+its own bit, and each hospital's capabilities are stored as one integer mask.
+A search's filters compile once into a few masks, so checking a candidate is a
+handful of bitwise ANDs instead of repeated string comparisons.
+
+The compiled filter has the same semantics as the `$in` match_filter built in
+main.py:
+- needsICU=True  -> hasICU must be True
+- specialist     -> has specialist OR 'emergency' OR 'general'
+- equipment      -> has at least one of the listed items
+"""
+
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Bit 0 is reserved for hasICU; specialists/equipment are assigned from bit 1 upwards
+ICU_BIT = 1
+
+
+class CapabilityFilter(NamedTuple):
+    """A search's filters compiled into masks (0 means "no filter" for that part)."""
+    required: int       # every bit must be set (hasICU)
+    specialist_any: int # at least one bit must be set
+    equipment_any: int  # at least one bit must be set
+    specialist_set: bool  # a specialist filter was requested
+    equipment_set: bool   # an equipment filter was requested
+
+    def matches(self, mask: int) -> bool:
+        if mask & self.required != self.required:
+            return False
+        if self.specialist_set and not mask & self.specialist_any:
+            return False
+        if self.equipment_set and not mask & self.equipment_any:
+            return False
+        return True
+
+    def matches_words(self, words: np.ndarray) -> np.ndarray:
+        """Vectorized `matches` over masks packed by CapabilityIndex.to_words (one row per hospital)."""
+        n_words = words.shape[1]
+        keep = np.ones(len(words), dtype=bool)
+        if self.required:
+            required = int_to_words(self.required, n_words)
+            keep &= ((words & required) == required).all(axis=1)
+        if self.specialist_set:
+            keep &= (words & int_to_words(self.specialist_any, n_words)).any(axis=1)
+        if self.equipment_set:
+            keep &= (words & int_to_words(self.equipment_any, n_words)).any(axis=1)
+        return keep
+
+
+def int_to_words(mask: int, n_words: int) -> np.ndarray:
+    """Splits an integer mask into `n_words` little-endian uint64 words."""
+    return np.array([(mask >> (64 * i)) & 0xFFFFFFFFFFFFFFFF for i in range(n_words)], dtype=np.uint64)
+
+
+def test_bit(words: np.ndarray, bit_number: int) -> np.ndarray:
+    """Whether each packed mask (row of CapabilityIndex.to_words) has bit `bit_number` set."""
+    word, shift = divmod(bit_number, 64)
+    if word >= words.shape[1]:
+        return np.zeros(len(words), dtype=bool)
+    return ((words[:, word] >> np.uint64(shift)) & np.uint64(1)).astype(bool)
+
+
+def _as_list(value: Any) -> List[Any]:
+    """Returns a field as a list, the way MongoDB's $in sees it (scalar or array)."""
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+class CapabilityIndex:
+    """Dictionary mapping capability strings to bits, plus mask encoding/decoding."""
+
+    def __init__(self):
+        # Specialists and equipment get separate namespaces so a string that
+        # appears in both fields can't satisfy the wrong filter
+        self._bits: Dict[str, Dict[Any, int]] = {"specialists": {}, "equipment": {}}
+        self._next_bit = ICU_BIT << 1
+
+    def __len__(self) -> int:
+        return sum(len(bits) for bits in self._bits.values())
+
+    def bit_positions(self) -> Dict[str, List[Tuple[Any, int]]]:
+        """(value, bit number) pairs per field, to store the assignment alongside packed masks."""
+        return {field: [(value, bit.bit_length() - 1) for value, bit in bits.items()]
+                for field, bits in self._bits.items()}
+
+    @classmethod
+    def from_bit_positions(cls, positions: Dict[str, Iterable[Tuple[Any, int]]]) -> "CapabilityIndex":
+        """Rebuilds an index from bit_positions(), so masks packed by the original decode the same way."""
+        index = cls()
+        for field, pairs in positions.items():
+            for value, bit_number in pairs:
+                bit = 1 << bit_number
+                index._bits[field][value] = bit
+                index._next_bit = max(index._next_bit, bit << 1)
+        return index
+
+    def bit_number(self, field: str, value: Any) -> Optional[int]:
+        """Bit number assigned to a specialist / equipment string (None if no hospital has it)."""
+        bit = self._bits[field].get(value)
+        return None if bit is None else bit.bit_length() - 1
+
+    def _bit(self, field: str, value: Any) -> int:
+        bits = self._bits[field]
+        bit = bits.get(value)
+        if bit is None:
+            bit = bits[value] = self._next_bit
+            self._next_bit <<= 1
+        return bit
+
+    def encode(self, doc: Dict[str, Any]) -> int:
+        """Returns the capability mask for a hospital document (registers new strings)."""
+        mask = ICU_BIT if doc.get("hasICU") is True else 0
+        for field in ("specialists", "equipment"):
+            for value in _as_list(doc.get(field)):
+                mask |= self._bit(field, value)
+        return mask
+
+    def encode_all(self, docs: Iterable[Dict[str, Any]]) -> List[int]:
+        return [self.encode(doc) for doc in docs]
+
+    @property
+    def n_words(self) -> int:
+        """uint64 words needed to hold every assigned bit."""
+        return max(1, ((self._next_bit >> 1).bit_length() + 63) // 64)
+
+    def to_words(self, masks: Sequence[int]) -> np.ndarray:
+        """Packs integer masks into a (n, n_words) uint64 array for vectorized filtering."""
+        n_words = self.n_words
+        words = np.zeros((len(masks), n_words), dtype=np.uint64)
+        for i in range(n_words):
+            shift = 64 * i
+            words[:, i] = np.fromiter(((mask >> shift) & 0xFFFFFFFFFFFFFFFF for mask in masks),
+                                      dtype=np.uint64, count=len(masks))
+        return words
+
+    def _lookup(self, field: str, values: Iterable[Any]) -> int:
+        bits = self._bits[field]
+        mask = 0
+        for value in values:
+            mask |= bits.get(value, 0) # Unknown strings can't match any hospital
+        return mask
+
+    def compile(self,
+                needs_icu: Optional[bool] = None,
+                specialist: Optional[str] = None,
+                equipment: Optional[List[str]] = None) -> CapabilityFilter:
+        """Compiles search filters (same inputs as find_suitable_hospitals) into masks."""
+        specialist_any = 0
+        equipment_any = 0
+        if specialist:
+            specialist_any = self._lookup("specialists", [specialist.lower(), "emergency", "general"])
+        if equipment:
+            equipment_any = self._lookup("equipment", [e.lower() for e in equipment])
+        return CapabilityFilter(
+            required=ICU_BIT if needs_icu is True else 0,
+            specialist_any=specialist_any,
+            equipment_any=equipment_any,
+            specialist_set=bool(specialist),
+            equipment_set=bool(equipment),
+        )
@@ -0,0 +1,38 @@
+# condition_profiles.py
+"""
+Need profiles of the emergency conditions the frontend asks about.
+
+`analyzePatientCondition` in map-script.js turns the selected condition into
+the ICU / specialist / equipment filters it sends to /api/find-suitable. For
+the fixed conditions (everything except free-text "other") those filters come
+from a small, known set, listed here so the backend can precompute answers
+for them (hospital_tiles.py).
+"""
+
+from typing import Dict, NamedTuple, Optional, Tuple
+
+
+class NeedProfile(NamedTuple):
+    """Search filters for one condition, as sent by the frontend."""
+    needs_icu: bool
+    specialist: Optional[str]
+    equipment: Tuple[str, ...]
+
+    def filter_key(self) -> Tuple[bool, Optional[str], Optional[Tuple[str, ...]]]:
+        """Same normalization as main.filter_key, so a request's filters can be matched to a profile."""
+        equipment_key = tuple(sorted({e.lower() for e in self.equipment})) if self.equipment else None
+        return (self.needs_icu is True, self.specialist.lower() if self.specialist else None, equipment_key)
+
+
+# --- Profiles ---
+# One entry per case of analyzePatientCondition's switch; the *_severe variants
+# are the ones its details checks switch to ("anaphylaxis", "bleeding", ...)
+CONDITION_PROFILES: Dict[str, NeedProfile] = {
+    "cardiac": NeedProfile(True, "cardiologist", ("defibrillator", "cardiac_monitor", "ecg")),
+    "stroke": NeedProfile(True, "neurologist", ("ct_scanner", "mri")),
+    "accident": NeedProfile(True, "orthopedic", ("x_ray", "orthopedic_tools", "trauma_equipment", "ct_scanner")),
+    "allergy": NeedProfile(False, "allergist", ("allergy_test_kits", "epinephrine")),
+    "allergy_severe": NeedProfile(True, "emergency", ("allergy_test_kits", "epinephrine")),
+    "labor": NeedProfile(False, "obstetrician", ("obstetric_ultrasound", "fetal_monitor")),
+    "labor_severe": NeedProfile(True, "obstetrician", ("obstetric_ultrasound", "fetal_monitor")),
+}
@@ -0,0 +1,102 @@
+# export_shards.py
+"""
+Exports the hospitals as geohash-prefix shards for the static frontend
+(static_shards.py), so a phone fetches only the one to four shards around it
+instead of the whole dataset. map-script.js falls back to them when the API
+can't be reached.
+
+Usage:
+    python export_shards.py                                        # hospitals from MongoDB -> ../shards
+    python export_shards.py --from data/hospitals_sample.ndjson    # hospitals from a loader input file
+    python export_shards.py --update                               # only rewrite shards whose hospitals changed
+    python export_shards.py --precision 4 --report shards-report.json
+
+The default output is the `shards` directory next to map-index.html, which
+static hosting then serves as-is. Logs a report of the shard sizes and the
+export time (--report also writes it as JSON).
+"""
+
+import os
+import json
+import time
+import logging
+import argparse
+import statistics
+
+from pymongo.errors import ConnectionFailure
+
+from build_tiles import SEARCH_RADIUS_METERS, hospitals_from_file, hospitals_from_mongo
+from static_shards import DEFAULT_PRECISION, export_shards
+
+# --- Logging Setup ---
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+DEFAULT_SHARDS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "shards")
+LARGE_SHARD_BYTES = 512 * 1024 # Shards above this are slow on a weak mobile connection
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from", dest="source", help="Read hospitals from this file instead of MongoDB")
+    parser.add_argument("--out", default=DEFAULT_SHARDS_DIR, help="Shards directory")
+    parser.add_argument("--update", action="store_true", help="Keep the files of shards whose hospitals are unchanged")
+    parser.add_argument("--precision", type=int, default=DEFAULT_PRECISION, choices=range(1, 7),
+                        help="Geohash prefix length of a shard")
+    parser.add_argument("--report", help="Also write the report (shard sizes, export time) to this JSON file")
+    parser.add_argument("--report-rows", type=int, default=20, help="Largest shards listed in the log")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        docs = hospitals_from_file(args.source) if args.source else hospitals_from_mongo()
+    except ConnectionFailure as e:
+        logger.critical(f"Could not connect to MongoDB: {e}")
+        return
+    read_seconds = time.perf_counter() - start
+    logger.info(f"{len(docs)} hospitals read in {read_seconds:.2f}s.")
+
+    manifest, reports, timings = export_shards(docs, args.out, args.precision, update=args.update)
+    total_seconds = time.perf_counter() - start
+
+    current = [r for r in reports if r.status != "removed"]
+    by_size = sorted(current, key=lambda r: r.gzip_bytes, reverse=True)
+    counts = {status: sum(r.status == status for r in reports) for status in ("written", "unchanged", "removed")}
+    logger.info(f"{'shard':>8} {'hospitals':>9} {'raw KB':>9} {'gzip KB':>9}  status")
+    for r in by_size[:args.report_rows]:
+        logger.info(f"{r.prefix:>8} {r.hospitals:>9} {r.raw_bytes / 1024:>9.1f} {r.gzip_bytes / 1024:>9.1f}  {r.status}")
+    if len(by_size) > args.report_rows:
+        logger.info(f"... {len(by_size) - args.report_rows} smaller shards")
+    if current:
+        sizes = [r.gzip_bytes for r in current]
+        logger.info(f"{len(current)} shards ({counts['written']} written, {counts['unchanged']} unchanged, "
+                    f"{counts['removed']} removed): {sum(sizes) / 1024:.1f} KB gzipped in total, "
+                    f"median {statistics.median(sizes) / 1024:.1f} KB, largest {max(sizes) / 1024:.1f} KB; "
+                    f"a client fetches at most 4 (<= {sum(sorted(sizes)[-4:]) / 1024:.1f} KB).")
+    if manifest["coverage_km"] < SEARCH_RADIUS_METERS / 1000:
+        logger.warning(f"Precision {args.precision} shards only cover {manifest['coverage_km']} km around a client, "
+                       f"less than the {SEARCH_RADIUS_METERS / 1000:g} km search radius; use a lower --precision.")
+    for r in by_size:
+        if r.gzip_bytes > LARGE_SHARD_BYTES:
+            logger.warning(f"Shard {r.prefix} is {r.gzip_bytes / 1024:.0f} KB gzipped; consider a higher --precision.")
+    logger.info(f"Exported generation {manifest['generation']} to {args.out} in {total_seconds:.2f}s "
+                f"(read {read_seconds:.2f}s, partition {timings['partition']:.2f}s, encode {timings['encode']:.2f}s, "
+                f"write {timings['write']:.2f}s).")
+
+    if args.report:
+        report = {
+            "generation": manifest["generation"],
+            "precision": args.precision,
+            "coverage_km": manifest["coverage_km"],
+            "hospitals": manifest["hospitals"],
+            "seconds": {"total": total_seconds, "read": read_seconds, **timings},
+            "shards": [r._asdict() for r in sorted(reports, key=lambda r: r.prefix)],
+        }
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+        logger.info(f"Wrote report to {args.report}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# fast_json.py
+"""
+Pre-serialized JSON for hospital search results.
+
+A search result is a stored hospital plus a per-request `distance_km` and,
+when ranked by them, `eta_minutes` / `score` values. Running every result
+through `HospitalResponse` validation and serialization on every request
+re-checks data that doesn't change between requests, so instead each hospital
+is validated and serialized once (with orjson) into the bytes of its JSON
+object minus the closing brace:
+
+    {"_id":"...","id":1,"name":"...",...,"equipment":[...]
+
+and a response is assembled by splicing in `,"distance_km":1.23}` (plus the
+ranking fields that are set) per result. The bytes are exactly what FastAPI
+would produce through the response_model, so endpoints keep their declared
+response_model (and OpenAPI schema) and just return a raw Response.
+"""
+
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import orjson
+from fastapi import Response
+
+from geo_index import doc_key
+from schemas import RANKING_FIELDS, HospitalResponse
+
+# Fields serialized once per hospital (everything in HospitalResponse except the per-request ones)
+STATIC_FIELDS = ("_id", "id", "name", "location", "hasICU", "specialists", "equipment")
+
+
+class HospitalEncoder:
+    """Cache of pre-serialized hospital JSON, keyed by hospital (see geo_index.doc_key)."""
+
+    def __init__(self, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._prefixes: Dict[Any, Tuple[Dict[str, Any], bytes]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._prefixes)
+
+    def _prefix(self, doc: Dict[str, Any]) -> bytes:
+        key = doc_key(doc)
+        entry = self._prefixes.get(key)
+        # The stored copy catches hospitals updated since they were encoded
+        if entry is not None and all(entry[0].get(field) == doc.get(field) for field in STATIC_FIELDS):
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        source = {field: doc[field] for field in STATIC_FIELDS if field in doc}
+        # Validated once, exactly as the response_model would (raises on bad data)
+        encoded = HospitalResponse.model_validate(source).model_dump(mode="json", by_alias=True, exclude={"distance_km", *RANKING_FIELDS})
+        prefix = orjson.dumps(encoded)[:-1]
+        if len(self._prefixes) >= self.max_entries:
+            self._prefixes.clear()
+        self._prefixes[key] = (source, prefix)
+        return prefix
+
+    def encode_result(self, doc: Dict[str, Any]) -> bytes:
+        """JSON object for one search result (a hospital document with `distance_km`, and `eta_minutes` / `score` if set)."""
+        encoded = self._prefix(doc) + b',"distance_km":' + orjson.dumps(doc.get("distance_km"))
+        for field in RANKING_FIELDS:
+            if doc.get(field) is not None: # Left out when unset, like HospitalResponse
+                encoded += b',"' + field.encode() + b'":' + orjson.dumps(doc[field])
+        return encoded + b"}"
+
+    def encode_results(self, docs: Iterable[Dict[str, Any]]) -> bytes:
+        """JSON array for one search (same bytes as List[HospitalResponse] serialization)."""
+        return b"[" + b",".join([self.encode_result(doc) for doc in docs]) + b"]"
+
+    def encode_batch(self, results: Iterable[Iterable[Dict[str, Any]]]) -> bytes:
+        """JSON array of arrays for a batch search (List[List[HospitalResponse]])."""
+        return b"[" + b",".join([self.encode_results(docs) for docs in results]) + b"]"
+
+    def invalidate(self) -> None:
+        self._prefixes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {"entries": len(self._prefixes), "hits": self.hits, "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None}
+
+
+def json_response(body: bytes, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
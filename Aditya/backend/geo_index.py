@@ -0,0 +1,501 @@
+# geo_index.py
+"""
+In-process geospatial index for hospital documents.
+
+Answers the same query as the `$geoNear` pipeline in main.py (radius cut-off,
+ICU / specialist / equipment filters, nearest-N by great-circle distance)
+without a round-trip to MongoDB. Hospitals are bucketed into a fixed
+latitude/longitude grid so a query only looks at the cells its search circle
+can touch; capability filtering and distance ranking over those cells are
+vectorized (capabilities.py, ranking.py).
+"""
+
+import math
+import logging
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from capabilities import CapabilityIndex, int_to_words
+from ranking import EARTH_RADIUS_M, HaversineRanker
+from scoring import ScoreWeights, capability_scores, distance_scores, top_scored
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+# Grid cell size in degrees (~28 km of latitude). A 50 km query touches at most
+# a handful of cells in each direction.
+DEFAULT_CELL_SIZE_DEG = 0.25
+# Fields kept for each hospital: the $project stage in main.py, plus the
+# emergencyCapacity profile maintained by the Node backend (used for allocation)
+RESULT_FIELDS = ("_id", "id", "name", "location", "hasICU", "specialists", "equipment", "emergencyCapacity")
+# Incremental updates leave removed documents as tombstones; the index is
+# rebuilt once they make up this share of it (and there are at least COMPACT_MIN_DEAD)
+COMPACT_DEAD_RATIO = 0.25
+COMPACT_MIN_DEAD = 1024
+
+
+class SearchRadius(NamedTuple):
+    """Radius a search ended up using, and how many times it was doubled to get there."""
+    radius_m: float
+    expansions: int
+
+
+def expansion_radii(start_radius_m: float, max_radius_m: float) -> List[float]:
+    """Radii tried by an adaptive search: `start_radius_m` doubled until it reaches the `max_radius_m` ceiling."""
+    radii = [min(start_radius_m, max_radius_m)]
+    while radii[-1] < max_radius_m:
+        radii.append(min(radii[-1] * 2, max_radius_m))
+    return radii
+
+
+def doc_key(doc: Dict[str, Any]) -> Any:
+    """Identity of a hospital document (MongoDB `_id`, or the numeric `id` for documents without one)."""
+    return doc.get("_id", doc.get("id"))
+
+
+def key_order(key: Any) -> Tuple[int, Any]:
+    """Sort key for doc_key values, in MongoDB's BSON order (numbers < strings < ObjectIds)."""
+    if isinstance(key, (int, float)):
+        return (0, key)
+    if isinstance(key, str):
+        return (1, key)
+    return (2, getattr(key, "binary", str(key))) # ObjectId bytes compare like MongoDB does
+
+
+def haversine_m(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
+    """Great-circle distance between two [lon, lat] points in meters."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _field_values(doc: Dict[str, Any], key: str) -> List[Any]:
+    """Returns a field as a list, the way MongoDB's $in sees it (scalar or array)."""
+    value = doc.get(key)
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def matches_filters(doc: Dict[str, Any],
+                    needs_icu: Optional[bool] = None,
+                    specialist: Optional[str] = None,
+                    equipment: Optional[List[str]] = None) -> bool:
+    """
+    Applies the same capability filters as the `match_filter` built in main.py.
+    Reference (string comparison) implementation; HospitalIndex.search uses the
+    equivalent bitmask filter from capabilities.py.
+    - needs_icu=True  -> hasICU must be True
+    - specialist      -> specialists contains specialist OR 'emergency' OR 'general'
+    - equipment       -> equipment contains at least one of the listed items
+    """
+    if needs_icu is True and doc.get("hasICU") is not True:
+        return False
+    if specialist:
+        wanted = {specialist.lower(), "emergency", "general"}
+        if not any(s in wanted for s in _field_values(doc, "specialists")):
+            return False
+    if equipment:
+        wanted = {e.lower() for e in equipment}
+        if not any(e in wanted for e in _field_values(doc, "equipment")):
+            return False
+    return True
+
+
+class HospitalIndex:
+    """Grid-bucketed, in-memory copy of the hospitals collection."""
+
+    def __init__(self, cell_size_deg: float = DEFAULT_CELL_SIZE_DEG):
+        self.cell_size_deg = cell_size_deg
+        self._lon_cells = int(round(360 / cell_size_deg))
+        self._docs: List[Optional[Dict[str, Any]]] = []  # None = removed (tombstone)
+        self.capabilities = CapabilityIndex()
+        self._mask_words = np.zeros((0, 1), dtype=np.uint64)  # packed capability bitmask per document
+        self._ranker = HaversineRanker([], [])  # coordinates per document
+        self._cells: Dict[Tuple[int, int], np.ndarray] = {}  # document positions per grid cell
+        self._positions: Dict[Any, int] = {}  # position of each live document, by doc_key
+        self._doc_cells: List[Optional[Tuple[int, int]]] = []  # grid cell per position (None = removed)
+        self._dead = 0  # removed positions not yet compacted away
+        self.layout = 0  # Bumped whenever load() renumbers the positions
+
+    @classmethod
+    def from_documents(cls, docs: Iterable[Dict[str, Any]], **kwargs) -> "HospitalIndex":
+        index = cls(**kwargs)
+        index.load(docs)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def documents(self) -> List[Dict[str, Any]]:
+        """Every hospital in the index (stored fields only)."""
+        return [doc for doc in self._docs if doc is not None]
+
+    def keys(self) -> Iterable[Any]:
+        """doc_key of every hospital in the index."""
+        return self._positions.keys()
+
+    def _document(self, position: int) -> Dict[str, Any]:
+        """Stored fields of the hospital at `position` (shared: copy before modifying)."""
+        return self._docs[position]
+
+    def row_count(self) -> int:
+        """Positions in use, removed ones included (the length of per-position arrays)."""
+        return len(self._docs)
+
+    def row_keys(self, start: int = 0) -> Iterator[Tuple[int, Tuple[Any, Any]]]:
+        """(position, (`_id`, numeric `id`)) of every live hospital from `start` on, for per-position columns."""
+        for position in range(start, len(self._docs)):
+            doc = self._docs[position]
+            if doc is not None:
+                yield position, (doc.get("_id"), doc.get("id"))
+
+    def _document_reader(self) -> Callable[[int], Optional[Dict[str, Any]]]:
+        """Reads documents of the current positions even if the index is rebuilt meanwhile (None = removed)."""
+        return self._docs.__getitem__ # load() replaces the list, so this one keeps the old positions
+
+    def _cell(self, lon: float, lat: float) -> Tuple[int, int]:
+        row = int(math.floor(lat / self.cell_size_deg))
+        col = int(math.floor(lon / self.cell_size_deg)) % self._lon_cells
+        return row, col
+
+    def load(self, docs: Iterable[Dict[str, Any]]) -> None:
+        """Replaces the index contents with the given hospital documents."""
+        self._docs = []
+        self._positions = {}
+        self._doc_cells = []
+        self._dead = 0
+        self.layout += 1
+        self.capabilities = CapabilityIndex()
+        lats: List[float] = []
+        lons: List[float] = []
+        masks: List[int] = []
+        cells: Dict[Tuple[int, int], List[int]] = {}
+        skipped = 0
+        for doc in docs:
+            try:
+                lon, lat = doc["location"]["coordinates"]
+            except (KeyError, TypeError, ValueError):
+                skipped += 1
+                continue
+            position = len(self._docs)
+            self._docs.append({k: doc[k] for k in RESULT_FIELDS if k in doc})
+            self._positions[doc_key(doc)] = position
+            lons.append(float(lon))
+            lats.append(float(lat))
+            masks.append(self.capabilities.encode(doc))
+            cell = self._cell(lon, lat)
+            self._doc_cells.append(cell)
+            cells.setdefault(cell, []).append(position)
+
+        self._ranker = HaversineRanker(lats, lons)
+        self._mask_words = self.capabilities.to_words(masks)
+        self._cells = {cell: np.array(positions, dtype=np.int64) for cell, positions in cells.items()}
+        if skipped:
+            logger.warning(f"Skipped {skipped} hospital documents without valid location coordinates.")
+        logger.info(f"In-memory hospital index loaded with {len(self._docs)} hospitals in {len(self._cells)} grid cells "
+                    f"({len(self.capabilities)} distinct capabilities).")
+
+    # --- Incremental updates (change-feed sync) ---
+
+    def _add_to_cell(self, cell: Tuple[int, int], position: int) -> None:
+        existing = self._cells.get(cell)
+        self._cells[cell] = np.array([position], dtype=np.int64) if existing is None else np.append(existing, position)
+
+    def _remove_from_cell(self, cell: Tuple[int, int], position: int) -> None:
+        remaining = self._cells[cell][self._cells[cell] != position]
+        if len(remaining):
+            self._cells[cell] = remaining
+        else:
+            del self._cells[cell]
+
+    def _remove(self, key: Any) -> int:
+        position = self._positions.pop(key, None)
+        if position is None:
+            return 0
+        # Tombstone: the position stays in the coordinate/mask arrays but no cell points at it
+        self._remove_from_cell(self._doc_cells[position], position)
+        self._docs[position] = None
+        self._doc_cells[position] = None
+        self._dead += 1
+        return 1
+
+    def apply_changes(self, upserts: Iterable[Dict[str, Any]], deletes: Iterable[Any] = ()) -> int:
+        """
+        Applies inserted/updated hospital documents and deleted keys (see doc_key)
+        in place, without reloading the whole index. Returns how many hospitals
+        actually changed (re-applying an identical document is a no-op).
+        """
+        changed = 0
+        for key in deletes:
+            changed += self._remove(key)
+
+        n_existing = len(self._ranker)
+        new_lats: List[float] = []
+        new_lons: List[float] = []
+        new_masks: List[Tuple[int, int]] = []
+        for doc in upserts:
+            try:
+                lon, lat = (float(c) for c in doc["location"]["coordinates"])
+            except (KeyError, TypeError, ValueError):
+                changed += self._remove(doc_key(doc)) # No usable location any more: can't be searched
+                continue
+            stored = {k: doc[k] for k in RESULT_FIELDS if k in doc}
+            key = doc_key(stored)
+            position = self._positions.get(key)
+            if position is not None and self._docs[position] == stored:
+                continue
+            cell = self._cell(lon, lat)
+            if position is None:
+                position = len(self._docs)
+                self._docs.append(stored)
+                self._doc_cells.append(cell)
+                self._positions[key] = position
+                self._add_to_cell(cell, position)
+                new_lats.append(lat)
+                new_lons.append(lon)
+            else:
+                self._docs[position] = stored
+                if position < n_existing:
+                    self._ranker.set(position, lat, lon)
+                else: # Inserted earlier in this same batch
+                    new_lats[position - n_existing] = lat
+                    new_lons[position - n_existing] = lon
+                if cell != self._doc_cells[position]:
+                    self._remove_from_cell(self._doc_cells[position], position)
+                    self._add_to_cell(cell, position)
+                    self._doc_cells[position] = cell
+            new_masks.append((position, self.capabilities.encode(stored)))
+            changed += 1
+
+        if new_lats:
+            self._ranker.extend(new_lats, new_lons)
+        if new_masks:
+            n_words = self.capabilities.n_words # Grows when a new specialist/equipment string appears
+            if self._mask_words.shape != (len(self._docs), n_words):
+                grown = np.zeros((len(self._docs), n_words), dtype=np.uint64)
+                grown[:self._mask_words.shape[0], :self._mask_words.shape[1]] = self._mask_words
+                self._mask_words = grown
+            for position, mask in new_masks:
+                self._mask_words[position] = int_to_words(mask, n_words)
+
+        if self._dead >= COMPACT_MIN_DEAD and self._dead >= COMPACT_DEAD_RATIO * len(self._docs):
+            self.load([doc for doc in self._docs if doc is not None])
+        return changed
+
+    def _candidate_cells(self, lat: float, lon: float, max_distance_m: float) -> Iterable[Tuple[int, int]]:
+        """Yields every grid cell the search circle around (lat, lon) can touch."""
+        angular = max_distance_m / EARTH_RADIUS_M
+        dlat = math.degrees(angular)
+        row_min = int(math.floor((lat - dlat) / self.cell_size_deg))
+        row_max = int(math.floor((lat + dlat) / self.cell_size_deg))
+
+        if abs(lat) + dlat >= 90 or angular >= math.pi / 2:
+            # Circle reaches a pole (or is huge): every longitude is in range
+            cols: Iterable[int] = range(self._lon_cells)
+        else:
+            # Widest longitude extent of a spherical cap centred at `lat`
+            dlon = math.degrees(math.asin(min(1.0, math.sin(angular) / math.cos(math.radians(lat)))))
+            col_min = int(math.floor((lon - dlon) / self.cell_size_deg))
+            col_max = int(math.floor((lon + dlon) / self.cell_size_deg))
+            if col_max - col_min + 1 >= self._lon_cells:
+                cols = range(self._lon_cells)
+            else:
+                cols = sorted({c % self._lon_cells for c in range(col_min, col_max + 1)})
+
+        for row in range(row_min, row_max + 1):
+            for col in cols:
+                yield row, col
+
+    def _candidate_positions(self, points: Iterable[Tuple[float, float]], max_distance_m: float) -> np.ndarray:
+        """Positions of documents in cells touched by any (lat, lon) point's circle (each cell once)."""
+        cells = set()
+        for lat, lon in points:
+            cells.update(self._candidate_cells(lat, lon, max_distance_m))
+        arrays = [self._cells[cell] for cell in cells if cell in self._cells]
+        if not arrays:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate(arrays)
+
+    def _filter_positions(self, positions: np.ndarray, needs_icu: Optional[bool],
+                          specialist: Optional[str], equipment: Optional[List[str]]) -> np.ndarray:
+        """Keeps positions whose capability mask passes the compiled filters."""
+        cap_filter = self.capabilities.compile(needs_icu, specialist, equipment)
+        return positions[cap_filter.matches_words(self._mask_words[positions])]
+
+    def candidates(self,
+                   points: Iterable[Tuple[float, float]],
+                   max_distance_m: float,
+                   needs_icu: Optional[bool] = None,
+                   specialist: Optional[str] = None,
+                   equipment: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Returns hospitals that pass the capability filters and sit in a grid cell
+        touched by the search circle around any of the (lat, lon) points. The
+        filter is compiled once and each hospital is checked at most once, so a
+        group of nearby patients shares the work.
+        """
+        positions = self._filter_positions(self._candidate_positions(points, max_distance_m),
+                                           needs_icu, specialist, equipment)
+        # Index order, so equal distances rank the same way as in search()
+        return [self._document(position) for position in np.sort(positions).tolist()]
+
+    def search(self,
+               lat: float,
+               lon: float,
+               needs_icu: Optional[bool] = None,
+               specialist: Optional[str] = None,
+               equipment: Optional[List[str]] = None,
+               max_distance_m: float = 50000,
+               limit: int = 15) -> List[Dict[str, Any]]:
+        """
+        Returns up to `limit` hospitals within `max_distance_m` of (lat, lon) that
+        pass the capability filters, nearest first, each with `distance_km`
+        rounded to 2 decimals (same shape as the $geoNear pipeline output).
+        """
+        positions = self._filter_positions(self._candidate_positions([(lat, lon)], max_distance_m),
+                                           needs_icu, specialist, equipment)
+        chosen, distances = self._ranker.top_k(lat, lon, max_distance_m, limit, positions)
+
+        results = []
+        for position, distance_m in zip(chosen.tolist(), distances.tolist()):
+            result = dict(self._document(position))
+            result["distance_km"] = round(distance_m / 1000, 2)
+            results.append(result)
+        return results
+
+    def search_expanding(self,
+                         lat: float,
+                         lon: float,
+                         needs_icu: Optional[bool] = None,
+                         specialist: Optional[str] = None,
+                         equipment: Optional[List[str]] = None,
+                         start_radius_m: float = 2000,
+                         max_radius_m: float = 200000,
+                         limit: int = 15) -> Tuple[List[Dict[str, Any]], SearchRadius]:
+        """
+        search() with a radius that starts at `start_radius_m` and doubles until
+        `limit` hospitals are found or `max_radius_m` is reached. Once a radius
+        holds `limit` hospitals they are the nearest overall, so the results
+        match a search with the ceiling radius while scanning fewer cells.
+        """
+        for expansions, radius_m in enumerate(expansion_radii(start_radius_m, max_radius_m)):
+            results = self.search(lat, lon, needs_icu, specialist, equipment, radius_m, limit)
+            if len(results) >= limit:
+                break
+        return results, SearchRadius(radius_m, expansions)
+
+    def count_candidates(self, lat: float, lon: float, max_distance_m: float) -> int:
+        """Hospitals in the grid cells a search with this radius scans (before filtering), for benchmarks."""
+        return len(self._candidate_positions([(lat, lon)], max_distance_m))
+
+    def _within(self, lat: float, lon: float, needs_icu: Optional[bool], specialist: Optional[str],
+                equipment: Optional[List[str]], max_distance_m: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions and distances (meters) of every matching hospital within `max_distance_m`, unordered."""
+        positions = self._filter_positions(self._candidate_positions([(lat, lon)], max_distance_m),
+                                           needs_icu, specialist, equipment)
+        distances = self._ranker.distances_m(lat, lon, positions)
+        within = distances <= max_distance_m
+        return positions[within], distances[within]
+
+    def search_scored(self,
+                      lat: float,
+                      lon: float,
+                      weights: ScoreWeights,
+                      needs_icu: Optional[bool] = None,
+                      specialist: Optional[str] = None,
+                      equipment: Optional[List[str]] = None,
+                      max_distance_m: float = 50000,
+                      limit: int = 15,
+                      bonus: Optional[Callable[[np.ndarray], np.ndarray]] = None) -> List[Dict[str, Any]]:
+        """
+        Up to `limit` hospitals within `max_distance_m` that pass the filters,
+        best weighted score first (scoring.py), each with `distance_km` and
+        `score`. `bonus(positions)` is the live ICU bed term of those index
+        positions (0..1 each, weighted by `weights.icu_beds`).
+        """
+        positions, distances = self._within(lat, lon, needs_icu, specialist, equipment, max_distance_m)
+        scores = distance_scores(distances, weights) + capability_scores(
+            self.capabilities, self._mask_words[positions], weights, specialist, equipment)
+        bonus_of = (lambda rows: bonus(positions[rows])) if bonus is not None else None
+        chosen, final = top_scored(scores, distances, positions, limit, bonus_of, weights.icu_beds)
+
+        results = []
+        for i, score in zip(chosen.tolist(), final.tolist()):
+            result = dict(self._document(int(positions[i])))
+            result["distance_km"] = round(float(distances[i]) / 1000, 2)
+            result["score"] = round(score, 4)
+            results.append(result)
+        return results
+
+    def search_page(self,
+                    lat: float,
+                    lon: float,
+                    needs_icu: Optional[bool] = None,
+                    specialist: Optional[str] = None,
+                    equipment: Optional[List[str]] = None,
+                    max_distance_m: float = 50000,
+                    limit: int = 15,
+                    after: Optional[Tuple[float, Any]] = None) -> Tuple[List[Dict[str, Any]], List[float]]:
+        """
+        One page of search results ordered by (distance, doc_key), starting
+        after `after` = (distance in meters, doc_key) of the previous page's
+        last hospital. Returns the results (with `distance_km`) and their exact
+        distances in meters, to build the next cursor from.
+        """
+        positions, distances = self._within(lat, lon, needs_icu, specialist, equipment, max_distance_m)
+        if after is not None:
+            after_distance, after_key = after
+            keep = distances >= after_distance
+            positions, distances = positions[keep], distances[keep]
+            ties = np.flatnonzero(distances == after_distance)
+            if len(ties):
+                # Same distance as the cursor: only hospitals ordered after its key are left
+                after_order = key_order(after_key)
+                keep = np.ones(len(positions), dtype=bool)
+                for i in ties.tolist():
+                    keep[i] = key_order(doc_key(self._document(int(positions[i])))) > after_order
+                positions, distances = positions[keep], distances[keep]
+        if len(distances) > limit:
+            # Partial sort down to the limit-th distance (and everything tied with it)
+            kth = np.partition(distances, limit - 1)[limit - 1]
+            keep = distances <= kth
+            positions, distances = positions[keep], distances[keep]
+
+        ranked = sorted((distance_m, key_order(doc_key(self._document(position))), position)
+                        for position, distance_m in zip(positions.tolist(), distances.tolist()))[:limit]
+        results = []
+        for distance_m, _, position in ranked:
+            result = dict(self._document(position))
+            result["distance_km"] = round(distance_m / 1000, 2)
+            results.append(result)
+        return results, [distance_m for distance_m, _, _ in ranked]
+
+    def iter_nearest(self,
+                     lat: float,
+                     lon: float,
+                     needs_icu: Optional[bool] = None,
+                     specialist: Optional[str] = None,
+                     equipment: Optional[List[str]] = None,
+                     max_distance_m: float = 50000) -> Iterator[Dict[str, Any]]:
+        """
+        Yields every matching hospital within `max_distance_m`, nearest first
+        (with `distance_km`). Documents are copied one at a time as they are
+        consumed; hospitals removed meanwhile are skipped.
+        """
+        positions, distances = self._within(lat, lon, needs_icu, specialist, equipment, max_distance_m)
+        order = np.lexsort((positions, distances))
+        read = self._document_reader()
+        for position, distance_m in zip(positions[order].tolist(), distances[order].tolist()):
+            doc = read(position)
+            if doc is None:
+                continue
+            result = dict(doc)
+            result["distance_km"] = round(distance_m / 1000, 2)
+            yield result
@@ -0,0 +1,243 @@
+# hospital_snapshot.py
+"""
+Columnar, memory-mapped snapshot of the in-memory hospital index, shared by
+every API worker on a host.
+
+With several uvicorn workers each process would otherwise fetch the whole
+collection and keep a private HospitalIndex. Instead one loader process
+(snapshot_loader.py) keeps the index in sync with MongoDB and publishes it as
+flat .npy columns; workers memory-map them read-only (SnapshotIndex.attach).
+The pages live once in the OS page cache (or in /dev/shm) no matter how many
+workers map them, and attaching is a few file opens instead of a DB fetch.
+
+Columns (one row per hospital, tombstones compacted away):
+    lat, lon, cos_lat     float64 (n,)        radians, as HaversineRanker keeps them
+    masks                 uint64 (n, words)   capability bitmasks (capabilities.py)
+    cell_keys             int64 (cells, 2)    (row, col) of each occupied grid cell
+    cell_starts           int64 (cells + 1,)  cell i holds cell_positions[starts[i]:starts[i + 1]]
+    cell_positions        int64 (n,)          positions grouped by grid cell
+    records               uint8 (bytes,)      stored fields of each hospital (name, ...) as JSON
+    record_offsets        int64 (n + 1,)      hospital i is records[offsets[i]:offsets[i + 1]]
+
+Directory layout:
+    manifest.json                  generation, counts, grid cell size, capability bits, column files
+    <column>.<generation>.npy      one file per column and generation
+
+A new generation is written next to the current one and the manifest is
+swapped in atomically (os.replace). Workers poll the manifest's generation and
+re-attach; the previous generation's files are kept until the next publish so
+a worker that read the old manifest can still open them (already mapped files
+stay readable after they are removed).
+"""
+
+import os
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import orjson
+from bson import ObjectId
+
+from capabilities import CapabilityIndex
+from geo_index import HospitalIndex, doc_key
+from ranking import HaversineRanker
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+SNAPSHOT_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+COLUMNS = ("lat", "lon", "cos_lat", "masks", "cell_keys", "cell_starts", "cell_positions", "records", "record_offsets")
+KEEP_GENERATIONS = 2 # The published generation and the one before it
+# tmpfs when available, so the columns never touch disk
+DEFAULT_SNAPSHOT_DIR = "/dev/shm/chetak-snapshot" if os.path.isdir("/dev/shm") else \
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "snapshot")
+
+
+def _encode_doc(doc: Dict[str, Any]) -> bytes:
+    if isinstance(doc.get("_id"), ObjectId):
+        doc = {**doc, "_id": str(doc["_id"])}
+    return orjson.dumps(doc, default=str)
+
+
+def _decode_doc(data) -> Dict[str, Any]:
+    doc = orjson.loads(data)
+    if isinstance(doc.get("_id"), str) and ObjectId.is_valid(doc["_id"]):
+        doc["_id"] = ObjectId(doc["_id"])
+    return doc
+
+
+def _generation_of(file: str) -> Optional[int]:
+    """Generation of a `<column>.<generation>.npy` file name (None for other files)."""
+    parts = file.split(".")
+    if len(parts) == 3 and parts[2] == "npy" and parts[1].isdigit():
+        return int(parts[1])
+    return None
+
+
+def _load_column(path: str) -> np.ndarray:
+    try:
+        # Plain ndarray view of the mapping (np.memmap results carry subclass overhead through every operation)
+        return np.asarray(np.load(path, mmap_mode="r"))
+    except ValueError: # Zero-length arrays can't be mapped
+        return np.load(path)
+
+
+def read_manifest(directory: str) -> Dict[str, Any]:
+    with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format version {manifest.get('version')} in {directory}")
+    return manifest
+
+
+def published_generation(directory: str) -> Optional[int]:
+    """Generation currently published in `directory` (None when there is no snapshot yet)."""
+    try:
+        return read_manifest(directory)["generation"]
+    except FileNotFoundError:
+        return None
+
+
+def write_snapshot(directory: str, index: HospitalIndex) -> int:
+    """
+    Publishes the live hospitals of `index` as the next generation in
+    `directory` and returns its number. Runs in the loader process only.
+    """
+    positions = np.array(sorted(index._positions.values()), dtype=np.int64)
+    ranker = index._ranker
+    records = [_encode_doc(index._document(position)) for position in positions.tolist()]
+    record_offsets = np.zeros(len(records) + 1, dtype=np.int64)
+    np.cumsum([len(record) for record in records], out=record_offsets[1:])
+
+    cells: Dict[Any, List[int]] = {}
+    for new_position, position in enumerate(positions.tolist()):
+        cells.setdefault(index._doc_cells[position], []).append(new_position)
+    cell_keys = sorted(cells)
+    cell_starts = np.zeros(len(cell_keys) + 1, dtype=np.int64)
+    np.cumsum([len(cells[cell]) for cell in cell_keys], out=cell_starts[1:])
+
+    columns = {
+        "lat": ranker.lat[positions],
+        "lon": ranker.lon[positions],
+        "cos_lat": ranker.cos_lat[positions],
+        "masks": index._mask_words[positions],
+        "cell_keys": np.array(cell_keys, dtype=np.int64).reshape(-1, 2),
+        "cell_starts": cell_starts,
+        "cell_positions": np.array([p for cell in cell_keys for p in cells[cell]], dtype=np.int64),
+        "records": np.frombuffer(b"".join(records), dtype=np.uint8),
+        "record_offsets": record_offsets,
+    }
+
+    os.makedirs(directory, exist_ok=True)
+    previous = published_generation(directory)
+    generation = (previous or 0) + 1
+    files = {name: f"{name}.{generation}.npy" for name in COLUMNS}
+    for name, array in columns.items():
+        with open(os.path.join(directory, files[name]), "wb") as f:
+            np.save(f, array)
+
+    manifest = {
+        "version": SNAPSHOT_FORMAT_VERSION,
+        "generation": generation,
+        "published_at": datetime.now(timezone.utc).isoformat(),
+        "hospitals": len(positions),
+        "cell_size_deg": index.cell_size_deg,
+        "capabilities": index.capabilities.bit_positions(),
+        "columns": files,
+    }
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    temp_path = manifest_path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, default=str)
+    os.replace(temp_path, manifest_path)
+
+    for file in os.listdir(directory):
+        file_generation = _generation_of(file)
+        if file_generation is not None and file_generation <= generation - KEEP_GENERATIONS:
+            try:
+                os.remove(os.path.join(directory, file))
+            except FileNotFoundError:
+                pass
+    return generation
+
+
+class SnapshotIndex(HospitalIndex):
+    """
+    Read-only HospitalIndex over a published snapshot. Search and candidate
+    lookups work exactly as on the index it was written from; documents are
+    decoded from the mapped records when a result needs them.
+    """
+
+    def __init__(self, directory: str, manifest: Dict[str, Any], columns: Dict[str, np.ndarray]):
+        super().__init__(cell_size_deg=manifest["cell_size_deg"])
+        self.directory = directory
+        self.generation = manifest["generation"]
+        self.published_at = manifest.get("published_at")
+        self.capabilities = CapabilityIndex.from_bit_positions(manifest["capabilities"])
+        self._mask_words = columns["masks"]
+        self._ranker = HaversineRanker.from_radians(columns["lat"], columns["lon"], columns["cos_lat"])
+        starts = columns["cell_starts"].tolist()
+        cell_positions = columns["cell_positions"]
+        self._cells = {(row, col): cell_positions[starts[i]:starts[i + 1]]
+                       for i, (row, col) in enumerate(columns["cell_keys"].tolist())}
+        self._records = columns["records"]
+        self._record_offsets = columns["record_offsets"]
+        self._columns = columns
+        self._count = manifest["hospitals"]
+
+    @classmethod
+    def attach(cls, directory: str, retries: int = 3) -> "SnapshotIndex":
+        """Maps the published generation (retrying if a newer one replaces it while its files are opened)."""
+        for attempt in range(retries):
+            manifest = read_manifest(directory)
+            try:
+                columns = {name: _load_column(os.path.join(directory, file))
+                           for name, file in manifest["columns"].items()}
+                return cls(directory, manifest, columns)
+            except FileNotFoundError:
+                if attempt == retries - 1:
+                    raise
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _document(self, position: int) -> Dict[str, Any]:
+        start, end = self._record_offsets[position:position + 2].tolist()
+        return _decode_doc(memoryview(self._records[start:end]))
+
+    def _document_reader(self):
+        return self._document # The mapped generation never changes
+
+    def row_count(self) -> int:
+        return self._count
+
+    def row_keys(self, start: int = 0) -> Iterator[Tuple[int, Tuple[Any, Any]]]:
+        for position in range(start, self._count):
+            doc = self._document(position)
+            yield position, (doc.get("_id"), doc.get("id"))
+
+    def documents(self) -> List[Dict[str, Any]]:
+        return [self._document(position) for position in range(self._count)]
+
+    def keys(self) -> Iterable[Any]:
+        return [doc_key(doc) for doc in self.documents()]
+
+    def load(self, docs: Iterable[Dict[str, Any]]) -> None:
+        raise TypeError("SnapshotIndex is read-only; publish a new generation with snapshot_loader.py")
+
+    def apply_changes(self, upserts: Iterable[Dict[str, Any]], deletes: Iterable[Any] = ()) -> int:
+        raise TypeError("SnapshotIndex is read-only; publish a new generation with snapshot_loader.py")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "generation": self.generation,
+            "published_at": self.published_at,
+            "hospitals": self._count,
+            "grid_cells": len(self._cells),
+            "capabilities": len(self.capabilities),
+            "mapped_bytes": sum(column.nbytes for column in self._columns.values()),
+        }
@@ -0,0 +1,381 @@
+# hospital_sync.py
+"""
+Keeps the API's in-process hospital snapshot (HospitalIndex + search cache)
+in step with MongoDB without full reloads.
+
+Hospitals update their ICU / equipment / capacity data through the Node
+backend (`PATCH /profile`, `/emergency-capacity`), which writes straight to the
+shared collection. A background task reads those writes from a change feed and
+applies them incrementally:
+
+- ChangeStreamSource:   tails a MongoDB change stream (replica sets / Atlas),
+                        resuming from the last token after errors
+- WatermarkPollSource:  polls `updatedAt` (set by Mongoose timestamps and by
+                        load_data.py) when change streams aren't available;
+                        deletes are found by a periodic key reconciliation
+- FakeChangeFeed:       in-process source for tests and benchmarks
+
+Staleness is reported as the age of the newest point in time the snapshot is
+known to include (`staleness_seconds` in stats()).
+"""
+
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from geo_index import doc_key
+from live_status import STATUS_FIELD as LIVE_STATUS_FIELD
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+CHANGE_STREAM_MAX_AWAIT_MS = 1000 # How long one empty change-stream poll waits on the server
+CHANGE_STREAM_HISTORY_LOST = 286 # Resume token no longer in the oplog
+RETRY_BACKOFF_SECONDS = (0.5, 1, 2, 5, 10, 30)
+
+
+class ChangeEvent(NamedTuple):
+    op: str # "upsert", "delete" or "reload" (snapshot must be rebuilt from scratch)
+    key: Any = None # doc_key of the hospital
+    doc: Optional[Dict[str, Any]] = None # Full document for upserts
+    event_time: Optional[float] = None # When the write happened (epoch seconds), if known
+
+
+def _epoch(value: Any) -> Optional[float]:
+    """Epoch seconds of a BSON datetime (naive UTC) or Timestamp."""
+    if isinstance(value, datetime):
+        return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+    if hasattr(value, "time"): # bson.Timestamp
+        return float(value.time)
+    return None
+
+
+def coalesce(events: Iterable[ChangeEvent]) -> Dict[Any, ChangeEvent]:
+    """Keeps only the last event per hospital, so a batch can be applied in any order."""
+    latest: Dict[Any, ChangeEvent] = {}
+    for event in events:
+        latest.pop(event.key, None) # Re-insert so dict order follows the latest event
+        latest[event.key] = event
+    return latest
+
+
+# --- Change feed sources ---
+# A source has `mode`, `pause_seconds` (wait between batches), `complete_batches`
+# (each batch holds every write made before it was read, so the snapshot is
+# caught up once it's applied), `async open()`,
+# `async next_batch() -> List[ChangeEvent]` (an empty list means "caught up")
+# and `async close()`.
+
+class ChangeStreamSource:
+    """Tails a MongoDB change stream on the hospitals collection."""
+    mode = "change_stream"
+    pause_seconds = 0.0 # try_next() already waits on the server for new events
+    complete_batches = False # One event at a time
+
+    def __init__(self, collection, projection: Optional[Dict[str, int]] = None):
+        self.collection = collection
+        self.projection = projection
+        self._stream = None
+        self._token = None
+        self._needs_reload = False
+
+    async def open(self) -> None:
+        pipeline: List[Dict[str, Any]] = [
+            {"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete", "drop", "rename", "invalidate"]}}},
+            # Live availability writes (live_status.py) touch nothing the snapshot keeps: skip updates of only those
+            {"$match": {"$expr": {"$or": [
+                {"$ne": ["$operationType", "update"]},
+                {"$gt": [{"$size": {"$ifNull": ["$updateDescription.removedFields", []]}}, 0]},
+                {"$gt": [{"$size": {"$filter": {
+                    "input": {"$objectToArray": {"$ifNull": ["$updateDescription.updatedFields", {}]}},
+                    "cond": {"$ne": [{"$arrayElemAt": [{"$split": ["$$this.k", "."]}, 0]}, LIVE_STATUS_FIELD]},
+                }}}, 0]},
+            ]}}},
+        ]
+        if self.projection:
+            # Only the fields the snapshot keeps (plus what identifies the event)
+            fields = {f"fullDocument.{field}": 1 for field in self.projection}
+            pipeline.append({"$project": {"operationType": 1, "documentKey": 1, "clusterTime": 1, **fields}})
+        try:
+            self._stream = await self.collection.watch(pipeline, full_document="updateLookup",
+                                                       resume_after=self._token,
+                                                       max_await_time_ms=CHANGE_STREAM_MAX_AWAIT_MS)
+        except OperationFailure as err:
+            if self._token is None or err.code != CHANGE_STREAM_HISTORY_LOST:
+                raise
+            # Fell too far behind to resume: start a fresh stream and rebuild the snapshot
+            logger.warning("Change stream resume token expired; restarting stream and reloading snapshot.")
+            self._token = None
+            self._needs_reload = True
+            self._stream = await self.collection.watch(pipeline, full_document="updateLookup",
+                                                       max_await_time_ms=CHANGE_STREAM_MAX_AWAIT_MS)
+        self._token = self._stream.resume_token
+
+    async def next_batch(self) -> List[ChangeEvent]:
+        if self._needs_reload:
+            self._needs_reload = False
+            return [ChangeEvent("reload")]
+        change = await self._stream.try_next()
+        self._token = self._stream.resume_token
+        if change is None:
+            return []
+
+        operation = change["operationType"]
+        event_time = _epoch(change.get("clusterTime"))
+        if operation in ("drop", "rename", "invalidate"):
+            # The stream is closed after these; reopen a fresh one and rebuild
+            await self.close()
+            self._token = None
+            await self.open()
+            return [ChangeEvent("reload", event_time=event_time)]
+        key = change["documentKey"]["_id"]
+        doc = change.get("fullDocument")
+        if operation == "delete" or doc is None: # Updated then deleted before the lookup
+            return [ChangeEvent("delete", key, None, event_time)]
+        return [ChangeEvent("upsert", key, doc, event_time)]
+
+    async def close(self) -> None:
+        if self._stream is not None:
+            await self._stream.close()
+            self._stream = None
+
+
+class WatermarkPollSource:
+    """
+    Polls for documents whose `updatedAt` is past the last one seen. Each poll
+    re-reads a short overlap window, so writes committed out of timestamp order
+    (or stamped by slightly skewed clocks) aren't missed; re-applying an
+    unchanged document is a no-op in the snapshot.
+    """
+    mode = "polling"
+    complete_batches = True
+
+    def __init__(self, collection, known_keys: Callable[[], Optional[Iterable[Any]]],
+                 projection: Optional[Dict[str, int]] = None, field: str = "updatedAt",
+                 interval_seconds: float = 2.0, overlap_seconds: float = 1.0, reconcile_every: int = 30):
+        self.collection = collection
+        self.known_keys = known_keys
+        self.projection = {**projection, field: 1} if projection else None
+        self.field = field
+        self.pause_seconds = interval_seconds
+        self.overlap_seconds = overlap_seconds
+        self.reconcile_every = reconcile_every
+        self._watermark: Optional[datetime] = None
+        self._opened = False
+        self._polls = 0
+
+    async def open(self) -> None:
+        if self._opened:
+            return # Reopening after an error: keep polling from the current watermark
+        # Start from the newest write already in the collection (server data, so no clock skew)
+        latest = await self.collection.find({self.field: {"$exists": True}}, {self.field: 1}) \
+            .sort(self.field, -1).limit(1).to_list(1)
+        self._watermark = latest[0][self.field] if latest else None
+        self._opened = True
+
+    async def next_batch(self) -> List[ChangeEvent]:
+        self._polls += 1
+
+        if self._watermark is None:
+            query: Dict[str, Any] = {self.field: {"$exists": True}}
+        else:
+            query = {self.field: {"$gte": self._watermark - timedelta(seconds=self.overlap_seconds)}}
+        docs = await self.collection.find(query, self.projection).sort(self.field, 1).to_list(None)
+        events = [ChangeEvent("upsert", doc_key(doc), doc, _epoch(doc.get(self.field))) for doc in docs]
+        if docs:
+            self._watermark = max(self._watermark or docs[-1][self.field], docs[-1][self.field])
+
+        if self._polls % self.reconcile_every == 0:
+            events.extend(await self._reconcile())
+        return events
+
+    async def _reconcile(self) -> List[ChangeEvent]:
+        """Deletes can't be seen by a watermark: compare the snapshot's keys with the collection's."""
+        known = self.known_keys()
+        if known is None:
+            return []
+        present = {doc["_id"] for doc in await self.collection.find({}, {"_id": 1}).to_list(None)}
+        return [ChangeEvent("delete", key) for key in list(known) if key not in present]
+
+    async def close(self) -> None:
+        pass
+
+
+class FakeChangeFeed:
+    """In-process change feed: push events from a test or benchmark, the sync task applies them."""
+    mode = "fake"
+    pause_seconds = 0.0
+    complete_batches = True # next_batch() drains the queue
+
+    def __init__(self, wait_seconds: float = 0.05):
+        self.wait_seconds = wait_seconds
+        self._queue: "asyncio.Queue[ChangeEvent]" = asyncio.Queue()
+
+    def upsert(self, doc: Dict[str, Any], event_time: Optional[float] = None) -> None:
+        self._queue.put_nowait(ChangeEvent("upsert", doc_key(doc), doc, event_time or time.time()))
+
+    def delete(self, key: Any, event_time: Optional[float] = None) -> None:
+        self._queue.put_nowait(ChangeEvent("delete", key, None, event_time or time.time()))
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    async def open(self) -> None:
+        pass
+
+    async def next_batch(self) -> List[ChangeEvent]:
+        try:
+            events = [await asyncio.wait_for(self._queue.get(), self.wait_seconds)]
+        except asyncio.TimeoutError:
+            return []
+        while not self._queue.empty():
+            events.append(self._queue.get_nowait())
+        return events
+
+    async def close(self) -> None:
+        pass
+
+
+async def open_source(collection, mode: str, known_keys: Callable[[], Optional[Iterable[Any]]],
+                      projection: Optional[Dict[str, int]] = None, **poll_options):
+    """
+    Opens the change feed for `mode` ("change_stream", "poll" or "auto").
+    "auto" uses a change stream and falls back to polling when the deployment
+    doesn't support them (standalone mongod).
+    """
+    if mode in ("auto", "change_stream"):
+        source = ChangeStreamSource(collection, projection)
+        try:
+            await source.open()
+            return source
+        except OperationFailure as err:
+            if mode == "change_stream":
+                raise
+            logger.warning(f"Change streams unavailable ({err}); polling for updates instead.")
+    source = WatermarkPollSource(collection, known_keys, projection, **poll_options)
+    await source.open()
+    return source
+
+
+# --- Sync task ---
+
+class HospitalSync:
+    """
+    Background task applying a change feed to the snapshot.
+    `apply(upserts, deletes)` returns how many hospitals changed;
+    `reload()` rebuilds the snapshot from scratch.
+    """
+
+    def __init__(self, source, apply: Callable[[List[Dict[str, Any]], List[Any]], Awaitable[int]],
+                 reload: Callable[[], Awaitable[None]]):
+        self.source = source
+        self.apply = apply
+        self.reload = reload
+        self._task: Optional[asyncio.Task] = None
+        # Metrics
+        self.started_at: Optional[float] = None
+        self.synced_through: Optional[float] = None # Every write up to this time is in the snapshot
+        self.last_event_lag_seconds: Optional[float] = None # Write -> applied delay of the latest event
+        self.events = 0
+        self.changes_applied = 0
+        self.reloads = 0
+        self.errors = 0
+
+    def start(self) -> None:
+        self.started_at = self.synced_through = time.time()
+        self._task = asyncio.create_task(self._run(), name="hospital-sync")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.source.close()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def staleness_seconds(self) -> Optional[float]:
+        """How far behind the database the snapshot may be."""
+        if self.synced_through is None:
+            return None
+        return max(0.0, time.time() - self.synced_through)
+
+    async def step(self) -> int:
+        """Reads and applies one batch from the source; returns how many hospitals changed."""
+        polled_at = time.time()
+        events = await self.source.next_batch()
+        if not events:
+            self.synced_through = polled_at # Caught up with everything written before the poll
+            return 0
+
+        self.events += len(events)
+        changed = 0
+        if any(event.op == "reload" for event in events):
+            await self.reload()
+            self.reloads += 1
+        else:
+            latest = coalesce(events)
+            upserts = [event.doc for event in latest.values() if event.op == "upsert"]
+            deletes = [event.key for event in latest.values() if event.op == "delete"]
+            changed = await self.apply(upserts, deletes)
+            self.changes_applied += changed
+
+        applied_at = time.time()
+        event_times = [event.event_time for event in events if event.event_time is not None]
+        if event_times:
+            newest = max(event_times)
+            if changed: # Polling re-reads unchanged documents in its overlap window
+                self.last_event_lag_seconds = max(0.0, applied_at - newest)
+            self.synced_through = max(self.synced_through or 0.0, min(newest, applied_at))
+        if self.source.complete_batches:
+            self.synced_through = polled_at
+        return changed
+
+    async def _run(self) -> None:
+        logger.info(f"Hospital snapshot sync started ({self.source.mode}).")
+        failures = 0
+        while True:
+            try:
+                await self.step()
+                failures = 0
+                if self.source.pause_seconds:
+                    await asyncio.sleep(self.source.pause_seconds)
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as err:
+                self.errors += 1
+                delay = RETRY_BACKOFF_SECONDS[min(failures, len(RETRY_BACKOFF_SECONDS) - 1)]
+                failures += 1
+                logger.error(f"Hospital snapshot sync error ({err}); retrying in {delay}s.")
+                await asyncio.sleep(delay)
+                try:
+                    await self.source.close()
+                    await self.source.open() # Resumes from the last change-stream token / watermark
+                except PyMongoError as reopen_err:
+                    logger.error(f"Failed to reopen change feed: {reopen_err}")
+            except Exception as err:
+                self.errors += 1
+                logger.error(f"Unexpected error applying hospital changes: {err}", exc_info=True)
+                await asyncio.sleep(RETRY_BACKOFF_SECONDS[0])
+
+    def stats(self) -> Dict[str, Any]:
+        staleness = self.staleness_seconds()
+        return {
+            "mode": self.source.mode,
+            "running": self.running,
+            "staleness_seconds": None if staleness is None else round(staleness, 3),
+            "last_event_lag_seconds": None if self.last_event_lag_seconds is None else round(self.last_event_lag_seconds, 3),
+            "events": self.events,
+            "changes_applied": self.changes_applied,
+            "reloads": self.reloads,
+            "errors": self.errors,
+        }
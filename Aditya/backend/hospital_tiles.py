@@ -0,0 +1,440 @@
+# hospital_tiles.py
+"""
+Precomputed nearest-suitable-hospital tiles, one layer per need profile
+(condition_profiles.py).
+
+An offline build (build_tiles.py) rasterizes the service region into a
+latitude/longitude grid and stores, for every cell and profile, the k suitable
+hospitals nearest to the cell centre (hospital slots plus centre distances,
+nearest first) in plain .npy files that are memory-mapped at startup. A search
+whose filters match a profile is then a cell lookup plus an exact distance
+re-rank of those k candidates.
+
+Completeness works like the search cache: each cell keeps a `horizon`, and
+every suitable hospital closer than that to the cell centre is in its list, so
+a hospital left out is at least `horizon - cell_radius` from any caller in the
+cell. The answer is used only if everything returned (or the search radius,
+when fewer than `limit` were found) is closer than that; otherwise search()
+returns None and the caller runs a normal search.
+
+Hospital changes are applied incrementally: a hospital that becomes suitable
+(or moves) is inserted into the cells whose ranking it enters, and only cells
+that listed a hospital which moved away, was deleted or lost a capability are
+recomputed. A server applies change-feed writes to its private copy-on-write
+mapping; build_tiles.py --update writes them back.
+
+Directory layout:
+    manifest.json                    grid, k, radius, profiles, array files and the
+                                     hospital table (slot -> document, null = removed)
+    <profile>.slots.<generation>.npy     int32 (rows, cols, k), -1 = empty
+    <profile>.dist.<generation>.npy      float32 (rows, cols, k), meters from the cell centre
+    <profile>.horizon.<generation>.npy   float32 (rows, cols), meters
+"""
+
+import os
+import json
+import math
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from bson import ObjectId
+
+from condition_profiles import CONDITION_PROFILES, NeedProfile
+from geo_index import RESULT_FIELDS, doc_key, haversine_m, matches_filters
+from ranking import EARTH_RADIUS_M, HaversineRanker, select_nearest
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+TILES_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+ARRAY_KINDS = ("slots", "dist", "horizon")
+DEFAULT_CELL_SIZE_DEG = 0.01 # ~1.1 km cells
+DEFAULT_CANDIDATES = 32 # Hospitals kept per cell and profile (about 2x MAX_RESULTS)
+DEFAULT_MARGIN_DEG = 0.05 # Grid extends this far beyond the outermost hospitals
+HORIZON_MARGIN_M = 1.0 # Horizons are lowered by this much so float32 rounding never overstates them
+CHUNK_ELEMENTS = 1 << 22 # Max (cell, hospital) distances computed at once during (re)computation
+
+
+class TileGrid(NamedTuple):
+    """Regular latitude/longitude grid over the service region."""
+    min_lat: float
+    min_lon: float
+    cell_size_deg: float
+    rows: int
+    cols: int
+
+    @classmethod
+    def covering(cls, region: Tuple[float, float, float, float], cell_size_deg: float) -> "TileGrid":
+        """Grid over a (min_lat, max_lat, min_lon, max_lon) region."""
+        min_lat, max_lat, min_lon, max_lon = region
+        rows = max(1, int(math.ceil((max_lat - min_lat) / cell_size_deg)))
+        cols = max(1, int(math.ceil((max_lon - min_lon) / cell_size_deg)))
+        return cls(min_lat, min_lon, cell_size_deg, rows, cols)
+
+    def cell(self, lat: float, lon: float) -> Optional[Tuple[int, int]]:
+        """(row, col) of the cell holding (lat, lon), or None outside the grid."""
+        row = int(math.floor((lat - self.min_lat) / self.cell_size_deg))
+        col = int(math.floor((lon - self.min_lon) / self.cell_size_deg))
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            return row, col
+        return None
+
+    def centers(self, rows: np.ndarray, cols: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(lats, lons) of the centres of the given cells."""
+        return (self.min_lat + (rows + 0.5) * self.cell_size_deg,
+                self.min_lon + (cols + 0.5) * self.cell_size_deg)
+
+    def cell_radius_m(self) -> float:
+        """Largest centre-to-corner distance of any cell (cells are widest on the row nearest the equator)."""
+        half = self.cell_size_deg / 2
+        edge_rows = (self.min_lat + half, self.min_lat + (self.rows - 0.5) * self.cell_size_deg)
+        return max(haversine_m(0.0, c_lat, half, c_lat + d_lat) for c_lat in edge_rows for d_lat in (-half, half))
+
+    def cells_near(self, lat: float, lon: float, distance_m: float) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, cols) of the cells whose centre may be within `distance_m` of (lat, lon) (a bounding box)."""
+        d_lat = math.degrees(distance_m / EARTH_RADIUS_M)
+        widest = min(89.9, max(abs(lat - d_lat), abs(lat + d_lat)))
+        d_lon = min(180.0, d_lat / math.cos(math.radians(widest)))
+        row_lo = max(0, int(math.floor((lat - d_lat - self.min_lat) / self.cell_size_deg)))
+        row_hi = min(self.rows - 1, int(math.floor((lat + d_lat - self.min_lat) / self.cell_size_deg)))
+        col_lo = max(0, int(math.floor((lon - d_lon - self.min_lon) / self.cell_size_deg)))
+        col_hi = min(self.cols - 1, int(math.floor((lon + d_lon - self.min_lon) / self.cell_size_deg)))
+        if row_lo > row_hi or col_lo > col_hi:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        rows, cols = np.meshgrid(np.arange(row_lo, row_hi + 1), np.arange(col_lo, col_hi + 1), indexing="ij")
+        return rows.ravel(), cols.ravel()
+
+
+def _stored_fields(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: doc[field] for field in RESULT_FIELDS if field in doc}
+
+
+def _encode_doc(doc: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if doc is not None and isinstance(doc.get("_id"), ObjectId):
+        return {**doc, "_id": str(doc["_id"])}
+    return doc
+
+
+def _decode_doc(doc: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if doc is not None and isinstance(doc.get("_id"), str) and ObjectId.is_valid(doc["_id"]):
+        return {**doc, "_id": ObjectId(doc["_id"])}
+    return doc
+
+
+def _lat_lon(doc: Dict[str, Any]) -> Tuple[float, float]:
+    lon, lat = doc["location"]["coordinates"]
+    return float(lat), float(lon)
+
+
+class TileSet:
+    """Per-profile top-k hospital tiles over a TileGrid, plus the hospital table they point into."""
+
+    def __init__(self, grid: TileGrid, k: int, radius_m: float, profiles: Dict[str, NeedProfile],
+                 docs: List[Optional[Dict[str, Any]]], arrays: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]],
+                 built_at: Optional[str] = None, generation: int = 0):
+        self.grid = grid
+        self.k = k
+        self.radius_m = radius_m
+        self.cell_radius_m = grid.cell_radius_m()
+        # Stored candidates reach far enough that the search radius around any point of the cell is covered
+        self.reach_m = radius_m + 2 * self.cell_radius_m
+        self.profiles = profiles
+        self.built_at = built_at
+        self.generation = generation
+        self._by_filters = {profile.filter_key(): name for name, profile in profiles.items()}
+        self._docs = docs # None = removed (tombstone)
+        self._slots_of = {doc_key(doc): slot for slot, doc in enumerate(docs) if doc is not None}
+        coords = [_lat_lon(doc) if doc is not None else (0.0, 0.0) for doc in docs]
+        self._ranker = HaversineRanker([lat for lat, _ in coords], [lon for _, lon in coords])
+        self._suitable = {name: np.array([doc is not None and matches_filters(doc, *profile) for doc in docs], dtype=bool)
+                          for name, profile in profiles.items()}
+        self._slots = {name: arrays[name][0] for name in profiles}
+        self._dist = {name: arrays[name][1] for name in profiles}
+        self._horizon = {name: arrays[name][2] for name in profiles}
+        self.hits = 0
+        self.fallbacks = 0
+        self.outside = 0
+        self.cells_updated = 0
+
+    def __len__(self) -> int:
+        return len(self._slots_of)
+
+    def documents(self) -> List[Dict[str, Any]]:
+        """Every hospital in the tile set (stored fields only)."""
+        return [doc for doc in self._docs if doc is not None]
+
+    # --- Building and storage ---
+
+    @classmethod
+    def build(cls, docs: Iterable[Dict[str, Any]], radius_m: float,
+              profiles: Dict[str, NeedProfile] = CONDITION_PROFILES, k: int = DEFAULT_CANDIDATES,
+              cell_size_deg: float = DEFAULT_CELL_SIZE_DEG,
+              region: Optional[Tuple[float, float, float, float]] = None,
+              margin_deg: float = DEFAULT_MARGIN_DEG) -> "TileSet":
+        """
+        Computes every cell of every profile. `region` is (min_lat, max_lat,
+        min_lon, max_lon); by default the hospitals' bounding box plus `margin_deg`.
+        """
+        docs = [_stored_fields(doc) for doc in docs]
+        if region is None:
+            if not docs:
+                raise ValueError("Cannot derive the tile region without hospitals; pass region explicitly")
+            coords = [_lat_lon(doc) for doc in docs]
+            lats, lons = [lat for lat, _ in coords], [lon for _, lon in coords]
+            region = (min(lats) - margin_deg, max(lats) + margin_deg, min(lons) - margin_deg, max(lons) + margin_deg)
+        grid = TileGrid.covering(region, cell_size_deg)
+        shape = (grid.rows, grid.cols)
+        arrays = {name: (np.full(shape + (k,), -1, dtype=np.int32), np.full(shape + (k,), np.inf, dtype=np.float32),
+                         np.zeros(shape, dtype=np.float32)) for name in profiles}
+        tiles = cls(grid, k, radius_m, profiles, docs, arrays,
+                    built_at=datetime.now(timezone.utc).isoformat())
+        rows, cols = np.meshgrid(np.arange(grid.rows), np.arange(grid.cols), indexing="ij")
+        for name in profiles:
+            tiles._compute_cells(name, rows.ravel(), cols.ravel())
+        return tiles
+
+    @classmethod
+    def open(cls, directory: str) -> "TileSet":
+        """
+        Memory-maps a built tile set. Arrays are mapped copy-on-write: updates
+        applied by this process stay private to it and never touch the files.
+        """
+        with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != TILES_FORMAT_VERSION:
+            raise ValueError(f"Unsupported tiles format version {manifest.get('version')} in {directory}")
+        profiles = {name: NeedProfile(p["needs_icu"], p["specialist"], tuple(p["equipment"]))
+                    for name, p in manifest["profiles"].items()}
+        arrays = {name: tuple(np.load(os.path.join(directory, manifest["arrays"][name][kind]), mmap_mode="c")
+                              for kind in ARRAY_KINDS) for name in profiles}
+        return cls(TileGrid(**manifest["grid"]), manifest["k"], manifest["radius_m"], profiles,
+                   [_decode_doc(doc) for doc in manifest["hospitals"]], arrays,
+                   built_at=manifest.get("built_at"), generation=manifest.get("generation", 0))
+
+    def save(self, directory: str) -> None:
+        """
+        Writes the tile set as a new generation of array files, then swaps the
+        manifest in atomically and removes the previous generation (servers
+        that already mapped it keep reading it until they restart).
+        """
+        os.makedirs(directory, exist_ok=True)
+        manifest_path = os.path.join(directory, MANIFEST_FILE)
+        previous = []
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                previous = [file for files in json.load(f).get("arrays", {}).values() for file in files.values()]
+
+        self.generation += 1
+        files = {name: {kind: f"{name}.{kind}.{self.generation}.npy" for kind in ARRAY_KINDS} for name in self.profiles}
+        for name in self.profiles:
+            for kind, array in zip(ARRAY_KINDS, (self._slots[name], self._dist[name], self._horizon[name])):
+                with open(os.path.join(directory, files[name][kind]), "wb") as f:
+                    np.save(f, np.asarray(array))
+
+        manifest = {
+            "version": TILES_FORMAT_VERSION,
+            "generation": self.generation,
+            "built_at": self.built_at,
+            "saved_at": datetime.now(timezone.utc).isoformat(),
+            "grid": self.grid._asdict(),
+            "k": self.k,
+            "radius_m": self.radius_m,
+            "profiles": {name: {"needs_icu": p.needs_icu, "specialist": p.specialist, "equipment": list(p.equipment)}
+                         for name, p in self.profiles.items()},
+            "arrays": files,
+            "hospitals": [_encode_doc(doc) for doc in self._docs],
+        }
+        temp_path = manifest_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, default=str)
+        os.replace(temp_path, manifest_path)
+
+        current = {file for names in files.values() for file in names.values()}
+        for file in previous:
+            if file not in current:
+                try:
+                    os.remove(os.path.join(directory, file))
+                except FileNotFoundError:
+                    pass
+
+    # --- Cell computation ---
+
+    def _compute_cells(self, name: str, rows: np.ndarray, cols: np.ndarray) -> None:
+        """Recomputes the candidate lists and horizons of the given cells from scratch."""
+        positions = np.flatnonzero(self._suitable[name])
+        center_lats, center_lons = self.grid.centers(rows, cols)
+        chunk = max(1, CHUNK_ELEMENTS // max(1, len(positions)))
+        for start in range(0, len(rows), chunk):
+            r, c = rows[start:start + chunk], cols[start:start + chunk]
+            slots = np.full((len(r), self.k), -1, dtype=np.int32)
+            dist = np.full((len(r), self.k), np.inf, dtype=np.float32)
+            horizon = np.full(len(r), self.reach_m, dtype=np.float32)
+            if len(positions):
+                d = self._ranker.distances_many_m(center_lats[start:start + chunk], center_lons[start:start + chunk], positions)
+                d[d > self.reach_m] = np.inf
+                take = min(self.k + 1, len(positions))
+                if len(positions) > take:
+                    # Partial sort: everything closer than the (k+1)-th distance is among the first `take`
+                    part = np.argpartition(d, take - 1, axis=1)[:, :take]
+                else:
+                    part = np.broadcast_to(np.arange(len(positions)), (len(r), take))
+                part_d = np.take_along_axis(d, part, axis=1)
+                part_slots = positions[part]
+                order = np.lexsort((part_slots, part_d))
+                part_d = np.take_along_axis(part_d, order, axis=1)
+                part_slots = np.take_along_axis(part_slots, order, axis=1)
+                kept = min(self.k, take)
+                slots[:, :kept] = np.where(np.isfinite(part_d[:, :kept]), part_slots[:, :kept], -1)
+                dist[:, :kept] = part_d[:, :kept]
+                if take > self.k:
+                    horizon = np.minimum(horizon, part_d[:, self.k] - HORIZON_MARGIN_M)
+            self._slots[name][r, c] = slots
+            self._dist[name][r, c] = dist
+            self._horizon[name][r, c] = horizon
+
+    def _evict(self, name: str, slot: int, lat: float, lon: float) -> int:
+        """Recomputes the cells (around the hospital's previous location) that list `slot`."""
+        rows, cols = self.grid.cells_near(lat, lon, self.reach_m)
+        listed = (self._slots[name][rows, cols] == slot).any(axis=1)
+        rows, cols = rows[listed], cols[listed]
+        if len(rows):
+            self._compute_cells(name, rows, cols)
+        return len(rows)
+
+    def _insert(self, name: str, slot: int, lat: float, lon: float) -> int:
+        """Adds `slot` to every cell it is closer to than the cell's horizon, keeping lists ranked."""
+        rows, cols = self.grid.cells_near(lat, lon, self.reach_m)
+        if not len(rows):
+            return 0
+        center_lats, center_lons = self.grid.centers(rows, cols)
+        d = HaversineRanker(center_lats, center_lons).distances_m(lat, lon)
+        slots = self._slots[name][rows, cols]
+        enters = (d < self._horizon[name][rows, cols]) & ~(slots == slot).any(axis=1)
+        if not enters.any():
+            return 0
+        rows, cols = rows[enters], cols[enters]
+        merged_slots = np.concatenate([slots[enters], np.full((len(rows), 1), slot, dtype=np.int32)], axis=1)
+        merged_d = np.concatenate([self._dist[name][rows, cols], d[enters][:, None].astype(np.float32)], axis=1)
+        order = np.lexsort((merged_slots, merged_d))
+        merged_slots = np.take_along_axis(merged_slots, order, axis=1)
+        merged_d = np.take_along_axis(merged_d, order, axis=1)
+        self._slots[name][rows, cols] = merged_slots[:, :self.k]
+        self._dist[name][rows, cols] = merged_d[:, :self.k]
+        # The hospital pushed out of a full list is now the nearest one missing (inf when nothing was dropped)
+        self._horizon[name][rows, cols] = np.minimum(self._horizon[name][rows, cols],
+                                                     merged_d[:, self.k] - HORIZON_MARGIN_M)
+        return len(rows)
+
+    # --- Incremental updates ---
+
+    def apply_changes(self, upserts: Iterable[Dict[str, Any]], deletes: Iterable[Any] = ()) -> int:
+        """
+        Applies inserted/updated hospital documents and deleted keys (same
+        arguments as HospitalIndex.apply_changes). Returns how many cells changed.
+        """
+        upserts = [_stored_fields(doc) for doc in upserts]
+        new_docs = [doc for doc in upserts if doc_key(doc) not in self._slots_of]
+        if new_docs:
+            # New slots start out removed and unsuitable; the update below fills them in
+            first = len(self._docs)
+            coords = [_lat_lon(doc) for doc in new_docs]
+            self._ranker.extend([lat for lat, _ in coords], [lon for _, lon in coords])
+            self._docs.extend([None] * len(new_docs))
+            for name in self.profiles:
+                self._suitable[name] = np.concatenate([self._suitable[name], np.zeros(len(new_docs), dtype=bool)])
+            for offset, doc in enumerate(new_docs):
+                self._slots_of[doc_key(doc)] = first + offset
+
+        updated = 0
+        for key in deletes:
+            slot = self._slots_of.pop(key, None)
+            if slot is not None:
+                updated += self._update_slot(slot, None)
+        for doc in upserts:
+            updated += self._update_slot(self._slots_of[doc_key(doc)], doc)
+        self.cells_updated += updated
+        return updated
+
+    def _update_slot(self, slot: int, doc: Optional[Dict[str, Any]]) -> int:
+        old = self._docs[slot]
+        self._docs[slot] = doc
+        old_point = _lat_lon(old) if old is not None else None
+        new_point = _lat_lon(doc) if doc is not None else None
+        if new_point is not None:
+            self._ranker.set(slot, *new_point)
+        moved = old_point is not None and new_point is not None and old_point != new_point
+
+        updated = 0
+        for name, profile in self.profiles.items():
+            was = bool(self._suitable[name][slot])
+            now = doc is not None and matches_filters(doc, *profile)
+            self._suitable[name][slot] = now
+            if was and (moved or not now):
+                updated += self._evict(name, slot, *old_point)
+            if now and (moved or not was):
+                updated += self._insert(name, slot, *new_point)
+        return updated
+
+    def sync_with(self, docs: Iterable[Dict[str, Any]]) -> int:
+        """Brings the tiles up to date with a full hospital list (e.g. the collection); returns cells changed."""
+        current = {}
+        for doc in docs:
+            doc = _stored_fields(doc)
+            current[doc_key(doc)] = doc
+        upserts = [doc for key, doc in current.items()
+                   if key not in self._slots_of or self._docs[self._slots_of[key]] != doc]
+        deletes = [key for key in self._slots_of if key not in current]
+        return self.apply_changes(upserts, deletes)
+
+    # --- Queries ---
+
+    def profile_for(self, filters: Tuple[bool, Optional[str], Optional[Tuple[str, ...]]]) -> Optional[str]:
+        """Name of the profile whose filters equal `filters` (normalized as main.filter_key), if any."""
+        return self._by_filters.get(filters)
+
+    def search(self, profile: str, lat: float, lon: float, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Up to `limit` suitable hospitals within the tile radius of (lat, lon),
+        nearest first with `distance_km` (same shape as HospitalIndex.search),
+        or None when the point is outside the grid or the cell can't guarantee
+        the result.
+        """
+        cell = self.grid.cell(lat, lon)
+        if cell is None:
+            self.outside += 1
+            return None
+        slots = self._slots[profile][cell]
+        slots = slots[slots >= 0]
+        distances = self._ranker.distances_m(lat, lon, slots)
+        chosen = select_nearest(distances, self.radius_m, limit, keys=slots)
+        reach_m = distances[chosen[-1]] if len(chosen) == limit else self.radius_m
+        if reach_m >= float(self._horizon[profile][cell]) - self.cell_radius_m:
+            self.fallbacks += 1
+            return None
+
+        self.hits += 1
+        results = []
+        for slot, distance_m in zip(slots[chosen].tolist(), distances[chosen].tolist()):
+            result = dict(self._docs[slot])
+            result["distance_km"] = round(distance_m / 1000, 2)
+            results.append(result)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.fallbacks + self.outside
+        return {
+            "profiles": list(self.profiles),
+            "hospitals": len(self),
+            "grid": {"rows": self.grid.rows, "cols": self.grid.cols, "cell_size_deg": self.grid.cell_size_deg},
+            "candidates_per_cell": self.k,
+            "built_at": self.built_at,
+            "generation": self.generation,
+            "hits": self.hits,
+            "fallbacks": self.fallbacks,
+            "outside_grid": self.outside,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "cells_updated": self.cells_updated,
+        }
@@ -0,0 +1,418 @@
+# live_status.py
+"""
+Live bed / ICU availability pushed by hospitals (POST /api/hospitals/{id}/status).
+
+`hasICU` only says a hospital has an ICU, not that a bed is free. Hospitals
+push their current counts (free ICU beds, free ventilators, ER load) every few
+seconds; at that rate a MongoDB write per update would cost more than the
+searches it serves, so:
+
+- StatusTable holds the latest status of every hospital in process memory.
+  Updates are coalesced per hospital: only the newest pending status of each
+  is written, however many arrived since the last flush.
+- StatusWriter flushes the pending statuses to the `liveStatus` field of the
+  hospital documents in `bulk_write` batches every `flush_seconds`, and reads
+  back statuses flushed by other workers (newer `reportedAt` wins, on both
+  sides), so every worker filters on every hospital's status.
+- IcuBedColumn mirrors the free-ICU-bed flag per in-memory index position,
+  so rankBy=score adds the live term for all its candidates in one lookup.
+
+Statuses are stamped with the server's receive time; one older than
+`max_age_seconds` no longer counts as current (a hospital that stopped
+reporting is not assumed to have free beds).
+
+Pushes steer patient routing, so each hospital authenticates with its own
+key (load_status_keys: a JSON object of hospital id -> key, compared in
+constant time by status_key_matches).
+"""
+
+import hmac
+import json
+import time
+import asyncio
+import logging
+from itertools import islice
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+STATUS_FIELD = "liveStatus" # Sub-document written to each hospital document
+RETRY_BACKOFF_SECONDS = (0.5, 1, 2, 5, 10, 30)
+REFRESH_OVERLAP_SECONDS = 2.0 # Re-read window for statuses stamped by workers with slightly skewed clocks
+
+
+class HospitalStatus(NamedTuple):
+    icu_beds: Optional[int] # Free ICU beds (None = never reported)
+    ventilators: Optional[int] # Free ventilators
+    er_load: Optional[float] # Emergency room occupancy, percent
+    reported_at: float # Epoch seconds, when the server received it
+
+    def to_document(self) -> Dict[str, Any]:
+        return {"icuBedsAvailable": self.icu_beds, "ventilatorsAvailable": self.ventilators, "erLoad": self.er_load,
+                "reportedAt": datetime.fromtimestamp(self.reported_at, timezone.utc)}
+
+    @classmethod
+    def from_document(cls, doc: Dict[str, Any]) -> Optional["HospitalStatus"]:
+        reported_at = doc.get("reportedAt")
+        if not isinstance(reported_at, datetime):
+            return None
+        if reported_at.tzinfo is None: # BSON datetimes decode as naive UTC
+            reported_at = reported_at.replace(tzinfo=timezone.utc)
+        return cls(doc.get("icuBedsAvailable"), doc.get("ventilatorsAvailable"), doc.get("erLoad"), reported_at.timestamp())
+
+
+class Availability(NamedTuple):
+    """What a search requires of a hospital's current status (None = no requirement)."""
+    min_icu_beds: Optional[int] = None
+    min_ventilators: Optional[int] = None
+    max_er_load: Optional[float] = None
+
+    def matches(self, status: HospitalStatus) -> bool:
+        if self.min_icu_beds is not None and (status.icu_beds is None or status.icu_beds < self.min_icu_beds):
+            return False
+        if self.min_ventilators is not None and (status.ventilators is None or status.ventilators < self.min_ventilators):
+            return False
+        if self.max_er_load is not None and (status.er_load is None or status.er_load > self.max_er_load):
+            return False
+        return True
+
+
+def hospital_key(value: str) -> Any:
+    """Status key for a path id: a MongoDB `_id` (24 hex digits) or the numeric `id`; ValueError otherwise."""
+    if ObjectId.is_valid(value):
+        return ObjectId(value)
+    if value.isdigit():
+        return int(value)
+    raise ValueError(f"Not a hospital id: '{value}'")
+
+
+def routing_key(key: Any) -> Tuple[str, Any]:
+    """("_id" | "id", value): the document field a status key names (regions.RegionCollections routes writes on it)."""
+    return ("_id", key) if isinstance(key, ObjectId) else ("id", key)
+
+
+def document_filter(key: Any) -> Dict[str, Any]:
+    """MongoDB filter for the hospital a status key names."""
+    return dict([routing_key(key)])
+
+
+def load_status_keys(path: str) -> Dict[str, str]:
+    """Per-hospital push keys from a JSON object {"<_id or numeric id>": "<key>"}; ValueError if malformed."""
+    with open(path, encoding="utf-8") as f:
+        keys = json.load(f)
+    if not isinstance(keys, dict) or not all(isinstance(key, str) and key for key in keys.values()):
+        raise ValueError(f"{path}: expected a JSON object of hospital id -> non-empty key string")
+    return {str(hospital_key(hospital_id)): key for hospital_id, key in keys.items()}
+
+
+def status_key_matches(keys: Dict[str, str], key: Any, given: Optional[str]) -> bool:
+    """True when `given` is the push key of the hospital `key` names."""
+    expected = keys.get(str(key))
+    return bool(given) and expected is not None and hmac.compare_digest(given.encode(), expected.encode())
+
+
+class StatusTable:
+    """Latest status per hospital, plus the ones not yet written to MongoDB."""
+
+    def __init__(self, max_age_seconds: float = 300.0, max_hospitals: int = 200000):
+        self.max_age_seconds = max_age_seconds
+        self.max_hospitals = max_hospitals
+        self._latest: Dict[Any, HospitalStatus] = {} # hospital_key -> newest known status
+        self._pending: Dict[Any, HospitalStatus] = {} # Received here, not yet flushed (insertion order = age)
+        self.columns: List["IcuBedColumn"] = [] # Kept current with every status adopted
+        # Metrics
+        self.updates = 0
+        self.rejected = 0
+
+    def __len__(self) -> int:
+        return len(self._latest)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._latest
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def update(self, key: Any, icu_beds: Optional[int] = None, ventilators: Optional[int] = None,
+               er_load: Optional[float] = None, now: Optional[float] = None) -> Optional[HospitalStatus]:
+        """
+        Records a pushed status (fields left out keep their last reported value)
+        and queues it for the next flush, replacing any pending one. Returns
+        None when the table is full and `key` is new.
+        """
+        previous = self._latest.get(key)
+        if previous is None and len(self._latest) >= self.max_hospitals:
+            self.rejected += 1
+            return None
+        status = HospitalStatus(
+            icu_beds if icu_beds is not None else (previous.icu_beds if previous else None),
+            ventilators if ventilators is not None else (previous.ventilators if previous else None),
+            er_load if er_load is not None else (previous.er_load if previous else None),
+            time.time() if now is None else now,
+        )
+        self._latest[key] = status
+        self._pending.pop(key, None) # Re-insert: the pending queue stays ordered by age
+        self._pending[key] = status
+        self.updates += 1
+        for column in self.columns:
+            column.set(key, status)
+        return status
+
+    def merge(self, key: Any, status: HospitalStatus) -> bool:
+        """Adopts a status read from MongoDB if it's newer than the one known here."""
+        current = self._latest.get(key)
+        if current is not None and current.reported_at >= status.reported_at:
+            return False
+        if current is None and len(self._latest) >= self.max_hospitals:
+            return False
+        self._latest[key] = status
+        for column in self.columns:
+            column.set(key, status)
+        return True
+
+    def take_pending(self, limit: int) -> Dict[Any, HospitalStatus]:
+        """Removes and returns up to `limit` pending statuses, oldest first."""
+        batch = {}
+        for key in list(islice(self._pending, limit)):
+            batch[key] = self._pending.pop(key)
+        return batch
+
+    def restore_pending(self, batch: Dict[Any, HospitalStatus]) -> None:
+        """Requeues a batch that failed to flush (statuses received meanwhile win)."""
+        self._pending = {**{key: status for key, status in batch.items() if key not in self._pending}, **self._pending}
+
+    def status_for(self, doc: Dict[str, Any], now: Optional[float] = None) -> Optional[HospitalStatus]:
+        """Current status of a hospital document (pushed under its `_id` or its numeric `id`), None if none is fresh."""
+        newest = None
+        for key in (doc.get("_id"), doc.get("id")):
+            status = self._latest.get(key) if key is not None else None
+            if status is not None and (newest is None or status.reported_at > newest.reported_at):
+                newest = status
+        if newest is None or (time.time() if now is None else now) - newest.reported_at > self.max_age_seconds:
+            return None
+        return newest
+
+    def accepts(self, doc: Dict[str, Any], availability: Availability, now: Optional[float] = None) -> bool:
+        """True when the hospital has a current status meeting `availability`."""
+        status = self.status_for(doc, now)
+        return status is not None and availability.matches(status)
+
+    def mongo_filter(self, availability: Availability, now: Optional[float] = None) -> Dict[str, Any]:
+        """The same requirement on the flushed `liveStatus` fields, for $geoNear's query."""
+        oldest = datetime.fromtimestamp((time.time() if now is None else now) - self.max_age_seconds, timezone.utc)
+        query: Dict[str, Any] = {f"{STATUS_FIELD}.reportedAt": {"$gte": oldest}}
+        if availability.min_icu_beds is not None:
+            query[f"{STATUS_FIELD}.icuBedsAvailable"] = {"$gte": availability.min_icu_beds}
+        if availability.min_ventilators is not None:
+            query[f"{STATUS_FIELD}.ventilatorsAvailable"] = {"$gte": availability.min_ventilators}
+        if availability.max_er_load is not None:
+            query[f"{STATUS_FIELD}.erLoad"] = {"$lte": availability.max_er_load}
+        return query
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Forgets flushed statuses too old to count; returns how many were dropped."""
+        cutoff = (time.time() if now is None else now) - self.max_age_seconds
+        stale = [key for key, status in self._latest.items() if status.reported_at < cutoff and key not in self._pending]
+        for key in stale:
+            del self._latest[key]
+        return len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hospitals": len(self._latest), "pending": len(self._pending), "updates": self.updates,
+                "rejected": self.rejected, "max_age_seconds": self.max_age_seconds}
+
+
+class IcuBedColumn:
+    """
+    Whether each position of a search index (geo_index.HospitalIndex) has a
+    free ICU bed, and when that was reported, as arrays scoring can index with
+    its candidate positions. Registered with its StatusTable, which sets every
+    status it adopts; sync() follows the index's positions.
+    """
+
+    def __init__(self, table: StatusTable):
+        self.table = table
+        self._index = None # Index whose positions the arrays follow, and its layout when they were built
+        self._layout = None
+        self._positions: Dict[Any, List[int]] = {} # hospital_key (`_id` and numeric `id`) -> positions
+        self._free = np.zeros(0, dtype=bool)
+        self._reported_at = np.zeros(0, dtype=np.float64)
+        table.columns.append(self)
+
+    def sync(self, index) -> None:
+        """Rebuilds the arrays for another (or reloaded) index, or extends them with positions added since."""
+        if index is not self._index or index.layout != self._layout:
+            self._index, self._layout, self._positions = index, index.layout, {}
+            self._free, self._reported_at = np.zeros(0, dtype=bool), np.zeros(0, dtype=np.float64)
+        start, count = len(self._free), index.row_count()
+        if count <= start:
+            return
+        self._free = np.concatenate([self._free, np.zeros(count - start, dtype=bool)])
+        self._reported_at = np.concatenate([self._reported_at, np.full(count - start, -np.inf)])
+        for position, keys in index.row_keys(start):
+            for key in keys:
+                if key is None:
+                    continue
+                self._positions.setdefault(key, []).append(position)
+                status = self.table._latest.get(key)
+                if status is not None:
+                    self._set_position(position, status)
+
+    def set(self, key: Any, status: HospitalStatus) -> None:
+        for position in self._positions.get(key, ()):
+            self._set_position(position, status)
+
+    def _set_position(self, position: int, status: HospitalStatus) -> None:
+        # Pushed under `_id` and numeric `id`: the newest counts (as in StatusTable.status_for)
+        if status.reported_at >= self._reported_at[position]:
+            self._free[position] = bool(status.icu_beds)
+            self._reported_at[position] = status.reported_at
+
+    def values(self, positions: np.ndarray, now: Optional[float] = None) -> np.ndarray:
+        """1.0 for the positions currently reporting a free ICU bed, else 0.0 (status_for's freshness rule)."""
+        oldest = (time.time() if now is None else now) - self.table.max_age_seconds
+        return (self._free[positions] & (self._reported_at[positions] >= oldest)).astype(np.float64)
+
+
+class StatusWriter:
+    """
+    Background task flushing a StatusTable to MongoDB (and, with
+    `refresh_seconds`, reading back statuses flushed by other workers).
+    """
+
+    def __init__(self, table: StatusTable, collection, flush_seconds: float = 1.0, batch_size: int = 1000,
+                 refresh_seconds: float = 2.0):
+        self.table = table
+        self.collection = collection
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self.refresh_seconds = refresh_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._watermark: Optional[datetime] = None # Newest reportedAt read back
+        self._last_refresh = 0.0
+        # Metrics
+        self.flushes = 0
+        self.written = 0 # Statuses sent in bulk writes
+        self.matched = 0 # ... that found their hospital with an older status
+        self.refreshed = 0 # Statuses adopted from other workers
+        self.errors = 0
+        self.last_flush_ms: Optional[float] = None
+
+    async def ensure_index(self) -> None:
+        """Index behind the read-back of other workers' statuses."""
+        await self.collection.create_index(f"{STATUS_FIELD}.reportedAt")
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="status-writer")
+
+    async def stop(self) -> None:
+        """Stops the task after writing whatever is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except PyMongoError as err:
+            logger.error(f"Failed to flush {self.table.pending} live statuses on shutdown: {err}")
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def flush(self) -> int:
+        """Writes the statuses pending when called, `batch_size` per bulk_write; returns how many were sent."""
+        sent = 0
+        remaining = self.table.pending # Statuses arriving during the writes wait for the next flush
+        while remaining > 0 and self.table.pending:
+            batch = self.table.take_pending(min(self.batch_size, remaining))
+            remaining -= len(batch)
+            # Only overwrite an older status: another worker may have flushed a newer one for the same hospital
+            requests = [UpdateOne({**document_filter(key),
+                                   "$or": [{f"{STATUS_FIELD}.reportedAt": {"$lt": document["reportedAt"]}},
+                                           {f"{STATUS_FIELD}.reportedAt": {"$exists": False}}]},
+                                  {"$set": {STATUS_FIELD: document}})
+                        for key, document in ((key, status.to_document()) for key, status in batch.items())]
+            # Region collections send each write to its hospital's region only
+            routing = ({"keys": [routing_key(key) for key in batch]}
+                       if getattr(self.collection, "routes_writes", False) else {})
+            start = time.perf_counter()
+            try:
+                result = await self.collection.bulk_write(requests, ordered=False, **routing)
+            except PyMongoError:
+                self.table.restore_pending(batch)
+                raise
+            self.last_flush_ms = (time.perf_counter() - start) * 1000
+            self.flushes += 1
+            self.written += len(requests)
+            self.matched += result.matched_count
+            sent += len(requests)
+        return sent
+
+    async def refresh(self) -> int:
+        """Adopts statuses other workers flushed since the last read; returns how many were newer."""
+        query: Dict[str, Any] = {f"{STATUS_FIELD}.reportedAt": {"$exists": True}}
+        if self._watermark is not None:
+            query = {f"{STATUS_FIELD}.reportedAt": {"$gte": self._watermark - timedelta(seconds=REFRESH_OVERLAP_SECONDS)}}
+        docs = await self.collection.find(query, {"_id": 1, STATUS_FIELD: 1}).to_list(None)
+        adopted = 0
+        for doc in docs:
+            status = HospitalStatus.from_document(doc.get(STATUS_FIELD) or {})
+            if status is None:
+                continue
+            adopted += self.table.merge(doc["_id"], status)
+            reported_at = doc[STATUS_FIELD]["reportedAt"]
+            self._watermark = reported_at if self._watermark is None else max(self._watermark, reported_at)
+        self.refreshed += adopted
+        return adopted
+
+    async def step(self) -> None:
+        await self.flush()
+        if self.refresh_seconds and time.monotonic() - self._last_refresh >= self.refresh_seconds:
+            self._last_refresh = time.monotonic()
+            await self.refresh()
+            self.table.prune()
+
+    async def _run(self) -> None:
+        logger.info(f"Live status writer started (flush every {self.flush_seconds}s, up to {self.batch_size} per batch).")
+        failures = 0
+        while True:
+            try:
+                await asyncio.sleep(self.flush_seconds if not failures else
+                                    RETRY_BACKOFF_SECONDS[min(failures - 1, len(RETRY_BACKOFF_SECONDS) - 1)])
+                await self.step()
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as err:
+                self.errors += 1
+                failures += 1
+                logger.error(f"Live status flush failed ({err}); {self.table.pending} statuses pending, retrying.")
+            except Exception as err:
+                self.errors += 1
+                failures += 1
+                logger.error(f"Unexpected error in live status writer: {err}", exc_info=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "written": self.written,
+            # Updates replaced by a newer one from the same hospital before they were flushed
+            "coalesced": max(0, self.table.updates - self.written - self.table.pending),
+            "matched": self.matched,
+            "flushes": self.flushes,
+            "last_flush_ms": None if self.last_flush_ms is None else round(self.last_flush_ms, 3),
+            "refreshed": self.refreshed,
+            "errors": self.errors,
+        }
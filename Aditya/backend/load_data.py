@@ -1,10 +1,48 @@
 # load_data.py
+"""
+Streaming bulk loader for the hospitals collection.
+
+Reads hospital records from CSV, NDJSON or GeoJSON files of any size,
+validates each one against the API's GeoLocation / HospitalResponse schema and
+upserts them (keyed on `id`) with unordered `bulk_write` batches. Memory use
+stays constant regardless of file size: records are streamed one at a time
+and at most one batch is held in memory.
+
+Usage:
+    python load_data.py                                   # loads data/hospitals_sample.ndjson
+    python load_data.py facilities.csv more.geojson --batch-size 5000
+    python load_data.py india.ndjson --region-precision 3 # one collection per geohash cell (regions.py)
+
+Input formats (chosen from the file extension, or with --format):
+- .ndjson / .jsonl: one hospital document per line (same shape as the API)
+- .csv:     columns id, name, lon/longitude, lat/latitude, hasICU, specialists,
+            equipment (lists separated by ';' or '|')
+- .geojson: a FeatureCollection (or one Feature per line) of Point features;
+            hospital fields come from each feature's properties
+
+With --region-precision (or HOSPITAL_REGION_PRECISION) each record goes to
+the collection of its geohash cell (`hospitals_te7`, ...), batched per cell.
+A hospital re-loaded after moving to another cell would be left in its old
+cell too: those older copies are deleted at the end of the load.
+"""
+
 import os
+import csv
+import json
+import time
 import logging
-from pymongo import MongoClient, GEOSPHERE
-from pymongo.errors import ConnectionFailure, OperationFailure
+import argparse
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from pymongo import MongoClient, GEOSPHERE, UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, OperationFailure
+from pydantic import ValidationError
 from dotenv import load_dotenv
 
+from schemas import HospitalResponse
+from regions import REGION_PREFIX, collection_name, region_names, region_of
+
 # --- Logging Setup ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -15,270 +53,320 @@ load_dotenv() # Load variables from .env file
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = os.getenv("DB_NAME", "chetakDB") # Use default if not set
 COLLECTION_NAME = "hospitals"
+REGION_PRECISION = int(os.getenv("HOSPITAL_REGION_PRECISION", "0")) # Same as main.py; 0 = the single collection
+DEFAULT_DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "hospitals_sample.ndjson")
+DEFAULT_BATCH_SIZE = 1000
+READ_CHUNK_SIZE = 1 << 16 # Bytes read at a time when streaming a GeoJSON FeatureCollection
+
+
+class InvalidRecord(ValueError):
+    """A source record that can't be turned into a valid hospital document."""
+
+
+# --- Readers (each yields raw records one at a time) ---
+
+def read_ndjson(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def _split_list(value: Optional[str]) -> List[str]:
+    if not value:
+        return []
+    return [item.strip() for item in value.replace("|", ";").split(";") if item.strip()]
+
+
+def _parse_bool(value: Any) -> bool:
+    """Booleans as written in CSV cells or JSON properties ("false", "0" and "no" are False)."""
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1", "yes", "y")
+    return bool(value)
+
+
+def read_csv(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            lon = row.get("lon") or row.get("longitude")
+            lat = row.get("lat") or row.get("latitude")
+            yield {
+                "id": row.get("id"),
+                "name": row.get("name"),
+                "location": {"type": "Point", "coordinates": [lon, lat]},
+                "hasICU": _parse_bool(row.get("hasICU") or ""),
+                "specialists": _split_list(row.get("specialists")),
+                "equipment": _split_list(row.get("equipment")),
+            }
+
+
+def _feature_to_record(feature: Dict[str, Any]) -> Dict[str, Any]:
+    return {**(feature.get("properties") or {}), "location": feature.get("geometry")}
+
+
+def read_geojson(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Streams features out of a GeoJSON FeatureCollection without loading the
+    whole file: finds the "features" array and decodes one feature at a time.
+    Newline-delimited features (one Feature object per line) work too.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as f:
+        buffer = f.read(READ_CHUNK_SIZE)
+        start = buffer.find('"features"')
+        if start == -1:
+            # No FeatureCollection wrapper: treat it as newline-delimited features
+            f.seek(0)
+            for line in f:
+                line = line.strip().lstrip("\x1e") # RFC 8142 record separator
+                if line:
+                    yield _feature_to_record(json.loads(line))
+            return
+
+        buffer = buffer[buffer.index("[", start) + 1:]
+        while True:
+            buffer = buffer.lstrip().lstrip(",").lstrip()
+            if buffer.startswith("]"):
+                return
+            try:
+                feature, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                chunk = f.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    raise InvalidRecord(f"Truncated GeoJSON feature array in {path}")
+                buffer += chunk
+                continue
+            yield _feature_to_record(feature)
+            buffer = buffer[end:]
+            if len(buffer) < READ_CHUNK_SIZE:
+                buffer += f.read(READ_CHUNK_SIZE)
+
+
+READERS = {"ndjson": read_ndjson, "csv": read_csv, "geojson": read_geojson}
+EXTENSIONS = {".ndjson": "ndjson", ".jsonl": "ndjson", ".csv": "csv", ".geojson": "geojson", ".json": "geojson"}
+
+
+def read_records(path: str, fmt: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    fmt = fmt or EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if fmt not in READERS:
+        raise ValueError(f"Can't tell the format of '{path}'; pass --format ndjson|csv|geojson")
+    return READERS[fmt](path)
+
+
+# --- Validation ---
+
+def normalize_record(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validates a raw record against the HospitalResponse / GeoLocation schema and
+    returns the document to store. Specialists/equipment are lower-cased, since
+    searches compare lower-case strings.
+    """
+    try:
+        location = raw.get("location") or {}
+        coordinates = [float(c) for c in location.get("coordinates") or []]
+        record = {
+            "_id": None, # Assigned by MongoDB
+            "id": int(raw["id"]),
+            "name": str(raw["name"]).strip(),
+            "location": {"type": location.get("type", "Point"), "coordinates": coordinates},
+            "hasICU": _parse_bool(raw.get("hasICU", False)),
+            "specialists": [str(s).strip().lower() for s in raw.get("specialists") or []],
+            "equipment": [str(e).strip().lower() for e in raw.get("equipment") or []],
+        }
+        hospital = HospitalResponse.model_validate(record)
+    except (KeyError, TypeError, ValueError, ValidationError) as err:
+        raise InvalidRecord(str(err).splitlines()[0]) from err
+
+    if not hospital.name:
+        raise InvalidRecord("Empty hospital name")
+    return hospital.model_dump(by_alias=True, exclude={"mongo_id", "distance_km"})
+
+
+# --- Bulk Writer ---
+
+class LoadStats:
+    def __init__(self):
+        self.read = 0
+        self.invalid = 0
+        self.upserted = 0
+        self.modified = 0
+        self.matched = 0
+        self.write_errors = 0
+        self.regions = 0 # Region collections written (region_precision)
+        self.started = time.perf_counter()
+
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.read / elapsed if elapsed > 0 else 0.0
+
+    def log_progress(self) -> None:
+        logger.info(f"Progress: {self.read} records read ({self.invalid} invalid), {self.upserted} inserted, "
+                    f"{self.modified} updated, {self.matched - self.modified} unchanged - {self.rate():.0f} records/s")
+
+
+def flush(collection, operations: List[UpdateOne], stats: LoadStats) -> None:
+    """Writes one batch of upserts (unordered: one bad document doesn't stop the rest)."""
+    if not operations:
+        return
+    try:
+        result = collection.bulk_write(operations, ordered=False)
+        details = result.bulk_api_result
+    except BulkWriteError as bwe:
+        details = bwe.details
+        stats.write_errors += len(details.get("writeErrors", []))
+        logger.error(f"{len(details.get('writeErrors', []))} write errors in batch, "
+                     f"first: {details['writeErrors'][0].get('errmsg') if details.get('writeErrors') else 'n/a'}")
+    stats.upserted += details.get("nUpserted", 0)
+    stats.modified += details.get("nModified", 0)
+    stats.matched += details.get("nMatched", 0)
+    operations.clear()
+
+
+def upsert_operation(document: Dict[str, Any]) -> UpdateOne:
+    # updatedAt lets the API's snapshot sync pick up loader writes when it polls instead of using change streams
+    return UpdateOne({"id": document["id"]}, {"$set": document, "$currentDate": {"updatedAt": True}}, upsert=True)
+
+
+def load_files(collection, paths: List[str], fmt: Optional[str] = None,
+               batch_size: int = DEFAULT_BATCH_SIZE, progress_every: int = 10000, region_precision: int = 0) -> LoadStats:
+    """
+    Streams every file into the collection in bounded-size upsert batches.
+    With `region_precision`, `collection` is the database: each record goes to
+    the collection of its region, batched per region, and a region collection's
+    indexes are ensured the first time it is written. Once `batch_size`
+    upserts are pending in total the largest region batch is written, so
+    memory stays bounded however many regions the files cover.
+    """
+    stats = LoadStats()
+    batches: Dict[Optional[str], List[UpdateOne]] = {} # Collection name (None: `collection`) -> pending upserts
+    pending = 0 # Upserts held across every batch
+    targets: Dict[Optional[str], Any] = {None: collection}
+
+    def target(name: Optional[str]):
+        if name not in targets:
+            targets[name] = collection[name]
+            ensure_indexes(targets[name])
+            stats.regions += 1
+        return targets[name]
 
-if not MONGO_URI:
-    logger.critical("FATAL ERROR: MONGO_URI not found in environment variables. Check your .env file.")
-    exit("MONGO_URI not set.")
-
-# --- Hospital Data (Sample - 30 Hospitals: Mumbai & Panvel) ---
-# Note: Capabilities are illustrative examples, not live data.
-# Coordinates format: [Longitude, Latitude]
-hospitals_data = [
-    # --- Mumbai South ---
-    {
-        "id": 1, "name": "Breach Candy Hospital",
-        "location": {"type": "Point", "coordinates": [72.8045, 18.9645]},
-        "hasICU": True,
-        "specialists": ["cardiologist", "neurologist", "oncologist", "general_surgeon", "obstetrician", "emergency"],
-        "equipment": ["mri", "ct_scanner", "cardiac_monitor", "ventilator", "defibrillator", "ecg", "ultrasound", "x_ray"]
-    },
-    {
-        "id": 2, "name": "Jaslok Hospital",
-        "location": {"type": "Point", "coordinates": [72.8070, 18.9680]},
-        "hasICU": True,
-        "specialists": ["cardiologist", "neurologist", "orthopedic", "pulmonologist", "general_surgeon", "emergency", "pediatrician"],
-        "equipment": ["mri", "ct_scanner", "ventilator", "dialysis_machine", "cardiac_monitor", "defibrillator", "x_ray", "ecg"]
-    },
-    {
-        "id": 3, "name": "Sir H. N. Reliance Foundation Hospital",
-        "location": {"type": "Point", "coordinates": [72.8185, 18.9550]},
-        "hasICU": True,
-        "specialists": ["cardiologist", "neurologist", "orthopedic", "oncologist", "emergency", "general_surgeon"],
-        "equipment": ["mri", "ct_scanner", "pet_scanner", "ventilator", "cardiac_monitor", "defibrillator", "x_ray"]
-    },
-    {
-        "id": 4, "name": "Wockhardt Hospitals, South Mumbai",
-        "location": {"type": "Point", "coordinates": [72.8250, 18.9605]},
-        "hasICU": True,
-        "specialists": ["cardiologist", "neurologist", "orthopedic", "emergency", "general_surgeon"],
-        "equipment": ["ct_scanner", "cardiac_monitor", "ventilator", "defibrillator", "x_ray", "ultrasound"]
-    },
-    # --- Mumbai Central / Parel ---
-    {
-        "id": 5, "name": "KEM Hospital (King Edward Memorial)",
-        "location": {"type": "Point", "coordinates": [72.8390, 19.0000]}, # Approx location
-        "hasICU": True,
-        "specialists": ["general", "emergency", "cardiologist", "neurologist", "orthopedic", "pediatrician", "obstetrician", "general_surgeon", "trauma_surgeon"],
-        "equipment": ["ct_scanner", "x_ray", "ultrasound", "ventilator", "defibrillator", "cardiac_monitor", "ecg"]
-    },
-    {
-        "id": 6, "name": "Tata Memorial Hospital (Cancer)",
-        "location": {"type": "Point", "coordinates": [72.8400, 19.0020]}, # Approx location
-        "hasICU": True, # Specialized ICU likely
-        "specialists": ["oncologist", "general_surgeon", "radiologist"], # Primarily cancer focused
-        "equipment": ["ct_scanner", "mri", "pet_scanner", "radiotherapy", "x_ray", "ventilator"]
-    },
-    {
-        "id": 7, "name": "Global Hospitals, Parel",
-        "location": {"type": "Point", "coordinates": [72.8430, 19.0080]},
-        "hasICU": True,
-        "specialists": ["cardiologist", "neurologist", "gastroenterologist", "transplant_surgeon", "emergency"],
-        "equipment": ["mri", "ct_scanner", "ventilator", "cardiac_monitor", "defibrillator", "endoscopy", "x_ray"]
-    },
-    {
-        "id": 8, "name": "Bai Jerbai Wadia Hospital For Children",
-        "location": {"type": "Point", "coordinates": [72.8410, 19.0035]}, # Approx location
-        "hasICU": True, # Pediatric ICU (NICU/PICU)
-        "specialists": ["pediatrician", "pediatric_surgeon", "neonatologist", "pediatric_cardiologist"],
-        "equipment": ["pediatric_ventilator", "incubator", "x_ray", "ultrasound", "ecg"]
-    },
-     # --- Mumbai Suburbs (Bandra/Andheri/Vile Parle) ---
-    {
-        "id": 9, "name": "Lilavati Hospital & Research Centre",
-        "location": {"type": "Point", "coordinates": [72.8330, 19.0570]},
-        "hasICU": True,
-        "specialists": ["cardiologist", "neurologist", "orthopedic", "general_surgeon", "emergency", "obstetrician"],
-        "equipment": ["mri", "ct_scanner", "ventilator", "cardiac_monitor", "defibrillator", "x_ray", "ultrasound"]
-    },
-    {
-        "id": 10, "name": "Nanavati Max Super Speciality Hospital",
-        "location": {"type": "Point", "coordinates": [72.8430, 19.0980]},
-        "hasICU": True,
-        "specialists": ["cardiologist", "neurologist", "orthopedic", "oncologist", "general_surgeon", "emergency"],
-        "equipment": ["mri", "ct_scanner", "pet_scanner", "ventilator", "cardiac_monitor", "defibrillator", "x_ray"]
-    },
-    {
-        "id": 11, "name": "Holy Family Hospital, Bandra",
-        "location": {"type": "Point", "coordinates": [72.8305, 19.0620]},
-        "hasICU": True,
-        "specialists": ["general", "emergency", "cardiologist", "obstetrician", "pediatrician", "orthopedic"],
-        "equipment": ["ct_scanner", "x_ray", "ultrasound", "ventilator", "defibrillator", "cardiac_monitor"]
-    },
-    {
-        "id": 12, "name": "Kokilaben Dhirubhai Ambani Hospital",
-        "location": {"type": "Point", "coordinates": [72.8380, 19.1130]}, # Andheri West
-        "hasICU": True,
-        "specialists": ["cardiologist", "neurologist", "orthopedic", "oncologist", "general_surgeon", "emergency", "pediatrician"],
-        "equipment": ["mri", "ct_scanner", "ventilator", "cardiac_monitor", "defibrillator", "x_ray", "robotics"]
-    },
-    {
-        "id": 13, "name": "Cooper Hospital (RN Cooper Municipal)",
-        "location": {"type": "Point", "coordinates": [72.8395, 19.1050]}, # Vile Parle
-        "hasICU": True,
-        "specialists": ["general", "emergency", "orthopedic", "general_surgeon", "obstetrician"],
-        "equipment": ["ct_scanner", "x_ray", "ultrasound", "ventilator", "defibrillator", "cardiac_monitor"]
-    },
-     # --- Mumbai Suburbs (Further North - Goregaon/Malad/Borivali) ---
-    {
-        "id": 14, "name": "SRV Hospitals - Goregaon",
-        "location": {"type": "Point", "coordinates": [72.8490, 19.1600]},
-        "hasICU": True,
-        "specialists": ["orthopedic", "neurologist", "cardiologist", "emergency", "general_surgeon"],
-        "equipment": ["ct_scanner", "x_ray", "ventilator", "cardiac_monitor", "defibrillator", "ultrasound"]
-    },
-     {
-        "id": 15, "name": "Cloudnine Hospital, Malad",
-        "location": {"type": "Point", "coordinates": [72.8410, 19.1850]},
-        "hasICU": False, # Primarily Maternity/Pediatric non-critical? Check specific services. Assume NICU maybe, not general ICU.
-        "specialists": ["obstetrician", "pediatrician", "neonatologist"],
-        "equipment": ["fetal_monitor", "obstetric_ultrasound", "incubator", "ultrasound"]
-    },
-     {
-        "id": 16, "name": "Apex Hospitals Borivali",
-        "location": {"type": "Point", "coordinates": [72.8560, 19.2290]},
-        "hasICU": True,
-        "specialists": ["cardiologist", "general_surgeon", "orthopedic", "emergency", "general"],
-        "equipment": ["ct_scanner", "x_ray", "ultrasound", "ventilator", "defibrillator", "cardiac_monitor"]
-    },
-     {
-        "id": 17, "name": "Karuna Hospital, Borivali West",
-        "location": {"type": "Point", "coordinates": [72.8480, 19.2250]},
-        "hasICU": True,
-        "specialists": ["general", "emergency", "obstetrician", "orthopedic"],
-        "equipment": ["x_ray", "ultrasound", "ventilator", "defibrillator", "ecg"]
-    },
-    # --- Mumbai Suburbs (Eastern - Mulund/Thane side) ---
-     {
-        "id": 18, "name": "Fortis Hospital, Mulund",
-        "location": {"type": "Point", "coordinates": [72.9500, 19.1750]},
-        "hasICU": True,
-        "specialists": ["cardiologist", "neurologist", "orthopedic", "oncologist", "emergency", "transplant_surgeon"],
-        "equipment": ["mri", "ct_scanner", "ventilator", "cardiac_monitor", "defibrillator", "ecg", "x_ray"]
-    },
-     {
-        "id": 19, "name": "Jupiter Hospital, Thane",
-        "location": {"type": "Point", "coordinates": [72.9700, 19.1890]}, # Thane is adjacent
-        "hasICU": True,
-        "specialists": ["cardiologist", "neurologist", "orthopedic", "emergency", "general_surgeon", "pediatrician"],
-        "equipment": ["mri", "ct_scanner", "ventilator", "cardiac_monitor", "defibrillator", "x_ray", "ultrasound"]
-    },
-     {
-        "id": 20, "name": "Hiranandani Hospital, Powai",
-        "location": {"type": "Point", "coordinates": [72.9150, 19.1180]},
-        "hasICU": True,
-        "specialists": ["general", "emergency", "cardiologist", "neurologist", "orthopedic", "obstetrician"],
-        "equipment": ["mri", "ct_scanner", "ventilator", "cardiac_monitor", "defibrillator", "x_ray", "ultrasound"]
-    },
-    {
-        "id": 21, "name": "Godrej Memorial Hospital, Vikhroli",
-        "location": {"type": "Point", "coordinates": [72.9300, 19.0950]},
-        "hasICU": True,
-        "specialists": ["general", "emergency", "orthopedic", "obstetrician", "pediatrician"],
-        "equipment": ["x_ray", "ultrasound", "ventilator", "defibrillator", "cardiac_monitor"]
-    },
-    {
-        "id": 22, "name": "Criticzre Asia Multispeciality Hospital, Kurla",
-        "location": {"type": "Point", "coordinates": [72.8850, 19.0700]}, # Approx location
-        "hasICU": True,
-        "specialists": ["general", "emergency", "cardiologist", "neurologist", "orthopedic"],
-        "equipment": ["ct_scanner", "ventilator", "cardiac_monitor", "defibrillator", "x_ray", "ultrasound"]
-    },
-
-    # --- Panvel Area ---
-    {
-        "id": 23, "name": "Lifeline Hospital, Panvel",
-        "location": {"type": "Point", "coordinates": [73.1080, 18.9950]},
-        "hasICU": True,
-        "specialists": ["general", "emergency", "orthopedic", "cardiologist", "general_surgeon", "obstetrician"],
-        "equipment": ["ct_scanner", "x_ray", "ultrasound", "ventilator", "defibrillator", "cardiac_monitor"]
-    },
-    {
-        "id": 24, "name": "Ashtvinayak Hospital, Panvel",
-        "location": {"type": "Point", "coordinates": [73.1150, 18.9890]},
-        "hasICU": True,
-        "specialists": ["general", "emergency", "pediatrician", "obstetrician", "orthopedic"],
-        "equipment": ["x_ray", "ultrasound", "ventilator", "defibrillator", "ecg", "pediatric_ventilator"]
-    },
-    {
-        "id": 25, "name": "Gandhi Hospital, Panvel",
-        "location": {"type": "Point", "coordinates": [73.1190, 18.9900]}, # Approx location
-        "hasICU": True, # Assume general ICU
-        "specialists": ["general", "emergency", "general_surgeon", "orthopedic"],
-        "equipment": ["x_ray", "ultrasound", "ecg", "ventilator", "defibrillator"]
-    },
-    {
-        "id": 26, "name": "Parulekar Hospital, Panvel",
-        "location": {"type": "Point", "coordinates": [73.1100, 18.9910]}, # Approx location
-        "hasICU": False, # Assuming smaller setup
-        "specialists": ["general", "obstetrician"],
-        "equipment": ["ultrasound", "ecg", "x_ray"]
-    },
-    {
-        "id": 27, "name": "Sukham Hospital, Panvel",
-        "location": {"type": "Point", "coordinates": [73.1165, 18.9960]}, # Approx location
-        "hasICU": False, # Assuming smaller clinic/nursing home
-        "specialists": ["general"],
-        "equipment": ["ecg", "ultrasound"]
-    },
-    {
-        "id": 28, "name": "Reliance Hospital Navi Mumbai, Koparkhairane",
-        "location": {"type": "Point", "coordinates": [73.0050, 19.1250]}, # Navi Mumbai, near Panvel axis
-        "hasICU": True,
-        "specialists": ["cardiologist", "neurologist", "orthopedic", "general_surgeon", "emergency"],
-        "equipment": ["mri", "ct_scanner", "ventilator", "cardiac_monitor", "defibrillator", "x_ray"]
-    },
-     {
-        "id": 29, "name": "Apollo Hospitals, Navi Mumbai (Belapur)",
-        "location": {"type": "Point", "coordinates": [73.0350, 19.0220]}, # Navi Mumbai, near Panvel axis
-        "hasICU": True,
-        "specialists": ["cardiologist", "neurologist", "orthopedic", "oncologist", "transplant_surgeon", "emergency"],
-        "equipment": ["mri", "ct_scanner", "pet_scanner", "ventilator", "cardiac_monitor", "defibrillator", "x_ray"]
-    },
-     {
-        "id": 30, "name": "MGM Hospital & Research Center, Kamothe",
-        "location": {"type": "Point", "coordinates": [73.0750, 19.0200]}, # Kamothe, near Panvel
-        "hasICU": True,
-        "specialists": ["general", "emergency", "cardiologist", "neurologist", "orthopedic", "pediatrician", "obstetrician"],
-        "equipment": ["ct_scanner", "mri", "ventilator", "defibrillator", "cardiac_monitor", "x_ray", "ultrasound"]
-    },
-]
-
-# --- Database Operations ---
-client: MongoClient | None = None # Type hint for client
-try:
-    logger.info("Connecting to MongoDB Atlas...")
-    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-    # Ping to confirm connection
-    client.admin.command('ping')
-    logger.info("MongoDB connection successful.")
-
-    db = client[DB_NAME]
-    collection = db[COLLECTION_NAME]
-    logger.info(f"Using database '{DB_NAME}', collection '{COLLECTION_NAME}'.")
-
-    # Check if collection is empty before inserting
-    if collection.count_documents({}) == 0:
-        logger.info("Collection is empty. Inserting new hospital data...")
-        result = collection.insert_many(hospitals_data)
-        logger.info(f"Successfully inserted {len(result.inserted_ids)} hospital documents.")
-    else:
-         logger.warning("Collection already contains data. Skipping insertion.")
-         logger.info("Consider manually clearing the collection in Atlas or via script if you want to reload.")
-
-    # --- Ensure Geospatial Index ---
-    # This is idempotent - safe to run even if index exists
+    for path in paths:
+        logger.info(f"Loading hospitals from '{path}'...")
+        for raw in read_records(path, fmt):
+            stats.read += 1
+            try:
+                document = normalize_record(raw)
+            except InvalidRecord as err:
+                stats.invalid += 1
+                logger.warning(f"Skipping invalid record #{stats.read} in '{path}': {err}")
+                continue
+            name = None
+            if region_precision:
+                lon, lat = document["location"]["coordinates"][:2]
+                name = collection_name(region_of(lat, lon, region_precision))
+            batches.setdefault(name, []).append(upsert_operation(document))
+            pending += 1
+            if pending >= batch_size: # Across regions too: at most one batch is held in memory
+                largest = max(batches, key=lambda n: len(batches[n]))
+                pending -= len(batches[largest])
+                flush(target(largest), batches.pop(largest), stats)
+            if stats.read % progress_every == 0:
+                stats.log_progress()
+    for name, operations in batches.items():
+        flush(target(name), operations, stats)
+    return stats
+
+
+def remove_moved_copies(db) -> int:
+    """
+    Deletes all but the most recently loaded copy of hospitals present in more
+    than one region collection (moved to another cell); returns how many. The
+    copies are found on the server ($unionWith + $group, MongoDB 4.4+).
+    """
+    regions = region_names(db.list_collection_names())
+    if len(regions) < 2:
+        return 0
+
+    def tagged(region: str) -> List[Dict[str, Any]]:
+        return [{"$match": {"id": {"$exists": True}}},
+                {"$project": {"id": 1, "updatedAt": 1, "region": {"$literal": region}}}]
+
+    pipeline = tagged(regions[0]) + [{"$unionWith": {"coll": collection_name(region), "pipeline": tagged(region)}}
+                                     for region in regions[1:]]
+    pipeline += [{"$group": {"_id": "$id", "count": {"$sum": 1},
+                             "copies": {"$push": {"doc": "$_id", "region": "$region", "updatedAt": "$updatedAt"}}}},
+                 {"$match": {"count": {"$gt": 1}}}]
+    removed = 0
+    for group in db[collection_name(regions[0])].aggregate(pipeline, allowDiskUse=True):
+        newest = max(group["copies"], key=lambda copy: copy.get("updatedAt") or datetime.min)
+        for copy in group["copies"]:
+            if copy is not newest:
+                db[collection_name(copy["region"])].delete_one({"_id": copy["doc"]})
+                removed += 1
+    return removed
+
+
+def ensure_indexes(collection) -> None:
+    """2dsphere index for searches, unique index on `id` so upserts are index lookups."""
     try:
         collection.create_index([("location", GEOSPHERE)])
         logger.info("Successfully created or ensured 2dsphere index on 'location' field.")
+        # Partial: documents created by the Node backend have no numeric `id`
+        collection.create_index("id", unique=True, partialFilterExpression={"id": {"$exists": True}})
+        logger.info("Successfully created or ensured unique index on 'id' field.")
     except OperationFailure as idx_err:
         logger.error(f"Failed to create or ensure index: {idx_err}")
-        # Decide if this is critical - maybe log and continue?
-
-except ConnectionFailure as e:
-    logger.critical(f"Could not connect to MongoDB: {e}")
-except Exception as e:
-    logger.error(f"An unexpected error occurred: {e}", exc_info=True)
-finally:
-    if client:
-        client.close()
-        logger.info("MongoDB connection closed.")
\ No newline at end of file
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", default=[DEFAULT_DATA_FILE], help="Input files (CSV / NDJSON / GeoJSON)")
+    parser.add_argument("--format", choices=sorted(READERS), help="Input format (default: from file extension)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Upserts per bulk_write batch")
+    parser.add_argument("--progress-every", type=int, default=10000, help="Log progress every N records")
+    parser.add_argument("--region-precision", type=int, default=REGION_PRECISION, choices=range(0, 7),
+                        help="Geohash length of the region collections (0: the single collection)")
+    args = parser.parse_args()
+
+    if not MONGO_URI:
+        logger.critical("FATAL ERROR: MONGO_URI not found in environment variables. Check your .env file.")
+        exit("MONGO_URI not set.")
+
+    # --- Database Operations ---
+    client: MongoClient | None = None # Type hint for client
+    try:
+        logger.info("Connecting to MongoDB...")
+        client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+        # Ping to confirm connection
+        client.admin.command('ping')
+        logger.info("MongoDB connection successful.")
+
+        db = client[DB_NAME]
+        if args.region_precision:
+            logger.info(f"Using database '{DB_NAME}', region collections '{REGION_PREFIX}<geohash>' "
+                        f"(precision {args.region_precision}).")
+            stats = load_files(db, args.paths, args.format, args.batch_size, args.progress_every, args.region_precision)
+            moved = remove_moved_copies(db)
+            logger.info(f"Wrote {stats.regions} region collections; removed {moved} copies of hospitals that moved region.")
+        else:
+            collection = db[COLLECTION_NAME]
+            logger.info(f"Using database '{DB_NAME}', collection '{COLLECTION_NAME}'.")
+            ensure_indexes(collection)
+            stats = load_files(collection, args.paths, args.format, args.batch_size, args.progress_every)
+        elapsed = time.perf_counter() - stats.started
+        logger.info(f"Done: {stats.read} records read in {elapsed:.1f}s ({stats.rate():.0f} records/s), "
+                    f"{stats.invalid} invalid, {stats.upserted} inserted, {stats.modified} updated, "
+                    f"{stats.matched - stats.modified} unchanged, {stats.write_errors} write errors.")
+
+    except ConnectionFailure as e:
+        logger.critical(f"Could not connect to MongoDB: {e}")
+    except Exception as e:
+        logger.error(f"An unexpected error occurred: {e}", exc_info=True)
+    finally:
+        if client:
+            client.close()
+            logger.info("MongoDB connection closed.")
+
+
+if __name__ == "__main__":
+    main()
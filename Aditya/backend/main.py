@@ -1,18 +1,47 @@
 # main.py
 
+import time
+IMPORT_STARTED = time.perf_counter() # Import cost is reported at /metrics (chetak_import_seconds)
 import os
+import asyncio
 import logging
-from fastapi import FastAPI, HTTPException, Query
+import importlib
+from contextlib import nullcontext
+from fastapi import FastAPI, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pymongo import MongoClient, GEOSPHERE
-from pymongo.errors import ConnectionFailure, OperationFailure
+from pymongo import AsyncMongoClient, GEOSPHERE # Native asyncio driver (PyMongo >= 4.9)
+from pymongo.errors import ConnectionFailure, OperationFailure, PyMongoError
 from dotenv import load_dotenv
-from pydantic import BaseModel, Field, field_validator
-# Correct Pydantic V2 imports needed for schema customization
-from pydantic_core import core_schema
-#--------------------------------------------------------
-from typing import List, Optional, Dict, Any, Literal # Import Literal
-from bson import ObjectId # To handle MongoDB ObjectId
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Any, Tuple, AsyncIterator, TYPE_CHECKING
+from schemas import HospitalResponse # Shared hospital models
+from geo_index import HospitalIndex # Optional in-process search engine
+from hospital_snapshot import DEFAULT_SNAPSHOT_DIR, SnapshotIndex, published_generation # Shared multi-worker snapshot
+from search_cache import LastResults, SearchCache # Response cache for repeated nearby searches, last results for shed ones
+from geo_index import EARTH_RADIUS_M, RESULT_FIELDS, SearchRadius, doc_key, expansion_radii
+from pagination import InvalidCursor, PageCursor, decode_cursor, encode_cursor, search_fingerprint # Opaque page cursors
+from ranking import rank_many # Vectorized distance ranking for batch searches
+from hospital_sync import HospitalSync, open_source # Change-feed sync of the in-process snapshot
+from fast_json import HospitalEncoder, json_response # Pre-serialized hospital JSON for search responses
+from hospital_tiles import TileSet # Precomputed nearest-suitable-hospital tiles per condition profile
+from triage import assess # Server-side analyzePatientCondition (condition / transcript -> needs)
+from live_status import Availability, IcuBedColumn, StatusTable, StatusWriter, document_filter, hospital_key, load_status_keys, status_key_matches # Live bed / ICU availability pushed by hospitals
+from condition_profiles import CONDITION_PROFILES
+from scoring import (CONDITION_WEIGHTS, DEFAULT_WEIGHTS, ScoreWeights, distance_scores, document_capability_scores,
+                     load_weights, top_scored) # Weighted multi-criteria ranking (rankBy=score)
+import metrics # Prometheus metrics and per-stage search timings
+from metrics import MetricsMiddleware, MongoPoolListener, Sampled, observe_results, observe_seconds, observe_stage
+from readiness import StartupTracker # Liveness / readiness and cold-start timings
+from admission import AdmissionController, Shed, request_priority # Priority admission control under surge load
+from regions import REGION_PREFIX, RegionCollections # Region-partitioned hospital collections (HOSPITAL_REGION_PRECISION)
+import orjson
+import numpy as np
+from itertools import islice
+# Imported on first use / during warm-up (they pull in scipy): allocation (capacity-aware patient -> hospital
+# assignment, /api/allocate) and road_eta (offline road-network drive times, rankBy=eta)
+if TYPE_CHECKING:
+    from road_eta import EtaRanker
 
 # --- Basic Logging Setup ---
 # Configure logging format and level
@@ -28,11 +57,105 @@ load_dotenv() # Load environment variables from .env file
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = os.getenv("DB_NAME", "chetakDB") # Default database name if not in .env
 COLLECTION_NAME = "hospitals"
+# Region partitioning: hospitals stored one collection per geohash cell of this length (hospitals_te7, ...; see
+# regions.py, load_data.py --region-precision), searches routed to the cells within their radius; 0 = one collection
+HOSPITAL_REGION_PRECISION = int(os.getenv("HOSPITAL_REGION_PRECISION", "0"))
+REGION_REFRESH_SECONDS = float(os.getenv("REGION_REFRESH_SECONDS", "60")) # Re-lists region collections (new cells loaded)
+# Search engine: "mongo" runs $geoNear on the database, "memory" answers from an
+# in-process index loaded at startup, "shared" from the memory-mapped snapshot
+# published by snapshot_loader.py (one copy for all workers on the host).
+# "memory" and "shared" fall back to "mongo" while their index isn't loaded
+SEARCH_ENGINE = os.getenv("SEARCH_ENGINE", "mongo").lower()
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", DEFAULT_SNAPSHOT_DIR) # Written by snapshot_loader.py (SEARCH_ENGINE=shared)
+SNAPSHOT_POLL_INTERVAL_SECONDS = float(os.getenv("SNAPSHOT_POLL_INTERVAL_SECONDS", "1")) # Checks for a new generation
+SEARCH_RADIUS_METERS = 50000 # Max search radius (50 km)
+MAX_RESULTS = 15 # Max hospitals returned per search
+# radiusMode=adaptive: start small and double the radius until MAX_RESULTS hospitals are found or the ceiling is hit
+ADAPTIVE_START_RADIUS_METERS = float(os.getenv("ADAPTIVE_START_RADIUS_METERS", "2000"))
+ADAPTIVE_MAX_RADIUS_METERS = float(os.getenv("ADAPTIVE_MAX_RADIUS_METERS", "200000"))
+# Browsing beyond the first results: cursor pages (/api/find-suitable/page) and NDJSON streaming (/stream)
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "100"))
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "100")) # Documents per MongoDB cursor batch while streaming
+MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", "500")) # Max patients per batch search request
+# Beds assumed for hospitals without an emergencyCapacity.availableBeds value (allocation mode)
+DEFAULT_HOSPITAL_CAPACITY = int(os.getenv("DEFAULT_HOSPITAL_CAPACITY", "10"))
+HOSPITAL_PROJECTION = {field: 1 for field in RESULT_FIELDS} # Fields loaded for in-process work
+# Search cache: nearby requests with the same filters share one candidate lookup
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "10000")) # Max cached (cell, filters) entries
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "30"))
+SEARCH_CACHE_CELL_DEG = float(os.getenv("SEARCH_CACHE_CELL_DEG", "0.005")) # ~550 m grid cells
+SEARCH_CACHE_CANDIDATES = MAX_RESULTS * 4 # Candidates stored per entry
+# Connection pool tuning: each concurrent search holds one pooled connection for its round-trip
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+# Kept warm so surges don't pay for TLS handshakes; shared-snapshot workers rarely query, so they keep none
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0" if SEARCH_ENGINE == "shared" else "10"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000")) # Fail fast when the pool is exhausted
+# Search responses are assembled from pre-serialized hospital JSON instead of per-request model validation
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "true").lower() == "true"
+# Road-network ETA ranking (rankBy=eta) from a local OSM extract; no routing server involved
+ROAD_GRAPH_FILE = os.getenv("ROAD_GRAPH_FILE") # .osm / .osm.gz / .osm.pbf extract; unset disables rankBy=eta
+ROAD_MAX_ETA_MINUTES = float(os.getenv("ROAD_MAX_ETA_MINUTES", "120")) # Hospitals farther than this count as unreachable
+ROAD_ETA_CELL_DEG = float(os.getenv("ROAD_ETA_CELL_DEG", "0.001")) # ~110 m origin cells share a road node and cached ETAs
+ROAD_ETA_CACHE_SIZE = int(os.getenv("ROAD_ETA_CACHE_SIZE", "20000")) # Max cached origin cells
+ROAD_TREE_CACHE_SIZE = int(os.getenv("ROAD_TREE_CACHE_SIZE", "512")) # Max hospitals with a travel-time tree in memory
+ETA_CANDIDATES = MAX_RESULTS * 4 # Nearest hospitals (straight line) re-ranked by drive time
+# Weighted multi-criteria ranking (rankBy=score, see scoring.py)
+SCORE_WEIGHTS_FILE = os.getenv("SCORE_WEIGHTS_FILE") # JSON per-condition weight overrides; unset uses the built-in weights
+SCORE_CANDIDATES = int(os.getenv("SCORE_CANDIDATES", str(MAX_RESULTS * 20))) # Nearest suitable hospitals scored (MongoDB engine)
+# Snapshot sync: keeps the in-memory index / search cache up to date with writes from the Node backend.
+# "auto" tails a change stream (replica set / Atlas) and falls back to polling updatedAt; "off" disables it
+SNAPSHOT_SYNC = os.getenv("SNAPSHOT_SYNC", "auto").lower() # auto | change_stream | poll | off
+SYNC_POLL_INTERVAL_SECONDS = float(os.getenv("SYNC_POLL_INTERVAL_SECONDS", "2"))
+SYNC_RECONCILE_EVERY = int(os.getenv("SYNC_RECONCILE_EVERY", "30")) # Polls between delete checks (polling mode)
+# Condition-profile tiles written by build_tiles.py (cardiac, stroke, accident, ...); unset disables them
+TILES_DIR = os.getenv("TILES_DIR")
+MAX_TRANSCRIPT_CHARS = int(os.getenv("MAX_TRANSCRIPT_CHARS", "20000")) # Longest description accepted by /api/triage-search
+# Live availability pushed by hospitals (POST /api/hospitals/{id}/status): coalesced per hospital in memory and
+# written to MongoDB in bulk, then read back by the other workers
+LIVE_STATUS_FLUSH_SECONDS = float(os.getenv("LIVE_STATUS_FLUSH_SECONDS", "1")) # Longest delay before an update is written
+LIVE_STATUS_BATCH_SIZE = int(os.getenv("LIVE_STATUS_BATCH_SIZE", "1000")) # Hospitals per bulk_write
+LIVE_STATUS_REFRESH_SECONDS = float(os.getenv("LIVE_STATUS_REFRESH_SECONDS", "2")) # Reads other workers' updates; 0 = off (one worker)
+LIVE_STATUS_MAX_AGE_SECONDS = float(os.getenv("LIVE_STATUS_MAX_AGE_SECONDS", "300")) # Older reports don't count as current
+LIVE_STATUS_MAX_HOSPITALS = int(os.getenv("LIVE_STATUS_MAX_HOSPITALS", "200000")) # Bounds the in-memory status table
+HOSPITAL_STATUS_KEYS_FILE = os.getenv("HOSPITAL_STATUS_KEYS_FILE") # JSON {"<hospital id>": "<key>"}; unset = pushes refused
+# Admission control (admission.py): at most ADMISSION_MAX_CONCURRENT searches run at once, the rest queue per
+# priority class; dispatcher consoles (X-Dispatch-Key header) go ahead of public users and have reserved slots.
+# A search not admitted within its class's queue time is shed: answered with the last results near the caller, or 503
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", str(MONGO_MAX_POOL_SIZE))) # Searches running at once
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "1000")) # Waiting searches, all classes
+ADMISSION_DISPATCH_QUEUE_SECONDS = float(os.getenv("ADMISSION_DISPATCH_QUEUE_SECONDS", "2"))
+ADMISSION_PUBLIC_QUEUE_SECONDS = float(os.getenv("ADMISSION_PUBLIC_QUEUE_SECONDS", "0.25"))
+ADMISSION_DISPATCH_RESERVED = int(os.getenv("ADMISSION_DISPATCH_RESERVED", "1")) # Slots public searches can't take
+if ADMISSION_ENABLED and ADMISSION_MAX_CONCURRENT < 1:
+    raise ValueError(f"ADMISSION_MAX_CONCURRENT (defaults to MONGO_MAX_POOL_SIZE) must be at least 1, "
+                     f"got {ADMISSION_MAX_CONCURRENT}")
+if ADMISSION_ENABLED and ADMISSION_DISPATCH_RESERVED >= ADMISSION_MAX_CONCURRENT:
+    # Public searches need at least one slot
+    logger.warning(f"ADMISSION_DISPATCH_RESERVED={ADMISSION_DISPATCH_RESERVED} leaves no slot for public searches with "
+                   f"ADMISSION_MAX_CONCURRENT={ADMISSION_MAX_CONCURRENT}; reserving {max(0, ADMISSION_MAX_CONCURRENT - 1)}")
+    ADMISSION_DISPATCH_RESERVED = max(0, ADMISSION_MAX_CONCURRENT - 1)
+DISPATCH_API_KEYS = [key.strip() for key in os.getenv("DISPATCH_API_KEYS", "").split(",") if key.strip()] # Comma-separated
+LAST_RESULTS_SIZE = int(os.getenv("LAST_RESULTS_SIZE", "20000")) # Max (cell, filters) entries kept for shed searches
+# Prometheus metrics at /metrics: per-stage search timings, result counts, cache hit ratios, MongoDB pool wait
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "false").lower() == "true" # Per-request stage timings for browser devtools
+# Startup: "background" starts serving at once (/healthz is live, /readyz turns ready once searches can be answered)
+# and connects, creates indexes and warms up in the background, retrying the database until it answers;
+# "blocking" does all of it before the server accepts requests (one connection attempt)
+STARTUP_MODE = os.getenv("STARTUP_MODE", "background").lower() # background | blocking
+READINESS_REQUIRES_WARMUP = os.getenv("READINESS_REQUIRES_WARMUP", "false").lower() == "true" # Also wait for index/tiles/road graph
+# Warm-up search run once startup has loaded everything (primes connections, query plans and caches)
+WARMUP_LAT = float(os.getenv("WARMUP_LAT", "19.0760"))
+WARMUP_LON = float(os.getenv("WARMUP_LON", "72.8777"))
+CONNECT_RETRY_BACKOFF_SECONDS = (0.5, 1, 2, 5, 10, 30)
 
 # --- Pre-startup Checks ---
 if not MONGO_URI:
-    logger.critical("FATAL ERROR: MONGO_URI environment variable not found. Set it in your .env file.")
-    exit("MONGO_URI not set.")
+    # Not fatal: /healthz stays up and /readyz reports it (a shared snapshot can still serve searches)
+    logger.critical("MONGO_URI environment variable not found. Set it in your .env file; searches need the database.")
 
 # --- FastAPI App Initialization ---
 app = FastAPI(
@@ -58,197 +181,433 @@ origins = [
     # e.g., "https://your-netlify-app-name.netlify.app"
 ]
 
+HOSPITAL_SYSTEM_PATH_PREFIX = "/api/hospitals/" # Live status pushes (POST /api/hospitals/{id}/status)
+
+class BrowserCORSMiddleware(CORSMiddleware):
+    """CORS for the browser-facing routes only: hospital systems' routes get no CORS headers, so pages can't call them."""
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http" and scope["path"].startswith(HOSPITAL_SYSTEM_PATH_PREFIX):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
 app.add_middleware(
-    CORSMiddleware,
+    BrowserCORSMiddleware,
     allow_origins=origins,      # Origins allowed to make requests
     allow_credentials=True,   # Allow cookies if needed in future
-    allow_methods=["GET"],      # Only allow GET method for this simple API
+    allow_methods=["GET", "POST"], # GET for searches, POST for batch searches
     allow_headers=["*"],        # Allow all standard headers
+    # Readable by the frontend (radiusMode=adaptive, degraded answers to shed searches)
+    expose_headers=["X-Search-Radius-Km", "X-Radius-Expansions", "X-Degraded", "X-Results-Age-Seconds"],
 )
 
+# --- Metrics Middleware ---
+# Request duration / status per route, and the optional Server-Timing header
+metrics.ENABLED = METRICS_ENABLED
+app.add_middleware(MetricsMiddleware, routes=app.routes, server_timing_header=SERVER_TIMING_HEADER)
+
 # --- Database Connection Management ---
-client: Optional[MongoClient] = None
+client: Optional[AsyncMongoClient] = None
 db = None
 hospitals_collection = None
+hospital_index: Optional[HospitalIndex] = None # Set when SEARCH_ENGINE is "memory" (or "shared": a SnapshotIndex)
+snapshot_watcher: Optional[asyncio.Task] = None # Re-attaches to new shared snapshot generations
+search_cache: Optional[SearchCache] = (
+    SearchCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL_SECONDS, SEARCH_CACHE_CELL_DEG) if SEARCH_CACHE_ENABLED else None
+)
+hospital_sync: Optional[HospitalSync] = None # Started when there is an in-process snapshot to keep fresh
+hospital_encoder: Optional[HospitalEncoder] = HospitalEncoder() if FAST_JSON_RESPONSES else None
+eta_ranker: Optional["EtaRanker"] = None # Set when ROAD_GRAPH_FILE is loaded
+hospital_tiles: Optional[TileSet] = None # Set when TILES_DIR is loaded
+live_status = StatusTable(LIVE_STATUS_MAX_AGE_SECONDS, LIVE_STATUS_MAX_HOSPITALS)
+icu_bed_column = IcuBedColumn(live_status) # Live ICU bed term per hospital_index position (rankBy=score)
+hospital_status_keys: Dict[str, str] = load_status_keys(HOSPITAL_STATUS_KEYS_FILE) if HOSPITAL_STATUS_KEYS_FILE else {}
+indexed_hospitals: Optional[set] = None # _id and numeric id of every indexed hospital (status pushes), built on first use
+score_weights: Dict[str, ScoreWeights] = (load_weights(SCORE_WEIGHTS_FILE) if SCORE_WEIGHTS_FILE
+                                          else {"default": DEFAULT_WEIGHTS, **CONDITION_WEIGHTS})
+# Condition whose weights rankBy=score uses when the request doesn't name one, by normalized filters
+SCORE_PROFILES = {profile.filter_key(): name for name, profile in CONDITION_PROFILES.items()}
+status_writer: Optional[StatusWriter] = None # Flushes live_status once the database is connected
+startup = StartupTracker(IMPORT_STARTED)
+admission_control: Optional[AdmissionController] = (
+    AdmissionController(ADMISSION_MAX_CONCURRENT, ADMISSION_MAX_QUEUE,
+                        {"dispatch": ADMISSION_DISPATCH_QUEUE_SECONDS, "public": ADMISSION_PUBLIC_QUEUE_SECONDS},
+                        ADMISSION_DISPATCH_RESERVED) if ADMISSION_ENABLED else None
+)
+last_results = LastResults(LAST_RESULTS_SIZE) # Degraded answers for shed searches
+startup_task: Optional[asyncio.Task] = None # Background connect + warm-up (STARTUP_MODE=background)
 
-@app.on_event("startup")
-async def startup_db_client():
-    """Connects to MongoDB and ensures necessary indexes on application startup."""
-    global client, db, hospitals_collection
+async def load_hospital_index():
+    """Loads every hospital document into the in-process search index."""
+    global hospital_index, indexed_hospitals
+    try:
+        docs = await hospitals_collection.find({}, HOSPITAL_PROJECTION).to_list(None)
+        hospital_index = HospitalIndex.from_documents(docs)
+        indexed_hospitals = None
+        if search_cache is not None:
+            search_cache.invalidate() # Hospital data changed
+        if hospital_encoder is not None:
+            hospital_encoder.invalidate() # Drop hospitals that no longer exist
+    except Exception as load_err:
+        logger.error(f"Failed to load in-memory hospital index, falling back to MongoDB search: {load_err}", exc_info=True)
+        hospital_index = None
+
+async def attach_shared_snapshot():
+    """Maps the newest snapshot generation published by snapshot_loader.py, if it isn't attached yet."""
+    global hospital_index, indexed_hospitals
+    try:
+        generation = published_generation(SNAPSHOT_DIR)
+        if generation is None:
+            if hospital_index is None:
+                logger.warning(f"No hospital snapshot published in '{SNAPSHOT_DIR}' yet (run snapshot_loader.py); searching MongoDB.")
+            return
+        if isinstance(hospital_index, SnapshotIndex) and hospital_index.generation == generation:
+            return
+        start = time.perf_counter()
+        snapshot = SnapshotIndex.attach(SNAPSHOT_DIR)
+        hospital_index = snapshot # Searches already running keep the generation they started on
+        indexed_hospitals = None
+        if search_cache is not None:
+            search_cache.invalidate()
+        if hospital_encoder is not None:
+            hospital_encoder.invalidate()
+        logger.info(f"Attached hospital snapshot generation {snapshot.generation} ({len(snapshot)} hospitals) "
+                    f"in {(time.perf_counter() - start) * 1000:.1f} ms.")
+    except Exception as attach_err:
+        logger.error(f"Failed to attach hospital snapshot in '{SNAPSHOT_DIR}', keeping the current one: {attach_err}", exc_info=True)
+
+async def watch_shared_snapshot():
+    """Background task: swaps to each new snapshot generation as the loader publishes it."""
+    while True:
+        await asyncio.sleep(SNAPSHOT_POLL_INTERVAL_SECONDS)
+        await attach_shared_snapshot()
+
+async def apply_hospital_changes(upserts: List[Dict[str, Any]], deletes: List[Any]) -> int:
+    """Applies change-feed writes to the in-memory index and drops cached searches; returns hospitals changed."""
+    global indexed_hospitals
+    if SEARCH_ENGINE == "memory" and hospital_index is not None:
+        changed = hospital_index.apply_changes(upserts, deletes)
+        indexed_hospitals = None
+    else:
+        # MongoDB engine: only the cache holds hospital data (a shared snapshot follows the loader's generations)
+        changed = len(upserts) + len(deletes)
+    if hospital_tiles is not None:
+        hospital_tiles.apply_changes(upserts, deletes) # Only the cells the changed hospitals affect
+    if changed and search_cache is not None:
+        search_cache.invalidate()
+    return changed
+
+async def reload_snapshot():
+    """Rebuilds everything the change feed keeps in sync (after the feed lost track of writes)."""
+    if SEARCH_ENGINE == "memory":
+        await load_hospital_index()
+    else:
+        if search_cache is not None:
+            search_cache.invalidate()
+        if hospital_encoder is not None:
+            hospital_encoder.invalidate()
+    if hospital_tiles is not None:
+        await sync_hospital_tiles(hospital_tiles)
+
+async def sync_hospital_tiles(tiles: TileSet):
+    """Applies hospital changes made since the tiles were built (off the event loop)."""
+    if hospital_index is not None:
+        docs = hospital_index.documents()
+    else:
+        docs = await hospitals_collection.find({}, HOSPITAL_PROJECTION).to_list(None)
+    changed = await asyncio.to_thread(tiles.sync_with, docs)
+    logger.info(f"Hospital tiles synced with the collection ({changed} cells updated).")
+
+async def load_hospital_tiles():
+    """Memory-maps the condition-profile tiles and catches them up with the collection."""
+    global hospital_tiles
     try:
-        logger.info(f"Attempting to connect to MongoDB Atlas...")
-        client = MongoClient(MONGO_URI,
-                             serverSelectionTimeoutMS=5000) # Add timeout
-        # Ping the server to verify connection before proceeding
-        client.admin.command('ping')
-        logger.info("MongoDB connection successful (ping successful).")
-
-        db = client[DB_NAME]
-        hospitals_collection = db[COLLECTION_NAME]
+        tiles = await asyncio.to_thread(TileSet.open, TILES_DIR)
+        if tiles.radius_m != SEARCH_RADIUS_METERS:
+            logger.error(f"Tiles in '{TILES_DIR}' were built for a {tiles.radius_m} m radius, not {SEARCH_RADIUS_METERS} m; ignoring them.")
+            return
+        await sync_hospital_tiles(tiles)
+        hospital_tiles = tiles
+        logger.info(f"Loaded hospital tiles for {len(tiles.profiles)} condition profiles "
+                    f"({tiles.grid.rows}x{tiles.grid.cols} cells, built {tiles.built_at}).")
+    except Exception as tiles_err:
+        logger.error(f"Failed to load hospital tiles from '{TILES_DIR}', searching without them: {tiles_err}", exc_info=True)
+        hospital_tiles = None
+
+async def load_eta_ranker():
+    """Loads the road graph and precomputes travel-time trees for the known hospitals (off the event loop)."""
+    global eta_ranker
+    try:
+        from road_eta import EtaRanker, RoadGraph
+        road_graph = await asyncio.to_thread(RoadGraph.load, ROAD_GRAPH_FILE)
+        ranker = EtaRanker(road_graph, max_eta_s=ROAD_MAX_ETA_MINUTES * 60, cell_size_deg=ROAD_ETA_CELL_DEG,
+                           cache_size=ROAD_ETA_CACHE_SIZE, tree_cache_size=ROAD_TREE_CACHE_SIZE)
+        if hospital_index is not None:
+            docs = hospital_index.documents()
+        else:
+            docs = await hospitals_collection.find({}, {"_id": 1, "id": 1, "location": 1}).to_list(None)
+        await asyncio.to_thread(ranker.precompute, docs)
+        eta_ranker = ranker
+    except Exception as road_err:
+        logger.error(f"Failed to load road graph '{ROAD_GRAPH_FILE}', rankBy=eta disabled: {road_err}", exc_info=True)
+        eta_ranker = None
+
+def snapshot_keys():
+    """Keys of the hospitals in the in-memory index (None when searches run on MongoDB)."""
+    return hospital_index.keys() if hospital_index is not None else None
+
+async def open_hospital_sync() -> Optional[HospitalSync]:
+    """Opens the change feed (before the snapshot is loaded, so no write in between is missed)."""
+    if SNAPSHOT_SYNC == "off" or (SEARCH_ENGINE != "memory" and search_cache is None and not TILES_DIR):
+        return None
+    if SEARCH_ENGINE == "shared" and not TILES_DIR:
+        return None # The loader follows the feed; the cache is dropped when a new generation is attached
+    try:
+        source = await open_source(hospitals_collection, SNAPSHOT_SYNC, snapshot_keys, HOSPITAL_PROJECTION,
+                                   interval_seconds=SYNC_POLL_INTERVAL_SECONDS, reconcile_every=SYNC_RECONCILE_EVERY)
+        return HospitalSync(source, apply_hospital_changes, reload_snapshot)
+    except PyMongoError as sync_err:
+        logger.error(f"Failed to open hospital change feed, snapshot will not be kept in sync: {sync_err}", exc_info=True)
+        return None
+
+async def start_status_writer():
+    """Starts writing pushed hospital statuses to MongoDB, after reading the ones already there."""
+    global status_writer
+    writer = StatusWriter(live_status, hospitals_collection, LIVE_STATUS_FLUSH_SECONDS, LIVE_STATUS_BATCH_SIZE,
+                          LIVE_STATUS_REFRESH_SECONDS)
+    if LIVE_STATUS_REFRESH_SECONDS:
+        try:
+            await writer.ensure_index()
+            await writer.refresh() # Statuses reported before this process started
+        except PyMongoError as status_err:
+            logger.error(f"Failed to read live hospital statuses (updates are still written): {status_err}")
+    writer.start()
+    status_writer = writer
+
+def searches_available() -> bool:
+    """True when some engine can answer searches (in-memory index / shared snapshot, or the database)."""
+    return hospital_index is not None or (hospitals_collection is not None and client is not None)
+
+def is_ready() -> bool:
+    ready = searches_available() and (startup.warm or not READINESS_REQUIRES_WARMUP)
+    if ready:
+        startup.mark_ready()
+    return ready
+
+async def connect_database(retry: bool) -> bool:
+    """
+    Connects to MongoDB (retrying with backoff when `retry`) and ensures the
+    2dsphere index; searches can use the database once it returns True.
+    """
+    global client, db, hospitals_collection
+    if not MONGO_URI:
+        startup.errors["connect"] = "MONGO_URI not set"
+        return False
+    logger.info(f"Attempting to connect to MongoDB Atlas...")
+    # The client connects lazily; the ping below is the first round-trip
+    candidate = AsyncMongoClient(MONGO_URI,
+                                 serverSelectionTimeoutMS=5000, # Add timeout
+                                 maxPoolSize=MONGO_MAX_POOL_SIZE,
+                                 minPoolSize=MONGO_MIN_POOL_SIZE,
+                                 maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+                                 waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+                                 event_listeners=[MongoPoolListener()] if METRICS_ENABLED else [])
+    failures = 0
+    start = time.perf_counter()
+    startup.running = "connect"
+    while True:
+        try:
+            # Ping the server to verify connection before proceeding
+            await candidate.admin.command('ping')
+            break
+        except ConnectionFailure as conn_err:
+            startup.errors["connect"] = f"{type(conn_err).__name__}: {conn_err}"
+            if not retry:
+                logger.critical(f"FATAL: Failed to connect to MongoDB: {conn_err}", exc_info=True)
+                await candidate.close()
+                startup.running = None
+                return False
+            delay = CONNECT_RETRY_BACKOFF_SECONDS[min(failures, len(CONNECT_RETRY_BACKOFF_SECONDS) - 1)]
+            failures += 1
+            logger.error(f"Failed to connect to MongoDB ({conn_err}); retrying in {delay}s.")
+            await asyncio.sleep(delay)
+    startup.phases["connect"] = time.perf_counter() - start # Including retries
+    startup.errors.pop("connect", None)
+    startup.running = None
+    logger.info("MongoDB connection successful (ping successful).")
+
+    if HOSPITAL_REGION_PRECISION:
+        collection = RegionCollections(candidate[DB_NAME], HOSPITAL_REGION_PRECISION, REGION_REFRESH_SECONDS)
+        try:
+            await collection.refresh()
+        except PyMongoError as list_err:
+            logger.error(f"Failed to list region collections (retried on the first search): {list_err}")
+        logger.info(f"Using database: '{DB_NAME}', {len(collection.regions)} region collections "
+                    f"('{REGION_PREFIX}<geohash>', precision {HOSPITAL_REGION_PRECISION})")
+    else:
+        collection = candidate[DB_NAME][COLLECTION_NAME]
         logger.info(f"Using database: '{DB_NAME}', collection: '{COLLECTION_NAME}'")
+    # Ensure Geospatial Index exists (idempotent operation)
+    try:
+        with startup.phase("indexes"):
+            await collection.create_index([("location", GEOSPHERE)])
+        logger.info("Ensured 2dsphere index exists on 'location'.")
+    except OperationFailure as idx_err:
+        # Logged, the app continues: the index usually exists already (load_data.py creates it)
+        logger.error(f"Failed to create or ensure index: {idx_err}", exc_info=True)
+    client, db, hospitals_collection = candidate, candidate[DB_NAME], collection
+    return True
 
-        # Ensure Geospatial Index exists (idempotent operation)
+async def warm_up():
+    """Loads the in-process structures, then runs a warm-up search (each phase timed at /readyz)."""
+    global hospital_sync
+    if hospitals_collection is not None:
+        with startup.phase("change_feed"):
+            hospital_sync = await open_hospital_sync()
+        if SEARCH_ENGINE == "memory":
+            with startup.phase("hospital_index"):
+                await load_hospital_index()
+    if TILES_DIR and searches_available():
+        with startup.phase("tiles"):
+            await load_hospital_tiles()
+    if hospital_sync is not None:
+        hospital_sync.start()
+    if hospitals_collection is not None:
+        with startup.phase("live_status"):
+            await start_status_writer()
+    if ROAD_GRAPH_FILE and searches_available():
+        with startup.phase("road_graph"):
+            await load_eta_ranker()
+    with startup.phase("imports"):
+        await asyncio.to_thread(importlib.import_module, "allocation") # scipy, for the first /api/allocate
+    if searches_available():
         try:
-            hospitals_collection.create_index([("location", GEOSPHERE)])
-            logger.info("Ensured 2dsphere index exists on 'location'.")
-        except OperationFailure as idx_err:
-             logger.error(f"Failed to create or ensure index: {idx_err}", exc_info=True)
-             # Depending on the error, you might want to handle it differently
-             # For now, we log it but allow the app to continue if connection was okay
-
-    except ConnectionFailure as conn_err:
-        logger.critical(f"FATAL: Failed to connect to MongoDB: {conn_err}", exc_info=True)
-        # You might want the app to fail startup if DB is essential
-        # raise RuntimeError("Database connection failed on startup") from conn_err
-        client = None # Ensure client is None if connection failed
-        db = None
-        hospitals_collection = None
+            with startup.phase("warmup_search"):
+                # Primes a pooled connection and the query plan (or the index), the search cache and serialized JSON
+                results, _ = await search_hospitals(WARMUP_LAT, WARMUP_LON, True, "cardiologist")
+                if hospital_encoder is not None:
+                    hospital_encoder.encode_results(results)
+        except Exception as warm_err:
+            logger.warning(f"Warm-up search failed (not fatal): {warm_err}")
+
+async def initialize(retry: bool):
+    """Everything startup needs: the shared snapshot, the database connection, then warm-up."""
+    global snapshot_watcher
+    try:
+        if SEARCH_ENGINE == "shared":
+            # Attached before connecting: the worker can serve searches without the database
+            with startup.phase("snapshot"):
+                await attach_shared_snapshot()
+            snapshot_watcher = asyncio.create_task(watch_shared_snapshot(), name="snapshot-watcher")
+            is_ready()
+        await connect_database(retry)
+        is_ready()
+        await warm_up()
+    except Exception as startup_err:
+        logger.error(f"Startup did not complete: {startup_err}", exc_info=True)
+    finally:
+        startup.warm = True
+        is_ready()
+        logger.info(f"Startup finished: {startup.stats()['phases']}")
+
+@app.on_event("startup")
+async def startup_db_client():
+    """Connects to MongoDB, ensures indexes and warms up (in the background with STARTUP_MODE=background)."""
+    global startup_task
+    if STARTUP_MODE == "blocking":
+        await initialize(retry=False)
+    else:
+        startup_task = asyncio.create_task(initialize(retry=True), name="startup")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     """Closes the MongoDB connection on application shutdown."""
-    global client
+    if startup_task is not None and not startup_task.done():
+        startup_task.cancel()
+    if snapshot_watcher is not None:
+        snapshot_watcher.cancel()
+    if hospital_sync is not None:
+        await hospital_sync.stop()
+    if status_writer is not None:
+        await status_writer.stop() # Writes the statuses still pending
     if client:
-        client.close()
+        await client.close()
         logger.info("MongoDB connection closed.")
 
 
 # --- Pydantic Models (Data Validation & Serialization) ---
+# Hospital models (PyObjectId, GeoLocation, HospitalResponse) live in schemas.py
 
-# Helper class for MongoDB ObjectId serialization AND SCHEMA REPRESENTATION
-# --- Pydantic Models (Data Validation & Serialization) ---
+# Request model for one patient in a batch search (same fields as /api/find-suitable's query)
+class SearchQuery(BaseModel):
+    lat: float = Field(..., ge=-90, le=90, description="Patient's latitude")
+    lon: float = Field(..., ge=-180, le=180, description="Patient's longitude")
+    needsICU: Optional[bool] = Field(None, description="Filter for hospitals with ICU availability")
+    specialist: Optional[str] = Field(None, description="Required specialist; matches specialist OR 'emergency' OR 'general'")
+    equipment: Optional[List[str]] = Field(None, description="Required equipment; hospital must have at least one")
 
-# Helper class for MongoDB ObjectId serialization AND SCHEMA REPRESENTATION
-class PyObjectId(ObjectId):
-    @classmethod
-    def __get_validators__(cls):
-        yield cls.validate
-
-    # --- CORRECTED SIGNATURE ---
-    @classmethod
-    def validate(cls, v: Any) -> ObjectId: # Remove the _info argument
-        # --- Keep the validation logic ---
-        if isinstance(v, ObjectId):
-            return v
-        if isinstance(v, str) and ObjectId.is_valid(v):
-            return ObjectId(v)
-        raise ValueError(f"Not a valid ObjectId: '{v}'")
-    # --- END CORRECTION ---
-
-    @classmethod
-    def __get_pydantic_json_schema__(
-        cls, core_schema_obj: core_schema.CoreSchema, handler: callable
-    ) -> dict[str, Any]:
-        # --- Keep this method as it was ---
-        return {
-            "type": "string",
-            "minLength": 24,
-            "maxLength": 24,
-            "pattern": r"^[0-9a-fA-F]{24}$",
-            "examples": ["60c72b9f9b1e8a5f1f1e8a5f"],
-        }
 
-    @classmethod
-    def __get_pydantic_core_schema__(
-        cls, source: type[Any], handler: callable
-    ) -> core_schema.CoreSchema:
-        # --- Keep this method as it was ---
-        # Use no_info_plain_validator_function as we removed _info from validate
-        return core_schema.no_info_plain_validator_function(
-            cls.validate, serialization=core_schema.to_string_ser_schema()
-        )
-# GeoJSON Point structure
-class GeoLocation(BaseModel):
-    # Use Literal to enforce the value "Point" - Pydantic V2 Style
-    type: Literal["Point"] = Field(default="Point", description="GeoJSON type, must be 'Point'")
-    coordinates: List[float] # Expected order: [longitude, latitude]
-
-    # Use field_validator - Pydantic V2 Style
-    @field_validator('coordinates')
-    @classmethod # Keep classmethod decorator here
-    def validate_coordinates(cls, v: List[float]) -> List[float]: # Add type hints
-        if len(v) != 2:
-            raise ValueError('Coordinates must be a list of [longitude, latitude]')
-        lon, lat = v
-        # Validate longitude
-        if not (-180 <= lon <= 180):
-            raise ValueError(f'Invalid longitude: {lon}. Must be between -180 and 180.')
-        # Validate latitude
-        if not (-90 <= lat <= 90):
-            raise ValueError(f'Invalid latitude: {lat}. Must be between -90 and 90.')
-        return v # Return the validated value
-
-# API response model for a hospital
-class HospitalResponse(BaseModel):
-    mongo_id: Optional[PyObjectId] = Field(alias="_id", description="MongoDB document ID")
-    hospital_id: int = Field(alias="id", description="Original numeric hospital ID from data source")
-    name: str
-    location: GeoLocation
-    hasICU: bool
-    specialists: List[str] = Field(default_factory=list)
-    equipment: List[str] = Field(default_factory=list)
-    distance_km: Optional[float] = Field(None, description="Calculated distance in kilometers")
-
-    # Use model_config for Pydantic V2 instead of class Config
-    model_config = {
-        "arbitrary_types_allowed": True,
-        "json_encoders": {
-            ObjectId: str # Serialize ObjectId to string
-        },
-        # --- MODIFIED for Pydantic V2 ---
-        "populate_by_name": True, # Renamed from allow_population_by_field_name
-        # --- END OF MODIFICATION ---
-         # Optional: Example to show in OpenAPI docs
-        "json_schema_extra": {
-            "example": {
-                 "mongo_id": "60c72b9f9b1e8a5f1f1e8a5f",
-                 "hospital_id": 1,
-                 "name": "City General Hospital",
-                 "location": {
-                     "type": "Point",
-                     "coordinates": [72.8800, 19.0880]
-                 },
-                 "hasICU": True,
-                 "specialists": ["cardiologist", "neurologist"],
-                 "equipment": ["defibrillator", "ct_scanner"],
-                 "distance_km": 1.23
-             }
-         }
-    }
+# Request/response models for capacity-aware allocation of a patient batch
+class AllocationRequest(BaseModel):
+    patients: List[SearchQuery]
+    defaultCapacity: int = Field(DEFAULT_HOSPITAL_CAPACITY, ge=0,
+                                 description="Beds assumed for hospitals without emergencyCapacity.availableBeds")
 
+class PatientAllocation(BaseModel):
+    patient: int = Field(..., description="Index of the patient in the request")
+    hospital: Optional[HospitalResponse] = Field(None, description="Assigned hospital (null if no suitable bed is left)")
 
-# --- API Endpoints ---
+class AllocationResponse(BaseModel):
+    assignments: List[PatientAllocation]
+    assigned: int
+    unassigned: int
+    total_distance_km: float = Field(..., description="Sum of travel distances of assigned patients")
+    solver_ms: float = Field(..., description="Time spent solving the assignment, in milliseconds")
 
-@app.get("/", tags=["Root"])
-async def read_root():
-    """Provides a simple welcome message to verify the API is running."""
-    return {"message": "Welcome to the Chetak API! Visit /docs for API documentation."}
 
-@app.get("/api/find-suitable",
-         response_model=List[HospitalResponse], # Specify the expected response structure
-         tags=["Hospitals"],
-         summary="Find suitable hospitals near a location",
-         description="Returns a list of hospitals near the provided coordinates, filtered by optional criteria (ICU, specialist, equipment), sorted by distance.")
-async def find_suitable_hospitals(
-    lat: float = Query(..., description="User's latitude", example=19.0760, ge=-90, le=90),
-    lon: float = Query(..., description="User's longitude", example=72.8777, ge=-180, le=180),
-    needsICU: Optional[bool] = Query(None, description="Filter for hospitals with ICU availability (pass true to filter)"),
-    specialist: Optional[str] = Query(None, description="Filter by required specialist (e.g., 'cardiologist'). Matches specialist OR 'emergency' OR 'general'."),
-    # Use alias 'equipment' to allow multiple ?equipment=X&equipment=Y in URL
-    equipment: Optional[List[str]] = Query(None, description="List of required equipment; hospital must have at least one (e.g., ?equipment=ct_scanner&equipment=mri)")
-):
-    """
-    Finds hospitals based on proximity and capability filters.
-    - Requires **latitude** and **longitude**.
-    - Optional filters: **needsICU**, **specialist**, **equipment**.
-    - Returns hospitals sorted by distance (nearest first).
-    """
-    if hospitals_collection is None or client is None:
-         logger.error("Database connection not available for request.")
-         raise HTTPException(status_code=503, detail="Database service unavailable. Please try again later.")
+# Request/response models for one-hop triage + search (needs resolved server-side, see triage.py)
+class TriageRequest(BaseModel):
+    lat: float = Field(..., ge=-90, le=90, description="Patient's latitude")
+    lon: float = Field(..., ge=-180, le=180, description="Patient's longitude")
+    condition: Optional[str] = Field(None, max_length=64, description="Selected condition id: cardiac, stroke, accident, allergy, labor or other")
+    details: Optional[str] = Field(None, max_length=MAX_TRANSCRIPT_CHARS, description="Typed description or voice transcript")
+    rankBy: str = Field("distance", pattern="^(distance|eta|score)$", description="'distance' (straight line), 'eta' (drive time) or 'score' (weighted suitability)")
+    radiusMode: str = Field("fixed", pattern="^(fixed|adaptive)$", description="'fixed' (50 km) or 'adaptive' (grows until enough hospitals are found)")
+
+class MedicalNeeds(BaseModel):
+    # Same fields as the frontend's medicalNeeds object
+    needsICU: bool
+    needsSpecialist: Optional[str]
+    urgencyLevel: int
+    requiredEquipment: List[str]
+    conditionLabel: str
+
+# Response model for one page of a paginated search
+class PageResponse(BaseModel):
+    hospitals: List[HospitalResponse]
+    nextCursor: Optional[str] = Field(None, description="Pass as ?cursor= to get the next page (null on the last page)")
+
 
-    logger.info(f"API Request: Find hospitals near (lat={lat}, lon={lon}) with filters: ICU={needsICU}, Spec={specialist}, Equip={equipment}")
+class TriageResponse(BaseModel):
+    needs: MedicalNeeds
+    hospitals: List[HospitalResponse]
+    searchRadiusKm: float = Field(..., description="Radius the search ended up using")
+    radiusExpansions: int = Field(..., description="Times the radius was doubled (radiusMode=adaptive)")
 
+# Request model for a hospital's live availability push (fields left out keep their last reported value)
+class StatusUpdate(BaseModel):
+    icuBedsAvailable: Optional[int] = Field(None, ge=0, description="Free ICU beds right now")
+    ventilatorsAvailable: Optional[int] = Field(None, ge=0, description="Free ventilators right now")
+    erLoad: Optional[float] = Field(None, ge=0, le=100, description="Emergency room occupancy, percent")
+
+
+# --- Search Pipeline ---
+
+def build_match_filter(needsICU: Optional[bool] = None, specialist: Optional[str] = None,
+                       equipment: Optional[List[str]] = None, availability: Optional[Availability] = None) -> Dict[str, Any]:
+    """Builds the MongoDB capability filter (ICU / specialist / equipment) for a search."""
     # --- Build the MongoDB Filter for $geoNear's query ---
     match_filter: Dict[str, Any] = {}
     if needsICU is True: # Explicitly check for True
@@ -258,12 +617,24 @@ async def find_suitable_hospitals(
         # Hospital must have the specific specialist OR 'emergency' OR 'general'
         specialist_filter = {"$in": [specialist.lower(), "emergency", "general"]} # Convert input specialist to lowercase
         match_filter["specialists"] = specialist_filter
-        logger.debug(f"Applying filter: specialists in {specialist_filter['$in']}")
+        logger.debug("Applying filter: specialists in %s", specialist_filter['$in'])
     if equipment and len(equipment) > 0:
         # Hospital must have at least one of the listed equipment (convert input to lowercase)
         equipment_filter = {"$in": [e.lower() for e in equipment]}
         match_filter["equipment"] = equipment_filter
-        logger.debug(f"Applying filter: equipment in {equipment_filter['$in']}")
+        logger.debug("Applying filter: equipment in %s", equipment_filter['$in'])
+    if availability is not None:
+        # On the statuses written so far (up to LIVE_STATUS_FLUSH_SECONDS behind the pushes)
+        match_filter.update(live_status.mongo_filter(availability))
+    return match_filter
+
+
+def build_search_pipeline(lat: float, lon: float, needsICU: Optional[bool] = None,
+                          specialist: Optional[str] = None, equipment: Optional[List[str]] = None,
+                          max_distance_m: float = SEARCH_RADIUS_METERS, limit: Optional[int] = MAX_RESULTS,
+                          availability: Optional[Availability] = None) -> List[Dict[str, Any]]:
+    """Builds the $geoNear aggregation pipeline used by the MongoDB search engine (limit=None: every match)."""
+    match_filter = build_match_filter(needsICU, specialist, equipment, availability)
 
     # --- Build the Aggregation Pipeline using $geoNear ---
     # $geoNear MUST be the first stage when used
@@ -277,7 +648,7 @@ async def find_suitable_hospitals(
                 # Output field name for the calculated distance (in meters by default)
                 'distanceField': 'distance_meters',
                  # Optional: Limit search radius (e.g., 50km = 50000 meters) - adjust as needed
-                'maxDistance': 50000,
+                'maxDistance': max_distance_m,
                 'query': match_filter,           # Apply capability filters here
                 'spherical': True                # Use spherical geometry for accuracy
             }
@@ -288,10 +659,6 @@ async def find_suitable_hospitals(
                 'distance_km': {'$round': [{'$divide': ['$distance_meters', 1000]}, 2]}
             }
         },
-        {
-             # Limit the number of results returned
-            '$limit': 15
-        },
         {   # Ensure output matches the response model structure (optional but good practice)
            '$project': {
                '_id': 1,
@@ -305,19 +672,613 @@ async def find_suitable_hospitals(
            }
         }
     ]
+    if limit is not None:
+        # Limit the number of results returned
+        pipeline.insert(2, {'$limit': limit})
+    return pipeline
 
-    try:
-        logger.debug(f"Executing MongoDB aggregation pipeline: {pipeline}")
-        # Execute the aggregation pipeline
-        results_cursor = hospitals_collection.aggregate(pipeline)
+
+def build_page_pipeline(lat: float, lon: float, needsICU: Optional[bool] = None,
+                        specialist: Optional[str] = None, equipment: Optional[List[str]] = None,
+                        max_distance_m: float = SEARCH_RADIUS_METERS, limit: int = MAX_RESULTS,
+                        after: Optional[PageCursor] = None) -> List[Dict[str, Any]]:
+    """
+    Builds the $geoNear pipeline for one page ordered by (distance, _id), starting
+    after the cursor's hospital; keeps `distance_meters` for the next cursor.
+    """
+    geo_near: Dict[str, Any] = {
+        'near': {'type': 'Point', 'coordinates': [lon, lat]},
+        'distanceField': 'distance_meters',
+        'maxDistance': max_distance_m,
+        'query': build_match_filter(needsICU, specialist, equipment),
+        'spherical': True
+    }
+    pipeline: List[Dict[str, Any]] = [{'$geoNear': geo_near}]
+    if after is not None:
+        geo_near['minDistance'] = after.distance_m # Earlier pages are skipped on the index
+        pipeline.append({'$match': {'$or': [{'distance_meters': {'$gt': after.distance_m}},
+                                            {'distance_meters': after.distance_m, '_id': {'$gt': after.key}}]}})
+    pipeline.extend([
+        {'$sort': {'distance_meters': 1, '_id': 1}}, # Top-k sort with the $limit: memory bounded by the page size
+        {'$limit': limit},
+        {'$addFields': {'distance_km': {'$round': [{'$divide': ['$distance_meters', 1000]}, 2]}}},
+        {'$project': {'_id': 1, 'id': 1, 'name': 1, 'location': 1, 'hasICU': 1, 'specialists': 1,
+                      'equipment': 1, 'distance_km': 1, 'distance_meters': 1}}
+    ])
+    return pipeline
+
+
+async def execute_search(lat: float, lon: float, needsICU: Optional[bool] = None,
+                   specialist: Optional[str] = None, equipment: Optional[List[str]] = None,
+                   max_distance_m: float = SEARCH_RADIUS_METERS, limit: int = MAX_RESULTS,
+                   availability: Optional[Availability] = None) -> List[Dict[str, Any]]:
+    """
+    Runs a search on the in-memory index if it is loaded, otherwise on MongoDB.
+    With `availability`, only hospitals whose current live status meets it are returned (still up to
+    `limit`: hospitals that fail it are replaced by the next nearest that pass).
+    """
+    if hospital_index is not None:
+        # In-process engine: same filters, radius and limit as build_search_pipeline()
+        start = time.perf_counter()
+        if availability is None:
+            results = hospital_index.search(lat, lon, needs_icu=needsICU, specialist=specialist, equipment=equipment,
+                                            max_distance_m=max_distance_m, limit=limit)
+        else:
+            # Nearest first, skipping hospitals without a current status that meets it
+            nearest = hospital_index.iter_nearest(lat, lon, needs_icu=needsICU, specialist=specialist,
+                                                  equipment=equipment, max_distance_m=max_distance_m)
+            results = list(islice((doc for doc in nearest if live_status.accepts(doc, availability)), limit))
+        observe_stage("memory_search", start)
+        return results
+
+    fetch = limit
+    while True:
+        start = time.perf_counter()
+        pipeline = build_search_pipeline(lat, lon, needsICU, specialist, equipment, max_distance_m, fetch, availability)
+        observe_stage("filter_build", start)
+        logger.debug("Executing MongoDB aggregation pipeline: %s", pipeline)
+        start = time.perf_counter()
+        # Execute the aggregation pipeline (awaits the round-trip instead of blocking the event loop)
+        results_cursor = await hospitals_collection.aggregate(pipeline)
         # Convert cursor to list - this reads all results into memory
-        results = list(results_cursor)
-        logger.info(f"Query successful. Found {len(results)} suitable hospitals.")
+        docs = await results_cursor.to_list(None)
+        observe_stage("db_aggregation", start) # Includes the pool wait (chetak_mongo_pool_wait_seconds)
+        if availability is None:
+            return docs
+        # Statuses pushed to this worker since the last flush are newer than the database's
+        results = [doc for doc in docs if live_status.accepts(doc, availability)]
+        if fetch is None or len(results) >= limit or len(docs) < fetch:
+            return results[:limit]
+        # Some of the nearest no longer qualify: fetch further out until the limit is filled or none are left
+        fetch *= 2
+
+
+async def execute_page(lat: float, lon: float, needsICU: Optional[bool], specialist: Optional[str],
+                       equipment: Optional[List[str]], max_distance_m: float, limit: int,
+                       after: Optional[PageCursor]) -> Tuple[List[Dict[str, Any]], List[float]]:
+    """One page of results ordered by (distance, key), and their exact distances in meters (for the next cursor)."""
+    if hospital_index is not None:
+        start = time.perf_counter()
+        page = hospital_index.search_page(lat, lon, needs_icu=needsICU, specialist=specialist, equipment=equipment,
+                                          max_distance_m=max_distance_m, limit=limit, after=after)
+        observe_stage("memory_search", start)
+        return page
+
+    start = time.perf_counter()
+    pipeline = build_page_pipeline(lat, lon, needsICU, specialist, equipment, max_distance_m, limit, after)
+    observe_stage("filter_build", start)
+    start = time.perf_counter()
+    results = await (await hospitals_collection.aggregate(pipeline)).to_list(None)
+    observe_stage("db_aggregation", start)
+    return results, [doc.pop('distance_meters') for doc in results]
+
+
+async def stream_search(lat: float, lon: float, needsICU: Optional[bool], specialist: Optional[str],
+                        equipment: Optional[List[str]], max_distance_m: float,
+                        limit: Optional[int]) -> AsyncIterator[Dict[str, Any]]:
+    """Yields matching hospitals nearest first, one at a time, as the index or the MongoDB cursor produces them."""
+    if hospital_index is not None:
+        results = hospital_index.iter_nearest(lat, lon, needs_icu=needsICU, specialist=specialist,
+                                              equipment=equipment, max_distance_m=max_distance_m)
+        for count, result in enumerate(results, 1):
+            yield result
+            if count == limit:
+                return
+        return
+
+    pipeline = build_search_pipeline(lat, lon, needsICU, specialist, equipment, max_distance_m, limit)
+    cursor = await hospitals_collection.aggregate(pipeline, batchSize=STREAM_BATCH_SIZE)
+    try:
+        async for doc in cursor: # One batch of STREAM_BATCH_SIZE documents held at a time
+            yield doc
+    finally:
+        await cursor.close()
+
+
+async def ndjson_lines(results: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+    """One HospitalResponse JSON object per line, sent as soon as each hospital is found."""
+    count = 0
+    try:
+        async for doc in results:
+            if hospital_encoder is not None:
+                line = hospital_encoder.encode_result(doc)
+            else:
+                line = HospitalResponse.model_validate(doc).model_dump_json(by_alias=True).encode()
+            yield line + b"\n"
+            count += 1
+        startup.query_succeeded()
+    except Exception as e:
+        # The status line is already sent: the client sees a truncated stream
+        logger.error(f"An unexpected error occurred while streaming hospitals (after {count}): {e}", exc_info=True)
+    finally:
+        observe_results("stream", count)
+
+
+async def admitted_stream(priority: str, lines: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Streams `lines` holding an admission slot for as long as the stream runs. Prime it with anext()
+    before responding: that raises Shed (answer 503) or takes the slot, released when the stream
+    ends, fails or the client goes away.
+    """
+    try:
+        async with admitted(priority):
+            yield b"" # Slot taken (consumed by the route, never sent)
+            async for line in lines:
+                yield line
+    finally:
+        await lines.aclose()
+
+
+async def cached_search(lat: float, lon: float, needsICU: Optional[bool] = None,
+                  specialist: Optional[str] = None, equipment: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Serves a search through the response cache. On a miss, candidates are
+    fetched around the centre of the caller's cache cell (radius widened to
+    cover the whole cell); hits only recompute exact distances for the caller.
+    """
+    start = time.perf_counter()
+    key = search_cache.make_key(lat, lon, needsICU, specialist, equipment)
+    entry = search_cache.get(key)
+    cache_seconds = time.perf_counter() - start
+    if entry is None:
+        center_lat, center_lon = search_cache.cell_center(key)
+        reach_m = SEARCH_RADIUS_METERS + search_cache.cell_radius_m(key)
+        candidates = await execute_search(center_lat, center_lon, needsICU, specialist, equipment,
+                                    max_distance_m=reach_m, limit=SEARCH_CACHE_CANDIDATES)
+        start = time.perf_counter()
+        entry = search_cache.put(key, candidates, truncated=len(candidates) >= SEARCH_CACHE_CANDIDATES)
+        cache_seconds += time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = search_cache.rank(key, entry, lat, lon, SEARCH_RADIUS_METERS, MAX_RESULTS)
+    observe_seconds("cache_lookup", cache_seconds + time.perf_counter() - start) # Excludes the search on a miss
+    if results is None:
+        # Cached candidates can't guarantee this caller's top results, search directly
+        results = await execute_search(lat, lon, needsICU, specialist, equipment)
+    return results
+
+async def adaptive_search(lat: float, lon: float, needsICU: Optional[bool] = None,
+                          specialist: Optional[str] = None, equipment: Optional[List[str]] = None,
+                          limit: int = MAX_RESULTS, availability: Optional[Availability] = None) -> Tuple[List[Dict[str, Any]], SearchRadius]:
+    """
+    Searches with a radius starting at ADAPTIVE_START_RADIUS_METERS, doubled
+    until `limit` hospitals are found or ADAPTIVE_MAX_RADIUS_METERS is reached:
+    dense areas scan a few cells, sparse ones still get an answer.
+    """
+    if hospital_index is not None and availability is None:
+        start = time.perf_counter()
+        found = hospital_index.search_expanding(lat, lon, needs_icu=needsICU, specialist=specialist, equipment=equipment,
+                                                start_radius_m=ADAPTIVE_START_RADIUS_METERS,
+                                                max_radius_m=ADAPTIVE_MAX_RADIUS_METERS, limit=limit)
+        observe_stage("memory_search", start)
+        return found
+
+    # One $geoNear (or index walk) per radius (each bounded by the 2dsphere index)
+    for expansions, radius_m in enumerate(expansion_radii(ADAPTIVE_START_RADIUS_METERS, ADAPTIVE_MAX_RADIUS_METERS)):
+        results = await execute_search(lat, lon, needsICU, specialist, equipment, max_distance_m=radius_m, limit=limit,
+                                       availability=availability)
+        if len(results) >= limit:
+            break
+    return results, SearchRadius(radius_m, expansions)
+
+def tile_search(lat: float, lon: float, needsICU: Optional[bool] = None,
+                specialist: Optional[str] = None, equipment: Optional[List[str]] = None) -> Optional[List[Dict[str, Any]]]:
+    """
+    Answers from the precomputed tiles when the filters are exactly one of the
+    frontend's condition profiles (cell lookup + exact re-rank of its candidates).
+    Returns None when the tiles don't cover the request.
+    """
+    if hospital_tiles is None:
+        return None
+    profile = hospital_tiles.profile_for(filter_key(needsICU, specialist, equipment))
+    if profile is None:
+        return None
+    start = time.perf_counter()
+    results = hospital_tiles.search(profile, lat, lon, MAX_RESULTS)
+    observe_stage("tile_lookup", start)
+    return results
+
+def score_weights_for(condition: Optional[str], needsICU: Optional[bool], specialist: Optional[str],
+                      equipment: Optional[List[str]]) -> ScoreWeights:
+    """Weights for rankBy=score: the named condition's, else those of the condition the filters belong to, else the defaults."""
+    if condition is None:
+        condition = SCORE_PROFILES.get(filter_key(needsICU, specialist, equipment))
+    return score_weights.get(condition, score_weights["default"])
+
+def live_icu_bed_bonus(doc: Dict[str, Any]) -> float:
+    """Live ICU bed term of the score: 1 when the hospital currently reports a free ICU bed."""
+    status = live_status.status_for(doc)
+    return 1.0 if status is not None and status.icu_beds else 0.0
+
+def indexed_icu_bed_bonus(positions: np.ndarray) -> np.ndarray:
+    """live_icu_bed_bonus of hospital_index positions, from icu_bed_column."""
+    icu_bed_column.sync(hospital_index)
+    return icu_bed_column.values(positions)
+
+async def scored_search(lat: float, lon: float, needsICU: Optional[bool], specialist: Optional[str],
+                        equipment: Optional[List[str]], weights: ScoreWeights,
+                        max_distance_m: float = SEARCH_RADIUS_METERS,
+                        availability: Optional[Availability] = None) -> List[Dict[str, Any]]:
+    """
+    The MAX_RESULTS suitable hospitals within `max_distance_m` with the best
+    weighted score (scoring.py), each with its `score`. The in-memory index
+    scores every hospital in the radius; MongoDB scores the nearest SCORE_CANDIDATES.
+    """
+    if hospital_index is not None and availability is None:
+        start = time.perf_counter()
+        results = hospital_index.search_scored(lat, lon, weights, needs_icu=needsICU, specialist=specialist,
+                                               equipment=equipment, max_distance_m=max_distance_m,
+                                               limit=MAX_RESULTS, bonus=indexed_icu_bed_bonus)
+        observe_stage("score_rank", start)
+        return results
+
+    candidates = await execute_search(lat, lon, needsICU, specialist, equipment, max_distance_m=max_distance_m,
+                                      limit=SCORE_CANDIDATES, availability=availability)
+    start = time.perf_counter()
+    distances_m = np.array([doc['distance_km'] * 1000 for doc in candidates], dtype=np.float64)
+    scores = distance_scores(distances_m, weights) + document_capability_scores(candidates, weights, specialist, equipment)
+    chosen, final = top_scored(scores, distances_m, np.arange(len(candidates)), MAX_RESULTS,
+                               lambda rows: np.fromiter((live_icu_bed_bonus(candidates[i]) for i in rows.tolist()),
+                                                        dtype=np.float64, count=len(rows)),
+                               weights.icu_beds)
+    results = [{**candidates[i], 'score': round(score, 4)} for i, score in zip(chosen.tolist(), final.tolist())]
+    observe_stage("score_rank", start)
+    return results
+
+async def search_hospitals(lat: float, lon: float, needsICU: Optional[bool] = None,
+                           specialist: Optional[str] = None, equipment: Optional[List[str]] = None,
+                           rankBy: str = "distance", radiusMode: str = "fixed",
+                           availability: Optional[Availability] = None,
+                           condition: Optional[str] = None) -> Tuple[List[Dict[str, Any]], SearchRadius]:
+    """
+    Runs one search through the fastest engine that can answer it (tiles, cache,
+    index or MongoDB); returns the hospitals and the radius searched.
+    `condition` picks the weights of rankBy=score (see score_weights_for).
+    """
+    radius = SearchRadius(SEARCH_RADIUS_METERS, 0)
+    if rankBy == "score":
+        weights = score_weights_for(condition, needsICU, specialist, equipment)
+        if radiusMode == "adaptive":
+            # The adaptive search only picks the radius; every suitable hospital within it is then scored
+            _, radius = await adaptive_search(lat, lon, needsICU, specialist, equipment, availability=availability)
+        results = await scored_search(lat, lon, needsICU, specialist, equipment, weights, radius.radius_m, availability)
+        return results, radius
+    if rankBy == "eta":
+        # Re-rank the nearest candidates by drive time (straight-line order is only the prefilter)
+        if radiusMode == "adaptive":
+            candidates, radius = await adaptive_search(lat, lon, needsICU, specialist, equipment, limit=ETA_CANDIDATES,
+                                                       availability=availability)
+        else:
+            candidates = await execute_search(lat, lon, needsICU, specialist, equipment, limit=ETA_CANDIDATES,
+                                              availability=availability)
+        start = time.perf_counter()
+        missing = eta_ranker.missing_trees(candidates)
+        if missing:
+            # Travel-time trees not cached yet: one Dijkstra over the road graph each, off the event loop
+            eta_ranker.add_trees(missing, await asyncio.to_thread(eta_ranker.build_trees, missing))
+        results = eta_ranker.rank(lat, lon, candidates, MAX_RESULTS)
+        observe_stage("eta_rank", start)
+        return results, radius
+    if radiusMode == "adaptive":
+        # Tiles and cached candidates only cover the fixed radius
+        return await adaptive_search(lat, lon, needsICU, specialist, equipment, availability=availability)
+    if availability is not None:
+        # Tiles and cached candidates don't follow live availability
+        return await execute_search(lat, lon, needsICU, specialist, equipment, availability=availability), radius
+    results = tile_search(lat, lon, needsICU, specialist, equipment)
+    if results is None and search_cache is not None:
+        results = await cached_search(lat, lon, needsICU, specialist, equipment)
+    elif results is None:
+        results = await execute_search(lat, lon, needsICU, specialist, equipment)
+    return results, radius
+
+def radius_headers(radius: SearchRadius) -> Dict[str, str]:
+    """Response headers reporting the radius a /api/find-suitable search used."""
+    return {"X-Search-Radius-Km": f"{radius.radius_m / 1000:g}", "X-Radius-Expansions": str(radius.expansions)}
+
+def filter_key(needsICU: Optional[bool], specialist: Optional[str],
+               equipment: Optional[List[str]]) -> Tuple[bool, Optional[str], Optional[Tuple[str, ...]]]:
+    """Normalizes search filters so equivalent requests compare equal."""
+    equipment_key = tuple(sorted({e.lower() for e in equipment})) if equipment else None
+    return (needsICU is True, specialist.lower() if specialist else None, equipment_key)
+
+def admitted(priority: str):
+    """`async with admitted(priority):` holds an admission slot around a search (raises Shed if refused)."""
+    return admission_control.slot(priority) if admission_control is not None else nullcontext()
+
+def shed_response(shed: Shed, lat: float, lon: float, filters: Tuple, rankBy: str,
+                  availability: Optional[Availability] = None) -> Optional[Tuple[List[Dict[str, Any]], Dict[str, str]]]:
+    """
+    Degraded answer to a shed search: the last results recorded near the caller (live availability
+    re-checked), with headers saying so; None when there are none, so the caller answers 503.
+    """
+    degraded = last_results.nearest(last_results.make_key(lat, lon, filters, rankBy), lat, lon, SEARCH_RADIUS_METERS)
+    if degraded is None:
+        return None
+    results, age = degraded
+    if availability is not None:
+        results = [doc for doc in results if live_status.accepts(doc, availability)]
+    admission_control.degraded[shed.priority] += 1
+    return results, {"X-Degraded": "stale-results", "X-Results-Age-Seconds": f"{age:.1f}"}
+
+def shed_unavailable(shed: Shed) -> HTTPException:
+    logger.debug("Search shed: %s", shed)
+    return HTTPException(status_code=503, detail="Server overloaded. Please retry shortly.", headers={"Retry-After": "1"})
+
+
+async def fetch_batch_candidates(points: List[Tuple[float, float]], needsICU: Optional[bool],
+                                 specialist: Optional[str], equipment: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """
+    Fetches, once for a whole group of patients sharing a filter set, every
+    suitable hospital within the search radius of at least one patient.
+    """
+    if hospital_index is not None:
+        start = time.perf_counter()
+        candidates = hospital_index.candidates(points, SEARCH_RADIUS_METERS, needs_icu=needsICU,
+                                               specialist=specialist, equipment=equipment)
+        observe_stage("memory_search", start)
+        return candidates
+
+    # Same capability filter as the $geoNear query, restricted to the union of the patients' search circles
+    start = time.perf_counter()
+    match_filter = build_match_filter(needsICU, specialist, equipment)
+    radius_radians = SEARCH_RADIUS_METERS / EARTH_RADIUS_M
+    circles = [{'location': {'$geoWithin': {'$centerSphere': [[lon, lat], radius_radians]}}}
+               for lat, lon in set(points)]
+    query = {'$and': [match_filter, {'$or': circles}]} if match_filter else {'$or': circles}
+    observe_stage("filter_build", start)
+    logger.debug("Executing MongoDB batch candidate query for %d patients", len(points))
+    start = time.perf_counter()
+    if isinstance(hospitals_collection, RegionCollections):
+        # Only the regions within reach of some patient
+        cursor = hospitals_collection.find(query, HOSPITAL_PROJECTION,
+                                           regions=hospitals_collection.regions_near(points, SEARCH_RADIUS_METERS))
+    else:
+        cursor = hospitals_collection.find(query, HOSPITAL_PROJECTION)
+    candidates = await cursor.to_list(None)
+    observe_stage("db_find", start)
+    return candidates
+
 
+async def batch_search(queries: List[SearchQuery]) -> List[List[Dict[str, Any]]]:
+    """
+    Answers many searches at once. Queries with the same normalized filters are
+    grouped so candidate filtering runs once per group, and all patient x
+    candidate distances for a group are computed in one vectorized pass.
+    """
+    groups: Dict[Tuple, List[int]] = {}
+    for position, query in enumerate(queries):
+        groups.setdefault(filter_key(query.needsICU, query.specialist, query.equipment), []).append(position)
+
+    results: List[List[Dict[str, Any]]] = [[] for _ in queries]
+    for positions in groups.values():
+        first = queries[positions[0]]
+        points = [(queries[p].lat, queries[p].lon) for p in positions]
+        candidates = await fetch_batch_candidates(points, first.needsICU, first.specialist, first.equipment)
+        lons, lats = zip(*(c['location']['coordinates'] for c in candidates)) if candidates else ((), ())
+        ranked = rank_many([lat for lat, _ in points], [lon for _, lon in points], lats, lons,
+                           SEARCH_RADIUS_METERS, MAX_RESULTS)
+        for position, hits in zip(positions, ranked):
+            results[position] = [{**candidates[c], 'distance_km': round(distance_m / 1000, 2)} for c, distance_m in hits]
+    return results
+
+def hospital_capacity(doc: Dict[str, Any], default_capacity: int) -> int:
+    """Available emergency beds from the Node profile (emergencyCapacity.availableBeds), or the default."""
+    capacity = (doc.get('emergencyCapacity') or {}).get('availableBeds')
+    return int(capacity) if isinstance(capacity, (int, float)) else default_capacity
+
+
+async def allocate_patients(patients: List[SearchQuery], default_capacity: int) -> Dict[str, Any]:
+    """
+    Spreads a patient batch across suitable hospitals: candidates are gathered
+    per filter group (as in batch_search), then one assignment minimizing total
+    distance is solved over all patients and hospitals, respecting capacity.
+    """
+    groups: Dict[Tuple, List[int]] = {}
+    for position, patient in enumerate(patients):
+        groups.setdefault(filter_key(patient.needsICU, patient.specialist, patient.equipment), []).append(position)
+
+    hospitals: List[Dict[str, Any]] = []
+    column_of: Dict[Any, int] = {}
+    group_columns: List[Tuple[List[int], List[int]]] = []
+    for positions in groups.values():
+        first = patients[positions[0]]
+        points = [(patients[p].lat, patients[p].lon) for p in positions]
+        columns = []
+        for doc in await fetch_batch_candidates(points, first.needsICU, first.specialist, first.equipment):
+            key = doc.get('_id', doc.get('id'))
+            if key not in column_of:
+                column_of[key] = len(hospitals)
+                hospitals.append(doc)
+            columns.append(column_of[key])
+        group_columns.append((positions, columns))
+
+    suitable = np.zeros((len(patients), len(hospitals)), dtype=bool)
+    for positions, columns in group_columns:
+        suitable[np.ix_(positions, columns)] = True
+
+    coordinates = [doc['location']['coordinates'] for doc in hospitals]
+    from allocation import allocate # Already imported by warm-up
+    result = allocate([p.lat for p in patients], [p.lon for p in patients],
+                      [lat for _, lat in coordinates], [lon for lon, _ in coordinates],
+                      [hospital_capacity(doc, default_capacity) for doc in hospitals],
+                      suitable, SEARCH_RADIUS_METERS)
+
+    assignments = []
+    for position, (column, distance_m) in enumerate(zip(result.hospitals, result.distances_m)):
+        hospital = None if column is None else {**hospitals[column], 'distance_km': round(distance_m / 1000, 2)}
+        assignments.append({'patient': position, 'hospital': hospital})
+    assigned = sum(1 for column in result.hospitals if column is not None)
+    return {
+        'assignments': assignments,
+        'assigned': assigned,
+        'unassigned': len(patients) - assigned,
+        'total_distance_km': round(sum(d for d in result.distances_m if d is not None) / 1000, 2),
+        'solver_ms': round(result.solver_ms, 3),
+    }
+
+
+# --- Metrics (read at scrape time) ---
+
+def cache_counters() -> List[Tuple[str, int, int]]:
+    """(cache, hits, misses) for each enabled cache."""
+    counters = []
+    if search_cache is not None:
+        counters.append(("search", search_cache.hits, search_cache.misses))
+    if hospital_tiles is not None:
+        counters.append(("tiles", hospital_tiles.hits, hospital_tiles.fallbacks + hospital_tiles.outside))
+    if hospital_encoder is not None:
+        counters.append(("serialized_json", hospital_encoder.hits, hospital_encoder.misses))
+    if eta_ranker is not None:
+        counters.append(("road_eta", eta_ranker.cache_hits, eta_ranker.cache_misses))
+    return counters
+
+Sampled("chetak_cache_lookups_total", "Lookups per cache, by result.", "counter", ["cache", "result"],
+        lambda: [((name, result), value) for name, hits, misses in cache_counters()
+                 for result, value in (("hit", hits), ("miss", misses))])
+Sampled("chetak_cache_hit_ratio", "Hit ratio of each cache since startup.", "gauge", ["cache"],
+        lambda: [((name,), hits / (hits + misses) if hits + misses else None) for name, hits, misses in cache_counters()])
+Sampled("chetak_shared_snapshot_generation", "Shared snapshot generation this worker searches (SEARCH_ENGINE=shared).", "gauge", [],
+        lambda: [((), hospital_index.generation if isinstance(hospital_index, SnapshotIndex) else None)])
+startup.register_metrics(is_ready)
+Sampled("chetak_live_status_updates_total", "Hospital status pushes, by outcome.", "counter", ["result"],
+        lambda: [(("accepted",), live_status.updates), (("rejected",), live_status.rejected)])
+Sampled("chetak_live_status_pending", "Hospital statuses received but not yet written to MongoDB.", "gauge", [],
+        lambda: [((), live_status.pending)])
+Sampled("chetak_live_status_writes_total", "Hospital statuses written to MongoDB (one per hospital per flush).", "counter", [],
+        lambda: [((), status_writer.written if status_writer is not None else None)])
+Sampled("chetak_live_status_flush_errors_total", "Failed live status flushes.", "counter", [],
+        lambda: [((), status_writer.errors if status_writer is not None else None)])
+if admission_control is not None:
+    admission_control.register_metrics()
+Sampled("chetak_snapshot_staleness_seconds", "Time since the in-process snapshot last heard from its change feed.", "gauge", [],
+        lambda: [((), hospital_sync.staleness_seconds() if hospital_sync is not None else None)])
+
+
+# --- API Endpoints ---
+
+@app.get("/", tags=["Root"])
+async def read_root():
+    """Provides a simple welcome message to verify the API is running."""
+    return {"message": "Welcome to the Chetak API! Visit /docs for API documentation."}
+
+@app.get("/healthz", tags=["Diagnostics"], summary="Liveness probe")
+async def liveness():
+    """200 while the process and its event loop respond (startup may still be running)."""
+    return {"status": "ok"}
+
+@app.get("/readyz", tags=["Diagnostics"], summary="Readiness probe")
+async def readiness():
+    """200 once searches can be answered (and, with READINESS_REQUIRES_WARMUP, warm-up is done), else 503; with startup phase timings."""
+    ready = is_ready()
+    body = {"ready": ready, "searchEngine": SEARCH_ENGINE,
+            "database": hospitals_collection is not None, "index": hospital_index is not None, **startup.stats()}
+    return json_response(orjson.dumps(body), status_code=200 if ready else 503)
+
+@app.get("/api/find-suitable",
+         response_model=List[HospitalResponse], # Specify the expected response structure
+         tags=["Hospitals"],
+         summary="Find suitable hospitals near a location",
+         description="Returns a list of hospitals near the provided coordinates, filtered by optional criteria (ICU, specialist, equipment), sorted by distance (or drive time / weighted score, see rankBy).")
+async def find_suitable_hospitals(
+    response: Response, # Injected by FastAPI; carries the radius headers
+    lat: float = Query(..., description="User's latitude", example=19.0760, ge=-90, le=90),
+    lon: float = Query(..., description="User's longitude", example=72.8777, ge=-180, le=180),
+    needsICU: Optional[bool] = Query(None, description="Filter for hospitals with ICU availability (pass true to filter)"),
+    specialist: Optional[str] = Query(None, description="Filter by required specialist (e.g., 'cardiologist'). Matches specialist OR 'emergency' OR 'general'."),
+    # Use alias 'equipment' to allow multiple ?equipment=X&equipment=Y in URL
+    equipment: Optional[List[str]] = Query(None, description="List of required equipment; hospital must have at least one (e.g., ?equipment=ct_scanner&equipment=mri)"),
+    rankBy: str = Query("distance", pattern="^(distance|eta|score)$", description="'distance' (straight line), 'eta' (estimated drive time over the road network) or 'score' (weighted distance, exact capability matches and ICU availability)"),
+    condition: Optional[str] = Query(None, max_length=64, description="Condition whose weights rankBy=score uses (cardiac, stroke, accident, allergy, labor, ...); default: the condition these filters belong to"),
+    radiusMode: str = Query("fixed", pattern="^(fixed|adaptive)$", description="'fixed' (50 km) or 'adaptive' (starts small and doubles until enough hospitals are found, up to a ceiling)"),
+    minIcuBeds: Optional[int] = Query(None, ge=0, description="Only hospitals currently reporting at least this many free ICU beds"),
+    minVentilators: Optional[int] = Query(None, ge=0, description="Only hospitals currently reporting at least this many free ventilators"),
+    maxErLoad: Optional[float] = Query(None, ge=0, le=100, description="Only hospitals currently reporting an ER occupancy (percent) of at most this"),
+    dispatchKey: Optional[str] = Header(None, alias="X-Dispatch-Key", description="Dispatcher console key (DISPATCH_API_KEYS): searches go ahead of public traffic under load")
+):
+    """
+    Finds hospitals based on proximity and capability filters.
+    - Requires **latitude** and **longitude**.
+    - Optional filters: **needsICU**, **specialist**, **equipment**.
+    - Optional live availability filters: **minIcuBeds**, **minVentilators**, **maxErLoad**, on the
+      statuses hospitals push to `/api/hospitals/{id}/status`. Hospitals without a recent status are left out.
+    - Returns hospitals sorted by distance (nearest first), or by drive time with **rankBy=eta**.
+    - **rankBy=score** sorts by a weighted score (higher first, in each result's `score`) of distance, the
+      requested specialist / equipment the hospital actually has, its ICU and free ICU beds, with the
+      weights of **condition**.
+    - **radiusMode=adaptive** grows the radius as needed; the radius used is in the
+      `X-Search-Radius-Km` / `X-Radius-Expansions` response headers.
+    - Under overload a search that can't be admitted in time gets the last results found near the
+      caller, flagged by `X-Degraded: stale-results` and `X-Results-Age-Seconds`, or a 503.
+    """
+    if not searches_available():
+         logger.error("Database connection not available for request.")
+         raise HTTPException(status_code=503, detail="Database service unavailable. Please try again later.")
+    if rankBy == "eta" and eta_ranker is None:
+         raise HTTPException(status_code=503, detail="Drive-time ranking is not available (no road graph loaded).")
+    if condition is not None and condition not in score_weights:
+         raise HTTPException(status_code=400, detail=f"Unknown condition '{condition}' (expected one of: {', '.join(sorted(score_weights))}).")
+
+    # Per-request lines are debug-level and formatted lazily; volumes and latencies are in /metrics
+    logger.debug("API Request: Find hospitals near (lat=%s, lon=%s) with filters: ICU=%s, Spec=%s, Equip=%s, rankBy=%s, radiusMode=%s",
+                 lat, lon, needsICU, specialist, equipment, rankBy, radiusMode)
+    availability = Availability(minIcuBeds, minVentilators, maxErLoad)
+    if availability == Availability():
+        availability = None
+    filters = filter_key(needsICU, specialist, equipment)
+    ranking = rankBy if condition is None else f"{rankBy}:{condition}"
+
+    try:
+        async with admitted(request_priority(dispatchKey, DISPATCH_API_KEYS)):
+            results, radius = await search_hospitals(lat, lon, needsICU, specialist, equipment, rankBy, radiusMode,
+                                                     availability, condition)
+        logger.debug("Query successful. Found %d suitable hospitals within %s m (%d expansions).",
+                     len(results), radius.radius_m, radius.expansions)
+        observe_results("find_suitable", len(results))
+        startup.query_succeeded()
+        if radiusMode == "fixed" and availability is None:
+            last_results.record(last_results.make_key(lat, lon, filters, ranking), results)
+
+        if hospital_encoder is not None:
+            # Same JSON as the response_model would produce, from bytes serialized once per hospital
+            start = time.perf_counter()
+            encoded = json_response(hospital_encoder.encode_results(results), headers=radius_headers(radius))
+            observe_stage("serialization", start)
+            return encoded
+        response.headers.update(radius_headers(radius))
         # FastAPI will automatically validate the list 'results' against List[HospitalResponse]
         # because it's specified in `response_model`. If validation fails, FastAPI returns an error.
         return results
 
+    except Shed as shed:
+        degraded = shed_response(shed, lat, lon, filters, ranking, availability)
+        if degraded is None:
+            raise shed_unavailable(shed)
+        results, headers = degraded
+        if hospital_encoder is not None:
+            return json_response(hospital_encoder.encode_results(results), headers=headers)
+        response.headers.update(headers)
+        return results
     except OperationFailure as op_err:
          logger.error(f"MongoDB operation error during aggregation: {op_err}", exc_info=True)
          # Provide more specific details if available
@@ -327,11 +1288,424 @@ async def find_suitable_hospitals(
         logger.error(f"An unexpected error occurred during hospital search: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="An internal server error occurred while searching for hospitals.")
 
+@app.get("/api/find-suitable/page",
+         response_model=PageResponse,
+         tags=["Hospitals"],
+         summary="Browse suitable hospitals page by page",
+         description="Same search as /api/find-suitable, ordered by distance, returned in pages of up to pageSize hospitals. Pass the returned nextCursor as ?cursor= (with the same search parameters) to get the next page.")
+async def find_suitable_hospitals_page(
+    lat: float = Query(..., description="User's latitude", example=19.0760, ge=-90, le=90),
+    lon: float = Query(..., description="User's longitude", example=72.8777, ge=-180, le=180),
+    needsICU: Optional[bool] = Query(None, description="Filter for hospitals with ICU availability (pass true to filter)"),
+    specialist: Optional[str] = Query(None, description="Filter by required specialist. Matches specialist OR 'emergency' OR 'general'."),
+    equipment: Optional[List[str]] = Query(None, description="List of required equipment; hospital must have at least one"),
+    radiusKm: float = Query(SEARCH_RADIUS_METERS / 1000, gt=0, le=ADAPTIVE_MAX_RADIUS_METERS / 1000, description="Search radius in kilometers"),
+    pageSize: int = Query(MAX_RESULTS, ge=1, le=MAX_PAGE_SIZE, description="Hospitals per page"),
+    cursor: Optional[str] = Query(None, description="nextCursor of the previous page (omit for the first page)"),
+    dispatchKey: Optional[str] = Header(None, alias="X-Dispatch-Key", description="Dispatcher console key (DISPATCH_API_KEYS): searches go ahead of public traffic under load")
+):
+    """
+    Cursor-paginated version of /api/find-suitable for coordinators browsing the wider list.
+    - Pages are ordered by distance (ties by hospital id) and never repeat or skip a hospital
+      while the data doesn't change.
+    - **nextCursor** is null on the last page.
+    """
+    if not searches_available():
+         logger.error("Database connection not available for request.")
+         raise HTTPException(status_code=503, detail="Database service unavailable. Please try again later.")
+    fingerprint = search_fingerprint(lat, lon, filter_key(needsICU, specialist, equipment), radiusKm)
+    try:
+        after = decode_cursor(cursor, fingerprint) if cursor else None
+    except InvalidCursor as cursor_err:
+        raise HTTPException(status_code=400, detail=str(cursor_err))
+
+    try:
+        # One extra hospital tells whether there is a next page
+        async with admitted(request_priority(dispatchKey, DISPATCH_API_KEYS)):
+            results, distances = await execute_page(lat, lon, needsICU, specialist, equipment,
+                                                    radiusKm * 1000, pageSize + 1, after)
+        next_cursor = None
+        if len(results) > pageSize:
+            results = results[:pageSize]
+            next_cursor = encode_cursor(fingerprint, distances[pageSize - 1], doc_key(results[-1]))
+        observe_results("page", len(results))
+        startup.query_succeeded()
+        if hospital_encoder is not None:
+            start = time.perf_counter()
+            response = json_response(b'{"hospitals":' + hospital_encoder.encode_results(results)
+                                     + b',"nextCursor":' + orjson.dumps(next_cursor) + b"}")
+            observe_stage("serialization", start)
+            return response
+        return {"hospitals": results, "nextCursor": next_cursor}
+
+    except Shed as shed:
+        raise shed_unavailable(shed)
+    except OperationFailure as op_err:
+         logger.error(f"MongoDB operation error during paginated search: {op_err}", exc_info=True)
+         error_detail = op_err.details.get('errmsg', 'Unknown database operation error')
+         raise HTTPException(status_code=500, detail=f"Database query error: {error_detail}")
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during paginated hospital search: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="An internal server error occurred while searching for hospitals.")
+
+@app.get("/api/find-suitable/stream",
+         tags=["Hospitals"],
+         summary="Stream suitable hospitals as NDJSON",
+         description="Same search as /api/find-suitable without the 15-result cap: every suitable hospital within radiusKm (or the first `limit`), nearest first, one HospitalResponse JSON object per line, sent as soon as each is found.",
+         response_class=StreamingResponse)
+async def stream_suitable_hospitals(
+    lat: float = Query(..., description="User's latitude", example=19.0760, ge=-90, le=90),
+    lon: float = Query(..., description="User's longitude", example=72.8777, ge=-180, le=180),
+    needsICU: Optional[bool] = Query(None, description="Filter for hospitals with ICU availability (pass true to filter)"),
+    specialist: Optional[str] = Query(None, description="Filter by required specialist. Matches specialist OR 'emergency' OR 'general'."),
+    equipment: Optional[List[str]] = Query(None, description="List of required equipment; hospital must have at least one"),
+    radiusKm: float = Query(SEARCH_RADIUS_METERS / 1000, gt=0, le=ADAPTIVE_MAX_RADIUS_METERS / 1000, description="Search radius in kilometers"),
+    limit: Optional[int] = Query(None, ge=1, description="Stop after this many hospitals (default: all within the radius)"),
+    dispatchKey: Optional[str] = Header(None, alias="X-Dispatch-Key", description="Dispatcher console key (DISPATCH_API_KEYS): searches go ahead of public traffic under load")
+):
+    """
+    NDJSON streaming version of /api/find-suitable (`application/x-ndjson`).
+    - Server memory doesn't grow with the number of hospitals returned.
+    - A stream cut short by a server error simply ends early (the status was already sent).
+    - Holds an admission slot while it runs; refused with a 503 when shed (no degraded answer).
+    """
+    if not searches_available():
+         logger.error("Database connection not available for request.")
+         raise HTTPException(status_code=503, detail="Database service unavailable. Please try again later.")
+    logger.debug("API Request: Stream hospitals near (lat=%s, lon=%s) within %s km, limit=%s", lat, lon, radiusKm, limit)
+    results = stream_search(lat, lon, needsICU, specialist, equipment, radiusKm * 1000, limit)
+    lines = admitted_stream(request_priority(dispatchKey, DISPATCH_API_KEYS), ndjson_lines(results))
+    try:
+        await anext(lines)
+    except Shed as shed:
+        raise shed_unavailable(shed)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+@app.post("/api/triage-search",
+          response_model=TriageResponse,
+          tags=["Hospitals"],
+          summary="Assess a patient's condition and find suitable hospitals in one request",
+          description="Resolves the needs (ICU, specialist, equipment, urgency) from the selected condition and/or a free-text or voice description, with the same rules as the frontend, and returns them with the matching hospitals.")
+async def triage_search(
+    request: TriageRequest,
+    response: Response, # Injected by FastAPI; carries the degraded-answer headers
+    dispatchKey: Optional[str] = Header(None, alias="X-Dispatch-Key", description="Dispatcher console key (DISPATCH_API_KEYS): searches go ahead of public traffic under load")
+):
+    """
+    One-hop version of the frontend's analyzePatientCondition + /api/find-suitable.
+    - Requires **lat** and **lon**, plus a **condition** id and/or **details** text.
+    - Returns the resolved **needs** and the **hospitals** found for them, with the radius searched
+      (**radiusMode=adaptive** grows it until enough hospitals are found).
+    - Shed under overload like /api/find-suitable (`X-Degraded` answer or 503).
+    """
+    if not searches_available():
+         logger.error("Database connection not available for request.")
+         raise HTTPException(status_code=503, detail="Database service unavailable. Please try again later.")
+    if request.rankBy == "eta" and eta_ranker is None:
+         raise HTTPException(status_code=503, detail="Drive-time ranking is not available (no road graph loaded).")
+
+    start = time.perf_counter()
+    needs = assess(request.condition, request.details)
+    observe_stage("triage", start)
+    logger.debug("API Request: Triage search near (lat=%s, lon=%s) for condition=%s, %d chars of details -> %s (urgency %s)",
+                 request.lat, request.lon, request.condition, len(request.details or ''),
+                 needs['conditionLabel'], needs['urgencyLevel'])
+    equipment = needs["requiredEquipment"] or None
+    filters = filter_key(needs["needsICU"], needs["needsSpecialist"], equipment)
+    try:
+        async with admitted(request_priority(dispatchKey, DISPATCH_API_KEYS)):
+            results, radius = await search_hospitals(request.lat, request.lon, needs["needsICU"], needs["needsSpecialist"],
+                                                     equipment, request.rankBy, request.radiusMode)
+        logger.debug("Query successful. Found %d suitable hospitals.", len(results))
+        observe_results("triage_search", len(results))
+        startup.query_succeeded()
+        if request.radiusMode == "fixed":
+            last_results.record(last_results.make_key(request.lat, request.lon, filters, request.rankBy), results)
+        radius_fields = {"searchRadiusKm": round(radius.radius_m / 1000, 3), "radiusExpansions": radius.expansions}
+        headers: Dict[str, str] = {}
+    except Shed as shed:
+        degraded = shed_response(shed, request.lat, request.lon, filters, request.rankBy)
+        if degraded is None:
+            raise shed_unavailable(shed)
+        results, headers = degraded
+        radius_fields = {"searchRadiusKm": SEARCH_RADIUS_METERS / 1000, "radiusExpansions": 0}
+    except OperationFailure as op_err:
+         logger.error(f"MongoDB operation error during triage search: {op_err}", exc_info=True)
+         error_detail = op_err.details.get('errmsg', 'Unknown database operation error')
+         raise HTTPException(status_code=500, detail=f"Database query error: {error_detail}")
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during triage search: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="An internal server error occurred while searching for hospitals.")
+
+    if hospital_encoder is not None:
+        start = time.perf_counter()
+        encoded = json_response(b'{"needs":' + orjson.dumps(needs) + b',"hospitals":'
+                                + hospital_encoder.encode_results(results) + b"," + orjson.dumps(radius_fields)[1:],
+                                headers=headers)
+        observe_stage("serialization", start)
+        return encoded
+    response.headers.update(headers)
+    return {"needs": needs, "hospitals": results, **radius_fields}
+
+@app.post("/api/find-suitable/batch",
+          response_model=List[List[HospitalResponse]],
+          tags=["Hospitals"],
+          summary="Find suitable hospitals for many patients at once",
+          description="Takes a list of patient queries (same fields as /api/find-suitable) and returns, for each one in order, the suitable hospitals sorted by distance.")
+async def find_suitable_hospitals_batch(
+    queries: List[SearchQuery],
+    dispatchKey: Optional[str] = Header(None, alias="X-Dispatch-Key", description="Dispatcher console key (DISPATCH_API_KEYS): searches go ahead of public traffic under load")
+):
+    """
+    Batch version of /api/find-suitable for multi-patient dispatch.
+    - Each query has **lat**, **lon** and optional **needsICU**, **specialist**, **equipment**.
+    - Returns one list of hospitals per query, in the same order as the queries.
+    """
+    if len(queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"Too many queries in batch (max {MAX_BATCH_QUERIES}).")
+    if not searches_available():
+         logger.error("Database connection not available for request.")
+         raise HTTPException(status_code=503, detail="Database service unavailable. Please try again later.")
+
+    logger.info("API Request: Batch search for %d patients", len(queries))
+    try:
+        async with admitted(request_priority(dispatchKey, DISPATCH_API_KEYS)):
+            results = await batch_search(queries)
+        logger.info("Batch query successful. Found %d hospital matches in total.", sum(len(r) for r in results))
+        for hits in results:
+            observe_results("batch", len(hits))
+        startup.query_succeeded()
+        if hospital_encoder is not None:
+            start = time.perf_counter()
+            response = json_response(hospital_encoder.encode_batch(results))
+            observe_stage("serialization", start)
+            return response
+        return results
+
+    except Shed as shed:
+        raise shed_unavailable(shed)
+    except OperationFailure as op_err:
+         logger.error(f"MongoDB operation error during batch search: {op_err}", exc_info=True)
+         error_detail = op_err.details.get('errmsg', 'Unknown database operation error')
+         raise HTTPException(status_code=500, detail=f"Database query error: {error_detail}")
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during batch hospital search: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="An internal server error occurred while searching for hospitals.")
+
+@app.post("/api/allocate",
+          response_model=AllocationResponse,
+          tags=["Hospitals"],
+          summary="Spread a patient batch across suitable hospitals",
+          description="Assigns each patient to a suitable hospital (ICU/specialist/equipment filters, within the search radius) minimizing total travel distance while respecting each hospital's available beds.")
+async def allocate_patient_batch(
+    request: AllocationRequest,
+    dispatchKey: Optional[str] = Header(None, alias="X-Dispatch-Key", description="Dispatcher console key (DISPATCH_API_KEYS): searches go ahead of public traffic under load")
+):
+    """
+    Capacity-aware allocation for mass-casualty dispatch.
+    - Each patient has **lat**, **lon** and optional **needsICU**, **specialist**, **equipment**.
+    - Hospital capacity is `emergencyCapacity.availableBeds`, or **defaultCapacity** when missing.
+    - Patients left without a suitable bed are returned with `hospital: null`.
+    """
+    if len(request.patients) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"Too many patients in batch (max {MAX_BATCH_QUERIES}).")
+    if not searches_available():
+         logger.error("Database connection not available for request.")
+         raise HTTPException(status_code=503, detail="Database service unavailable. Please try again later.")
+
+    logger.info("API Request: Allocate %d patients (default capacity %d)", len(request.patients), request.defaultCapacity)
+    try:
+        async with admitted(request_priority(dispatchKey, DISPATCH_API_KEYS)):
+            allocation = await allocate_patients(request.patients, request.defaultCapacity)
+        startup.query_succeeded()
+        logger.info("Allocation successful. Assigned %d patients, %d unassigned, solver took %s ms.",
+                    allocation['assigned'], allocation['unassigned'], allocation['solver_ms'])
+        return allocation
+
+    except Shed as shed:
+        raise shed_unavailable(shed)
+    except OperationFailure as op_err:
+         logger.error(f"MongoDB operation error during allocation: {op_err}", exc_info=True)
+         error_detail = op_err.details.get('errmsg', 'Unknown database operation error')
+         raise HTTPException(status_code=500, detail=f"Database query error: {error_detail}")
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during allocation: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="An internal server error occurred while allocating patients.")
+
+async def hospital_exists(key: Any) -> bool:
+    """Whether a status key names a hospital: in the search index / snapshot when one is loaded, else in MongoDB."""
+    global indexed_hospitals
+    if key in live_status: # Checked when it first reported (or read back from MongoDB)
+        return True
+    if hospital_index is not None:
+        if indexed_hospitals is None:
+            documents = await asyncio.to_thread(hospital_index.documents)
+            indexed_hospitals = {value for doc in documents for value in (doc.get("_id"), doc.get("id")) if value is not None}
+        return key in indexed_hospitals
+    return bool(await hospitals_collection.find(document_filter(key), {"_id": 1}).limit(1).to_list(None))
+
+@app.post("/api/hospitals/{hospital_id}/status",
+          status_code=202,
+          tags=["Hospitals"],
+          summary="Push a hospital's current bed / ICU availability")
+async def push_hospital_status(
+    hospital_id: str,
+    update: StatusUpdate,
+    hospitalKey: Optional[str] = Header(None, alias="X-Hospital-Key", description="The hospital's push key (HOSPITAL_STATUS_KEYS_FILE)")
+):
+    """
+    Records a hospital's current free ICU beds, free ventilators and ER load.
+    - **hospital_id** is the MongoDB `_id` or the numeric `id`.
+    - Requires the hospital's own key in **X-Hospital-Key**; not callable from browsers (no CORS).
+    - Meant to be called every few seconds: updates are kept in memory and written to
+      MongoDB in batches (every LIVE_STATUS_FLUSH_SECONDS, only the latest per hospital).
+    - Searches can filter on them right away (**minIcuBeds**, **minVentilators**, **maxErLoad**).
+    """
+    try:
+        key = hospital_key(hospital_id)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+    if not hospital_status_keys:
+        raise HTTPException(status_code=403, detail="Status pushes are disabled (no HOSPITAL_STATUS_KEYS_FILE).")
+    if not status_key_matches(hospital_status_keys, key, hospitalKey):
+        raise HTTPException(status_code=401, detail="Missing or wrong X-Hospital-Key for this hospital.")
+    if update.icuBedsAvailable is None and update.ventilatorsAvailable is None and update.erLoad is None:
+        raise HTTPException(status_code=400, detail="No status fields given.")
+    if not searches_available():
+        raise HTTPException(status_code=503, detail="Database service unavailable. Please try again later.")
+    try:
+        exists = await hospital_exists(key)
+    except PyMongoError as err:
+        logger.error(f"Failed to look up hospital {hospital_id} for a status push: {err}")
+        raise HTTPException(status_code=503, detail="Database service unavailable. Please try again later.")
+    if not exists:
+        raise HTTPException(status_code=404, detail=f"No hospital '{hospital_id}'.")
+    if live_status.update(key, update.icuBedsAvailable, update.ventilatorsAvailable, update.erLoad) is None:
+        raise HTTPException(status_code=503, detail="Too many hospitals reporting status (LIVE_STATUS_MAX_HOSPITALS).")
+    return {"accepted": True}
+
+@app.get("/api/cache-stats", tags=["Diagnostics"], summary="Search cache statistics")
+async def get_cache_stats():
+    """Returns hit/miss/eviction counters for the /api/find-suitable response cache."""
+    if search_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **search_cache.stats()}
+
+@app.get("/api/sync-stats", tags=["Diagnostics"], summary="Snapshot sync status and staleness")
+async def get_sync_stats():
+    """Returns the change-feed mode, staleness lag and counters of the in-process snapshot sync."""
+    if hospital_sync is None:
+        return {"enabled": False}
+    return {"enabled": True, **hospital_sync.stats()}
+
+@app.get("/api/status-stats", tags=["Diagnostics"], summary="Live hospital status ingestion")
+async def get_status_stats():
+    """Returns the hospitals with a known status, pending (unwritten) updates and the coalescing / bulk write counters."""
+    writer = status_writer.stats() if status_writer is not None else {"running": False}
+    return {**live_status.stats(), **writer}
+
+@app.get("/api/admission-stats", tags=["Diagnostics"], summary="Admission control and load shedding")
+async def get_admission_stats():
+    """Returns the concurrency limit, queue depth per priority class and the admitted / shed / degraded counters."""
+    if admission_control is None:
+        return {"enabled": False}
+    return {"enabled": True, **admission_control.stats(), "last_results": last_results.stats()}
+
+@app.get("/api/region-stats", tags=["Diagnostics"], summary="Region-partitioned hospital collections")
+async def get_region_stats():
+    """Returns the region precision, region collections found and how many regions searches were routed to."""
+    if not isinstance(hospitals_collection, RegionCollections):
+        return {"enabled": False}
+    return {"enabled": True, **hospitals_collection.stats()}
+
+@app.get("/api/tile-stats", tags=["Diagnostics"], summary="Condition-profile tile statistics")
+async def get_tile_stats():
+    """Returns the grid, hit/fallback counters and incremental updates of the precomputed hospital tiles."""
+    if hospital_tiles is None:
+        return {"enabled": False}
+    return {"enabled": True, **hospital_tiles.stats()}
+
+@app.get("/api/snapshot-stats", tags=["Diagnostics"], summary="Shared hospital snapshot status")
+async def get_snapshot_stats():
+    """Returns the generation, size and mapped bytes of the shared snapshot this worker searches (SEARCH_ENGINE=shared)."""
+    if not isinstance(hospital_index, SnapshotIndex):
+        return {"enabled": False}
+    return {"enabled": True, "pid": os.getpid(), **hospital_index.stats()}
+
+@app.get("/metrics", tags=["Diagnostics"], summary="Prometheus metrics")
+async def get_metrics():
+    """Request and search-stage latency histograms, result counts, cache hit ratios and MongoDB pool wait, in Prometheus text format."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED=false).")
+    return Response(content=metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+startup.imported()
+
 # --- How to Run Locally ---
 # 1. Make sure MongoDB (Atlas or Local) is running.
 # 2. Ensure .env file has MONGO_URI and optionally DB_NAME.
 # 3. Activate virtual environment (recommended): source venv/bin/activate (or .\venv\Scripts\activate on Windows)
-# 4. Install dependencies: pip install fastapi uvicorn pymongo[srv] python-dotenv pydantic email-validator
+# 4. Install dependencies: pip install -r requirements.txt (fastapi, uvicorn, "pymongo[srv]>=4.9", numpy, scipy, orjson, ...)
 # 5. Run Uvicorn: uvicorn main:app --reload --host 0.0.0.0 --port 8080
 # 6. Access API docs at http://127.0.0.1:8080/docs
-# 7. Access application at http://127.0.0.1:8080/
\ No newline at end of file
+# 7. Access application at http://127.0.0.1:8080/
+# 8. (Optional) Set SEARCH_ENGINE=memory in .env to answer searches from an in-process index loaded at startup.
+#    Check it against the $geoNear path with: python -m bench.parity_check
+# 9. The search cache is on by default; tune it with SEARCH_CACHE_ENABLED, SEARCH_CACHE_SIZE,
+#    SEARCH_CACHE_TTL_SECONDS and SEARCH_CACHE_CELL_DEG. Counters are at /api/cache-stats.
+# 10. The in-memory index and cache follow database writes via a change stream (needs a replica set or
+#     Atlas) or by polling updatedAt (SNAPSHOT_SYNC=auto|change_stream|poll|off). Lag is at /api/sync-stats.
+# 11. (Optional) Set ROAD_GRAPH_FILE to a local OSM extract (e.g. a Mumbai .osm.pbf / .osm) to enable
+#     /api/find-suitable?rankBy=eta (drive-time ranking, fully offline). Try it with: python -m bench.bench_road_eta
+# 12. (Optional) Precompute the nearest suitable hospitals per condition profile: python build_tiles.py
+#     (or --from data/hospitals_sample.ndjson), then set TILES_DIR=data/tiles. Searches whose filters match
+#     a profile become a grid-cell lookup; counters are at /api/tile-stats. Check with: python -m bench.bench_tiles
+# 13. POST /api/triage-search takes {lat, lon, condition, details} and resolves the needs server-side (same rules
+#     as analyzePatientCondition in map-script.js) before searching. Check / benchmark it with: python -m bench.bench_triage
+# 14. Prometheus metrics are at /metrics (METRICS_ENABLED=false turns them off). SERVER_TIMING_HEADER=true adds
+#     each request's stage timings to a Server-Timing header (shown in browser devtools). Per-request logs are
+#     at DEBUG level. Measure the instrumentation overhead with: python -m bench.bench_metrics
+# 15. Load test: python -m bench.load_api (open-loop, clustered patient locations, datasets of 30 / 10k / 1M
+#     hospitals on mongomock or a local mongod; --out results.json, then --diff old.json new.json between runs).
+# 16. Multi-worker mode: run `python snapshot_loader.py` once per host (publishes a memory-mapped hospital snapshot
+#     to SNAPSHOT_DIR, /dev/shm by default, and a new generation after writes), then start the API with
+#     SEARCH_ENGINE=shared uvicorn main:app --workers N. Workers attach in milliseconds and share one copy of the data;
+#     status is at /api/snapshot-stats. Measure attach time and per-worker memory with: python -m bench.bench_snapshot
+# 17. ?radiusMode=adaptive (or "radiusMode": "adaptive" for /api/triage-search) starts at ADAPTIVE_START_RADIUS_METERS
+#     and doubles up to ADAPTIVE_MAX_RADIUS_METERS until 15 hospitals are found; the radius used is reported in the
+#     X-Search-Radius-Km / X-Radius-Expansions headers. Compare with the fixed radius: python -m bench.bench_radius
+# 18. Beyond the first 15 results: GET /api/find-suitable/page?...&pageSize=50 returns {hospitals, nextCursor}; pass
+#     nextCursor back as &cursor= for the next page. GET /api/find-suitable/stream streams every hospital within
+#     radiusKm as NDJSON, nearest first. Check pages and streams against one search with: python -m bench.bench_pagination
+# 19. The server accepts requests right away: GET /healthz is the liveness probe, GET /readyz turns 200 once searches
+#     can be answered (database reachable and 2dsphere index ensured, or a shared snapshot attached) while the rest of
+#     startup (index, tiles, road graph, warm-up search) continues in the background. STARTUP_MODE=blocking restores
+#     the all-before-serving startup; READINESS_REQUIRES_WARMUP=true keeps /readyz at 503 until warm-up is done.
+#     Import time and time to the first served search are at /metrics. Measure cold start against a local stub
+#     database with: python -m bench.cold_start
+# 20. Hospitals push live availability with POST /api/hospitals/{id}/status {"icuBedsAvailable": 2,
+#     "ventilatorsAvailable": 1, "erLoad": 70}; searches filter on it with &minIcuBeds=1&minVentilators=1&maxErLoad=90.
+#     Updates are coalesced per hospital and bulk-written to liveStatus every LIVE_STATUS_FLUSH_SECONDS (counters at
+#     /api/status-stats). Each hospital sends its own key in X-Hospital-Key, from HOSPITAL_STATUS_KEYS_FILE
+#     ({"42": "<key>", ...}, by numeric id or _id; pushes are refused without it); browsers can't call the endpoint
+#     (no CORS). Load-test updates alongside searches with: python -m bench.load_status
+# 21. ?rankBy=score (or "rankBy": "score" for /api/triage-search) ranks the suitable hospitals by a weighted score of
+#     distance, the requested specialist / equipment they actually have, ICU and live free ICU beds, with per-condition
+#     weights (&condition=cardiac, or the condition the filters belong to). Override the weights with
+#     SCORE_WEIGHTS_FILE={"cardiac": {"specialist": 1.0}, ...}. Time scoring 10k candidates: python -m bench.bench_scoring
+# 22. For static hosting without a reachable API: python export_shards.py (or --from data/hospitals_sample.ndjson)
+#     writes the hospitals as pre-gzipped geohash shards plus a manifest to ../shards, next to map-index.html;
+#     map-script.js then falls back to the 1-4 shards around the user (STATIC_SHARDS_URL). Re-run it with --update
+#     after hospital changes to rewrite only the affected shards. Measure with: python -m bench.bench_shards
+# 23. Under surge load at most ADMISSION_MAX_CONCURRENT searches run at once (default MONGO_MAX_POOL_SIZE); the rest
+#     queue per priority class. Dispatcher consoles send X-Dispatch-Key (one of DISPATCH_API_KEYS) and go first, with
+#     ADMISSION_DISPATCH_RESERVED slots of their own. Searches not admitted within ADMISSION_DISPATCH_QUEUE_SECONDS /
+#     ADMISSION_PUBLIC_QUEUE_SECONDS are shed: /api/find-suitable and /api/triage-search answer with the last results
+#     near the caller (X-Degraded: stale-results, X-Results-Age-Seconds), other searches with 503 + Retry-After
+#     (a stream holds its slot until it ends). Queue depth, shed counts and wait times are at /metrics and
+#     /api/admission-stats. ADMISSION_ENABLED=false turns it off. Overload test: python -m bench.load_admission
+# 24. National datasets: python load_data.py --region-precision 3 data/india.ndjson stores the hospitals in one collection
+#     per geohash cell (hospitals_te7, ..., ~156 km cells) with its own indexes, then start the API with
+#     HOSPITAL_REGION_PRECISION=3. Each $geoNear search runs only on the cells within its radius (1-4 for 50 km) and
+#     their results are merged nearest first; routing counters are at /api/region-stats. Compare with one collection as
+#     the dataset grows: python -m bench.bench_regions --mongo-uri mongodb://localhost:27017
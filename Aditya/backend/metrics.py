@@ -0,0 +1,347 @@
+# metrics.py
+"""
+Request latency instrumentation and a Prometheus exporter (text format 0.0.4).
+
+The API only needs counters, histograms and values read at scrape time, so
+they are implemented here instead of pulling in a client library; recording
+is a bisect and two list/float updates, well under a microsecond
+(python -m bench.bench_metrics).
+
+Search stages are timed at their call sites:
+
+    start = time.perf_counter()
+    ...
+    observe_stage("db_aggregation", start)
+
+which feeds the `chetak_stage_seconds{stage=...}` histogram and, when the
+Server-Timing header is enabled, the current request's timings (a ContextVar
+set by MetricsMiddleware). MongoPoolListener records how long operations wait
+for a pooled connection.
+
+Everything runs on the event loop; updates are not locked.
+"""
+
+import math
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+ENABLED = True # Set from main.METRICS_ENABLED; when False nothing is recorded
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RESULT_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 15, 25, 50, 100, 250, 500, 1000)
+REGION_COUNT_BUCKETS = (0, 1, 2, 3, 4, 6, 9, 16, 32)
+
+# Stages of a search (see observe_stage call sites in main.py)
+STAGES = ("filter_build", "db_aggregation", "db_find", "memory_search", "cache_lookup", "tile_lookup",
+          "eta_rank", "score_rank", "triage", "serialization")
+
+# (stage, seconds) pairs of the current request, or None when Server-Timing is off
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+# --- Metric Types ---
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any]) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Registry:
+    """Metrics rendered by /metrics, in registration order."""
+
+    def __init__(self):
+        self.metrics: List[Any] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> bytes:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return ("\n".join(lines) + "\n").encode()
+
+
+REGISTRY = Registry()
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1) # Last slot: above the largest bound (+Inf)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class _Metric:
+    kind = ""
+    child_class: Callable[..., Any] = None
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional[Registry] = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        if registry is not None:
+            registry.register(self)
+
+    def _new_child(self):
+        return self.child_class()
+
+    def labels(self, *values: Any):
+        """The child for these label values (created on first use; keep the label sets small)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+            child = self._children[values] = self._new_child()
+        return child
+
+
+class Counter(_Metric):
+    kind = "counter"
+    child_class = _CounterChild
+
+    def inc(self, amount: float = 1) -> None:
+        self._children[()].inc(amount)
+
+    def samples(self) -> Iterable[str]:
+        for values, child in self._children.items():
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS, registry: Optional[Registry] = REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._children[()].observe(value)
+
+    def samples(self) -> Iterable[str]:
+        names = self.labelnames + ("le",)
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), list(child.counts)):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(names, values + (_format_value(bound),))} {cumulative}"
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Sampled:
+    """
+    A gauge or counter whose values are read at scrape time from `read()`,
+    which yields (label values, value) pairs; None values are skipped.
+    Used for state other modules already count (cache hits, snapshot staleness).
+    """
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames: Sequence[str],
+                 read: Callable[[], Iterable[Tuple[Tuple[Any, ...], Optional[float]]]],
+                 registry: Optional[Registry] = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.read = read
+        if registry is not None:
+            registry.register(self)
+
+    def samples(self) -> Iterable[str]:
+        for values, value in self.read():
+            if value is not None:
+                yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}"
+
+
+# --- API Metrics ---
+
+REQUEST_SECONDS = Histogram("chetak_request_seconds", "Time from request start to response end, by route.", ["path"])
+REQUESTS = Counter("chetak_requests_total", "Requests by route, method and status code.", ["path", "method", "status"])
+STAGE_SECONDS = Histogram("chetak_stage_seconds", "Time spent in each search stage.", ["stage"])
+RESULT_COUNT = Histogram("chetak_search_results", "Hospitals returned per search.", ["endpoint"], buckets=RESULT_COUNT_BUCKETS)
+POOL_WAIT_SECONDS = Histogram("chetak_mongo_pool_wait_seconds", "Time operations waited to check out a pooled MongoDB connection.")
+POOL_CHECKOUT_FAILURES = Counter("chetak_mongo_pool_checkout_failures_total", "Failed connection checkouts by reason.", ["reason"])
+ADMISSION_WAIT_SECONDS = Histogram("chetak_admission_wait_seconds", "Time searches waited for an admission slot, by priority class and outcome.",
+                                   ["priority", "outcome"])
+REGIONS_PER_SEARCH = Histogram("chetak_regions_per_search", "Region collections a MongoDB search was routed to (HOSPITAL_REGION_PRECISION).",
+                                buckets=REGION_COUNT_BUCKETS)
+
+_STAGE_CHILDREN = {stage: STAGE_SECONDS.labels(stage) for stage in STAGES}
+
+
+def observe_seconds(stage: str, seconds: float) -> None:
+    """Records `seconds` spent in a search stage (one of STAGES)."""
+    if not ENABLED:
+        return
+    _STAGE_CHILDREN[stage].observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+def observe_stage(stage: str, start: float) -> None:
+    """Records the time since `start` (a time.perf_counter() value) for a search stage."""
+    observe_seconds(stage, time.perf_counter() - start)
+
+
+def observe_results(endpoint: str, count: int) -> None:
+    """Records how many hospitals one search returned."""
+    if ENABLED:
+        RESULT_COUNT.labels(endpoint).observe(count)
+
+
+def server_timing(timings: List[Tuple[str, float]], total_seconds: float) -> bytes:
+    """Server-Timing header value: `stage;dur=<ms>` per recorded stage plus the total."""
+    entries = [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in timings]
+    entries.append(f"total;dur={total_seconds * 1000:.3f}")
+    return ", ".join(entries).encode("latin-1")
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request duration and status per route, and
+    optionally adding a Server-Timing header with the request's stage timings.
+
+    The path label is the matched route's template (taken from the endpoint the
+    router stored in the scope), or "other" for unmatched paths, so it stays
+    bounded whatever URLs clients send.
+    """
+
+    def __init__(self, app, routes: Sequence[Any], server_timing_header: bool = False):
+        self.app = app
+        self.routes = routes # The app's route list (routes added later are picked up on first request)
+        self.server_timing_header = server_timing_header
+        self._paths: Optional[Dict[Any, str]] = None
+        self._children: Dict[Tuple[Any, str, int], Tuple[_HistogramChild, _CounterChild]] = {}
+
+    def _path_label(self, scope) -> str:
+        if self._paths is None:
+            self._paths = {route.endpoint: route.path for route in self.routes if hasattr(route, "endpoint")}
+        return self._paths.get(scope.get("endpoint"), "other")
+
+    def _record(self, scope, status: int, seconds: float) -> None:
+        key = (scope.get("endpoint"), scope["method"], status)
+        children = self._children.get(key)
+        if children is None:
+            path = self._path_label(scope)
+            children = self._children[key] = (REQUEST_SECONDS.labels(path), REQUESTS.labels(path, scope["method"], status))
+        children[0].observe(seconds)
+        children[1].value += 1
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        timings: Optional[List[Tuple[str, float]]] = None
+        token = None
+        if self.server_timing_header:
+            timings = []
+            token = _request_timings.set(timings)
+        status = 500 # Reported if the app raises before starting a response
+
+        async def send_with_metrics(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if timings is not None:
+                    headers = list(message.get("headers", ()))
+                    headers.append((b"server-timing", server_timing(timings, time.perf_counter() - start)))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            if token is not None:
+                _request_timings.reset(token)
+            self._record(scope, status, time.perf_counter() - start)
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """Records connection checkout wait times (pass in AsyncMongoClient's event_listeners)."""
+
+    def connection_checked_out(self, event):
+        if ENABLED:
+            POOL_WAIT_SECONDS.observe(event.duration)
+            timings = _request_timings.get()
+            if timings is not None:
+                timings.append(("pool_wait", event.duration))
+
+    def connection_check_out_failed(self, event):
+        if ENABLED:
+            POOL_WAIT_SECONDS.observe(event.duration)
+            POOL_CHECKOUT_FAILURES.labels(event.reason).inc()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_checked_in(self, event):
+        pass
@@ -0,0 +1,72 @@
+# pagination.py
+"""
+Opaque cursors for paginated hospital searches (/api/find-suitable/page).
+
+Pages are ordered by (distance, hospital key), so a page can start right after
+the last hospital of the previous one without the server keeping any state:
+the cursor carries that hospital's exact distance in meters and its key
+(MongoDB `_id`, or numeric `id`), plus a fingerprint of the search it belongs
+to. A cursor presented with different coordinates, filters or radius is
+rejected instead of silently paging through another result list.
+
+Tokens are URL-safe base64 of a small JSON array; they are opaque to clients,
+not signed (a forged cursor can only skip ahead in a public hospital list).
+"""
+
+import base64
+import hashlib
+import binascii
+from typing import Any, NamedTuple
+
+import orjson
+from bson import ObjectId
+
+
+class InvalidCursor(ValueError):
+    """A page cursor that can't be decoded or belongs to a different search."""
+
+
+class PageCursor(NamedTuple):
+    distance_m: float # Exact distance of the last hospital served
+    key: Any # Its doc_key (geo_index.doc_key)
+
+
+def search_fingerprint(*parts: Any) -> str:
+    """Short digest of the search parameters (coordinates, normalized filters, radius)."""
+    return hashlib.blake2s(orjson.dumps(parts, default=str), digest_size=8).hexdigest()
+
+
+def _encode_key(key: Any) -> Any:
+    if isinstance(key, ObjectId):
+        return {"$oid": str(key)}
+    return key
+
+
+def _decode_key(value: Any) -> Any:
+    if isinstance(value, dict):
+        oid = value.get("$oid")
+        if not isinstance(oid, str) or not ObjectId.is_valid(oid):
+            raise InvalidCursor("Malformed cursor key.")
+        return ObjectId(oid)
+    if isinstance(value, (int, str)):
+        return value
+    raise InvalidCursor("Malformed cursor key.")
+
+
+def encode_cursor(fingerprint: str, distance_m: float, key: Any) -> str:
+    payload = orjson.dumps([fingerprint, distance_m, _encode_key(key)])
+    return base64.urlsafe_b64encode(payload).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(token: str, fingerprint: str) -> PageCursor:
+    """Returns the cursor's position; raises InvalidCursor if it's malformed or for another search."""
+    try:
+        payload = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        cursor_fingerprint, distance_m, key = orjson.loads(payload)
+    except (binascii.Error, orjson.JSONDecodeError, ValueError, TypeError) as err:
+        raise InvalidCursor("Malformed cursor.") from err
+    if cursor_fingerprint != fingerprint:
+        raise InvalidCursor("Cursor belongs to a different search (coordinates, filters or radius changed).")
+    if not isinstance(distance_m, (int, float)) or isinstance(distance_m, bool) or distance_m < 0:
+        raise InvalidCursor("Malformed cursor distance.")
+    return PageCursor(float(distance_m), _decode_key(key))
@@ -0,0 +1,134 @@
+# ranking.py
+"""
+Vectorized (NumPy) haversine ranking engine.
+
+Hospital coordinates are held in contiguous float64 arrays (radians, with
+cos(lat) precomputed), distances from one or many query points are computed
+in a single vectorized call, and the nearest N within the search radius are
+picked with a partial sort (argpartition) instead of sorting every candidate.
+"""
+
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Radius MongoDB uses for spherical distances on GeoJSON points (in meters).
+# Using the same value keeps distance_km identical to the $geoNear path.
+EARTH_RADIUS_M = 6378100.0
+
+
+def select_nearest(distances: np.ndarray, max_distance_m: float, limit: int,
+                   keys: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Returns indices into `distances` of the `limit` nearest values within
+    `max_distance_m`, nearest first. Ties are broken by `keys` (default: index),
+    so results don't depend on how argpartition orders equal distances.
+    """
+    within = np.flatnonzero(distances <= max_distance_m)
+    if len(within) > limit:
+        # Partial sort: only values up to the limit-th smallest distance survive
+        within_d = distances[within]
+        kth = np.partition(within_d, limit - 1)[limit - 1]
+        within = within[within_d <= kth]
+    tie_keys = within if keys is None else keys[within]
+    order = np.lexsort((tie_keys, distances[within]))[:limit]
+    return within[order]
+
+
+class HaversineRanker:
+    """Coordinates of a set of points (hospitals) laid out for vectorized distance ranking."""
+
+    def __init__(self, lats: Sequence[float], lons: Sequence[float]):
+        self.lat = np.ascontiguousarray(np.radians(np.asarray(lats, dtype=np.float64)))
+        self.lon = np.ascontiguousarray(np.radians(np.asarray(lons, dtype=np.float64)))
+        self.cos_lat = np.cos(self.lat)
+
+    @classmethod
+    def from_radians(cls, lat: np.ndarray, lon: np.ndarray, cos_lat: np.ndarray) -> "HaversineRanker":
+        """Uses already converted arrays as they are (no copy, e.g. memory-mapped snapshot columns)."""
+        ranker = cls.__new__(cls)
+        ranker.lat, ranker.lon, ranker.cos_lat = lat, lon, cos_lat
+        return ranker
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    def set(self, position: int, lat: float, lon: float) -> None:
+        """Moves one point in place."""
+        self.lat[position] = np.radians(lat)
+        self.lon[position] = np.radians(lon)
+        self.cos_lat[position] = np.cos(self.lat[position])
+
+    def extend(self, lats: Sequence[float], lons: Sequence[float]) -> None:
+        """Appends points (copies the arrays once per call, so add points in batches)."""
+        lat = np.radians(np.asarray(lats, dtype=np.float64))
+        self.lat = np.concatenate([self.lat, lat])
+        self.lon = np.concatenate([self.lon, np.radians(np.asarray(lons, dtype=np.float64))])
+        self.cos_lat = np.concatenate([self.cos_lat, np.cos(lat)])
+
+    def distances_m(self, lat: float, lon: float, positions: Optional[np.ndarray] = None) -> np.ndarray:
+        """Distances in meters from (lat, lon) to every point (or only `positions`)."""
+        p_lat, p_lon, p_cos = (self.lat, self.lon, self.cos_lat) if positions is None else \
+            (self.lat[positions], self.lon[positions], self.cos_lat[positions])
+        q_lat = np.radians(lat)
+        q_lon = np.radians(lon)
+        a = np.sin((p_lat - q_lat) / 2) ** 2 + np.cos(q_lat) * p_cos * np.sin((p_lon - q_lon) / 2) ** 2
+        return 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+    def distances_many_m(self, lats: Sequence[float], lons: Sequence[float],
+                         positions: Optional[np.ndarray] = None) -> np.ndarray:
+        """Distances in meters, shape (n_queries, n_points), in one vectorized pass."""
+        p_lat, p_lon, p_cos = (self.lat, self.lon, self.cos_lat) if positions is None else \
+            (self.lat[positions], self.lon[positions], self.cos_lat[positions])
+        q_lat = np.radians(np.asarray(lats, dtype=np.float64))[:, None]
+        q_lon = np.radians(np.asarray(lons, dtype=np.float64))[:, None]
+        a = (np.sin((p_lat[None, :] - q_lat) / 2) ** 2
+             + np.cos(q_lat) * p_cos[None, :] * np.sin((p_lon[None, :] - q_lon) / 2) ** 2)
+        return 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+    def top_k(self, lat: float, lon: float, max_distance_m: float, limit: int,
+              positions: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Nearest `limit` points within `max_distance_m` of (lat, lon), searching
+        all points or only `positions`. Returns (positions, distances_m), nearest
+        first; equal distances are ordered by position.
+        """
+        if positions is None:
+            positions = np.arange(len(self.lat))
+        distances = self.distances_m(lat, lon, positions)
+        chosen = select_nearest(distances, max_distance_m, limit, keys=positions)
+        return positions[chosen], distances[chosen]
+
+    def top_k_many(self, lats: Sequence[float], lons: Sequence[float], max_distance_m: float, limit: int,
+                   positions: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """top_k for many query points; distances for all of them come from one matrix."""
+        if positions is None:
+            positions = np.arange(len(self.lat))
+        matrix = self.distances_many_m(lats, lons, positions)
+        ranked = []
+        for row in matrix:
+            chosen = select_nearest(row, max_distance_m, limit, keys=positions)
+            ranked.append((positions[chosen], row[chosen]))
+        return ranked
+
+
+def haversine_matrix_m(query_lats: Sequence[float], query_lons: Sequence[float],
+                       lats: Sequence[float], lons: Sequence[float]) -> np.ndarray:
+    """
+    Great-circle distances in meters, shape (n_queries, n_points).
+    Same formula and earth radius as geo_index.haversine_m.
+    """
+    return HaversineRanker(lats, lons).distances_many_m(query_lats, query_lons)
+
+
+def rank_many(query_lats: Sequence[float], query_lons: Sequence[float],
+              lats: Sequence[float], lons: Sequence[float],
+              max_distance_m: float, limit: int) -> List[List[Tuple[int, float]]]:
+    """
+    For every query point returns up to `limit` (point index, distance_m) pairs
+    within `max_distance_m`, nearest first (ties keep point order).
+    """
+    if len(lats) == 0:
+        return [[] for _ in range(len(query_lats))]
+    ranked = HaversineRanker(lats, lons).top_k_many(query_lats, query_lons, max_distance_m, limit)
+    return [list(zip(chosen.tolist(), distances.tolist())) for chosen, distances in ranked]
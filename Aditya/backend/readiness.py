@@ -0,0 +1,90 @@
+# readiness.py
+"""
+Startup progress of the API process, for liveness / readiness probes and
+cold-start metrics.
+
+main.py records how long its import took, times each startup phase
+(database connection, index creation, snapshot / tile / road graph loading,
+warm-up queries) and the time from import to the first search it served
+successfully. /readyz reports the phases; /metrics exports them as gauges:
+
+    chetak_import_seconds
+    chetak_startup_phase_seconds{phase=...}
+    chetak_time_to_first_query_seconds
+    chetak_ready
+"""
+
+import time
+import logging
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from metrics import Sampled
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTracker:
+    """Phase timings and readiness of one API process (all times from `started_at`, a perf_counter value)."""
+
+    def __init__(self, started_at: float):
+        self.started_at = started_at
+        self.import_seconds: Optional[float] = None
+        self.phases: Dict[str, float] = {} # Phase -> seconds it took
+        self.errors: Dict[str, str] = {} # Phase -> last error
+        self.running: Optional[str] = None # Phase in progress
+        self.warm = False # Every startup phase finished (successfully or not)
+        self.ready_at: Optional[float] = None # Seconds from import to the first time the process was ready
+        self.first_query_seconds: Optional[float] = None
+
+    def imported(self) -> None:
+        self.import_seconds = time.perf_counter() - self.started_at
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Times a startup phase; an exception is recorded (and re-raised) as that phase's error."""
+        self.running = name
+        start = time.perf_counter()
+        try:
+            yield
+            self.errors.pop(name, None)
+        except Exception as err:
+            self.errors[name] = f"{type(err).__name__}: {err}"
+            raise
+        finally:
+            self.phases[name] = time.perf_counter() - start
+            self.running = None
+
+    def mark_ready(self) -> None:
+        if self.ready_at is None:
+            self.ready_at = time.perf_counter() - self.started_at
+            logger.info(f"Ready to serve searches {self.ready_at:.3f}s after import started.")
+
+    def query_succeeded(self) -> None:
+        """Call after each successful search; only the first one is recorded."""
+        if self.first_query_seconds is None:
+            self.first_query_seconds = time.perf_counter() - self.started_at
+
+    def stats(self) -> Dict[str, Any]:
+        def rounded(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round(value, 4)
+        return {
+            "import_seconds": rounded(self.import_seconds),
+            "phases": {name: round(seconds, 4) for name, seconds in self.phases.items()},
+            "running": self.running,
+            "errors": dict(self.errors),
+            "warm": self.warm,
+            "ready_after_seconds": rounded(self.ready_at),
+            "first_query_after_seconds": rounded(self.first_query_seconds),
+        }
+
+    def register_metrics(self, is_ready: Callable[[], bool]) -> None:
+        """Exports the startup timings at /metrics (`is_ready` is evaluated at scrape time)."""
+        Sampled("chetak_import_seconds", "Time taken to import the API module.", "gauge", [],
+                lambda: [((), self.import_seconds)])
+        Sampled("chetak_startup_phase_seconds", "Time taken by each startup phase.", "gauge", ["phase"],
+                lambda: [((name,), seconds) for name, seconds in self.phases.items()])
+        Sampled("chetak_time_to_first_query_seconds", "Time from import to the first successfully served search.", "gauge", [],
+                lambda: [((), self.first_query_seconds)])
+        Sampled("chetak_ready", "1 when the process can serve searches (readiness probe), else 0.", "gauge", [],
+                lambda: [((), 1 if is_ready() else 0)])
@@ -0,0 +1,368 @@
+# regions.py
+"""
+Region-partitioned hospital collections.
+
+With HOSPITAL_REGION_PRECISION set, hospitals are stored in one collection
+per geohash cell of that precision (`hospitals_te7`, ... the cells of
+static_shards.py), each with its own 2dsphere index, instead of the single
+`hospitals` collection. load_data.py places every record in the collection
+of its cell; a national dataset then never puts one region's searches or
+writes on another region's index.
+
+RegionCollections stands in for the single collection where the API and
+snapshot_loader.py use it:
+- aggregate() with a $geoNear pipeline runs only on the regions within its
+  maxDistance of the search point (routing), concurrently, and merges their
+  results nearest first (by $geoNear's own distance, then _id) up to the
+  pipeline's $limit (a search straddling a region boundary gets the same
+  top-k as on one collection);
+- find() reads every region (or the ones passed), with sort / limit applied
+  across them;
+- bulk_write() sends a write whose routing key names one hospital
+  (("_id" | "id", value), passed by the caller like StatusWriter does) to
+  that hospital's region only, found once and remembered until the next
+  listing; other writes, and create_index(), go to every region;
+- watch() is one database change stream over the region collections.
+
+The regions present are listed at startup and again every `refresh_seconds`
+(new ones appear as the loader reaches new cells).
+"""
+
+import re
+import math
+import time
+import heapq
+import asyncio
+from itertools import islice
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import metrics
+from geo_index import haversine_m
+from metrics import REGIONS_PER_SEARCH
+from ranking import EARTH_RADIUS_M
+from static_shards import GEOHASH_BASE32, cell_bounds, cell_size_deg, geohash
+
+REGION_PREFIX = "hospitals_"
+REGION_NAME_PATTERN = f"^{REGION_PREFIX}[{GEOHASH_BASE32}]+$"
+ROUTING_MARGIN = 1.01 # Cell distances are measured along parallels / meridians, slightly over the great circle
+
+
+# --- Regions ---
+
+def region_of(lat: float, lon: float, precision: int) -> str:
+    return geohash(lat, lon, precision)
+
+
+def collection_name(region: str) -> str:
+    return f"{REGION_PREFIX}{region}"
+
+
+def region_names(names: Iterable[str]) -> List[str]:
+    """The regions among collection names."""
+    pattern = re.compile(REGION_NAME_PATTERN)
+    return sorted(name[len(REGION_PREFIX):] for name in names if pattern.match(name))
+
+
+def _distance_to_cell_m(lat: float, lon: float, region: str) -> float:
+    min_lat, max_lat, min_lon, max_lon = cell_bounds(region)
+    half_width = (max_lon - min_lon) / 2
+    offset = (lon - (min_lon + half_width) + 180) % 360 - 180 # From the cell's centre, across the antimeridian too
+    outside = offset - min(max(offset, -half_width), half_width)
+    return haversine_m(lon, lat, lon - outside, min(max(lat, min_lat), max_lat))
+
+
+def regions_within(lat: float, lon: float, radius_m: float, precision: int) -> List[str]:
+    """Every cell of `precision` holding points within `radius_m` of (lat, lon); the point's own cell first."""
+    height, width = cell_size_deg(precision)
+    rows, cols = round(180 / height), round(360 / width)
+    angle = radius_m / EARTH_RADIUS_M
+    d_lat = math.degrees(angle)
+    first_row = max(0, math.floor((lat - d_lat + 90) / height))
+    last_row = min(rows - 1, math.floor((lat + d_lat + 90) / height))
+    if lat + d_lat >= 90 or lat - d_lat <= -90 or angle >= math.pi / 2:
+        col_range = range(cols) # Reaches a pole: every longitude
+    else:
+        # Widest longitude span of a spherical cap
+        d_lon = math.degrees(math.asin(min(1.0, math.sin(angle) / math.cos(math.radians(lat)))))
+        first_col, last_col = math.floor((lon - d_lon + 180) / width), math.floor((lon + d_lon + 180) / width)
+        col_range = range(cols) if last_col - first_col + 1 >= cols else range(first_col, last_col + 1)
+
+    own = region_of(lat, lon, precision)
+    regions = [own]
+    for row in range(first_row, last_row + 1):
+        for col in col_range:
+            region = geohash(-90 + (row + 0.5) * height, -180 + ((col % cols) + 0.5) * width, precision)
+            if region != own and _distance_to_cell_m(lat, lon, region) <= radius_m * ROUTING_MARGIN:
+                regions.append(region)
+    return regions
+
+
+# --- Merging ---
+
+class BulkResult(NamedTuple):
+    matched_count: int
+    modified_count: int
+
+
+def nearest_key(lon: float, lat: float, distance_field: Optional[str] = None) -> Callable[[Dict[str, Any]], Tuple[float, str]]:
+    """
+    Sort key of hospital documents by distance from (lon, lat), ties by _id
+    (like the page pipeline): the distance $geoNear put in `distance_field`,
+    or the haversine distance for documents without it.
+    """
+    def key(doc: Dict[str, Any]) -> Tuple[float, str]:
+        distance = doc.get(distance_field) if distance_field else None
+        if distance is None:
+            distance = haversine_m(lon, lat, *doc["location"]["coordinates"][:2])
+        return distance, str(doc.get("_id"))
+    return key
+
+
+def _keep_field(pipeline: List[Dict[str, Any]], field: str) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    The pipeline with `field` kept through its $project stages, and whether it
+    had to be added (the caller then removes it from the results).
+    """
+    kept, added = [], False
+    for stage in pipeline:
+        projection = stage.get("$project")
+        if isinstance(projection, dict) and field not in projection and any(
+                value in (1, True) for name, value in projection.items() if name != "_id"):
+            stage, added = {"$project": {**projection, field: 1}}, True # Inclusion projection leaving it out
+        elif isinstance(projection, dict) and projection.get(field) in (0, False):
+            stage, added = {"$project": {k: v for k, v in projection.items() if k != field}}, True
+        kept.append(stage)
+    return kept, added
+
+
+class MergedCursor:
+    """
+    Nearest-first merge of per-region cursors that are each nearest first,
+    stopping after `limit` documents. `hidden` is a field only kept for the
+    merge key, removed from the documents returned. Supports to_list(),
+    `async for` and close().
+    """
+
+    def __init__(self, cursors: List[Any], key: Callable[[Dict[str, Any]], Any], limit: Optional[int],
+                 hidden: Optional[str] = None):
+        self._cursors = cursors
+        self._key = key
+        self._limit = limit
+        self._hidden = hidden
+
+    def _shown(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        if self._hidden is not None:
+            doc.pop(self._hidden, None)
+        return doc
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        lists = await asyncio.gather(*(cursor.to_list(None) for cursor in self._cursors))
+        limits = [n for n in (self._limit, length) if n]
+        return [self._shown(doc) for doc in islice(heapq.merge(*lists, key=self._key), min(limits) if limits else None)]
+
+    def __aiter__(self) -> AsyncIterator[Dict[str, Any]]:
+        return self._merge()
+
+    async def _merge(self) -> AsyncIterator[Dict[str, Any]]:
+        heads = await asyncio.gather(*(anext(cursor, None) for cursor in self._cursors))
+        heap = [(self._key(doc), n, doc) for n, doc in enumerate(heads) if doc is not None]
+        heapq.heapify(heap)
+        sent = 0
+        while heap and sent != self._limit:
+            _, n, doc = heap[0]
+            yield self._shown(doc)
+            sent += 1
+            following = await anext(self._cursors[n], None)
+            if following is None:
+                heapq.heappop(heap)
+            else:
+                heapq.heapreplace(heap, (self._key(following), n, following))
+
+    async def close(self) -> None:
+        await asyncio.gather(*(cursor.close() for cursor in self._cursors))
+
+
+class RegionFind:
+    """find() across region collections; sort() / limit() apply to the combined result."""
+
+    def __init__(self, owner: "RegionCollections", query: Dict[str, Any], projection: Optional[Dict[str, Any]],
+                 regions: Optional[Iterable[str]]):
+        self._owner = owner
+        self._query = query
+        self._projection = projection
+        self._regions = regions
+        self._sort: Optional[Tuple[str, int]] = None
+        self._limit = 0
+
+    def sort(self, field: str, direction: int = 1) -> "RegionFind":
+        self._sort = (field, direction)
+        return self
+
+    def limit(self, limit: int) -> "RegionFind":
+        self._limit = limit
+        return self
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        known = await self._owner.current()
+        regions = sorted(known) if self._regions is None else [r for r in self._regions if r in known]
+        cursors = []
+        for region in regions:
+            cursor = self._owner.collection(region).find(self._query, self._projection)
+            if self._sort is not None:
+                cursor = cursor.sort(*self._sort)
+            if self._limit:
+                cursor = cursor.limit(self._limit)
+            cursors.append(cursor)
+        lists = await asyncio.gather(*(cursor.to_list(None) for cursor in cursors))
+        if self._sort is None:
+            docs = [doc for docs in lists for doc in docs]
+        else:
+            field, direction = self._sort
+            docs = list(heapq.merge(*lists, key=lambda doc: doc[field], reverse=direction < 0))
+        limits = [n for n in (self._limit, length) if n]
+        return docs[:min(limits)] if limits else docs
+
+
+# --- Collections ---
+
+class RegionCollections:
+    """The region collections of a database, used where the single hospitals collection would be (see module docstring)."""
+
+    routes_writes = True # bulk_write() takes routing keys (StatusWriter passes them)
+
+    def __init__(self, db, precision: int, refresh_seconds: float = 60.0):
+        self.db = db
+        self.precision = precision
+        self.refresh_seconds = refresh_seconds
+        self.regions: Set[str] = set()
+        self._listed_at = -math.inf
+        self._located: Dict[Tuple[str, Any], str] = {} # ("_id" | "id", value) -> region holding that hospital
+        # Counters
+        self.searches = 0
+        self.regions_queried = 0
+        self.straddling = 0 # Searches routed to more than one region
+        self.writes = 0 # Writes passed to bulk_write()
+        self.region_writes = 0 # Per-region bulk_write calls they became
+        self.lookups = 0 # Fan-out queries locating hospitals
+
+    def collection(self, region: str):
+        return self.db[collection_name(region)]
+
+    async def refresh(self) -> Set[str]:
+        """Lists the region collections present."""
+        names = await self.db.list_collection_names(filter={"name": {"$regex": REGION_NAME_PATTERN}})
+        self.regions = set(region_names(names))
+        self._listed_at = time.monotonic()
+        self._located.clear() # Hospitals may have moved to another cell since (load_data.py)
+        return self.regions
+
+    async def current(self) -> Set[str]:
+        if time.monotonic() - self._listed_at >= self.refresh_seconds:
+            await self.refresh()
+        return self.regions
+
+    async def route(self, lat: float, lon: float, radius_m: float) -> List[str]:
+        """The existing regions within `radius_m` of (lat, lon)."""
+        known = await self.current()
+        if radius_m == math.inf:
+            regions = sorted(known)
+        else:
+            regions = [region for region in regions_within(lat, lon, radius_m, self.precision) if region in known]
+        self.searches += 1
+        self.regions_queried += len(regions)
+        self.straddling += len(regions) > 1
+        if metrics.ENABLED:
+            REGIONS_PER_SEARCH.observe(len(regions))
+        return regions
+
+    def regions_near(self, points: Iterable[Tuple[float, float]], radius_m: float) -> Set[str]:
+        """Cells within `radius_m` of any of the (lat, lon) points (for find(regions=...))."""
+        return {region for lat, lon in set(points) for region in regions_within(lat, lon, radius_m, self.precision)}
+
+    # --- Write routing ---
+
+    async def locate(self, keys: Iterable[Tuple[str, Any]]) -> None:
+        """Finds the regions of the hospitals not located yet: one query per region for all of them."""
+        missing = {key for key in keys if key not in self._located}
+        if not missing:
+            return
+        clauses = [{field: {"$in": values}} for field in ("_id", "id")
+                   if (values := [value for f, value in missing if f == field])]
+        regions = sorted(await self.current())
+        found = await asyncio.gather(*(self.collection(region).find({"$or": clauses}, {"_id": 1, "id": 1}).to_list(None)
+                                       for region in regions))
+        for region, docs in zip(regions, found):
+            for doc in docs:
+                self._located.update({(field, doc[field]): region for field in ("_id", "id") if field in doc})
+        self.lookups += 1
+
+    # --- Collection interface ---
+
+    async def aggregate(self, pipeline: List[Dict[str, Any]], **kwargs) -> MergedCursor:
+        """Runs a $geoNear pipeline on the regions within its maxDistance, merged nearest first."""
+        geo_near = pipeline[0].get("$geoNear") if pipeline else None
+        if geo_near is None:
+            raise ValueError("Region collections only run pipelines starting with $geoNear")
+        lon, lat = geo_near["near"]["coordinates"]
+        regions = await self.route(lat, lon, geo_near.get("maxDistance", math.inf))
+        distance_field = geo_near.get("distanceField")
+        pipeline, added = _keep_field(pipeline, distance_field) if distance_field else (pipeline, False)
+        cursors = await asyncio.gather(*(self.collection(region).aggregate(pipeline, **kwargs) for region in regions))
+        limit = next((stage["$limit"] for stage in reversed(pipeline) if "$limit" in stage), None)
+        return MergedCursor(list(cursors), nearest_key(lon, lat, distance_field), limit,
+                            hidden=distance_field if added else None)
+
+    def find(self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None,
+             regions: Optional[Iterable[str]] = None) -> RegionFind:
+        return RegionFind(self, query or {}, projection, regions)
+
+    async def bulk_write(self, requests: List[Any], ordered: bool = True,
+                         keys: Optional[List[Optional[Tuple[str, Any]]]] = None) -> BulkResult:
+        """
+        One bulk_write per region involved. `keys` has the ("_id" | "id", value)
+        of the hospital each write is for (None, or no `keys`: every region);
+        a write for a hospital found in no region is dropped (it matches nothing).
+        """
+        keys = keys if keys is not None else [None] * len(requests)
+        await self.locate(key for key in keys if key is not None)
+        known = sorted(await self.current())
+        batches: Dict[str, List[Any]] = {}
+        for request, key in zip(requests, keys):
+            if key is None:
+                targets = known
+            else:
+                region = self._located.get(key)
+                targets = [region] if region is not None else []
+            for region in targets:
+                batches.setdefault(region, []).append(request)
+        results = await asyncio.gather(*(self.collection(region).bulk_write(batch, ordered=ordered)
+                                         for region, batch in sorted(batches.items())))
+        self.writes += len(requests)
+        self.region_writes += len(results)
+        return BulkResult(sum(r.matched_count for r in results), sum(r.modified_count for r in results))
+
+    async def create_index(self, keys: Any, **kwargs) -> None:
+        await asyncio.gather(*(self.collection(region).create_index(keys, **kwargs)
+                               for region in sorted(await self.current())))
+
+    async def watch(self, pipeline: Optional[List[Dict[str, Any]]] = None, **kwargs):
+        """One change stream on the database, limited to the region collections."""
+        regions_only = {"$match": {"ns.coll": {"$regex": REGION_NAME_PATTERN}}}
+        return await self.db.watch([regions_only, *(pipeline or [])], **kwargs)
+
+    async def drop(self) -> None:
+        await asyncio.gather(*(self.collection(region).drop() for region in sorted(await self.refresh())))
+        self.regions = set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "precision": self.precision,
+            "regions": len(self.regions),
+            "searches": self.searches,
+            "regions_per_search": round(self.regions_queried / self.searches, 3) if self.searches else 0.0,
+            "straddling": self.straddling,
+            "writes": self.writes,
+            "region_bulk_writes": self.region_writes,
+            "located_keys": len(self._located),
+            "location_lookups": self.lookups,
+        }
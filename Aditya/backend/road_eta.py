@@ -0,0 +1,397 @@
+# road_eta.py
+"""
+Offline road-network travel times for ranking hospitals by drive time.
+
+Straight-line distance misranks hospitals across Mumbai's harbour and creeks,
+where the nearest hospital "as the crow flies" can be a long drive around.
+This module loads a local OpenStreetMap extract into a directed road graph
+(edge weights = travel seconds from the highway type / maxspeed) and answers
+"how long to drive from here to hospital H" without any routing server:
+
+- Each hospital gets a reverse shortest-path tree: one Dijkstra run on the
+  reversed graph from the hospital's road node gives the drive time from
+  *every* node to that hospital. Trees are computed once (at load, or on first
+  use for hospitals added later, in a worker thread: build_trees()) and kept
+  in a bounded LRU.
+- A query snaps the origin to its nearest road node (KD-tree), so an ETA is
+  just `tree[node]` plus the short off-road legs at each end.
+- Origins are grouped into small grid cells; a cell's snapped node and the
+  ETAs already looked up from it are cached, so repeat origins skip the work.
+
+Supported extracts: OSM XML (.osm, .osm.gz, .osm.bz2), parsed with the
+standard library in two streaming passes, and .osm.pbf when pyosmium is
+installed. The parsed graph is cached next to the extract as `<file>.graph.npz`.
+"""
+
+import bz2
+import gzip
+import math
+import os
+import time
+import logging
+from collections import OrderedDict
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components, dijkstra
+from scipy.spatial import cKDTree
+
+from geo_index import doc_key, haversine_m
+from ranking import EARTH_RADIUS_M
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+# Typical urban speeds (km/h) per OSM highway type, used when a way has no usable maxspeed
+HIGHWAY_SPEEDS_KMH = {
+    "motorway": 80, "trunk": 60, "primary": 45, "secondary": 35, "tertiary": 30,
+    "unclassified": 25, "residential": 20, "living_street": 10, "service": 12, "road": 20,
+    "motorway_link": 50, "trunk_link": 40, "primary_link": 35, "secondary_link": 30, "tertiary_link": 25,
+}
+ONEWAY_BY_DEFAULT = {"motorway", "motorway_link"}
+ACCESS_SPEED_KMH = 15.0 # Off-road legs: origin -> nearest road node, hospital road node -> hospital
+GRAPH_CACHE_VERSION = 1
+
+
+# --- OSM extract parsing ---
+
+def _open_osm(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def _speed_kmh(tags: Dict[str, str]) -> float:
+    maxspeed = tags.get("maxspeed", "")
+    try:
+        value = float(maxspeed.split()[0])
+        return value * 1.609 if "mph" in maxspeed else value
+    except (ValueError, IndexError):
+        return HIGHWAY_SPEEDS_KMH[tags["highway"]]
+
+
+def _direction(tags: Dict[str, str]) -> Tuple[bool, bool]:
+    """(forward allowed, backward allowed) for a way."""
+    oneway = tags.get("oneway", "")
+    if oneway == "-1":
+        return False, True
+    if oneway in ("yes", "true", "1"):
+        return True, False
+    if oneway == "no":
+        return True, True
+    if tags.get("junction") == "roundabout" or tags["highway"] in ONEWAY_BY_DEFAULT:
+        return True, False
+    return True, True
+
+
+def _drivable(tags: Dict[str, str]) -> bool:
+    return (tags.get("highway") in HIGHWAY_SPEEDS_KMH
+            and tags.get("access") not in ("no", "private")
+            and tags.get("motor_vehicle") not in ("no", "private")
+            and tags.get("area") != "yes")
+
+
+def _ways_from_xml(path: str):
+    """Yields (node_refs, tags) for drivable ways, streaming the file."""
+    with _open_osm(path) as f:
+        for _, elem in ET.iterparse(f, events=("end",)):
+            if elem.tag == "way":
+                tags = {tag.get("k"): tag.get("v") for tag in elem.iter("tag")}
+                if _drivable(tags):
+                    yield [int(nd.get("ref")) for nd in elem.iter("nd")], tags
+                elem.clear()
+            elif elem.tag in ("node", "relation"):
+                elem.clear()
+
+
+def _nodes_from_xml(path: str, wanted: set):
+    """Yields (node_id, lat, lon) for the nodes in `wanted`, streaming the file."""
+    with _open_osm(path) as f:
+        for _, elem in ET.iterparse(f, events=("end",)):
+            if elem.tag == "node":
+                node_id = int(elem.get("id"))
+                if node_id in wanted:
+                    yield node_id, float(elem.get("lat")), float(elem.get("lon"))
+            if elem.tag in ("node", "way", "relation"):
+                elem.clear()
+
+
+def _read_pbf(path: str):
+    """Returns (ways, coords) from a .osm.pbf extract (needs pyosmium)."""
+    try:
+        import osmium
+    except ImportError as err:
+        raise ImportError("Reading .osm.pbf extracts needs pyosmium (pip install osmium), "
+                          "or convert the extract to .osm XML") from err
+    ways, coords = [], {}
+
+    class Handler(osmium.SimpleHandler):
+        def way(self, w):
+            tags = {tag.k: tag.v for tag in w.tags}
+            if _drivable(tags):
+                refs = [n.ref for n in w.nodes]
+                ways.append((refs, tags))
+                for n in w.nodes:
+                    if n.location.valid():
+                        coords[n.ref] = (n.location.lat, n.location.lon)
+
+    Handler().apply_file(path, locations=True)
+    return ways, coords
+
+
+class RoadGraph:
+    """Directed road graph: node coordinates plus a CSR matrix of edge travel times (seconds)."""
+
+    def __init__(self, lats: Sequence[float], lons: Sequence[float], graph: csr_matrix):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.graph = graph.tocsr()
+        self.reverse = self.graph.T.tocsr() # Dijkstra on this gives times *to* the source node
+        # Only snap to the largest strongly connected component, so every snapped
+        # origin can reach every snapped hospital (no isolated fragments, dead-end one-ways)
+        _, labels = connected_components(self.graph, directed=True, connection="strong")
+        main_component = np.bincount(labels).argmax() if len(labels) else 0
+        self.snap_nodes = np.flatnonzero(labels == main_component)
+        self._kdtree = cKDTree(self._unit_vectors(self.lats[self.snap_nodes], self.lons[self.snap_nodes]))
+
+    def __len__(self) -> int:
+        return len(self.lats)
+
+    @staticmethod
+    def _unit_vectors(lats, lons) -> np.ndarray:
+        lat = np.radians(np.asarray(lats, dtype=np.float64))
+        lon = np.radians(np.asarray(lons, dtype=np.float64))
+        return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+    def snap(self, lat: float, lon: float) -> Tuple[int, float]:
+        """Nearest routable node to (lat, lon) and the straight-line distance to it in meters."""
+        chord, position = self._kdtree.query(self._unit_vectors([lat], [lon])[0])
+        return int(self.snap_nodes[position]), 2 * EARTH_RADIUS_M * math.asin(min(1.0, chord / 2))
+
+    def times_to(self, node: int, limit_s: float = np.inf) -> np.ndarray:
+        """Drive time in seconds from every node to `node` (inf beyond `limit_s` or unreachable)."""
+        return dijkstra(self.reverse, directed=True, indices=node, limit=limit_s).astype(np.float32)
+
+    @classmethod
+    def from_ways(cls, ways, coords: Dict[int, Tuple[float, float]]) -> "RoadGraph":
+        index: Dict[int, int] = {}
+        lats: List[float] = []
+        lons: List[float] = []
+        rows: List[int] = []
+        cols: List[int] = []
+        seconds: List[float] = []
+
+        def node(ref: int) -> int:
+            position = index.get(ref)
+            if position is None:
+                position = index[ref] = len(lats)
+                lat, lon = coords[ref]
+                lats.append(lat)
+                lons.append(lon)
+            return position
+
+        for refs, tags in ways:
+            refs = [ref for ref in refs if ref in coords]
+            speed_ms = _speed_kmh(tags) / 3.6
+            forward, backward = _direction(tags)
+            for a, b in zip(refs, refs[1:]):
+                if a == b:
+                    continue
+                u, v = node(a), node(b)
+                # +0.01 s keeps zero-length segments from being dropped as explicit zeros
+                t = haversine_m(lons[u], lats[u], lons[v], lats[v]) / speed_ms + 0.01
+                for allowed, (start, end) in ((forward, (u, v)), (backward, (v, u))):
+                    if allowed:
+                        rows.append(start)
+                        cols.append(end)
+                        seconds.append(t)
+
+        n = len(lats)
+        graph = csr_matrix((seconds, (rows, cols)), shape=(n, n))
+        graph.sum_duplicates() # Parallel ways between the same nodes
+        return cls(lats, lons, graph)
+
+    @classmethod
+    def from_osm(cls, path: str) -> "RoadGraph":
+        """Builds the graph from an OSM extract (XML in two streaming passes, or PBF via pyosmium)."""
+        if path.endswith(".pbf"):
+            ways, coords = _read_pbf(path)
+        else:
+            ways = list(_ways_from_xml(path))
+            wanted = {ref for refs, _ in ways for ref in refs}
+            coords = {node_id: (lat, lon) for node_id, lat, lon in _nodes_from_xml(path, wanted)}
+        return cls.from_ways(ways, coords)
+
+    @classmethod
+    def load(cls, path: str) -> "RoadGraph":
+        """Loads the graph for an extract, reusing `<path>.graph.npz` if it's newer than the extract."""
+        start = time.perf_counter()
+        cache_path = path + ".graph.npz"
+        if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(path):
+            data = np.load(cache_path)
+            if int(data["version"]) == GRAPH_CACHE_VERSION:
+                n = len(data["lats"])
+                graph = csr_matrix((data["data"], data["indices"], data["indptr"]), shape=(n, n))
+                road_graph = cls(data["lats"], data["lons"], graph)
+                logger.info(f"Road graph loaded from cache '{cache_path}': {len(road_graph)} nodes, "
+                            f"{road_graph.graph.nnz} edges in {time.perf_counter() - start:.1f}s.")
+                return road_graph
+
+        road_graph = cls.from_osm(path)
+        try:
+            np.savez(cache_path, version=GRAPH_CACHE_VERSION, lats=road_graph.lats, lons=road_graph.lons,
+                     data=road_graph.graph.data, indices=road_graph.graph.indices, indptr=road_graph.graph.indptr)
+        except OSError as err:
+            logger.warning(f"Could not write road graph cache '{cache_path}': {err}")
+        logger.info(f"Road graph built from '{path}': {len(road_graph)} nodes, {road_graph.graph.nnz} edges, "
+                    f"{len(road_graph.snap_nodes)} routable, in {time.perf_counter() - start:.1f}s.")
+        return road_graph
+
+
+# --- ETA ranking ---
+
+class _HospitalTree:
+    __slots__ = ("coordinates", "node", "access_s", "times")
+
+    def __init__(self, coordinates, node: int, access_s: float, times: np.ndarray):
+        self.coordinates = coordinates
+        self.node = node
+        self.access_s = access_s
+        self.times = times
+
+
+class _OriginCell:
+    __slots__ = ("node", "node_lat", "node_lon", "etas")
+
+    def __init__(self, node: int, node_lat: float, node_lon: float):
+        self.node = node
+        self.node_lat = node_lat
+        self.node_lon = node_lon
+        self.etas: Dict[Any, float] = {} # hospital key -> seconds from `node`
+
+
+class EtaRanker:
+    """Re-ranks geo candidates by estimated drive time over a RoadGraph."""
+
+    def __init__(self, road_graph: RoadGraph, max_eta_s: float = 7200, cell_size_deg: float = 0.001,
+                 cache_size: int = 20000, tree_cache_size: int = 512, access_speed_kmh: float = ACCESS_SPEED_KMH):
+        self.road_graph = road_graph
+        self.max_eta_s = max_eta_s
+        self.cell_size_deg = cell_size_deg
+        self.cache_size = cache_size
+        self.tree_cache_size = tree_cache_size
+        self.access_speed_ms = access_speed_kmh / 3.6
+        self._trees: "OrderedDict[Any, _HospitalTree]" = OrderedDict()
+        self._cells: "OrderedDict[Tuple[int, int], _OriginCell]" = OrderedDict()
+        # Counters
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.trees_built = 0
+
+    def _cached_tree(self, doc: Dict[str, Any]) -> Optional[_HospitalTree]:
+        tree = self._trees.get(doc_key(doc))
+        return tree if tree is not None and tree.coordinates == tuple(doc["location"]["coordinates"]) else None
+
+    def missing_trees(self, docs: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """The hospitals among `docs` without a current travel-time tree (rank() would run a Dijkstra for each)."""
+        return [doc for doc in docs if self._cached_tree(doc) is None]
+
+    def build_trees(self, docs: Sequence[Dict[str, Any]]) -> List[_HospitalTree]:
+        """
+        Runs the Dijkstra of each hospital without touching the caches, so it can
+        run in a worker thread; add_trees() stores the result.
+        """
+        trees = []
+        for doc in docs:
+            coordinates = tuple(doc["location"]["coordinates"])
+            lon, lat = coordinates
+            node, access_m = self.road_graph.snap(lat, lon)
+            trees.append(_HospitalTree(coordinates, node, access_m / self.access_speed_ms,
+                                       self.road_graph.times_to(node, self.max_eta_s)))
+        return trees
+
+    def add_trees(self, docs: Sequence[Dict[str, Any]], trees: Sequence[_HospitalTree]) -> None:
+        for doc, tree in zip(docs, trees):
+            key = doc_key(doc)
+            if key in self._trees: # Hospital moved: cached ETAs to it are wrong
+                for cell in self._cells.values():
+                    cell.etas.pop(key, None)
+            self.trees_built += 1
+            self._trees[key] = tree
+            self._trees.move_to_end(key)
+            if len(self._trees) > self.tree_cache_size:
+                evicted, _ = self._trees.popitem(last=False)
+                for cell in self._cells.values():
+                    cell.etas.pop(evicted, None)
+
+    def _tree(self, doc: Dict[str, Any]) -> _HospitalTree:
+        tree = self._cached_tree(doc)
+        if tree is not None:
+            self._trees.move_to_end(doc_key(doc))
+            return tree
+        self.add_trees([doc], self.build_trees([doc]))
+        return self._trees[doc_key(doc)]
+
+    def precompute(self, docs: Sequence[Dict[str, Any]]) -> None:
+        """Builds reverse trees for hospitals up front (slow: one Dijkstra each; run off the event loop)."""
+        start = time.perf_counter()
+        for doc in docs[:self.tree_cache_size]:
+            self._tree(doc)
+        logger.info(f"Precomputed road travel-time trees for {min(len(docs), self.tree_cache_size)} hospitals "
+                    f"in {time.perf_counter() - start:.1f}s.")
+
+    def _origin(self, lat: float, lon: float) -> _OriginCell:
+        key = (int(math.floor(lat / self.cell_size_deg)), int(math.floor(lon / self.cell_size_deg)))
+        cell = self._cells.get(key)
+        if cell is not None:
+            self.cache_hits += 1
+            self._cells.move_to_end(key)
+            return cell
+        self.cache_misses += 1
+        # Everyone in the cell starts from the road node nearest the cell centre
+        center_lat, center_lon = (key[0] + 0.5) * self.cell_size_deg, (key[1] + 0.5) * self.cell_size_deg
+        node, _ = self.road_graph.snap(center_lat, center_lon)
+        cell = self._cells[key] = _OriginCell(node, float(self.road_graph.lats[node]), float(self.road_graph.lons[node]))
+        if len(self._cells) > self.cache_size:
+            self._cells.popitem(last=False)
+        return cell
+
+    def etas_s(self, lat: float, lon: float, docs: Sequence[Dict[str, Any]]) -> List[Optional[float]]:
+        """Estimated drive time in seconds from (lat, lon) to each hospital (None if unreachable / too far)."""
+        cell = self._origin(lat, lon)
+        access_s = haversine_m(lon, lat, cell.node_lon, cell.node_lat) / self.access_speed_ms
+        etas: List[Optional[float]] = []
+        for doc in docs:
+            key = doc_key(doc)
+            road_s = cell.etas.get(key)
+            if road_s is None:
+                tree = self._tree(doc)
+                road_s = cell.etas[key] = float(tree.times[cell.node]) + tree.access_s
+            etas.append(access_s + road_s if math.isfinite(road_s) else None)
+        return etas
+
+    def rank(self, lat: float, lon: float, candidates: Sequence[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+        """
+        Orders candidates (search results with distance_km) by drive time, adding
+        `eta_minutes`. Unreachable hospitals go last, by distance.
+        """
+        etas = self.etas_s(lat, lon, candidates)
+        order = sorted(range(len(candidates)),
+                       key=lambda i: (etas[i] is None, etas[i] if etas[i] is not None else candidates[i].get("distance_km", 0), i))
+        return [{**candidates[i], "eta_minutes": None if etas[i] is None else round(etas[i] / 60, 1)}
+                for i in order[:limit]]
+
+    def invalidate(self) -> None:
+        """Drops cached ETAs (e.g. after the hospital set was reloaded); trees are rebuilt on demand."""
+        self._cells.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.cache_hits + self.cache_misses
+        return {"nodes": len(self.road_graph), "routable_nodes": len(self.road_graph.snap_nodes),
+                "trees": len(self._trees), "trees_built": self.trees_built, "origin_cells": len(self._cells),
+                "cache_hits": self.cache_hits, "cache_misses": self.cache_misses,
+                "cache_hit_ratio": round(self.cache_hits / lookups, 4) if lookups else None}
@@ -0,0 +1,125 @@
+# schemas.py
+"""
+Pydantic models for hospital documents, shared by the API (main.py) and the
+bulk loader (load_data.py).
+"""
+
+from typing import List, Optional, Any, Literal
+from bson import ObjectId # To handle MongoDB ObjectId
+from pydantic import BaseModel, Field, field_validator, model_serializer
+# Correct Pydantic V2 imports needed for schema customization
+from pydantic_core import core_schema
+
+
+# Helper class for MongoDB ObjectId serialization AND SCHEMA REPRESENTATION
+class PyObjectId(ObjectId):
+    @classmethod
+    def __get_validators__(cls):
+        yield cls.validate
+
+    # --- CORRECTED SIGNATURE ---
+    @classmethod
+    def validate(cls, v: Any) -> ObjectId: # Remove the _info argument
+        # --- Keep the validation logic ---
+        if isinstance(v, ObjectId):
+            return v
+        if isinstance(v, str) and ObjectId.is_valid(v):
+            return ObjectId(v)
+        raise ValueError(f"Not a valid ObjectId: '{v}'")
+    # --- END CORRECTION ---
+
+    @classmethod
+    def __get_pydantic_json_schema__(
+        cls, core_schema_obj: core_schema.CoreSchema, handler: callable
+    ) -> dict[str, Any]:
+        # --- Keep this method as it was ---
+        return {
+            "type": "string",
+            "minLength": 24,
+            "maxLength": 24,
+            "pattern": r"^[0-9a-fA-F]{24}$",
+            "examples": ["60c72b9f9b1e8a5f1f1e8a5f"],
+        }
+
+    @classmethod
+    def __get_pydantic_core_schema__(
+        cls, source: type[Any], handler: callable
+    ) -> core_schema.CoreSchema:
+        # --- Keep this method as it was ---
+        # Use no_info_plain_validator_function as we removed _info from validate
+        return core_schema.no_info_plain_validator_function(
+            cls.validate, serialization=core_schema.to_string_ser_schema()
+        )
+# GeoJSON Point structure
+class GeoLocation(BaseModel):
+    # Use Literal to enforce the value "Point" - Pydantic V2 Style
+    type: Literal["Point"] = Field(default="Point", description="GeoJSON type, must be 'Point'")
+    coordinates: List[float] # Expected order: [longitude, latitude]
+
+    # Use field_validator - Pydantic V2 Style
+    @field_validator('coordinates')
+    @classmethod # Keep classmethod decorator here
+    def validate_coordinates(cls, v: List[float]) -> List[float]: # Add type hints
+        if len(v) != 2:
+            raise ValueError('Coordinates must be a list of [longitude, latitude]')
+        lon, lat = v
+        # Validate longitude
+        if not (-180 <= lon <= 180):
+            raise ValueError(f'Invalid longitude: {lon}. Must be between -180 and 180.')
+        # Validate latitude
+        if not (-90 <= lat <= 90):
+            raise ValueError(f'Invalid latitude: {lat}. Must be between -90 and 90.')
+        return v # Return the validated value
+
+# Ranking fields only present in results of the ranking that sets them (rankBy=eta / rankBy=score)
+RANKING_FIELDS = ("eta_minutes", "score")
+
+# API response model for a hospital
+class HospitalResponse(BaseModel):
+    mongo_id: Optional[PyObjectId] = Field(alias="_id", description="MongoDB document ID")
+    hospital_id: int = Field(alias="id", description="Original numeric hospital ID from data source")
+    name: str
+    location: GeoLocation
+    hasICU: bool
+    specialists: List[str] = Field(default_factory=list)
+    equipment: List[str] = Field(default_factory=list)
+    distance_km: Optional[float] = Field(None, description="Calculated distance in kilometers")
+    eta_minutes: Optional[float] = Field(None, description="Estimated drive time in minutes (only present when ranking by road ETA)")
+    score: Optional[float] = Field(None, description="Weighted suitability score, higher is better (only present when ranking by score)")
+
+    # Unset ranking fields are left out, so other searches keep their response shape.
+    # No return annotation: the OpenAPI schema stays the model's own
+    @model_serializer(mode="wrap")
+    def _omit_unset_ranking(self, handler):
+        data = handler(self)
+        for field in RANKING_FIELDS:
+            if field in data and data[field] is None:
+                del data[field]
+        return data
+
+    # Use model_config for Pydantic V2 instead of class Config
+    model_config = {
+        "arbitrary_types_allowed": True,
+        "json_encoders": {
+            ObjectId: str # Serialize ObjectId to string
+        },
+        # --- MODIFIED for Pydantic V2 ---
+        "populate_by_name": True, # Renamed from allow_population_by_field_name
+        # --- END OF MODIFICATION ---
+         # Optional: Example to show in OpenAPI docs
+        "json_schema_extra": {
+            "example": {
+                 "mongo_id": "60c72b9f9b1e8a5f1f1e8a5f",
+                 "hospital_id": 1,
+                 "name": "City General Hospital",
+                 "location": {
+                     "type": "Point",
+                     "coordinates": [72.8800, 19.0880]
+                 },
+                 "hasICU": True,
+                 "specialists": ["cardiologist", "neurologist"],
+                 "equipment": ["defibrillator", "ct_scanner"],
+                 "distance_km": 1.23
+             }
+         }
+    }
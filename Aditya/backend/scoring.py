@@ -0,0 +1,138 @@
+# scoring.py
+"""
+Weighted multi-criteria ranking of suitable hospitals (rankBy=score).
+
+The capability filters are pass/fail: "specialist OR emergency OR general" and
+"at least one of the equipment" let a general hospital 2 km away outrank a
+cardiac centre 3 km away, because only distance orders the results. Scoring
+ranks the hospitals that pass the filters by one number instead:
+
+    score = distance  * exp(-distance_km / distance_scale_km)
+          + specialist * (has the requested specialist itself, not only emergency / general)
+          + equipment  * (share of the requested equipment it has)
+          + icu        * (has an ICU)
+          + icu_beds   * (reports a free ICU bed right now, live_status.py)
+
+with weights per condition profile (condition_profiles.py names, overridable
+from a JSON file). Everything except the live bed term is computed with NumPy
+over the whole candidate set (capabilities straight from the packed bitmasks
+of the in-memory index); the top `limit` are picked with a partial sort. The
+live term is looked up for the candidates whose score can still reach the top
+`limit` with it, in one array lookup (live_status.IcuBedColumn, aligned with
+the index positions), which keeps the result exact.
+"""
+
+import json
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from capabilities import ICU_BIT, CapabilityIndex, test_bit
+
+
+class ScoreWeights(NamedTuple):
+    distance: float = 1.0
+    distance_scale_km: float = 5.0 # Distance term drops to 1/e at this distance
+    specialist: float = 0.5
+    equipment: float = 0.5
+    icu: float = 0.2
+    icu_beds: float = 0.2
+
+
+DEFAULT_WEIGHTS = ScoreWeights()
+# Time-critical conditions keep a short distance scale; those needing a specific
+# team or scanner weigh it heavily (see condition_profiles.CONDITION_PROFILES)
+CONDITION_WEIGHTS: Dict[str, ScoreWeights] = {
+    "cardiac": ScoreWeights(distance=1.0, distance_scale_km=6.0, specialist=0.8, equipment=0.5, icu=0.3, icu_beds=0.4),
+    "stroke": ScoreWeights(distance=1.0, distance_scale_km=8.0, specialist=0.8, equipment=0.8, icu=0.3, icu_beds=0.4),
+    "accident": ScoreWeights(distance=1.2, distance_scale_km=5.0, specialist=0.5, equipment=0.6, icu=0.3, icu_beds=0.3),
+    "allergy": ScoreWeights(distance=1.5, distance_scale_km=4.0, specialist=0.2, equipment=0.3, icu=0.0, icu_beds=0.0),
+    "allergy_severe": ScoreWeights(distance=1.5, distance_scale_km=3.0, specialist=0.2, equipment=0.4, icu=0.3, icu_beds=0.3),
+    "labor": ScoreWeights(distance=1.0, distance_scale_km=8.0, specialist=0.6, equipment=0.5, icu=0.0, icu_beds=0.0),
+    "labor_severe": ScoreWeights(distance=1.0, distance_scale_km=6.0, specialist=0.6, equipment=0.5, icu=0.3, icu_beds=0.3),
+}
+
+
+def load_weights(path: str) -> Dict[str, ScoreWeights]:
+    """
+    Per-condition weights from a JSON file: {"default": {...}, "cardiac": {...}, ...},
+    each entry overriding some fields of the built-in weights for that condition.
+    Raises ValueError on unknown fields or non-numeric values.
+    """
+    with open(path, encoding="utf-8") as f:
+        overrides = json.load(f)
+    if not isinstance(overrides, dict):
+        raise ValueError(f"{path}: expected an object of condition -> weights")
+    weights = {"default": DEFAULT_WEIGHTS, **CONDITION_WEIGHTS}
+    for condition, fields in overrides.items():
+        unknown = set(fields) - set(ScoreWeights._fields)
+        if unknown:
+            raise ValueError(f"{path}: unknown weights for '{condition}': {sorted(unknown)}")
+        if not all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in fields.values()):
+            raise ValueError(f"{path}: weights for '{condition}' must be numbers")
+        weights[condition] = weights.get(condition, DEFAULT_WEIGHTS)._replace(**{k: float(v) for k, v in fields.items()})
+    return weights
+
+
+def distance_scores(distances_m: np.ndarray, weights: ScoreWeights) -> np.ndarray:
+    return weights.distance * np.exp(-distances_m / (weights.distance_scale_km * 1000))
+
+
+def capability_scores(capabilities: CapabilityIndex, words: np.ndarray, weights: ScoreWeights,
+                      specialist: Optional[str] = None, equipment: Optional[List[str]] = None) -> np.ndarray:
+    """Capability part of the score for packed masks (rows of CapabilityIndex.to_words)."""
+    scores = np.zeros(len(words), dtype=np.float64)
+    if weights.icu:
+        scores += weights.icu * test_bit(words, ICU_BIT.bit_length() - 1)
+    if specialist and weights.specialist:
+        bit = capabilities.bit_number("specialists", specialist.lower())
+        if bit is not None: # No hospital has it: nobody gets the exact-specialist term
+            scores += weights.specialist * test_bit(words, bit)
+    if equipment and weights.equipment:
+        wanted = {e.lower() for e in equipment}
+        bits = [bit for bit in (capabilities.bit_number("equipment", e) for e in wanted) if bit is not None]
+        if bits:
+            matched = np.sum([test_bit(words, bit) for bit in bits], axis=0)
+            scores += weights.equipment * matched / len(wanted)
+    return scores
+
+
+def document_capability_scores(docs: Sequence[Dict[str, Any]], weights: ScoreWeights,
+                               specialist: Optional[str] = None, equipment: Optional[List[str]] = None) -> np.ndarray:
+    """capability_scores for hospital documents (search results without packed masks, e.g. from MongoDB)."""
+    wanted_specialist = specialist.lower() if specialist else None
+    wanted = {e.lower() for e in equipment} if equipment else set()
+    scores = np.zeros(len(docs), dtype=np.float64)
+    for i, doc in enumerate(docs):
+        specialists = doc.get("specialists") or []
+        have = doc.get("equipment") or []
+        scores[i] = (weights.icu * (doc.get("hasICU") is True)
+                     + weights.specialist * (wanted_specialist is not None and wanted_specialist in specialists)
+                     + (weights.equipment * len(wanted.intersection(have)) / len(wanted) if wanted else 0.0))
+    return scores
+
+
+def top_scored(scores: np.ndarray, distances_m: np.ndarray, keys: np.ndarray, limit: int,
+               bonus: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+               bonus_weight: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Indices of the `limit` best scores, best first (ties: nearer, then lower
+    key), and their final scores. `bonus(indices)` (0..1 each, times
+    `bonus_weight`) is only evaluated for candidates that could still make the
+    top `limit` with it.
+    """
+    candidates = np.arange(len(scores))
+    if bonus is not None and bonus_weight and len(scores):
+        if len(scores) > limit:
+            kth_best = np.partition(scores, len(scores) - limit)[len(scores) - limit]
+            candidates = np.flatnonzero(scores >= kth_best - bonus_weight)
+        scores = scores[candidates] + bonus_weight * bonus(candidates)
+    else:
+        scores = scores[candidates]
+    if len(scores) > limit:
+        # Partial sort: only scores down to the limit-th best (and ties with it) are ordered
+        kth_best = np.partition(scores, len(scores) - limit)[len(scores) - limit]
+        keep = np.flatnonzero(scores >= kth_best)
+        candidates, scores = candidates[keep], scores[keep]
+    order = np.lexsort((keys[candidates], distances_m[candidates], -scores))[:limit]
+    return candidates[order], scores[order]
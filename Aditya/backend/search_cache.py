@@ -0,0 +1,224 @@
+# search_cache.py
+"""
+TTL + LRU cache for /api/find-suitable.
+
+Requests are keyed on a snapped (lat, lon) grid cell plus the normalized
+filters (needsICU, specialist, sorted equipment). An entry holds the candidate
+hospitals found around the *cell centre* with a search radius widened by the
+cell's half-diagonal, so it covers every caller inside the cell. On a hit only
+the exact distances from the caller's real coordinates are recomputed, so
+results and ordering are the same as an uncached search.
+
+If the candidate list was truncated, a caller's results are only served from
+the cache when they are guaranteed to be complete (see `rank`); otherwise the
+caller falls back to a direct search.
+
+LastResults keeps the last answer per coarse cell and filters, without expiry,
+for requests shed by admission control (admission.py): a stale but immediate
+answer beats none during a surge.
+"""
+
+import math
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from geo_index import haversine_m
+
+logger = logging.getLogger(__name__)
+
+# (row, col, needsICU, specialist, equipment)
+CacheKey = Tuple[int, int, bool, Optional[str], Optional[Tuple[str, ...]]]
+
+
+class CacheEntry:
+    __slots__ = ("candidates", "coords", "horizon_m", "expires_at")
+
+    def __init__(self, candidates: List[Dict[str, Any]], horizon_m: float, expires_at: float):
+        self.candidates = candidates
+        # (lon, lat) per candidate, unpacked once for fast re-ranking
+        self.coords = [tuple(c["location"]["coordinates"]) for c in candidates]
+        # Hospitals missing from `candidates` are at least this far from the cell centre
+        self.horizon_m = horizon_m
+        self.expires_at = expires_at
+
+
+class SearchCache:
+    """Bounded TTL + LRU cache of candidate hospital sets per (cell, filters)."""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 30.0, cell_size_deg: float = 0.005):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.cell_size_deg = cell_size_deg
+        self._entries: "OrderedDict[CacheKey, CacheEntry]" = OrderedDict()
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.fallbacks = 0 # Hits whose candidates couldn't guarantee the caller's results
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # --- Keys and cell geometry ---
+
+    def make_key(self, lat: float, lon: float, needsICU: Optional[bool] = None,
+                 specialist: Optional[str] = None, equipment: Optional[List[str]] = None) -> CacheKey:
+        """Snaps the location to a grid cell and normalizes the filters."""
+        row = int(math.floor(lat / self.cell_size_deg))
+        col = int(math.floor(lon / self.cell_size_deg))
+        equipment_key = tuple(sorted({e.lower() for e in equipment})) if equipment else None
+        return (row, col, needsICU is True, specialist.lower() if specialist else None, equipment_key)
+
+    def cell_center(self, key: CacheKey) -> Tuple[float, float]:
+        """Returns (lat, lon) of the centre of the key's grid cell."""
+        row, col = key[0], key[1]
+        return (row + 0.5) * self.cell_size_deg, (col + 0.5) * self.cell_size_deg
+
+    def cell_radius_m(self, key: CacheKey) -> float:
+        """Largest distance from the cell centre to any point in the cell (its corners)."""
+        c_lat, c_lon = self.cell_center(key)
+        half = self.cell_size_deg / 2
+        return max(haversine_m(c_lon, c_lat, c_lon + d_lon, c_lat + d_lat)
+                   for d_lat in (-half, half) for d_lon in (-half, half))
+
+    # --- Cache operations ---
+
+    def get(self, key: CacheKey) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: CacheKey, candidates: List[Dict[str, Any]], truncated: bool) -> CacheEntry:
+        """
+        Stores the candidates found around the key's cell centre. `truncated`
+        means the search hit its result limit, so hospitals beyond the farthest
+        candidate may exist.
+        """
+        horizon_m = math.inf
+        if truncated and candidates:
+            c_lat, c_lon = self.cell_center(key)
+            horizon_m = max(haversine_m(c_lon, c_lat, *c["location"]["coordinates"]) for c in candidates)
+        entry = CacheEntry(candidates, horizon_m, time.monotonic() + self.ttl_seconds)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def rank(self, key: CacheKey, entry: CacheEntry, lat: float, lon: float,
+             max_distance_m: float, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Re-ranks an entry's candidates by exact distance from (lat, lon).
+        Returns None when a truncated candidate list can't guarantee the result:
+        any hospital left out is at least `horizon - cell_radius` from the caller,
+        so results are complete only if everything we return (or the search
+        radius, when fewer than `limit` were found) is closer than that.
+        """
+        hits = []
+        for position, (h_lon, h_lat) in enumerate(entry.coords):
+            distance_m = haversine_m(lon, lat, h_lon, h_lat)
+            if distance_m <= max_distance_m:
+                hits.append((distance_m, position))
+        hits.sort()
+        hits = hits[:limit]
+
+        if entry.horizon_m != math.inf:
+            reach_m = hits[-1][0] if len(hits) == limit else max_distance_m
+            if reach_m >= entry.horizon_m - self.cell_radius_m(key):
+                self.fallbacks += 1
+                return None
+
+        results = []
+        for distance_m, position in hits:
+            result = dict(entry.candidates[position])
+            result["distance_km"] = round(distance_m / 1000, 2)
+            results.append(result)
+        return results
+
+    def invalidate(self) -> None:
+        """Drops every entry; call whenever hospital data changes."""
+        self._entries.clear()
+        self.invalidations += 1
+        logger.info("Search cache invalidated.")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "fallbacks": self.fallbacks,
+        }
+
+
+class LastResults:
+    """
+    Bounded LRU of the last results served per (coarse cell, filters, rankBy).
+    Entries never expire; `nearest` re-ranks one for a caller elsewhere in the
+    cell and says how old it is.
+    """
+
+    def __init__(self, max_entries: int = 20000, cell_size_deg: float = 0.02):
+        self.max_entries = max_entries
+        self.cell_size_deg = cell_size_deg # ~2 km: results from anywhere in the cell are a fair fallback
+        self._entries: "OrderedDict[Tuple, Tuple[List[Dict[str, Any]], float]]" = OrderedDict()
+        # Counters
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def make_key(self, lat: float, lon: float, filters: Tuple, rankBy: str) -> Tuple:
+        return (int(math.floor(lat / self.cell_size_deg)), int(math.floor(lon / self.cell_size_deg)), filters, rankBy)
+
+    def record(self, key: Tuple, results: List[Dict[str, Any]]) -> None:
+        self._entries[key] = (results, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def nearest(self, key: Tuple, lat: float, lon: float,
+                max_distance_m: float) -> Optional[Tuple[List[Dict[str, Any]], float]]:
+        """
+        The key's last results with distances from (lat, lon), those beyond
+        `max_distance_m` dropped (re-sorted by distance for rankBy=distance),
+        and their age in seconds; None if nothing was recorded.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        stored, recorded_at = entry
+        results = []
+        for hospital in stored:
+            distance_m = haversine_m(lon, lat, *hospital["location"]["coordinates"][:2])
+            if distance_m <= max_distance_m:
+                results.append({**hospital, "distance_km": round(distance_m / 1000, 2)})
+        if key[-1] == "distance":
+            results.sort(key=lambda hospital: hospital["distance_km"])
+        return results, time.monotonic() - recorded_at
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
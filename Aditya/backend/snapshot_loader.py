@@ -0,0 +1,143 @@
+# snapshot_loader.py
+"""
+Loader process for the shared hospital snapshot (hospital_snapshot.py).
+
+Builds the in-memory hospital index once, publishes it as a memory-mapped
+columnar snapshot and then follows the hospitals change feed, publishing a new
+generation whenever hospitals changed (at most once per publish interval).
+API workers started with SEARCH_ENGINE=shared attach to the snapshot instead
+of each fetching the collection, and re-attach when the generation changes.
+
+Usage:
+    python snapshot_loader.py                                              # MongoDB -> SNAPSHOT_DIR, then follow writes
+    python snapshot_loader.py --once                                       # publish one generation and exit
+    python snapshot_loader.py --from data/hospitals_sample.ndjson --once   # hospitals from a loader input file
+    SEARCH_ENGINE=shared uvicorn main:app --workers 8 --host 0.0.0.0 --port 8080
+
+Run one loader per host, next to the workers (they share SNAPSHOT_DIR).
+"""
+
+import os
+import time
+import asyncio
+import logging
+import argparse
+from typing import Any, Dict, List
+
+from pymongo import AsyncMongoClient
+from pymongo.errors import ConnectionFailure, PyMongoError
+from dotenv import load_dotenv
+
+from build_tiles import hospitals_from_file
+from geo_index import HospitalIndex, RESULT_FIELDS
+from hospital_snapshot import DEFAULT_SNAPSHOT_DIR, write_snapshot
+from hospital_sync import HospitalSync, open_source
+from regions import REGION_PREFIX, RegionCollections
+
+# --- Logging Setup ---
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+load_dotenv()
+MONGO_URI = os.getenv("MONGO_URI")
+DB_NAME = os.getenv("DB_NAME", "chetakDB")
+COLLECTION_NAME = "hospitals"
+REGION_PRECISION = int(os.getenv("HOSPITAL_REGION_PRECISION", "0")) # Same as main.py: follow the region collections
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", DEFAULT_SNAPSHOT_DIR)
+SNAPSHOT_SYNC = os.getenv("SNAPSHOT_SYNC", "auto").lower() # auto | change_stream | poll (same as main.py)
+SYNC_POLL_INTERVAL_SECONDS = float(os.getenv("SYNC_POLL_INTERVAL_SECONDS", "2"))
+SYNC_RECONCILE_EVERY = int(os.getenv("SYNC_RECONCILE_EVERY", "30"))
+# Writes arriving within one interval are published together as one generation
+SNAPSHOT_PUBLISH_INTERVAL_SECONDS = float(os.getenv("SNAPSHOT_PUBLISH_INTERVAL_SECONDS", "1"))
+HOSPITAL_PROJECTION = {field: 1 for field in RESULT_FIELDS}
+
+
+def publish(index: HospitalIndex, directory: str) -> int:
+    start = time.perf_counter()
+    generation = write_snapshot(directory, index)
+    logger.info(f"Published snapshot generation {generation} ({len(index)} hospitals) to '{directory}' "
+                f"in {(time.perf_counter() - start) * 1000:.1f} ms.")
+    return generation
+
+
+async def follow(directory: str, publish_interval: float, once: bool) -> None:
+    """Loads the index from MongoDB, publishes it and keeps publishing its changes."""
+    client = AsyncMongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+    try:
+        await client.admin.command('ping')
+        if REGION_PRECISION:
+            collection = RegionCollections(client[DB_NAME], REGION_PRECISION)
+            await collection.refresh()
+            logger.info(f"Reading hospitals from database '{DB_NAME}', {len(collection.regions)} region collections "
+                        f"'{REGION_PREFIX}<geohash>'.")
+        else:
+            collection = client[DB_NAME][COLLECTION_NAME]
+            logger.info(f"Reading hospitals from database '{DB_NAME}', collection '{COLLECTION_NAME}'.")
+        index = HospitalIndex()
+        dirty = False
+
+        async def apply(upserts: List[Dict[str, Any]], deletes: List[Any]) -> int:
+            nonlocal dirty
+            changed = index.apply_changes(upserts, deletes)
+            dirty = dirty or changed > 0
+            return changed
+
+        async def reload() -> None:
+            nonlocal dirty
+            index.load(await collection.find({}, HOSPITAL_PROJECTION).to_list(None))
+            dirty = True
+
+        sync = None
+        if not once:
+            # Opened before the first load, so no write in between is missed
+            source = await open_source(collection, SNAPSHOT_SYNC, index.keys, HOSPITAL_PROJECTION,
+                                       interval_seconds=SYNC_POLL_INTERVAL_SECONDS, reconcile_every=SYNC_RECONCILE_EVERY)
+            sync = HospitalSync(source, apply, reload)
+        await reload()
+        publish(index, directory)
+        dirty = False
+        if sync is None:
+            return
+
+        sync.start()
+        try:
+            while True:
+                await asyncio.sleep(publish_interval)
+                if dirty:
+                    dirty = False
+                    publish(index, directory)
+        finally:
+            await sync.stop()
+    finally:
+        await client.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--from", dest="source", help="Read hospitals from this file instead of MongoDB (implies --once)")
+    parser.add_argument("--out", default=SNAPSHOT_DIR, help="Snapshot directory (SNAPSHOT_DIR)")
+    parser.add_argument("--once", action="store_true", help="Publish one generation and exit")
+    parser.add_argument("--publish-interval", type=float, default=SNAPSHOT_PUBLISH_INTERVAL_SECONDS,
+                        help="Seconds between generations while following writes")
+    args = parser.parse_args()
+
+    if args.source:
+        index = HospitalIndex.from_documents(hospitals_from_file(args.source))
+        publish(index, args.out)
+        return
+    if not MONGO_URI:
+        logger.critical("FATAL ERROR: MONGO_URI not found in environment variables. Check your .env file.")
+        exit("MONGO_URI not set.")
+    try:
+        asyncio.run(follow(args.out, args.publish_interval, args.once))
+    except ConnectionFailure as e:
+        logger.critical(f"Could not connect to MongoDB: {e}")
+    except PyMongoError as e:
+        logger.critical(f"Snapshot loader stopped on a database error: {e}", exc_info=True)
+    except KeyboardInterrupt:
+        logger.info("Snapshot loader stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+# static_shards.py
+"""
+Geohash-sharded static export of the hospital collection, for the frontend
+when it is served from static hosting without a reachable API.
+
+Hospitals are partitioned by the geohash of their location at a fixed
+precision (3 by default: cells of about 156 x 156 km at the equator). A
+client locates its own cell and adds the up to three neighbours on the side
+of the cell it stands in (east or west, north or south, and that diagonal),
+so the shards it fetches cover at least half a cell in every direction
+around it. The manifest records that guaranteed radius as `coverage_km`.
+
+Each shard is dictionary-coded JSON, gzipped ahead of time:
+
+    {"version": 1, "prefix": "te7", "specialists": [...], "equipment": [...],
+     "hospitals": [[id, name, lon, lat, hasICU, [specialist indexes], [equipment indexes]], ...]}
+
+Shard files are named after a hash of their content (`te7.<hash>.json.gz`),
+so they can be cached forever; only manifest.json changes between exports.
+With `update`, a shard whose content is unchanged keeps its file and only
+the shards that gained, lost or changed a hospital are encoded and written.
+
+Directory layout:
+    manifest.json               generation, precision, coverage and per-shard file, count and sizes
+    <prefix>.<hash>.json.gz     one shard (files of the previous generation are kept until the next export)
+"""
+
+import os
+import gzip
+import json
+import math
+import time
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+SHARDS_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+DEFAULT_PRECISION = 3
+GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+KM_PER_DEG = 111.32
+COORDINATE_DECIMALS = 5 # ~1 m
+HASH_CHARS = 12 # Content hash characters in shard file names
+
+
+# --- Geohash ---
+
+def geohash(lat: float, lon: float, precision: int) -> str:
+    """Standard geohash of a point (longitude bit first)."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, value, bits, use_lon = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, lon) if use_lon else (lat_range, lat)
+        mid = (interval[0] + interval[1]) / 2
+        if coordinate >= mid:
+            value, interval[0] = value * 2 + 1, mid
+        else:
+            value, interval[1] = value * 2, mid
+        use_lon, bits = not use_lon, bits + 1
+        if bits == 5:
+            chars.append(GEOHASH_BASE32[value])
+            value, bits = 0, 0
+    return "".join(chars)
+
+
+def cell_size_deg(precision: int) -> Tuple[float, float]:
+    """(height, width) in degrees of the geohash cells of a precision."""
+    lon_bits = (5 * precision + 1) // 2
+    return 180.0 / 2 ** (5 * precision - lon_bits), 360.0 / 2 ** lon_bits
+
+
+def cell_bounds(prefix: str) -> Tuple[float, float, float, float]:
+    """(min_lat, max_lat, min_lon, max_lon) of a geohash cell."""
+    lat_range, lon_range, use_lon = [-90.0, 90.0], [-180.0, 180.0], True
+    for char in prefix:
+        value = GEOHASH_BASE32.index(char)
+        for shift in range(4, -1, -1):
+            interval = lon_range if use_lon else lat_range
+            mid = (interval[0] + interval[1]) / 2
+            interval[0 if (value >> shift) & 1 else 1] = mid
+            use_lon = not use_lon
+    return lat_range[0], lat_range[1], lon_range[0], lon_range[1]
+
+
+def shards_around(lat: float, lon: float, precision: int) -> List[str]:
+    """
+    The point's own cell plus its neighbours on the nearer side in latitude
+    and longitude (and their diagonal): at most four cells that together
+    cover at least half a cell in every direction (same rule as map-script.js).
+    """
+    min_lat, max_lat, min_lon, max_lon = cell_bounds(geohash(lat, lon, precision))
+    height, width = max_lat - min_lat, max_lon - min_lon
+    center_lat, center_lon = (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+    step_lat = height if lat >= center_lat else -height
+    step_lon = width if lon >= center_lon else -width
+    prefixes = []
+    for d_lat, d_lon in ((0, 0), (0, step_lon), (step_lat, 0), (step_lat, step_lon)):
+        if -90 < center_lat + d_lat < 90: # No neighbour beyond a pole
+            prefix = geohash(center_lat + d_lat, (center_lon + d_lon + 180) % 360 - 180, precision)
+            if prefix not in prefixes:
+                prefixes.append(prefix)
+    return prefixes
+
+
+def coverage_km(precision: int, max_abs_lat: float) -> float:
+    """Radius shards_around is guaranteed to cover for points up to `max_abs_lat`."""
+    height, width = cell_size_deg(precision)
+    # Cells narrow towards the poles; the bound holds for the cell reaching furthest from the equator
+    edge_lat = min(90.0, (math.floor(max_abs_lat / height) + 1) * height)
+    return min(height, width * math.cos(math.radians(edge_lat))) / 2 * KM_PER_DEG
+
+
+# --- Shard encoding ---
+
+class ShardReport(NamedTuple):
+    """Outcome of one shard in an export."""
+    prefix: str
+    hospitals: int
+    raw_bytes: int
+    gzip_bytes: int
+    status: str # written | unchanged | removed
+
+
+def _hospital_id(doc: Dict[str, Any]) -> Any:
+    """Numeric `id` of a loader-inserted hospital, else its `_id` as a string."""
+    return doc["id"] if doc.get("id") is not None else str(doc.get("_id"))
+
+
+def encode_shard(prefix: str, docs: Iterable[Dict[str, Any]]) -> bytes:
+    """Dictionary-coded JSON of one shard; the same hospitals always give the same bytes."""
+    docs = sorted(docs, key=lambda doc: str(_hospital_id(doc)))
+    specialists = sorted({s for doc in docs for s in doc.get("specialists") or []})
+    equipment = sorted({e for doc in docs for e in doc.get("equipment") or []})
+    specialist_index = {s: i for i, s in enumerate(specialists)}
+    equipment_index = {e: i for i, e in enumerate(equipment)}
+    rows = []
+    for doc in docs:
+        lon, lat = doc["location"]["coordinates"][:2]
+        rows.append([_hospital_id(doc), doc.get("name"), round(lon, COORDINATE_DECIMALS), round(lat, COORDINATE_DECIMALS),
+                     1 if doc.get("hasICU") is True else 0,
+                     sorted(specialist_index[s] for s in set(doc.get("specialists") or [])),
+                     sorted(equipment_index[e] for e in set(doc.get("equipment") or []))])
+    return orjson.dumps({"version": SHARDS_FORMAT_VERSION, "prefix": prefix, "specialists": specialists,
+                         "equipment": equipment, "hospitals": rows})
+
+
+def decode_shard(data: bytes) -> List[Dict[str, Any]]:
+    """Hospitals of a (gzipped or plain) shard, as documents shaped like the API's results."""
+    shard = orjson.loads(gzip.decompress(data) if data[:2] == b"\x1f\x8b" else data)
+    specialists, equipment = shard["specialists"], shard["equipment"]
+    return [{"id": hospital_id, "name": name, "location": {"type": "Point", "coordinates": [lon, lat]},
+             "hasICU": bool(icu), "specialists": [specialists[i] for i in spec],
+             "equipment": [equipment[i] for i in equip]}
+            for hospital_id, name, lon, lat, icu, spec, equip in shard["hospitals"]]
+
+
+def partition(docs: Iterable[Dict[str, Any]], precision: int) -> Tuple[Dict[str, List[Dict[str, Any]]], int]:
+    """Hospitals grouped by geohash prefix, and how many were skipped for lacking a location."""
+    shards: Dict[str, List[Dict[str, Any]]] = {}
+    skipped = 0
+    for doc in docs:
+        coordinates = (doc.get("location") or {}).get("coordinates")
+        if not coordinates or len(coordinates) < 2:
+            skipped += 1
+            continue
+        lon, lat = coordinates[:2]
+        shards.setdefault(geohash(lat, lon, precision), []).append(doc)
+    return shards, skipped
+
+
+# --- Export ---
+
+def read_manifest(directory: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def export_shards(docs: Iterable[Dict[str, Any]], directory: str, precision: int = DEFAULT_PRECISION,
+                  update: bool = False) -> Tuple[Dict[str, Any], List[ShardReport], Dict[str, float]]:
+    """
+    Writes the hospitals as a new shard generation, then swaps the manifest in
+    atomically and removes shard files that neither it nor the previous
+    manifest reference (clients holding the previous one can still fetch its
+    shards). With `update`, shards whose content hasn't changed keep their
+    files. Returns the manifest, one ShardReport per shard and phase timings.
+    """
+    timings: Dict[str, float] = {}
+    os.makedirs(directory, exist_ok=True)
+    previous = read_manifest(directory)
+    if previous is not None and previous.get("version") != SHARDS_FORMAT_VERSION:
+        previous = None
+    reusable = previous["shards"] if update and previous and previous.get("precision") == precision else {}
+    if update and previous and not reusable:
+        logger.info("Existing shards use another precision or format; rewriting all of them.")
+
+    start = time.perf_counter()
+    shards, skipped = partition(docs, precision)
+    if skipped:
+        logger.warning(f"Skipped {skipped} hospitals without a location.")
+    timings["partition"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    entries: Dict[str, Dict[str, Any]] = {}
+    reports: List[ShardReport] = []
+    write_seconds = 0.0
+    for prefix in sorted(shards):
+        raw = encode_shard(prefix, shards[prefix])
+        digest = hashlib.sha256(raw).hexdigest()
+        old = reusable.get(prefix)
+        if old is not None and old["sha256"] == digest and os.path.exists(os.path.join(directory, old["file"])):
+            entries[prefix] = old
+            reports.append(ShardReport(prefix, old["hospitals"], old["raw_bytes"], old["bytes"], "unchanged"))
+            continue
+        compressed = gzip.compress(raw, compresslevel=9, mtime=0)
+        file = f"{prefix}.{digest[:HASH_CHARS]}.json.gz"
+        write_start = time.perf_counter()
+        _write_atomic(os.path.join(directory, file), compressed)
+        write_seconds += time.perf_counter() - write_start
+        entries[prefix] = {"file": file, "hospitals": len(shards[prefix]), "bytes": len(compressed),
+                           "raw_bytes": len(raw), "sha256": digest}
+        reports.append(ShardReport(prefix, len(shards[prefix]), len(raw), len(compressed), "written"))
+    for prefix in (previous or {}).get("shards", {}):
+        if prefix not in entries:
+            reports.append(ShardReport(prefix, 0, 0, 0, "removed"))
+    timings["encode"] = time.perf_counter() - start - write_seconds
+    timings["write"] = write_seconds
+
+    max_abs_lat = max((abs(doc["location"]["coordinates"][1]) for docs_in in shards.values() for doc in docs_in),
+                      default=0.0)
+    height, width = cell_size_deg(precision)
+    manifest = {
+        "version": SHARDS_FORMAT_VERSION,
+        "generation": (previous or {}).get("generation", 0) + 1,
+        "exported_at": datetime.now(timezone.utc).isoformat(),
+        "precision": precision,
+        "cell_deg": [height, width],
+        "coverage_km": round(coverage_km(precision, max_abs_lat), 1),
+        "hospitals": sum(entry["hospitals"] for entry in entries.values()),
+        "shards": entries,
+    }
+    start = time.perf_counter()
+    _write_atomic(os.path.join(directory, MANIFEST_FILE), json.dumps(manifest, indent=1).encode("utf-8"))
+
+    keep = {entry["file"] for entry in entries.values()}
+    keep.update(entry["file"] for entry in (previous or {}).get("shards", {}).values())
+    for file in os.listdir(directory):
+        if file.endswith(".json.gz") and file not in keep:
+            try:
+                os.remove(os.path.join(directory, file))
+            except FileNotFoundError:
+                pass
+    timings["write"] += time.perf_counter() - start
+    return manifest, reports, timings
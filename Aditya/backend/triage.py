@@ -0,0 +1,157 @@
+# triage.py
+"""
+Server-side version of the frontend's `analyzePatientCondition` (map-script.js).
+
+Turns the selected condition id and/or the free-text description (typed or a
+voice transcript) into the patient's needs: ICU, specialist, equipment,
+urgency and a display label, with exactly the frontend's rules, so
+/api/triage-search can resolve needs and search in one request.
+
+The description rules are substring checks (JS `includes`) against a fixed
+keyword vocabulary, so the keywords present are found once per request
+(KeywordMatcher) and every rule is then a set lookup. With the optional
+`pyahocorasick` package and a vocabulary of AUTOMATON_MIN_KEYWORDS or more,
+they are found in a single pass with an Aho-Corasick automaton built at import,
+whose cost doesn't grow with the vocabulary. For a small vocabulary like the
+current one, one C-level `in` scan per keyword is faster, even on long
+transcripts (python -m bench.bench_triage).
+"""
+
+from typing import Any, Dict, FrozenSet, Iterable, NamedTuple, Optional, Tuple, Union
+
+from condition_profiles import CONDITION_PROFILES
+
+try:
+    import ahocorasick # Optional: pip install pyahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Vocabulary size from which the automaton beats one `in` scan per keyword
+AUTOMATON_MIN_KEYWORDS = 64
+
+
+class KeywordMatcher:
+    """Finds which keywords of a fixed vocabulary occur (as substrings) in a text."""
+
+    def __init__(self, keywords: Iterable[str], engine: str = "auto"):
+        self.keywords = tuple(dict.fromkeys(keywords))
+        if engine == "auto":
+            use_automaton = ahocorasick is not None and len(self.keywords) >= AUTOMATON_MIN_KEYWORDS
+            engine = "automaton" if use_automaton else "substring"
+        if engine == "automaton" and ahocorasick is None:
+            raise ImportError("The automaton engine needs pyahocorasick: pip install pyahocorasick")
+        self.engine = engine
+        self._automaton = None
+        if engine == "automaton":
+            self._automaton = ahocorasick.Automaton()
+            for keyword in self.keywords:
+                self._automaton.add_word(keyword, keyword)
+            self._automaton.make_automaton()
+
+    def find(self, text: str) -> FrozenSet[str]:
+        """Keywords that occur anywhere in `text` (overlapping matches included)."""
+        if self._automaton is not None:
+            return frozenset(keyword for _, keyword in self._automaton.iter(text))
+        return frozenset(keyword for keyword in self.keywords if keyword in text)
+
+
+# --- Rules (mirroring analyzePatientCondition) ---
+
+class ConditionCase(NamedTuple):
+    """One case of the switch on the selected condition."""
+    profile: str # CONDITION_PROFILES entry with the case's ICU / specialist / equipment
+    urgency: int
+    label: Optional[str] = None # None = the formatted condition id
+    severe_keywords: Tuple[str, ...] = () # Any of these in the details switches to severe_profile
+    severe_profile: Optional[str] = None
+
+
+class DetailRule(NamedTuple):
+    """One keyword check on the free-text details (condition 'other' or unknown)."""
+    keywords: Tuple[str, ...]
+    specialist: str
+    urgency: int
+    equipment: Tuple[str, ...]
+    icu: Union[bool, str] # True, or the keyword that makes an ICU necessary
+    label: str
+
+
+CONDITION_CASES: Dict[str, ConditionCase] = {
+    "cardiac": ConditionCase("cardiac", 5),
+    "stroke": ConditionCase("stroke", 5),
+    "accident": ConditionCase("accident", 4, "Accident / Trauma"),
+    "allergy": ConditionCase("allergy", 3, "Allergic Reaction", ("breathing difficulty", "anaphylaxis"), "allergy_severe"),
+    "labor": ConditionCase("labor", 4, "Labor / Pregnancy", ("bleeding", "distress"), "labor_severe"),
+}
+SEVERE_URGENCY = 5
+
+# Checked in order; a later match overrides an earlier one (as in the frontend)
+DETAIL_RULES: Tuple[DetailRule, ...] = (
+    DetailRule(("chest pain", "heart attack"), "cardiologist", 5, ("cardiac_monitor", "ecg"), True, "Suspected Cardiac Event"),
+    DetailRule(("stroke symptoms", "numbness"), "neurologist", 5, ("ct_scanner", "mri"), True, "Suspected Stroke"),
+    DetailRule(("broken", "fracture"), "orthopedic", 4, ("x_ray", "orthopedic_tools"), "severe", "Injury / Fracture"),
+    DetailRule(("breathing", "breathe"), "pulmonologist", 5, ("ventilator", "pulse_oximeter"), True, "Breathing Difficulty"),
+    DetailRule(("pregnant", "labor", "contractions"), "obstetrician", 4, ("obstetric_ultrasound", "fetal_monitor"), "bleeding", "Pregnancy / Labor"),
+    DetailRule(("allergic", "allergy"), "allergist", 3, ("epinephrine",), "anaphylaxis", "Allergic Reaction"),
+    DetailRule(("burn",), "general_surgeon", 4, ("burn_dressings",), "severe", "Burn Injury"),
+)
+
+
+def _vocabulary() -> Iterable[str]:
+    for case in CONDITION_CASES.values():
+        yield from case.severe_keywords
+    for rule in DETAIL_RULES:
+        yield from rule.keywords
+        if isinstance(rule.icu, str):
+            yield rule.icu
+
+
+MATCHER = KeywordMatcher(_vocabulary())
+
+
+def format_name(name: Optional[str]) -> str:
+    """Same as the frontend's formatName: 'general_surgeon' -> 'General Surgeon'."""
+    if not name:
+        return "N/A"
+    return " ".join(word[:1].upper() + word[1:] for word in name.split("_"))
+
+
+def assess(condition: Optional[str], details: Optional[str] = None,
+           matcher: KeywordMatcher = MATCHER) -> Dict[str, Any]:
+    """
+    Returns the medicalNeeds object analyzePatientCondition would build:
+    needsICU, needsSpecialist, urgencyLevel, requiredEquipment, conditionLabel.
+    """
+    needs: Dict[str, Any] = {"needsICU": False, "needsSpecialist": None, "urgencyLevel": 1,
+                             "requiredEquipment": [], "conditionLabel": "General Checkup"}
+    if condition and condition != "other":
+        needs["conditionLabel"] = format_name(condition)
+    elif details:
+        needs["conditionLabel"] = "Described Condition"
+    found = matcher.find(details.lower()) if details else frozenset()
+
+    case = CONDITION_CASES.get(condition) if condition else None
+    if case is not None:
+        severe = any(keyword in found for keyword in case.severe_keywords)
+        profile = CONDITION_PROFILES[case.severe_profile if severe else case.profile]
+        needs.update(needsICU=profile.needs_icu, needsSpecialist=profile.specialist,
+                     urgencyLevel=SEVERE_URGENCY if severe else case.urgency,
+                     requiredEquipment=list(profile.equipment))
+        if case.label:
+            needs["conditionLabel"] = case.label
+    else:
+        needs["urgencyLevel"] = 2
+        if details:
+            for rule in DETAIL_RULES:
+                if any(keyword in found for keyword in rule.keywords):
+                    needs.update(needsICU=rule.icu if isinstance(rule.icu, bool) else rule.icu in found,
+                                 needsSpecialist=rule.specialist, urgencyLevel=rule.urgency,
+                                 requiredEquipment=list(rule.equipment), conditionLabel=rule.label)
+        elif condition == "other":
+            needs.update(conditionLabel="Unspecified Condition", urgencyLevel=1)
+
+    if not needs["needsSpecialist"] and needs["urgencyLevel"] >= 4:
+        needs["needsSpecialist"] = "emergency"
+    if not needs["needsSpecialist"] and needs["urgencyLevel"] < 3:
+        needs["needsSpecialist"] = "general"
+    return needs
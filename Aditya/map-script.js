@@ -42,6 +42,10 @@ document.addEventListener('DOMContentLoaded', function() {
 const API_BASE_URL = 'http://127.0.0.1:8080';
 // For deployed backend (replace with your actual deployed URL):
 // const API_BASE_URL = 'https://your-deployed-chetak-backend.com';
+// Hospital shards written by backend/export_shards.py, used when the API can't be reached (null disables them)
+const STATIC_SHARDS_URL = 'shards';
+const SHARD_SEARCH_RADIUS_KM = 50; // Same as the API's search radius
+const SHARD_MAX_RESULTS = 15;
 
 // --- Global Variables ---
 let map;
@@ -119,6 +123,95 @@ function analyzePatientCondition(condition, details) {
     return medicalNeeds;
 }
 
+// --- Offline Fallback: Static Hospital Shards ---
+// Same geohash rules as backend/static_shards.py
+const GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz';
+
+function geohashCell(lat, lon, precision) {
+    const latRange = [-90, 90], lonRange = [-180, 180];
+    let hash = '', value = 0, bits = 0, useLon = true;
+    while (hash.length < precision) {
+        const range = useLon ? lonRange : latRange;
+        const coordinate = useLon ? lon : lat;
+        const mid = (range[0] + range[1]) / 2;
+        if (coordinate >= mid) { value = value * 2 + 1; range[0] = mid; }
+        else { value = value * 2; range[1] = mid; }
+        useLon = !useLon;
+        if (++bits === 5) { hash += GEOHASH_BASE32[value]; value = 0; bits = 0; }
+    }
+    return { hash, minLat: latRange[0], maxLat: latRange[1], minLon: lonRange[0], maxLon: lonRange[1] };
+}
+
+// The user's cell plus its neighbours on the nearer side (and their diagonal): at most 4 shards
+function shardsAround(lat, lon, precision) {
+    const cell = geohashCell(lat, lon, precision);
+    const height = cell.maxLat - cell.minLat, width = cell.maxLon - cell.minLon;
+    const centerLat = (cell.minLat + cell.maxLat) / 2, centerLon = (cell.minLon + cell.maxLon) / 2;
+    const stepLat = lat >= centerLat ? height : -height;
+    const stepLon = lon >= centerLon ? width : -width;
+    const prefixes = [];
+    for (const [dLat, dLon] of [[0, 0], [0, stepLon], [stepLat, 0], [stepLat, stepLon]]) {
+        if (centerLat + dLat <= -90 || centerLat + dLat >= 90) continue; // No neighbour beyond a pole
+        const prefix = geohashCell(centerLat + dLat, ((centerLon + dLon + 540) % 360) - 180, precision).hash;
+        if (!prefixes.includes(prefix)) prefixes.push(prefix);
+    }
+    return prefixes;
+}
+
+async function fetchShard(url) {
+    const response = await fetch(url);
+    if (!response.ok) throw new Error(`Shard request failed! Status: ${response.status}`);
+    const bytes = new Uint8Array(await response.arrayBuffer());
+    // Hosts that serve .gz files with Content-Encoding: gzip hand over JSON the browser already decompressed
+    if (bytes[0] === 0x1f && bytes[1] === 0x8b) {
+        const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+        return new Response(stream).json();
+    }
+    return JSON.parse(new TextDecoder().decode(bytes));
+}
+
+function haversineKm(lat1, lon1, lat2, lon2) {
+    const toRad = deg => deg * Math.PI / 180;
+    const a = Math.sin(toRad(lat2 - lat1) / 2) ** 2
+            + Math.cos(toRad(lat1)) * Math.cos(toRad(lat2)) * Math.sin(toRad(lon2 - lon1) / 2) ** 2;
+    return 6378.1 * 2 * Math.asin(Math.sqrt(a));
+}
+
+// Same filters as /api/find-suitable: ICU, specialist OR emergency OR general, at least one of the equipment
+function matchesNeeds(hospital, medicalNeeds) {
+    if (medicalNeeds.needsICU && !hospital.hasICU) return false;
+    const specialist = medicalNeeds.needsSpecialist;
+    if (specialist && !hospital.specialists.some(s => s === specialist || s === 'emergency' || s === 'general')) return false;
+    const equipment = medicalNeeds.requiredEquipment || [];
+    return equipment.length === 0 || equipment.some(e => hospital.equipment.includes(e));
+}
+
+// Nearest suitable hospitals from the shards around the user, shaped like the API's results
+async function findHospitalsFromShards(lat, lon, medicalNeeds) {
+    const manifestResponse = await fetch(`${STATIC_SHARDS_URL}/manifest.json`, { cache: 'no-cache' });
+    if (!manifestResponse.ok) throw new Error(`Shard manifest request failed! Status: ${manifestResponse.status}`);
+    const manifest = await manifestResponse.json();
+    const files = shardsAround(lat, lon, manifest.precision)
+        .filter(prefix => manifest.shards[prefix]) // Cells without hospitals have no shard
+        .map(prefix => `${STATIC_SHARDS_URL}/${manifest.shards[prefix].file}`);
+    console.log(`Fetching ${files.length} hospital shards:`, files);
+    const shards = await Promise.all(files.map(fetchShard));
+
+    const suitable = [];
+    for (const shard of shards) {
+        for (const [id, name, hospitalLon, hospitalLat, icu, specialists, equipment] of shard.hospitals) {
+            const hospital = {
+                id, name, location: { type: 'Point', coordinates: [hospitalLon, hospitalLat] }, hasICU: icu === 1,
+                specialists: specialists.map(i => shard.specialists[i]), equipment: equipment.map(i => shard.equipment[i])
+            };
+            if (!matchesNeeds(hospital, medicalNeeds)) continue;
+            const distance = haversineKm(lat, lon, hospitalLat, hospitalLon);
+            if (distance <= SHARD_SEARCH_RADIUS_KM) suitable.push({ ...hospital, distance_km: Math.round(distance * 100) / 100 });
+        }
+    }
+    return suitable.sort((a, b) => a.distance_km - b.distance_km).slice(0, SHARD_MAX_RESULTS);
+}
+
 // --- Map and UI Functions ---
 
 function initializeMap(centerLat, centerLng) {
@@ -264,8 +357,8 @@ async function initializeApp() {
     const detailsText = localStorage.getItem('patientDetails') || '';
     console.log("Retrieved from localStorage:", { selectedCondition, detailsText });
 
-    const medicalNeeds = analyzePatientCondition(selectedCondition, detailsText);
-    console.log("Analyzed Medical Needs:", medicalNeeds);
+    // Needs come from /api/triage-search; analyzePatientCondition (same rules) only runs when the backend can't be reached
+    let medicalNeeds = null;
 
     if (navigator.geolocation) {
         navigator.geolocation.getCurrentPosition(
@@ -279,38 +372,52 @@ async function initializeApp() {
                 initializeMap(userLocation.lat, userLocation.lng);
                 addUserMarker(userLocation.lat, userLocation.lng);
 
-                // --- FETCH Hospitals from Backend API ---
-                const apiUrl = `${API_BASE_URL}/api/find-suitable`;
-                const params = new URLSearchParams({
-                    lat: userLocation.lat.toString(),
-                    lon: userLocation.lng.toString(),
-                });
-                // Append optional params based on medicalNeeds
-                if (medicalNeeds.needsICU) params.append('needsICU', 'true');
-                if (medicalNeeds.needsSpecialist) params.append('specialist', medicalNeeds.needsSpecialist);
-                if (medicalNeeds.requiredEquipment?.length > 0) {
-                    medicalNeeds.requiredEquipment.forEach(eq => params.append('equipment', eq));
-                }
+                // --- FETCH Needs + Hospitals from Backend API (one request) ---
+                const apiUrl = `${API_BASE_URL}/api/triage-search`;
+                const payload = {
+                    lat: userLocation.lat,
+                    lon: userLocation.lng,
+                    condition: selectedCondition,
+                    details: detailsText || null,
+                };
 
                 let suitableHospitalsList = [];
                 try {
-                    console.log(`Fetching: ${apiUrl}?${params.toString()}`);
-                    const response = await fetch(`${apiUrl}?${params.toString()}`);
+                    console.log(`Fetching: ${apiUrl}`, payload);
+                    const response = await fetch(apiUrl, {
+                        method: 'POST',
+                        headers: { 'Content-Type': 'application/json' },
+                        body: JSON.stringify(payload),
+                    });
 
                     if (!response.ok) {
                         const errorData = await response.text(); // Get error details from server if possible
                         console.error(`API Error Response: ${errorData}`);
                         throw new Error(`API request failed! Status: ${response.status}`);
                     }
-                    suitableHospitalsList = await response.json();
-                    console.log("Received Hospitals from API:", suitableHospitalsList);
+                    const triage = await response.json();
+                    medicalNeeds = triage.needs; // Server-side assessment (same rules as analyzePatientCondition)
+                    suitableHospitalsList = triage.hospitals;
+                    console.log("Received Needs and Hospitals from API:", triage);
 
                 } catch (error) {
                     console.error("Error fetching hospitals from API:", error);
-                    alert(`Could not fetch hospital data: ${error.message}. Please ensure the backend server is running and accessible.`);
-                    displayInfo(null, medicalNeeds, null); // Show error in info panel
-                    hideLoadingScreen();
-                    return; // Stop processing
+                    medicalNeeds = analyzePatientCondition(selectedCondition, detailsText);
+                    console.log("Analyzed Medical Needs locally:", medicalNeeds);
+                    // Offline / static hosting: search the exported shards with the local needs assessment
+                    const shardHospitals = STATIC_SHARDS_URL === null ? null
+                        : await findHospitalsFromShards(userLocation.lat, userLocation.lng, medicalNeeds).catch(shardError => {
+                            console.error("Error searching static hospital shards:", shardError);
+                            return null;
+                        });
+                    if (shardHospitals === null) {
+                        alert(`Could not fetch hospital data: ${error.message}. Please ensure the backend server is running and accessible.`);
+                        displayInfo(null, medicalNeeds, null); // Show error in info panel
+                        hideLoadingScreen();
+                        return; // Stop processing
+                    }
+                    suitableHospitalsList = shardHospitals;
+                    console.log("Using hospitals from static shards:", suitableHospitalsList);
                 }
                 // --- END FETCH ---
 
@@ -337,7 +444,7 @@ async function initializeApp() {
                 alert(`Geolocation Error: ${error.message}. Cannot determine nearby hospitals.`);
                 const defaultLocation = { lat: 19.0760, lng: 72.8777 }; // Fallback location
                 initializeMap(defaultLocation.lat, defaultLocation.lng);
-                displayInfo(null, medicalNeeds, null); // Show error panel
+                displayInfo(null, null, null); // Show error panel
                 hideLoadingScreen();
             },
             { enableHighAccuracy: true, timeout: 15000, maximumAge: 0 } // Geolocation options
@@ -347,7 +454,7 @@ async function initializeApp() {
         alert("Geolocation is not supported. Cannot find hospitals.");
         const defaultLocation = { lat: 19.0760, lng: 72.8777 };
         initializeMap(defaultLocation.lat, defaultLocation.lng);
-        displayInfo(null, medicalNeeds, null); // Show error panel
+        displayInfo(null, null, null); // Show error panel
         hideLoadingScreen();
     }
 }